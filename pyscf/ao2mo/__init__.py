@@ -17,9 +17,11 @@ Simple usage::
 import tempfile
 import numpy
 import h5py
+from pyscf import lib
 from pyscf.ao2mo import incore
 from pyscf.ao2mo import outcore
 from pyscf.ao2mo import r_outcore
+from pyscf.ao2mo import cache
 
 from pyscf.ao2mo.addons import load, restore
 
@@ -143,7 +145,7 @@ def full(eri_or_mol, mo_coeff, *args, **kwargs):
 
         fn = getattr(mod, 'full_iofree')
         if len(args) > 0:
-            if isinstance(args[0], (str, h5py.Group)): # args[0] is erifile
+            if isinstance(args[0], (str, h5py.Group, lib.MMapGroup)): # args[0] is erifile
                 fn = getattr(mod, 'full')
             elif isinstance(args[0], tempfile._TemporaryFileWrapper):
                 fn = getattr(mod, 'full')
@@ -298,7 +300,7 @@ def general(eri_or_mol, mo_coeffs, *args, **kwargs):
 
         fn = getattr(mod, 'general_iofree')
         if len(args) > 0:
-            if isinstance(args[0], (str, h5py.Group)): # args[0] is erifile
+            if isinstance(args[0], (str, h5py.Group, lib.MMapGroup)): # args[0] is erifile
                 fn = getattr(mod, 'general')
             elif isinstance(args[0], tempfile._TemporaryFileWrapper):
                 fn = getattr(mod, 'general')
@@ -24,7 +24,10 @@ class load(object):
         self.feri = None
 
     def __enter__(self):
-        if isinstance(self.eri, str):
+        if pyscf.lib.mmapfile.is_mmapfile(self.eri):
+            self.feri = pyscf.lib.MMapFile(self.eri, 'r')
+            return self.feri[self.dataname]
+        elif isinstance(self.eri, str):
             self.feri = h5py.File(self.eri, 'r')
             return self.feri[self.dataname]
         elif (hasattr(self.eri, 'read') or #isinstance(self.eri, file) or
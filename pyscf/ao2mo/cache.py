@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+
+'''
+Cache of MO integrals
+=====================
+
+The post-HF methods (MP2, CCSD, CISD, NEVPT2, ...) which are applied to the
+same reference repeat the same AO->MO integral transformation.  The cache
+keeps the transformed MO integrals, keyed by the hash of the AO integrals
+(the content of the AO integral array, or the Mole object and the integral
+name), the hash of the orbital coefficients and the permutation symmetry.
+The least recently used blocks are moved to a temporary HDF5 file when the
+in-memory cache exceeds :attr:`MAX_MEMORY`.
+
+A block which is not in the cache can be extracted from a cached full
+transformation if its orbitals are columns of the orbitals of the full
+transformation, e.g. the (ov|ov) block of MP2 is taken from the (pq|rs)
+integrals of CCSD.
+
+The cache is disabled by default.  It can be enabled with environment
+PYSCF_MO_CACHE=1 or
+
+>>> from pyscf import ao2mo
+>>> ao2mo.cache.enable(max_memory=8000)
+>>> mp.MP2(mf).run()
+>>> cc.CCSD(mf).run()  # (pq|rs) is transformed and cached
+>>> ci.CISD(mf).run()  # (pq|rs) is loaded from the cache
+'''
+
+import os
+import sys
+import hashlib
+import collections
+import numpy
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf.ao2mo import incore
+from pyscf.ao2mo import outcore
+
+# Enable the cache by default with environment PYSCF_MO_CACHE=1
+ENABLED = os.environ.get('PYSCF_MO_CACHE', '0') not in ('', '0')
+# Size (in MB) of the MO integrals held in memory
+MAX_MEMORY = 4000
+# Size (in MB) of the MO integrals held on disk
+MAX_DISK = 40000
+
+def hash_array(*arrays):
+    '''SHA1 digest of the content of the arrays'''
+    h = hashlib.sha1()
+    for a in arrays:
+        a = numpy.asarray(a)
+        h.update(str((a.dtype.str, a.shape)).encode())
+        h.update(numpy.ascontiguousarray(a).view(numpy.uint8).ravel())
+    return h.hexdigest()
+
+def hash_eri_source(eri_or_mol, intor='int2e', aosym='s4', comp=1):
+    '''Hash of the AO integrals.  For Mole object, the hash is determined
+    by the basis and geometry and the integral name.'''
+    if isinstance(eri_or_mol, numpy.ndarray):
+        return hash_array(eri_or_mol)
+    else:
+        mol = eri_or_mol
+        intor = mol._add_suffix(intor)
+        return hash_array(mol._atm, mol._bas, mol._env,
+                          numpy.frombuffer(str((intor, aosym, comp)).encode(),
+                                           dtype=numpy.uint8))
+
+def _hash_columns(c):
+    return [hash_array(c[:,k]) for k in range(c.shape[1])]
+
+
+class MOIntegralCache(object):
+    '''LRU cache of MO integrals.
+
+    Attributes:
+        max_memory : float
+            Size (in MB) of the integrals held in memory.  The least
+            recently used integrals are moved to disk beyond this size.
+        max_disk : float
+            Size (in MB) of the integrals held on disk.  The least recently
+            used integrals are discarded beyond this size.
+        hits, misses : int
+            Statistics of the lookups.
+    '''
+    def __init__(self, max_memory=MAX_MEMORY, max_disk=MAX_DISK):
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.hits = 0
+        self.misses = 0
+        self._mem = collections.OrderedDict()
+        self._disk = collections.OrderedDict()
+        self._h5 = None
+        # source hash -> {key: (tril, nmo, column-hash -> index)} of the full
+        # transformations, to look up the sub-blocks
+        self._full = {}
+
+    def __len__(self):
+        return len(self._mem) + len(self._disk)
+
+    def __contains__(self, key):
+        return key in self._mem or key in self._disk
+
+    def memory_usage(self):
+        '''Sizes (in MB) of the integrals in memory and on disk'''
+        return (sum(x.nbytes for x in self._mem.values()) / 1e6,
+                sum(self._disk.values()) / 1e6)
+
+    def clear(self):
+        self._mem.clear()
+        self._disk.clear()
+        self._full.clear()
+        if self._h5 is not None:
+            self._h5.close()
+            self._h5 = None
+
+    def make_key(self, source, mo_coeffs, compact=True):
+        return (source, tuple(hash_array(c) for c in mo_coeffs), bool(compact))
+
+    def get(self, key):
+        '''The cached integrals or None.  The returned array is read-only.'''
+        if key in self._mem:
+            eri = self._mem.pop(key)
+            self._mem[key] = eri
+            return eri
+        elif key in self._disk:
+            eri = numpy.asarray(self._h5[self._dataname(key)])
+            if eri.nbytes <= self.max_memory*1e6:
+                self._discard_disk(key)
+                self.put(key, eri)
+            else:
+                self._disk[key] = self._disk.pop(key)
+                eri.flags.writeable = False
+            return eri
+        return None
+
+    def put(self, key, eri):
+        eri = numpy.asarray(eri)
+        eri.flags.writeable = False
+        if eri.nbytes > self.max_memory*1e6:
+            self._spill(key, eri)
+            return
+        self._mem[key] = eri
+        size = sum(x.nbytes for x in self._mem.values())
+        while size > self.max_memory*1e6 and self._mem:
+            k, v = self._mem.popitem(last=False)
+            size -= v.nbytes
+            self._spill(k, v)
+
+    def _dataname(self, key):
+        return hash_array(numpy.frombuffer(str(key).encode(), dtype=numpy.uint8))
+
+    def _spill(self, key, eri):
+        if eri.nbytes > self.max_disk*1e6:
+            self._forget(key)
+            return
+        while (self._disk and
+               sum(self._disk.values()) + eri.nbytes > self.max_disk*1e6):
+            k = next(iter(self._disk))
+            self._discard_disk(k)
+            self._forget(k)
+        if self._h5 is None:
+            self._h5 = lib.H5TmpFile()
+        self._h5[self._dataname(key)] = eri
+        self._disk[key] = eri.nbytes
+
+    def _discard_disk(self, key):
+        del(self._h5[self._dataname(key)])
+        del(self._disk[key])
+
+    def _forget(self, key):
+        fulls = self._full.get(key[0], {})
+        if key in fulls:
+            del(fulls[key])
+
+    def _register_full(self, key, mo_coeff, compact):
+        colidx = dict((h, k) for k, h in enumerate(_hash_columns(mo_coeff)))
+        self._full.setdefault(key[0], {})[key] = (compact, mo_coeff.shape[1],
+                                                  colidx)
+
+    def _find_block(self, source, mo_coeffs, compact):
+        '''Extract the integrals from a cached full transformation if the
+        orbitals are the columns of the full transformation.'''
+        for key, (tril, nmo, colidx) in self._full.get(source, {}).items():
+            if key not in self:
+                continue
+            ranges = []
+            for c in mo_coeffs:
+                idx = [colidx.get(h, -1) for h in _hash_columns(c)]
+                if (len(idx) == 0 or idx[0] < 0 or
+                    idx != list(range(idx[0], idx[0]+len(idx)))):
+                    break
+                ranges.append(numpy.arange(idx[0], idx[0]+len(idx)))
+            else:
+                rows = _pair_index(ranges[0], ranges[1], nmo, tril,
+                                   compact and incore.iden_coeffs(*mo_coeffs[:2]))
+                cols = _pair_index(ranges[2], ranges[3], nmo, tril,
+                                   compact and incore.iden_coeffs(*mo_coeffs[2:]))
+                if key in self._mem:
+                    self._mem[key] = self._mem.pop(key)
+                    return lib.take_2d(self._mem[key], rows, cols)
+                else:
+                    return _take_2d_h5(self._h5[self._dataname(key)], rows, cols)
+        return None
+
+    def general(self, eri_or_mol, mo_coeffs, compact=True, verbose=None,
+                **kwargs):
+        '''Look up or transform the MO integrals.  AO integrals in ndarray
+        are transformed with :func:`incore.general`, Mole object with
+        :func:`outcore.general_iofree`.  kwargs are passed to
+        :func:`outcore.general_iofree`.
+        '''
+        if isinstance(verbose, logger.Logger):
+            log = verbose
+        else:
+            log = logger.Logger(getattr(eri_or_mol, 'stdout', sys.stdout),
+                                verbose or logger.WARN)
+        intor = kwargs.get('intor', 'int2e')
+        aosym = kwargs.get('aosym', 's4')
+        comp = kwargs.get('comp', 1)
+        source = hash_eri_source(eri_or_mol, intor, aosym, comp)
+        key = self.make_key(source, mo_coeffs, compact)
+        eri = self.get(key)
+        if eri is not None:
+            self.hits += 1
+            log.debug('MO integrals found in cache')
+            return eri
+
+        if comp == 1:
+            eri = self._find_block(source, mo_coeffs, compact)
+        if eri is not None:
+            self.hits += 1
+            log.debug('MO integrals extracted from the cached full transformation')
+        else:
+            self.misses += 1
+            if isinstance(eri_or_mol, numpy.ndarray):
+                eri = incore.general(eri_or_mol, mo_coeffs, compact=compact)
+            else:
+                if 'intor' not in kwargs:
+                    kwargs['intor'] = eri_or_mol._add_suffix('int2e')
+                eri = outcore.general_iofree(eri_or_mol, mo_coeffs,
+                                             compact=compact, **kwargs)
+            if (comp == 1 and all(incore.iden_coeffs(mo_coeffs[0], c)
+                                  for c in mo_coeffs[1:])):
+                self._register_full(key, mo_coeffs[0], compact)
+        self.put(key, eri)
+        return eri
+
+    def full(self, eri_or_mol, mo_coeff, compact=True, verbose=None, **kwargs):
+        return self.general(eri_or_mol, (mo_coeff,)*4, compact, verbose, **kwargs)
+
+def _pair_index(p, q, nmo, tril, compact):
+    '''Row indices of the pairs (p,q) in the MO integrals of nmo orbitals.
+    If compact, only the pairs p >= q are included.'''
+    if compact:
+        p, q = p[numpy.tril_indices(len(p))[0]], q[numpy.tril_indices(len(q))[1]]
+    else:
+        p, q = numpy.repeat(p, len(q)), numpy.tile(q, len(p))
+    if tril:
+        pmax = numpy.maximum(p, q)
+        return pmax*(pmax+1)//2 + numpy.minimum(p, q)
+    else:
+        return p * nmo + q
+
+def _take_2d_h5(dset, rows, cols, blksize=160):
+    out = numpy.empty((len(rows),len(cols)))
+    order = numpy.argsort(rows)
+    rows = rows[order]
+    for p0, p1 in lib.prange(0, len(rows), blksize):
+        r0 = rows[p0]
+        buf = numpy.asarray(dset[r0:rows[p1-1]+1])
+        out[order[p0:p1]] = lib.take_2d(buf, rows[p0:p1]-r0, cols)
+    return out
+
+
+_default = None
+def default_cache():
+    global _default
+    if _default is None:
+        _default = MOIntegralCache()
+    return _default
+
+def enable(max_memory=None, max_disk=None):
+    '''Enable the MO integral cache in the post-HF methods'''
+    global ENABLED
+    ENABLED = True
+    cache = default_cache()
+    if max_memory is not None:
+        cache.max_memory = max_memory
+    if max_disk is not None:
+        cache.max_disk = max_disk
+    return cache
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def clear():
+    if _default is not None:
+        _default.clear()
+
+def general(eri_or_mol, mo_coeffs, compact=True, verbose=None, **kwargs):
+    '''Same to :func:`incore.general` (or :func:`outcore.general_iofree` if
+    Mole object is given) when the cache is disabled.  Otherwise the MO
+    integrals are looked up in the cache first.  The MO integrals returned
+    from the cache are read-only.
+    '''
+    if ENABLED:
+        return default_cache().general(eri_or_mol, mo_coeffs, compact,
+                                       verbose, **kwargs)
+    elif isinstance(eri_or_mol, numpy.ndarray):
+        return incore.general(eri_or_mol, mo_coeffs, compact=compact)
+    else:
+        if 'intor' not in kwargs:
+            kwargs['intor'] = eri_or_mol._add_suffix('int2e')
+        return outcore.general_iofree(eri_or_mol, mo_coeffs, compact=compact,
+                                      **kwargs)
+
+def full(eri_or_mol, mo_coeff, compact=True, verbose=None, **kwargs):
+    return general(eri_or_mol, (mo_coeff,)*4, compact, verbose, **kwargs)
@@ -16,6 +16,10 @@ from pyscf.ao2mo import incore
 IOBUF_WORDS_PREFER = 1e8 # 800 MB
 IOBLK_SIZE = 256  # MB
 IOBUF_ROW_MIN = 160
+# Number of AO integral blocks generated ahead of the MO transformation on a
+# background thread in half_e1.  0 to generate and transform serially.  The
+# background thread runs the integral kernel on one OpenMP thread.
+PIPELINE_DEPTH = 1
 
 def full(mol, mo_coeff, erifile, dataname='eri_mo', tmpdir=None,
          intor='int2e_sph', aosym='s4', comp=1,
@@ -230,14 +234,18 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo', tmpdir=None,
 #        log.warn('low efficiency for AO to MO trans!')
 
     if isinstance(erifile, str):
-        if h5py.is_hdf5(erifile):
+        if lib.mmapfile.is_mmapfile(erifile):
+            feri = lib.MMapFile(erifile)
+            if dataname in feri:
+                del(feri[dataname])
+        elif h5py.is_hdf5(erifile):
             feri = h5py.File(erifile)
             if dataname in feri:
                 del(feri[dataname])
         else:
             feri = h5py.File(erifile, 'w')
     else:
-        assert(isinstance(erifile, h5py.Group))
+        assert(isinstance(erifile, (h5py.Group, lib.MMapGroup)))
         feri = erifile
     if comp == 1:
         chunks = (nmoj,nmol)
@@ -259,8 +267,11 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo', tmpdir=None,
 # transform e1
     if tmpdir is None:
         tmpdir = lib.param.TMPDIR
-    swapfile = tempfile.NamedTemporaryFile(dir=tmpdir)
-    fswap = h5py.File(swapfile.name, 'w')
+    if lib.param.STORAGE_BACKEND == 'mmap':
+        fswap = lib.MMapTmpFile(dir=tmpdir)
+    else:
+        swapfile = tempfile.NamedTemporaryFile(dir=tmpdir)
+        fswap = h5py.File(swapfile.name, 'w')
     half_e1(mol, mo_coeffs, fswap, intor, aosym, comp, max_memory, ioblk_size,
             log, compact)
 
@@ -409,6 +420,9 @@ def half_e1(mol, mo_coeffs, swapfile,
 # The buffer to hold AO integrals in C code, see line (@)
     aobuflen = max(int((mem_words - 2*comp*e1buflen*nij_pair) // (nao_pair*comp)),
                    IOBUF_ROW_MIN)
+# The AO integrals are generated in a ring of (PIPELINE_DEPTH+2) buffers
+    nfillbuf = PIPELINE_DEPTH + 2 if PIPELINE_DEPTH > 0 else 1
+    aobuflen = max(aobuflen//nfillbuf, IOBUF_ROW_MIN)
     shranges = guess_shell_ranges(mol, (aosym in ('s4', 's2kl')), e1buflen, aobuflen)
     if ao2mopt is None:
         if intor in ('int2e_sph', 'int2e_cart'):
@@ -431,38 +445,52 @@ def half_e1(mol, mo_coeffs, swapfile,
     e1buflen = max([x[2] for x in shranges])
 
     e2buflen, chunks = guess_e2bufsize(ioblk_size, nij_pair, e1buflen)
+# save runs on a background thread, next to the OpenMP kernels of the main
+# thread.  Its transpose is limited to one thread.
     def save(istep, iobuf):
-        for icomp in range(comp):
-            _transpose_to_h5g(fswap, '%d/%d'%(icomp,istep), iobuf[icomp],
-                              e2buflen, None)
+        with lib.with_omp_threads(1):
+            for icomp in range(comp):
+                _transpose_to_h5g(fswap, '%d/%d'%(icomp,istep), iobuf[icomp],
+                                  e2buflen, None)
 
     # transform e1
     ti0 = log.timer('Initializing ao2mo.outcore.half_e1', *time0)
-    with lib.call_in_background(save) as async_write:
-        buf1 = numpy.empty((comp*e1buflen,nao_pair))
-        buf2 = numpy.empty((comp*e1buflen,nij_pair))
-        buf_write = numpy.empty_like(buf2)
-        fill = _ao2mo.nr_e1fill
-        f_e1 = _ao2mo.nr_e1
+    fill = _ao2mo.nr_e1fill
+    f_e1 = _ao2mo.nr_e1
+    aobuflen = max([aoshs[2] for x in shranges for aoshs in x[3]])
+    def gen_ao_blocks():
+        bufs = [numpy.empty((comp*aobuflen,nao_pair)) for i in range(nfillbuf)]
+        k = 0
         for istep,sh_range in enumerate(shranges):
-            log.debug1('step 1 [%d/%d], AO [%d:%d], len(buf) = %d', \
-                       istep+1, nstep, *(sh_range[:3]))
-            buflen = sh_range[2]
-            iobuf = numpy.ndarray((comp,buflen,nij_pair), buffer=buf2)
-            nmic = len(sh_range[3])
-            p1 = 0
             for imic, aoshs in enumerate(sh_range[3]):
-                log.debug2('      fill iobuf micro [%d/%d], AO [%d:%d], len(aobuf) = %d',
-                           imic+1, nmic, *aoshs)
                 buf = fill(intor, aoshs, mol._atm, mol._bas, mol._env,
-                           aosym, comp, ao2mopt, out=buf1).reshape(-1,nao_pair)
-                buf = f_e1(buf, moij, ijshape, aosym, ijmosym)
-                p0, p1 = p1, p1 + aoshs[2]
-                iobuf[:,p0:p1] = buf.reshape(comp,aoshs[2],nij_pair)
-            ti0 = log.timer_debug1('gen AO/transform MO [%d/%d]'%(istep+1,nstep), *ti0)
+                           aosym, comp, ao2mopt, out=bufs[k%nfillbuf])
+                k += 1
+                yield istep, imic, aoshs, buf.reshape(-1,nao_pair)
 
-            async_write(istep, iobuf)
-            buf2, buf_write = buf_write, buf2
+    with lib.call_in_background(save) as async_write:
+        buf2 = numpy.empty((comp*e1buflen,nij_pair))
+        buf_write = numpy.empty_like(buf2)
+        for istep, imic, aoshs, buf in lib.prefetch_generator(gen_ao_blocks(),
+                                                              PIPELINE_DEPTH):
+            sh_range = shranges[istep]
+            nmic = len(sh_range[3])
+            if imic == 0:
+                log.debug1('step 1 [%d/%d], AO [%d:%d], len(buf) = %d', \
+                           istep+1, nstep, *(sh_range[:3]))
+                buflen = sh_range[2]
+                iobuf = numpy.ndarray((comp,buflen,nij_pair), buffer=buf2)
+                p1 = 0
+            log.debug2('      fill iobuf micro [%d/%d], AO [%d:%d], len(aobuf) = %d',
+                       imic+1, nmic, *aoshs)
+            buf = f_e1(buf, moij, ijshape, aosym, ijmosym)
+            p0, p1 = p1, p1 + aoshs[2]
+            iobuf[:,p0:p1] = buf.reshape(comp,aoshs[2],nij_pair)
+
+            if imic+1 == nmic:
+                ti0 = log.timer_debug1('gen AO/transform MO [%d/%d]'%(istep+1,nstep), *ti0)
+                async_write(istep, iobuf)
+                buf2, buf_write = buf_write, buf2
 
     if isinstance(swapfile, str):
         fswap.close()
@@ -470,19 +498,30 @@ def half_e1(mol, mo_coeffs, swapfile,
 
 def _load_from_h5g(h5group, row0, row1, out):
     nrow = row1 - row0
+    if nrow <= 0:
+        return out
     col0 = 0
     for key in range(len(h5group)):
-        dat = h5group[str(key)][row0:row1]
+        dat = h5group[str(key)]
         col1 = col0 + dat.shape[1]
-        out[:nrow,col0:col1] = dat
+        if isinstance(dat, numpy.ndarray) or not out.flags.c_contiguous:
+            # memory-mapped dataset is copied from the page cache
+            out[:nrow,col0:col1] = dat[row0:row1]
+        else:
+            # avoid the intermediate array of h5py reads
+            dat.read_direct(out, numpy.s_[row0:row1], numpy.s_[:nrow,col0:col1])
         col0 = col1
     return out
 
 def _transpose_to_h5g(h5group, key, dat, blksize, chunks=None):
     nrow, ncol = dat.shape
     dset = h5group.create_dataset(key, (ncol,nrow), 'f8', chunks=chunks)
-    for col0, col1 in prange(0, ncol, blksize):
-        dset[col0:col1] = lib.transpose(dat[:,col0:col1])
+    if isinstance(dset, numpy.ndarray) and dat.flags.c_contiguous:
+        # transpose to the mapped memory of the dataset
+        lib.transpose(dat, out=dset)
+    else:
+        for col0, col1 in prange(0, ncol, blksize):
+            dset[col0:col1] = lib.transpose(dat[:,col0:col1])
 
 def full_iofree(mol, mo_coeff, intor='int2e_sph', aosym='s4', comp=1,
                 max_memory=2000, ioblk_size=IOBLK_SIZE, verbose=logger.WARN, compact=True):
@@ -64,7 +64,7 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo', tmpdir=None,
         else:
             feri = h5py.File(erifile, 'w')
     else:
-        assert(isinstance(erifile, h5py.Group))
+        assert(isinstance(erifile, (h5py.Group, lib.MMapGroup)))
         feri = erifile
     if comp == 1:
         chunks = (nmoj,nmol)
@@ -105,39 +105,59 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo', tmpdir=None,
     ao_loc = numpy.asarray(mol.ao_loc_2c(), dtype=numpy.int32)
     tao = numpy.asarray(mol.tmap(), dtype=numpy.int32)
     ti0 = time_1pass
+
+    def load_buf(icomp, row0, row1, buf):
+        col0 = 0
+        for ic in range(klaoblks):
+            dat = fswap['%d/%d'%(icomp,ic)]
+            col1 = col0 + dat.shape[1]
+            buf[:row1-row0,col0:col1] = dat[row0:row1]
+            col0 = col1
+
+    def load(icomp, row0, row1, buf):
+        if icomp+1 < comp:
+            icomp += 1
+        else:  # move to next row-block
+            row0, row1 = row1, min(nij_pair, row1+e2buflen)
+            icomp = 0
+        if row0 < row1:
+            load_buf(icomp, row0, row1, buf)
+
+    def save(icomp, row0, row1, buf):
+        if comp == 1:
+            h5d_eri[row0:row1] = buf[:row1-row0]
+        else:
+            h5d_eri[icomp,row0:row1] = buf[:row1-row0]
+
     buf = numpy.empty((e2buflen, nao_pair), dtype=numpy.complex)
+    buf_prefetch = numpy.empty_like(buf)
+    outbuf = numpy.empty((e2buflen, nkl_pair), dtype=numpy.complex)
+    buf_write = numpy.empty_like(outbuf)
     istep = 0
-    for row0, row1 in prange(0, nij_pair, e2buflen):
-        nrow = row1 - row0
-
-        for icomp in range(comp):
-            istep += 1
-            tioi = 0
-            log.debug('step 2 [%d/%d], [%d,%d:%d], row = %d', \
-                      istep, ijmoblks, icomp, row0, row1, nrow)
-
-            col0 = 0
-            for ic in range(klaoblks):
-                dat = fswap['%d/%d'%(icomp,ic)]
-                col1 = col0 + dat.shape[1]
-                buf[:nrow,col0:col1] = dat[row0:row1]
-                col0 = col1
-            ti2 = log.timer('step 2 [%d/%d], load buf'%(istep,ijmoblks), *ti0)
-            tioi += ti2[1]-ti0[1]
-            pbuf = _ao2mo.r_e2(buf[:nrow], mokl, klshape, tao, ao_loc, aosym)
-
-            tw1 = time.time()
-            if comp == 1:
-                h5d_eri[row0:row1] = pbuf
-            else:
-                h5d_eri[icomp,row0:row1] = pbuf
-            tioi += time.time()-tw1
-
-            ti1 = (time.clock(), time.time())
-            log.debug('step 2 [%d/%d] CPU time: %9.2f, Wall time: %9.2f, I/O time: %9.2f', \
-                      istep, ijmoblks, ti1[0]-ti0[0], ti1[1]-ti0[1], tioi)
-            ti0 = ti1
-    buf = pbuf = None
+    with lib.call_in_background(load) as prefetch:
+        with lib.call_in_background(save) as async_write:
+            load_buf(0, 0, min(nij_pair, e2buflen), buf_prefetch)
+
+            for row0, row1 in prange(0, nij_pair, e2buflen):
+                nrow = row1 - row0
+
+                for icomp in range(comp):
+                    istep += 1
+                    log.debug('step 2 [%d/%d], [%d,%d:%d], row = %d', \
+                              istep, ijmoblks, icomp, row0, row1, nrow)
+
+                    buf, buf_prefetch = buf_prefetch, buf
+                    prefetch(icomp, row0, row1, buf_prefetch)
+                    _ao2mo.r_e2(buf[:nrow], mokl, klshape, tao, ao_loc, aosym,
+                                out=outbuf)
+                    async_write(icomp, row0, row1, outbuf)
+                    outbuf, buf_write = buf_write, outbuf  # avoid flushing writing buffer
+
+                    ti1 = (time.clock(), time.time())
+                    log.debug('step 2 [%d/%d] CPU time: %9.2f, Wall time: %9.2f', \
+                              istep, ijmoblks, ti1[0]-ti0[0], ti1[1]-ti0[1])
+                    ti0 = ti1
+    buf = buf_prefetch = outbuf = buf_write = None
     fswap.close()
     if isinstance(erifile, str):
         feri.close()
@@ -203,34 +223,42 @@ def half_e1(mol, mo_coeffs, swapfile,
 
     tao = numpy.asarray(mol.tmap(), dtype=numpy.int32)
 
+# save runs on a background thread, next to the OpenMP kernel r_e1 of the
+# main thread.  Its transpose is limited to one thread.
+    def save(istep, iobuf):
+        e2buflen, chunks = guess_e2bufsize(ioblk_size, nij_pair, iobuf.shape[1])
+        with lib.with_omp_threads(1):
+            for icomp in range(comp):
+                dset = fswap.create_dataset('%d/%d'%(icomp,istep),
+                                            (nij_pair,iobuf.shape[1]), 'c16',
+                                            chunks=None)
+                for col0, col1 in prange(0, nij_pair, e2buflen):
+                    dset[col0:col1] = lib.transpose(iobuf[icomp,:,col0:col1])
+
     # transform e1
     ti0 = log.timer('Initializing ao2mo.outcore.half_e1', *time0)
     nstep = len(shranges)
-    for istep,sh_range in enumerate(shranges):
-        log.debug('step 1 [%d/%d], AO [%d:%d], len(buf) = %d', \
-                  istep+1, nstep, *(sh_range[:3]))
-        buflen = sh_range[2]
-        iobuf = numpy.empty((comp,buflen,nij_pair), dtype=numpy.complex)
-        nmic = len(sh_range[3])
-        p0 = 0
-        for imic, aoshs in enumerate(sh_range[3]):
-            log.debug1('      fill iobuf micro [%d/%d], AO [%d:%d], len(aobuf) = %d', \
-                       imic+1, nmic, *aoshs)
-            buf = _ao2mo.r_e1(intor, moij, ijshape, aoshs,
-                              mol._atm, mol._bas, mol._env,
-                              tao, aosym, comp, ao2mopt)
-            iobuf[:,p0:p0+aoshs[2]] = buf
-            p0 += aoshs[2]
-        ti2 = log.timer('gen AO/transform MO [%d/%d]'%(istep+1,nstep), *ti0)
-
-        e2buflen, chunks = guess_e2bufsize(ioblk_size, nij_pair, buflen)
-        for icomp in range(comp):
-            dset = fswap.create_dataset('%d/%d'%(icomp,istep),
-                                        (nij_pair,iobuf.shape[1]), 'c16',
-                                        chunks=None)
-            for col0, col1 in prange(0, nij_pair, e2buflen):
-                dset[col0:col1] = lib.transpose(iobuf[icomp,:,col0:col1])
-        ti0 = log.timer('transposing to disk', *ti2)
+    with lib.call_in_background(save) as async_write:
+        for istep,sh_range in enumerate(shranges):
+            log.debug('step 1 [%d/%d], AO [%d:%d], len(buf) = %d', \
+                      istep+1, nstep, *(sh_range[:3]))
+            buflen = sh_range[2]
+            iobuf = numpy.empty((comp,buflen,nij_pair), dtype=numpy.complex)
+            nmic = len(sh_range[3])
+            p0 = 0
+            for imic, aoshs in enumerate(sh_range[3]):
+                log.debug1('      fill iobuf micro [%d/%d], AO [%d:%d], len(aobuf) = %d', \
+                           imic+1, nmic, *aoshs)
+                buf = _ao2mo.r_e1(intor, moij, ijshape, aoshs,
+                                  mol._atm, mol._bas, mol._env,
+                                  tao, aosym, comp, ao2mopt)
+                iobuf[:,p0:p0+aoshs[2]] = buf
+                p0 += aoshs[2]
+            ti0 = log.timer('gen AO/transform MO [%d/%d]'%(istep+1,nstep), *ti0)
+
+# iobuf is allocated for each step.  It can be written to disk while the
+# integrals of the next step are generated.
+            async_write(istep, iobuf)
     fswap.close()
     return swapfile
 
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy
+from pyscf import gto
+from pyscf import ao2mo
+from pyscf.ao2mo import cache
+
+mol = gto.Mole()
+mol.verbose = 0
+mol.output = None
+mol.atom = '''
+      o     0    0.       0
+      h     0    -0.757   0.587
+      h     0    0.757    0.587'''
+mol.basis = 'cc-pvdz'
+mol.build()
+nao = mol.nao_nr()
+eri = mol.intor('int2e_sph', aosym='s8')
+
+class KnowValues(unittest.TestCase):
+    def test_lookup(self):
+        numpy.random.seed(1)
+        mo = numpy.random.random((nao,10))
+        mocache = cache.MOIntegralCache()
+        eri1 = mocache.full(eri, mo)
+        self.assertTrue(numpy.allclose(eri1, ao2mo.incore.full(eri, mo)))
+        self.assertTrue(mocache.full(eri, mo) is eri1)
+        self.assertFalse(eri1.flags.writeable)
+        self.assertEqual((mocache.hits, mocache.misses), (1, 1))
+
+        co, cv = mo[:,:4], mo[:,4:]
+        for compact in (True, False):
+            for mos in [(co,cv,co,cv), (co,co,cv,cv), (cv,co,cv,cv)]:
+                ref = ao2mo.incore.general(eri, mos, compact=compact)
+                self.assertTrue(numpy.allclose(mocache.general(eri, mos, compact), ref))
+        self.assertEqual(mocache.misses, 1)
+
+        mocache.full(mol, mo)
+        self.assertEqual(mocache.misses, 2)
+
+    def test_spill_to_disk(self):
+        numpy.random.seed(1)
+        mo1 = numpy.random.random((nao,10))
+        mo2 = numpy.random.random((nao,8))
+        mocache = cache.MOIntegralCache(max_memory=.03)
+        eri1 = mocache.full(eri, mo1)
+        eri2 = mocache.full(eri, mo2)
+        self.assertEqual(len(mocache._mem), 1)
+        self.assertEqual(len(mocache._disk), 1)
+        self.assertTrue(numpy.allclose(mocache.full(eri, mo1), eri1))
+        self.assertEqual(mocache.misses, 2)
+        mo3 = mo1[:,2:5]
+        self.assertTrue(numpy.allclose(mocache.full(eri, mo3),
+                                       ao2mo.incore.full(eri, mo3)))
+        self.assertEqual(mocache.misses, 2)
+        mocache.clear()
+        self.assertEqual(len(mocache), 0)
+
+if __name__ == "__main__":
+    print("Full Tests for ao2mo.cache")
+    unittest.main()
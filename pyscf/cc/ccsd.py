@@ -5,10 +5,8 @@
 
 import time
 import ctypes
-import tempfile
 from functools import reduce
 import numpy
-import h5py
 from pyscf import gto
 from pyscf import lib
 from pyscf.lib import logger
@@ -21,6 +19,7 @@ BLKMIN = 4
 
 # t2 as ijab
 
+@lib.profiler.timed('ccsd')
 def kernel(mycc, eris, t1=None, t2=None, max_cycle=50, tol=1e-8, tolnormt=1e-6,
            verbose=logger.INFO):
     log = logger.new_logger(mycc, verbose)
@@ -45,7 +44,8 @@ def kernel(mycc, eris, t1=None, t2=None, max_cycle=50, tol=1e-8, tolnormt=1e-6,
 
     conv = False
     for istep in range(max_cycle):
-        t1new, t2new = mycc.update_amps(t1, t2, eris)
+        with lib.profiler.region('update_amps'):
+            t1new, t2new = mycc.update_amps(t1, t2, eris)
         normt = numpy.linalg.norm(t1new-t1) + numpy.linalg.norm(t2new-t2)
         t1, t2 = t1new, t2new
         t1new = t2new = None
@@ -124,66 +124,100 @@ def update_amps(mycc, t1, t2, eris):
     buflen = max(nocc*nvir**2, nocc**3)
     bufs = numpy.empty((5,blksize*buflen))
     buf1, buf2, buf3, buf4, buf5 = bufs
+
+    def contract_ovvv_(eris_ovvv, p0, p1, q0, q1, wOoVv, wooVV, fvv):
+        #: tau = t2 + numpy.einsum('ia,jb->ijab', t1, t1)
+        #: tmp = numpy.einsum('ijcd,kcdb->ijbk', tau, eris.ovvv)
+        #: t2new += numpy.einsum('ka,ijbk->ijab', -t1, tmp)
+        if not mycc.direct:
+            eris_vovv = lib.transpose(eris_ovvv.reshape(-1,nvir))
+            eris_vovv = eris_vovv.reshape(nvir*(p1-p0),-1)
+            tmp = numpy.ndarray((nocc,nocc,nvir,p1-p0), buffer=buf1)
+            for j0, j1 in prange(0, nocc, blksize):
+                tau = numpy.ndarray((j1-j0,nocc,q1-q0,nvir), buffer=buf2)
+                tau = numpy.einsum('ia,jb->ijab', t1[j0:j1,q0:q1], t1, out=tau)
+                tau += t2[j0:j1,:,q0:q1]
+                lib.ddot(tau.reshape((j1-j0)*nocc,-1), eris_vovv.T, 1,
+                         tmp[j0:j1].reshape((j1-j0)*nocc,-1), 0)
+            tmp1 = numpy.ndarray((nocc,nocc,nvir,p1-p0), buffer=buf2)
+            tmp1[:] = tmp.transpose(1,0,2,3)
+            lib.ddot(tmp1.reshape(-1,p1-p0), t1[p0:p1], -1, t2new.reshape(-1,nvir), 1)
+            eris_vovv = tau = tmp1 = tmp = None
+
+        fvv += numpy.einsum('kc,kcba->ab', 2*t1[p0:p1,q0:q1], eris_ovvv)
+        fvv[:,q0:q1] += numpy.einsum('kc,kbca->ab', -t1[p0:p1], eris_ovvv)
+
+        #: wooVV -= numpy.einsum('jc,icba->ijba', t1, eris_ovvv)
+        tmp = t1[:,q0:q1].copy()
+        beta = 0 if q0 == 0 else 1
+        for i in range(eris_ovvv.shape[0]):
+            lib.ddot(tmp, eris_ovvv[i].reshape(q1-q0,-1), -1,
+                     wooVV[i].reshape(nocc,-1), beta)
+
+        #: wOoVv += numpy.einsum('ibac,jc->jiba', eris_ovvv, t1)
+        tmp = numpy.ndarray((nocc,p1-p0,q1-q0,nvir), buffer=buf1)
+        lib.ddot(t1, eris_ovvv.reshape(-1,nvir).T, 1, tmp.reshape(nocc,-1))
+        wOoVv[:,:,q0:q1] = tmp
+
+        #: theta = t2.transpose(1,0,2,3) * 2 - t2
+        #: t1new += numpy.einsum('ijcb,jcba->ia', theta, eris.ovvv)
+        theta = tmp
+        theta[:] = t2[p0:p1,:,q0:q1,:].transpose(1,0,2,3)
+        theta *= 2
+        theta -= t2[:,p0:p1,q0:q1,:]
+        lib.ddot(theta.reshape(nocc,-1), eris_ovvv.reshape(-1,nvir), 1, t1new, 1)
+
+    if mycc.direct_ovvv:
+        # ovvv is computed from AO integrals for a block of virtual orbitals
+        # (and all occupied orbitals) at a time, so that the AO integrals are
+        # evaluated once for each block.  The contributions to wOoVv and wooVV
+        # are held for all occupied orbitals until the loop below.
+        wOoVv_ovvv = numpy.empty((nocc,nocc,nvir,nvir))
+        wooVV_ovvv = numpy.empty((nocc,nocc,nvir,nvir))
+        nao = mycc.mo_coeff.shape[0]
+        max_memory = max(0, mycc.max_memory - lib.current_memory()[0])
+        blkq = nocc*(nao*(nao+1)//2+nvir_pair) + blksize*nvir**2
+        blkq = int(max_memory*.5e6/8/blkq)
+        blkq = min(nvir, max(BLKMIN, blkq))
+        log.debug1('direct ovvv blksize = %d', blkq)
+        ovvvbuf = numpy.empty((blksize,blkq,nvir,nvir))
+        for q0, q1 in lib.prange(0, nvir, blkq):
+            ovvv = eris.ovvv.build(eris.ovvv.orbo, eris.ovvv.orbv[:,q0:q1])
+            for p0, p1 in prange(0, nocc, blksize):
+                eris_ovvv = ovvv[p0:p1].reshape(-1,nvir_pair)
+                eris_ovvv = lib.unpack_tril(eris_ovvv, out=ovvvbuf)
+                eris_ovvv = eris_ovvv.reshape(p1-p0,q1-q0,nvir,nvir)
+                contract_ovvv_(eris_ovvv, p0, p1, q0, q1, wOoVv_ovvv[:,p0:p1],
+                               wooVV_ovvv[p0:p1], fvv)
+            ovvv = eris_ovvv = None
+            time1 = log.timer_debug1('direct ovvv [%d:%d]'%(q0, q1), *time1)
+        ovvvbuf = None
+
     for p0, p1 in prange(0, nocc, blksize):
     #: wOoVv += numpy.einsum('iabc,jc->ijab', eris.ovvv, t1)
     #: wOoVv -= numpy.einsum('jbik,ka->jiba', eris.ovoo, t1)
         wOoVv = numpy.ndarray((nocc,p1-p0,nvir,nvir), buffer=buf3)
         wooVV = numpy.ndarray((p1-p0,nocc,nvir,nvir), buffer=buf4)
-        readbuf = numpy.empty((p1-p0,blknvir,nvir_pair))
-        prefetchbuf = numpy.empty((p1-p0,blknvir,nvir_pair))
-        ovvvbuf = numpy.empty((p1-p0,blknvir,nvir,nvir))
-        with lib.call_in_background(load_ovvv) as prefetch_ovvv:
-            prefetchbuf[:] = eris.ovvv[p0:p1,0:min(nvir,blknvir)]
-            for q0, q1 in lib.prange(0, nvir, blknvir):
-                readbuf, prefetchbuf = prefetchbuf, readbuf
-                prefetch_ovvv(p0, p1, q0, q1, prefetchbuf)
-                eris_ovvv = numpy.ndarray(((p1-p0)*(q1-q0),nvir_pair), buffer=readbuf)
-                #:eris_ovvv = _cp(eris.ovvv[p0:p1,q0:q1])
-                eris_ovvv = lib.unpack_tril(eris_ovvv, out=ovvvbuf)
-                eris_ovvv = eris_ovvv.reshape(p1-p0,q1-q0,nvir,nvir)
-
-                #: tau = t2 + numpy.einsum('ia,jb->ijab', t1, t1)
-                #: tmp = numpy.einsum('ijcd,kcdb->ijbk', tau, eris.ovvv)
-                #: t2new += numpy.einsum('ka,ijbk->ijab', -t1, tmp)
-                if not mycc.direct:
-                    eris_vovv = lib.transpose(eris_ovvv.reshape(-1,nvir))
-                    eris_vovv = eris_vovv.reshape(nvir*(p1-p0),-1)
-                    tmp = numpy.ndarray((nocc,nocc,nvir,p1-p0), buffer=buf1)
-                    for j0, j1 in prange(0, nocc, blksize):
-                        tau = numpy.ndarray((j1-j0,nocc,q1-q0,nvir), buffer=buf2)
-                        tau = numpy.einsum('ia,jb->ijab', t1[j0:j1,q0:q1], t1, out=tau)
-                        tau += t2[j0:j1,:,q0:q1]
-                        lib.ddot(tau.reshape((j1-j0)*nocc,-1), eris_vovv.T, 1,
-                                 tmp[j0:j1].reshape((j1-j0)*nocc,-1), 0)
-                    tmp1 = numpy.ndarray((nocc,nocc,nvir,p1-p0), buffer=buf2)
-                    tmp1[:] = tmp.transpose(1,0,2,3)
-                    lib.ddot(tmp1.reshape(-1,p1-p0), t1[p0:p1], -1, t2new.reshape(-1,nvir), 1)
-                    eris_vovv = tau = tmp1 = tmp = None
-
-                fvv += numpy.einsum('kc,kcba->ab', 2*t1[p0:p1,q0:q1], eris_ovvv)
-                fvv[:,q0:q1] += numpy.einsum('kc,kbca->ab', -t1[p0:p1], eris_ovvv)
-
-                #: wooVV -= numpy.einsum('jc,icba->ijba', t1, eris_ovvv)
-                tmp = t1[:,q0:q1].copy()
-                for i in range(eris_ovvv.shape[0]):
-                    lib.ddot(tmp, eris_ovvv[i].reshape(q1-q0,-1), -1,
-                             wooVV[i].reshape(nocc,-1))
-
-                #: wOoVv += numpy.einsum('ibac,jc->jiba', eris_ovvv, t1)
-                tmp = numpy.ndarray((nocc,p1-p0,q1-q0,nvir), buffer=buf1)
-                lib.ddot(t1, eris_ovvv.reshape(-1,nvir).T, 1, tmp.reshape(nocc,-1))
-                wOoVv[:,:,q0:q1] = tmp
-
-                #: theta = t2.transpose(1,0,2,3) * 2 - t2
-                #: t1new += numpy.einsum('ijcb,jcba->ia', theta, eris.ovvv)
-                theta = tmp
-                theta[:] = t2[p0:p1,:,q0:q1,:].transpose(1,0,2,3)
-                theta *= 2
-                theta -= t2[:,p0:p1,q0:q1,:]
-                lib.ddot(theta.reshape(nocc,-1), eris_ovvv.reshape(-1,nvir), 1, t1new, 1)
-                theta = tmp = None
-        readbuf = prefetchbuf = ovvvbuf = eris_ovvv = None
-        time2 = log.timer_debug1('ovvv [%d:%d]'%(p0, p1), *time1)
+        if mycc.direct_ovvv:
+            wOoVv[:] = wOoVv_ovvv[:,p0:p1]
+            wooVV[:] = wooVV_ovvv[p0:p1]
+            time2 = time1
+        else:
+            readbuf = numpy.empty((p1-p0,blknvir,nvir_pair))
+            prefetchbuf = numpy.empty((p1-p0,blknvir,nvir_pair))
+            ovvvbuf = numpy.empty((p1-p0,blknvir,nvir,nvir))
+            with lib.call_in_background(load_ovvv) as prefetch_ovvv:
+                prefetchbuf[:] = eris.ovvv[p0:p1,0:min(nvir,blknvir)]
+                for q0, q1 in lib.prange(0, nvir, blknvir):
+                    readbuf, prefetchbuf = prefetchbuf, readbuf
+                    prefetch_ovvv(p0, p1, q0, q1, prefetchbuf)
+                    eris_ovvv = numpy.ndarray(((p1-p0)*(q1-q0),nvir_pair), buffer=readbuf)
+                    #:eris_ovvv = _cp(eris.ovvv[p0:p1,q0:q1])
+                    eris_ovvv = lib.unpack_tril(eris_ovvv, out=ovvvbuf)
+                    eris_ovvv = eris_ovvv.reshape(p1-p0,q1-q0,nvir,nvir)
+                    contract_ovvv_(eris_ovvv, p0, p1, q0, q1, wOoVv, wooVV, fvv)
+            readbuf = prefetchbuf = ovvvbuf = eris_ovvv = None
+            time2 = log.timer_debug1('ovvv [%d:%d]'%(p0, p1), *time1)
 
         tmp = numpy.ndarray((nocc,p1-p0,nvir,nocc), buffer=buf1)
         tmp[:] = _cp(eris.ovoo[p0:p1]).transpose(2,0,1,3)
@@ -335,6 +369,7 @@ def update_amps(mycc, t1, t2, eris):
         woVoV = t2ibja = tmp = None
         time1 = log.timer_debug1('contract occ [%d:%d]'%(p0, p1), *time1)
     buf1 = buf2 = buf3 = buf4 = buf5 = bufs = None
+    wOoVv_ovvv = wooVV_ovvv = None
     time1 = log.timer_debug1('contract loop', *time0)
 
     woooo = None
@@ -620,6 +655,11 @@ class CCSD(lib.StreamObject):
             The step to start DIIS.  Default is 0.
         direct : bool
             AO-direct CCSD. Default is False.
+        direct_ovvv : bool
+            Compute the ovvv integrals from AO integrals in every iteration
+            instead of storing them.  Together with direct=True, no MO
+            integrals with three or four virtual indices are stored and the
+            memory usage is O(nocc^2 nvir^2).  Default is False.
         frozen : int or list
             If integer is given, the inner-most orbitals are frozen from CC
             amplitudes.  Given the orbital indices (0-based) in a list, both
@@ -670,6 +710,7 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
 # FIXME: Should we avoid DIIS starting early?
         self.diis_start_energy_diff = 1e9
         self.direct = False
+        self.direct_ovvv = False
 
         self.frozen = frozen
 
@@ -723,6 +764,7 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
             log.info('frozen orbitals %s', str(self.frozen))
         log.info('max_cycle = %d', self.max_cycle)
         log.info('direct = %d', self.direct)
+        log.info('direct_ovvv = %d', self.direct_ovvv)
         log.info('conv_tol = %g', self.conv_tol)
         log.info('conv_tol_normt = %s', self.conv_tol_normt)
         log.info('diis_space = %d', self.diis_space)
@@ -798,12 +840,14 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
                                    verbose=self.verbose)
         return self.l1, self.l2
 
-    def ccsd_t(self, t1=None, t2=None, eris=None):
+    def ccsd_t(self, t1=None, t2=None, eris=None, **kwargs):
+        '''CCSD(T) correction.  See :func:`ccsd_t.kernel` for the kwargs
+        nproc and chkfile.'''
         from pyscf.cc import ccsd_t
         if t1 is None: t1 = self.t1
         if t2 is None: t2 = self.t2
         if eris is None: eris = self.ao2mo(self.mo_coeff)
-        return ccsd_t.kernel(self, eris, t1, t2, self.verbose)
+        return ccsd_t.kernel(self, eris, t1, t2, self.verbose, **kwargs)
 
     def make_rdm1(self, t1=None, t2=None, l1=None, l2=None):
         '''Un-relaxed 1-particle density matrix in MO space'''
@@ -920,10 +964,11 @@ class _ERIS:
         mem_now = lib.current_memory()[0]
 
         log = logger.Logger(cc.stdout, cc.verbose)
-        if (method == 'incore' and cc._scf._eri is not None and
-            (mem_incore+mem_now < cc.max_memory) or cc.mol.incore_anyway):
+        if (method == 'incore' and not cc.direct_ovvv and
+            cc._scf._eri is not None and
+            (mem_incore+mem_now < cc.max_memory or cc.mol.incore_anyway)):
             log.info('Build MO integrals with incore ao2mo')
-            eri1 = ao2mo.incore.full(cc._scf._eri, mo_coeff)
+            eri1 = ao2mo.cache.full(cc._scf._eri, mo_coeff)
             #:eri1 = ao2mo.restore(1, eri1, nmo)
             #:self.oooo = eri1[:nocc,:nocc,:nocc,:nocc].copy()
             #:self.ooov = eri1[:nocc,:nocc,:nocc,nocc:].copy()
@@ -1015,7 +1060,7 @@ class _ERIS:
         else:
             log.info('Build MO integrals with outcore ao2mo')
             cput1 = time.clock(), time.time()
-            self.feri1 = lib.H5TmpFile()
+            self.feri1 = lib.TmpFile()
             orbo = mo_coeff[:,:nocc]
             orbv = mo_coeff[:,nocc:]
             nvpair = nvir * (nvir+1) // 2
@@ -1024,7 +1069,10 @@ class _ERIS:
             self.ovoo = self.feri1.create_dataset('ovoo', (nocc,nvir,nocc,nocc), 'f8')
             self.oovv = self.feri1.create_dataset('oovv', (nocc,nocc,nvir,nvir), 'f8')
             self.ovov = self.feri1.create_dataset('ovov', (nocc,nvir,nocc,nvir), 'f8')
-            self.ovvv = self.feri1.create_dataset('ovvv', (nocc,nvir,nvpair), 'f8')
+            if cc.direct_ovvv:
+                self.ovvv = _DirectOVVV(cc, orbo, orbv)
+            else:
+                self.ovvv = self.feri1.create_dataset('ovvv', (nocc,nvir,nvpair), 'f8')
             fsort = _ccsd.libcc.CCsd_sort_inplace
             nocc_pair = nocc*(nocc+1)//2
             nvir_pair = nvir*(nvir+1)//2
@@ -1050,34 +1098,161 @@ class _ERIS:
 
             if not cc.direct:
                 max_memory = max(2000,cc.max_memory-lib.current_memory()[0])
-                self.feri2 = lib.H5TmpFile()
+                self.feri2 = lib.TmpFile()
                 ao2mo.full(cc.mol, orbv, self.feri2, max_memory=max_memory, verbose=log)
                 self.vvvv = self.feri2['eri_mo']
                 cput1 = log.timer_debug1('transforming vvvv', *cput1)
 
-            tmpfile3 = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
-            with h5py.File(tmpfile3.name, 'w') as feri:
-                max_memory = max(2000, cc.max_memory-lib.current_memory()[0])
-                mo = numpy.hstack((orbv, orbo))
-                ao2mo.general(cc.mol, (orbo,mo,mo,mo),
-                              feri, max_memory=max_memory, verbose=log)
-                cput1 = log.timer_debug1('transforming oppp', *cput1)
-                blksize = max(1, int(min(8e9,max_memory*.5e6)/8/nmo**2))
-
-                with lib.call_in_background(save_vir_frac,
-                                            save_occ_frac) as (sav_v, sav_o):
-                    for i in range(nocc):
-                        for p0, p1 in lib.prange(0, nvir, blksize):
-                            eri = _cp(feri['eri_mo'][i*nmo+p0:i*nmo+p1])
-                            sav_v(i, p0, p1, eri)
-                        for p0, p1 in lib.prange(0, nocc, blksize):
-                            eri = _cp(feri['eri_mo'][i*nmo+nvir+p0:i*nmo+nvir+p1])
-                            sav_o(i, p0, p1, eri)
-                        cput1 = log.timer_debug1('sorting %d'%i, *cput1)
-                for key in feri.keys():
-                    del(feri[key])
+            if cc.direct_ovvv:
+                _make_eris_without_ovvv(self, cc, mo_coeff, log)
+            else:
+                with lib.TmpFile() as feri:
+                    max_memory = max(2000, cc.max_memory-lib.current_memory()[0])
+                    mo = numpy.hstack((orbv, orbo))
+                    ao2mo.general(cc.mol, (orbo,mo,mo,mo),
+                                  feri, max_memory=max_memory, verbose=log)
+                    cput1 = log.timer_debug1('transforming oppp', *cput1)
+                    blksize = max(1, int(min(8e9,max_memory*.5e6)/8/nmo**2))
+
+                    with lib.call_in_background(save_vir_frac,
+                                                save_occ_frac) as (sav_v, sav_o):
+                        for i in range(nocc):
+                            for p0, p1 in lib.prange(0, nvir, blksize):
+                                eri = _cp(feri['eri_mo'][i*nmo+p0:i*nmo+p1])
+                                sav_v(i, p0, p1, eri)
+                            for p0, p1 in lib.prange(0, nocc, blksize):
+                                eri = _cp(feri['eri_mo'][i*nmo+nvir+p0:i*nmo+nvir+p1])
+                                sav_o(i, p0, p1, eri)
+                            cput1 = log.timer_debug1('sorting %d'%i, *cput1)
+                    for key in feri.keys():
+                        del(feri[key])
         log.timer('CCSD integral transformation', *cput0)
 
+def _make_eris_without_ovvv(eris, cc, mo_coeff, log):
+    '''oooo, ooov, ovoo, ovov and oovv from the (op|op) and (oo|vv) integrals,
+    without transforming any integrals of three virtual indices'''
+    cput1 = time.clock(), time.time()
+    nocc = cc.nocc
+    nmo = mo_coeff.shape[1]
+    nvir = nmo - nocc
+    orbo = mo_coeff[:,:nocc]
+    orbv = mo_coeff[:,nocc:]
+    with lib.TmpFile() as feri:
+        max_memory = max(2000, cc.max_memory-lib.current_memory()[0])
+        ao2mo.general(cc.mol, (orbo,mo_coeff,orbo,mo_coeff), feri, 'opop',
+                      max_memory=max_memory, verbose=log, compact=False)
+        ao2mo.general(cc.mol, (orbo,orbo,orbv,orbv), feri, 'oovv',
+                      max_memory=max_memory, verbose=log, compact=False)
+        cput1 = log.timer_debug1('transforming opop, oovv', *cput1)
+        for i in range(nocc):
+            buf = _cp(feri['opop'][i*nmo:(i+1)*nmo]).reshape(nmo,nocc,nmo)
+            eris.oooo[i] = buf[:nocc,:,:nocc]
+            eris.ooov[i] = buf[:nocc,:,nocc:]
+            eris.ovoo[i] = buf[nocc:,:,:nocc]
+            eris.ovov[i] = buf[nocc:,:,nocc:]
+            buf = _cp(feri['oovv'][i*nocc:(i+1)*nocc])
+            eris.oovv[i] = buf.reshape(nocc,nvir,nvir)
+        cput1 = log.timer_debug1('sorting', *cput1)
+        for key in feri.keys():
+            del(feri[key])
+    return eris
+
+class _DirectOVVV(object):
+    '''The ovvv integrals (nocc,nvir,nvir_pair) for the integral-direct CCSD.
+    It replaces the ovvv array of _ERIS.
+
+    update_amps calls build() for one block of virtual orbitals at a time and
+    recomputes the integrals in every iteration.  Any other access, e.g.
+    eris.ovvv[p0:p1] in the lambda equations, (T) or the gradients,
+    transforms the whole ovvv block once and stores it in a temporary HDF5
+    file.  The later slices are read from that file.
+    '''
+    def __init__(self, cc, orbo, orbv):
+        self.mol = cc.mol
+        self.cc = cc
+        self.orbo = orbo
+        self.orbv = numpy.asarray(orbv, order='F')
+        nvir = orbv.shape[1]
+        self.shape = (orbo.shape[1], nvir, nvir*(nvir+1)//2)
+        self.dtype = numpy.double
+        self.intor = self.mol._add_suffix('int2e')
+        self._ao2mopt = _ao2mo.AO2MOpt(self.mol, self.intor, 'CVHFnr_schwarz_cond',
+                                       'CVHFsetnr_direct_scf')
+        self._tmpfile = None
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        return self.materialize()[key]
+
+    def __array__(self):
+        return self.materialize()[:]
+
+    def materialize(self):
+        '''Transform the full ovvv block once and save it in a temporary
+        HDF5 file.  Returns the h5py dataset.
+        '''
+        if self._tmpfile is None:
+            log = logger.Logger(self.cc.stdout, self.cc.verbose)
+            cput0 = (time.clock(), time.time())
+            nocc, nvir, nvir_pair = self.shape
+            tmpfile = lib.H5TmpFile()
+            ovvv = tmpfile.create_dataset('ovvv', self.shape, 'f8')
+            nao = self.orbv.shape[0]
+            max_memory = max(0, self.cc.max_memory - lib.current_memory()[0])
+            blkq = int(max_memory*.5e6/8 / (nocc*(nao*(nao+1)//2+nvir_pair)))
+            blkq = min(nvir, max(BLKMIN, blkq))
+            for q0, q1 in lib.prange(0, nvir, blkq):
+                ovvv[:,q0:q1] = self.build(self.orbo, self.orbv[:,q0:q1])
+            self._tmpfile = tmpfile
+            log.timer('direct ovvv materialized', *cput0)
+        return self._tmpfile['ovvv']
+
+    def build(self, orbo, orbq):
+        '''(ia|bc) for the occupied orbitals orbo and the virtual orbitals
+        orbq, with the pair bc in the lower triangular form.
+
+        The AO integrals are generated with Schwarz screening for batches of
+        the AO pairs (ls) in (mn|ls) and transformed to (ia|ls) immediately.
+        The batch size is determined by max_memory.
+        '''
+        mol = self.mol
+        nocc = orbo.shape[1]
+        nq = orbq.shape[1]
+        nao, nvir = self.orbv.shape
+        nvir_pair = self.shape[2]
+        nao_pair = nao * (nao+1) // 2
+        nij = nocc * nq
+        if nij == 0:
+            return numpy.zeros((nocc,nq,nvir_pair))
+
+        moij = numpy.asarray(numpy.hstack((orbo,orbq)), order='F')
+        ijshape = (0, nocc, nocc, nocc+nq)
+        half = numpy.empty((nij,nao_pair))
+        max_memory = max(0, self.cc.max_memory - lib.current_memory()[0])
+        aobuflen = int((max_memory*.9e6/8 - nij*nvir_pair) / (nao_pair+nij))
+        aobuflen = max(aobuflen, ao2mo.outcore.IOBUF_ROW_MIN)
+        shranges = ao2mo.outcore.guess_shell_ranges(mol, True, aobuflen)
+        aobuflen = max(x[2] for x in shranges)
+        aobuf = numpy.empty((aobuflen,nao_pair))
+        e1buf = numpy.empty((aobuflen,nij))
+
+        p1 = 0
+        for sh_range in shranges:
+            buf = _ao2mo.nr_e1fill(self.intor, sh_range, mol._atm, mol._bas,
+                                   mol._env, 's4', 1, self._ao2mopt, out=aobuf)
+            buf = _ao2mo.nr_e1(buf.reshape(-1,nao_pair), moij, ijshape,
+                               's4', 's1', out=e1buf)
+            p0, p1 = p1, p1 + sh_range[2]
+            half[:,p0:p1] = buf.T
+        aobuf = e1buf = buf = None
+
+        # The columns of half are ordered by shell pairs
+        out = _ao2mo.nr_e2(half, self.orbv, (0,nvir,0,nvir), 's4', 's2',
+                           ao_loc=mol.ao_loc_nr())
+        return out.reshape(nocc,nq,nvir_pair)
+
 
 def get_moidx(cc):
     moidx = numpy.ones(cc.mo_occ.size, dtype=numpy.bool)
@@ -5,9 +5,7 @@
 
 import time
 import ctypes
-import tempfile
 import numpy
-import h5py
 from pyscf import lib
 from functools import reduce
 from pyscf.lib import logger
@@ -30,8 +28,7 @@ def IX_intermediates(mycc, t1, t2, l1, l2, eris=None, d1=None, d2=None):
         d1 = ccsd_rdm.gamma1_intermediates(mycc, t1, t2, l1, l2)
     doo, dov, dvo, dvv = d1
     if d2 is None:
-        _d2tmpfile = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
-        fd2intermediate = h5py.File(_d2tmpfile.name, 'w')
+        fd2intermediate = lib.TmpFile()
         ccsd_rdm.gamma2_outcore(mycc, t1, t2, l1, l2, fd2intermediate)
         dovov = fd2intermediate['dovov']
         dvvvv = fd2intermediate['dvvvv']
@@ -47,8 +44,7 @@ def IX_intermediates(mycc, t1, t2, l1, l2, eris=None, d1=None, d2=None):
     nocc, nvir = t1.shape
     nov = nocc * nvir
     nvir_pair = nvir * (nvir+1) //2
-    _tmpfile = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
-    fswap = h5py.File(_tmpfile.name, 'w')
+    fswap = lib.TmpFile()
     fswap.create_group('e_vvov')
     fswap.create_group('c_vvov')
 
@@ -220,13 +216,11 @@ def IX_intermediates(mycc, t1, t2, l1, l2, eris=None, d1=None, d2=None):
     del(fswap['c_vvov'])
     del(fswap['dovvo'])
     fswap.close()
-    _tmpfile = None
 
     if d2 is None:
         for key in fd2intermediate.keys():
             del(fd2intermediate[key])
         fd2intermediate.close()
-        _d2tmpfile = None
 
     Ioo *= -1
     Ivv *= -1
@@ -327,7 +321,7 @@ def kernel(mycc, t1=None, t2=None, l1=None, l2=None, eris=None, atmlst=None,
 
     log.debug('symmetrized rdm2 and MO->AO transformation')
 # Basically, 4 times of dm2 is computed. *2 in _rdm2_mo2ao, *2 in _load_block_tril
-    fdm2 = lib.H5TmpFile()
+    fdm2 = lib.TmpFile()
     dm1_with_hf = dm1mo.copy()
     for i in range(nocc):  # HF 2pdm ~ 4(ij)(kl)-2(il)(jk), diagonal+1 because of 4*dm2
         dm1_with_hf[i,i] += 1
@@ -458,8 +452,7 @@ def shell_prange(mol, start, stop, blksize):
 def _rdm2_mo2ao(mycc, d2, dm1, mo_coeff, fsave=None):
     log = logger.Logger(mycc.stdout, mycc.verbose)
     if fsave is None:
-        _dm2file = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
-        fsave = h5py.File(_dm2file.name, 'w')
+        _dm2file = fsave = lib.TmpFile()
     else:
         _dm2file = None
     time1 = time.clock(), time.time()
@@ -485,8 +478,7 @@ def _rdm2_mo2ao(mycc, d2, dm1, mo_coeff, fsave=None):
         return out
 
 # transform dm2_ij to get lower triangular (dm2+dm2.transpose(0,1,3,2))
-    _tmpfile = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
-    fswap = h5py.File(_tmpfile.name)
+    fswap = lib.TmpFile()
     max_memory = mycc.max_memory - lib.current_memory()[0]
     blksize = int(max_memory*1e6/8/(nmo*nao_pair+nmo**3+nvir**3))
     blksize = min(nocc, max(ccsd.BLKMIN, blksize))
@@ -570,7 +562,6 @@ def _rdm2_mo2ao(mycc, d2, dm1, mo_coeff, fsave=None):
     del(fswap['o'])
     del(fswap['v'])
     fswap.close()
-    _tmpfile = None
     time1 = log.timer_debug1('_rdm2_mo2ao cleanup', *time1)
     if _dm2file is not None:
         nvir_pair = nvir * (nvir+1) // 2
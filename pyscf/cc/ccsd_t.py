@@ -6,12 +6,13 @@
 import gc
 import time
 import ctypes
-import tempfile
+import itertools
 import numpy
 import h5py
 from pyscf import lib
 from pyscf import symm
 from pyscf.lib import logger
+from pyscf.ao2mo.cache import hash_array
 from pyscf.cc import _ccsd
 
 '''
@@ -21,7 +22,27 @@ CCSD(T)
 # t3 as ijkabc
 
 # JCP, 94, 442.  Error in Eq (1), should be [ia] >= [jb] >= [kc]
-def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
+def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE,
+           nproc=1, chkfile=None):
+    '''CCSD(T) correction
+
+    The triples are computed in tasks.  Each task handles the blocks of
+    virtual orbitals a in [a0:a1], b in [b0:b1] and all c <= b.
+
+    Kwargs:
+        nproc : int
+            Number of processes to run the tasks.  The sorted integrals and
+            amplitudes are stored in a memory-mapped file which the worker
+            processes load.  The workers are started with the 'spawn' method
+            (the OpenMP runtime of a forked process may deadlock).  Under
+            Python 2, which can only fork, OpenMP must not have been used in
+            the parent process.  Default is 1 (the tasks are run in the
+            current process and the OpenMP threads of libcc).
+        chkfile : str
+            HDF5 file to save the energy of every finished task.  If a
+            calculation is restarted with the same chkfile and the same
+            amplitudes, the finished tasks are skipped.
+    '''
     cpu1 = cpu0 = (time.clock(), time.time())
     log = logger.new_logger(mycc, verbose)
     if t1 is None: t1 = mycc.t1
@@ -29,9 +50,13 @@ def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
 
     nocc, nvir = t1.shape
     nmo = nocc + nvir
+    if chkfile is not None:
+        chkkey = hash_array(t1, t2, eris.fock.diagonal())
 
-    _tmpfile = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
-    ftmp = h5py.File(_tmpfile.name)
+    if nproc > 1:
+        ftmp = lib.MMapTmpFile()
+    else:
+        ftmp = lib.TmpFile()
     eris_vvop = ftmp.create_dataset('vvop', (nvir,nvir,nocc,nmo), 'f8')
     orbsym = _sort_eri(mycc, eris, nocc, nvir, eris_vvop, log)
 
@@ -39,7 +64,6 @@ def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
     mo_energy, t1T, t2T, vooo = _sort_t2_vooo_(mycc, orbsym, t1, t2, eris)
     cpu1 = log.timer_debug1('CCSD(T) sort_eri', *cpu1)
 
-    cpu2 = list(cpu1)
     orbsym = numpy.hstack((numpy.sort(orbsym[:nocc]),numpy.sort(orbsym[nocc:])))
     o_ir_loc = numpy.append(0, numpy.cumsum(numpy.bincount(orbsym[:nocc], minlength=8)))
     v_ir_loc = numpy.append(0, numpy.cumsum(numpy.bincount(orbsym[nocc:], minlength=8)))
@@ -52,59 +76,178 @@ def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
     o_ir_loc = o_ir_loc.astype(numpy.int32)
     v_ir_loc = v_ir_loc.astype(numpy.int32)
     oo_ir_loc = oo_ir_loc.astype(numpy.int32)
-    et_sum = [0]
-    def contract(a0, a1, b0, b1, cache):
-        cache_row_a, cache_col_a, cache_row_b, cache_col_b = cache
-        drv = _ccsd.libcc.CCsd_t_contract
-        drv.restype = ctypes.c_double
-        et = drv(mo_energy.ctypes.data_as(ctypes.c_void_p),
-                 t1T.ctypes.data_as(ctypes.c_void_p),
-                 t2T.ctypes.data_as(ctypes.c_void_p),
-                 vooo.ctypes.data_as(ctypes.c_void_p),
-                 ctypes.c_int(nocc), ctypes.c_int(nvir),
-                 ctypes.c_int(a0), ctypes.c_int(a1),
-                 ctypes.c_int(b0), ctypes.c_int(b1),
-                 ctypes.c_int(nirrep),
-                 o_ir_loc.ctypes.data_as(ctypes.c_void_p),
-                 v_ir_loc.ctypes.data_as(ctypes.c_void_p),
-                 oo_ir_loc.ctypes.data_as(ctypes.c_void_p),
-                 orbsym.ctypes.data_as(ctypes.c_void_p),
-                 cache_row_a.ctypes.data_as(ctypes.c_void_p),
-                 cache_col_a.ctypes.data_as(ctypes.c_void_p),
-                 cache_row_b.ctypes.data_as(ctypes.c_void_p),
-                 cache_col_b.ctypes.data_as(ctypes.c_void_p))
-        cpu2[:] = log.timer_debug1('contract %d:%d,%d:%d'%(a0,a1,b0,b1), *cpu2)
-        et_sum[0] += et
-        return et
+    env = (mo_energy, t1T, t2T, vooo, nirrep, o_ir_loc, v_ir_loc, oo_ir_loc,
+           orbsym)
 
     # The rest 20% memory for cache b
     mem_now = lib.current_memory()[0]
     max_memory = max(2000, mycc.max_memory - mem_now)
-    bufsize = max(1, (max_memory*1e6/8-nocc**3*100)*.7/(nocc*nmo))
+    bufsize = max(1, (max_memory*1e6/8-nocc**3*100)*.7/(nocc*nmo)/nproc)
     log.debug('max_memory %d MB (%d MB in use)', max_memory, mem_now)
-    for a0, a1 in reversed(list(lib.prange_tril(0, nvir, bufsize))):
-        with lib.call_in_background(contract) as async_contract:
-            cache_row_a = numpy.asarray(eris_vvop[a0:a1,:a1], order='C')
-            cache_col_a = numpy.asarray(eris_vvop[:a0,a0:a1], order='C')
-            async_contract(a0, a1, a0, a1, (cache_row_a,cache_col_a,
-                                            cache_row_a,cache_col_a))
-
-            for b0, b1 in lib.prange_tril(0, a0, bufsize/6):
-                cache_row_b = numpy.asarray(eris_vvop[b0:b1,:b1], order='C')
-                cache_col_b = numpy.asarray(eris_vvop[:b0,b0:b1], order='C')
-                async_contract(a0, a1, b0, b1, (cache_row_a,cache_col_a,
-                                                cache_row_b,cache_col_b))
-                cache_row_b = cache_col_b = None
-            cache_row_a = cache_col_a = None
+
+    tasks = _make_tasks(nvir, bufsize)
+    et_tasks = numpy.empty(len(tasks))
+    et_tasks[:] = numpy.nan
+    if chkfile is not None:
+        tasks, et_tasks = _load_tasks(chkfile, chkkey, tasks, et_tasks)
+    todo = [i for i, et in enumerate(et_tasks) if numpy.isnan(et)]
+    log.info('CCSD(T) %d tasks, %d to compute, nproc = %d',
+             len(tasks), len(todo), nproc)
+
+    weights = numpy.array([_task_weight(*task) for task in tasks])
+    progress = [0, time.time()]
+    def task_done(i, et):
+        et_tasks[i] = et
+        if chkfile is not None:
+            _save_task(chkfile, i, et)
+        progress[0] += weights[i]
+        rate = progress[0] / max(time.time() - progress[1], 1e-3)
+        wleft = weights[numpy.isnan(et_tasks)].sum()
+        log.info('CCSD(T) task %d [%d:%d,%d:%d]  %.1f%% done, '
+                 '%.4g triples/s, ETA %.0f s', i, tasks[i][0], tasks[i][1],
+                 tasks[i][2], tasks[i][3], 100.-wleft*100./max(1,weights.sum()),
+                 rate, wleft/rate)
+
+    if nproc > 1:
+        # The workers load the task data from the memory-mapped file
+        for key, val in zip(_ENV_KEYS, env):
+            ftmp['env_'+key] = val
+        _run_in_pool(nproc, todo, tasks, ftmp.filename, task_done)
+    else:
+        cpu2 = list(cpu1)
+        def contract(i, cache):
+            a0, a1, b0, b1 = tasks[i]
+            et = _contract(env, a0, a1, b0, b1, cache)
+            cpu2[:] = log.timer_debug1('contract %d:%d,%d:%d'%(a0,a1,b0,b1), *cpu2)
+            task_done(i, et)
+
+        for (a0, a1), ids in itertools.groupby(todo, lambda i: tasks[i][:2]):
+            with lib.call_in_background(contract) as async_contract:
+                cache_row_a = numpy.asarray(eris_vvop[a0:a1,:a1], order='C')
+                cache_col_a = numpy.asarray(eris_vvop[:a0,a0:a1], order='C')
+                for i in ids:
+                    b0, b1 = tasks[i][2:]
+                    if b0 == a0:
+                        async_contract(i, (cache_row_a,cache_col_a,
+                                           cache_row_a,cache_col_a))
+                    else:
+                        cache_row_b = numpy.asarray(eris_vvop[b0:b1,:b1], order='C')
+                        cache_col_b = numpy.asarray(eris_vvop[:b0,b0:b1], order='C')
+                        async_contract(i, (cache_row_a,cache_col_a,
+                                           cache_row_b,cache_col_b))
+                        cache_row_b = cache_col_b = None
+                cache_row_a = cache_col_a = None
 
     t2[:] = ftmp['t2']
     ftmp.close()
-    _tmpfile = None
-    et = et_sum[0] * 2
+    ftmp = eris_vvop = None
+    et = et_tasks.sum() * 2
     log.timer('CCSD(T)', *cpu0)
     log.note('CCSD(T) correction = %.15g', et)
     return et
 
+def _contract(env, a0, a1, b0, b1, cache):
+    mo_energy, t1T, t2T, vooo, nirrep, o_ir_loc, v_ir_loc, oo_ir_loc, orbsym = env
+    nvir, nocc = t1T.shape
+    cache_row_a, cache_col_a, cache_row_b, cache_col_b = cache
+    drv = _ccsd.libcc.CCsd_t_contract
+    drv.restype = ctypes.c_double
+    et = drv(mo_energy.ctypes.data_as(ctypes.c_void_p),
+             t1T.ctypes.data_as(ctypes.c_void_p),
+             t2T.ctypes.data_as(ctypes.c_void_p),
+             vooo.ctypes.data_as(ctypes.c_void_p),
+             ctypes.c_int(nocc), ctypes.c_int(nvir),
+             ctypes.c_int(a0), ctypes.c_int(a1),
+             ctypes.c_int(b0), ctypes.c_int(b1),
+             ctypes.c_int(nirrep),
+             o_ir_loc.ctypes.data_as(ctypes.c_void_p),
+             v_ir_loc.ctypes.data_as(ctypes.c_void_p),
+             oo_ir_loc.ctypes.data_as(ctypes.c_void_p),
+             orbsym.ctypes.data_as(ctypes.c_void_p),
+             cache_row_a.ctypes.data_as(ctypes.c_void_p),
+             cache_col_a.ctypes.data_as(ctypes.c_void_p),
+             cache_row_b.ctypes.data_as(ctypes.c_void_p),
+             cache_col_b.ctypes.data_as(ctypes.c_void_p))
+    return et
+
+def _make_tasks(nvir, bufsize):
+    '''Blocks (a0,a1,b0,b1) of the virtual triples, ordered by the a-blocks'''
+    tasks = []
+    for a0, a1 in reversed(list(lib.prange_tril(0, nvir, bufsize))):
+        tasks.append((a0, a1, a0, a1))
+        for b0, b1 in lib.prange_tril(0, a0, bufsize/6):
+            tasks.append((a0, a1, b0, b1))
+    return tasks
+
+def _task_weight(a0, a1, b0, b1):
+    '''Number of the virtual triples a >= b >= c in the task'''
+    a = numpy.arange(a0, a1).reshape(-1,1)
+    b = numpy.arange(b0, b1)
+    return ((b <= a) * (b+1)).sum()
+
+def _load_tasks(chkfile, key, tasks, et_tasks):
+    '''Read the tasks and the energy of the finished tasks from chkfile.
+    They are initialized in chkfile if chkfile does not match the key of the
+    amplitudes.'''
+    with h5py.File(chkfile, 'a') as f:
+        if 'ccsd_t' in f and f['ccsd_t'].attrs.get('key') == key:
+            tasks = [tuple(x) for x in f['ccsd_t/tasks'][:]]
+            et_tasks = f['ccsd_t/et'][:]
+        else:
+            if 'ccsd_t' in f:
+                del(f['ccsd_t'])
+            g = f.create_group('ccsd_t')
+            g.attrs['key'] = key
+            g['tasks'] = numpy.asarray(tasks, dtype=numpy.int32)
+            g['et'] = et_tasks
+    return tasks, et_tasks
+
+def _save_task(chkfile, i, et):
+    with h5py.File(chkfile, 'a') as f:
+        f['ccsd_t/et'][i] = et
+
+_ENV_KEYS = ('mo_energy', 't1T', 't2T', 'vooo', 'nirrep', 'o_ir_loc',
+             'v_ir_loc', 'oo_ir_loc', 'orbsym')
+# Data of the worker process, loaded by _init_worker
+_shared = {}
+def _run_in_pool(nproc, todo, tasks, filename, callback):
+    import multiprocessing
+    if hasattr(multiprocessing, 'get_context'):
+        # Spawned workers do not inherit the OpenMP state of the parent
+        multiprocessing = multiprocessing.get_context('spawn')
+    nthreads = max(1, lib.num_threads() // nproc)
+    pool = multiprocessing.Pool(nproc, _init_worker,
+                                (filename, tasks, nthreads))
+    try:
+        for i, et in pool.imap_unordered(_run_task, todo):
+            callback(i, et)
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _init_worker(filename, tasks, nthreads):
+    try:
+        _ccsd.libcc.omp_set_num_threads(ctypes.c_int(nthreads))
+    except AttributeError:
+        pass
+    feri = lib.MMapFile(filename, 'r')
+    env = [numpy.asarray(feri['env_'+key]) for key in _ENV_KEYS]
+    env[4] = int(env[4])  # nirrep
+    _shared.update(tasks=tasks, vvop=feri['vvop'], env=tuple(env))
+
+def _run_task(i):
+    a0, a1, b0, b1 = _shared['tasks'][i]
+    vvop = _shared['vvop']
+    cache_row_a = numpy.asarray(vvop[a0:a1,:a1], order='C')
+    cache_col_a = numpy.asarray(vvop[:a0,a0:a1], order='C')
+    if b0 == a0:
+        cache_row_b, cache_col_b = cache_row_a, cache_col_a
+    else:
+        cache_row_b = numpy.asarray(vvop[b0:b1,:b1], order='C')
+        cache_col_b = numpy.asarray(vvop[:b0,b0:b1], order='C')
+    cache = (cache_row_a, cache_col_a, cache_row_b, cache_col_b)
+    return i, _contract(_shared['env'], a0, a1, b0, b1, cache)
+
 def _sort_eri(mycc, eris, nocc, nvir, vvop, log):
     cpu1 = (time.clock(), time.time())
     mol = mycc.mol
@@ -1,18 +1,23 @@
 import time
 import tempfile
+from functools import reduce
 import numpy
 import numpy as np
 import h5py
 
 from pyscf import lib
 from pyscf import ao2mo
+from pyscf import symm
 from pyscf.lib import logger
 from pyscf.cc import ccsd
 from pyscf.cc import rintermediates as imd
+from pyscf.cc import symm_tensor
+from pyscf.cc.symm_tensor import SymmTensor
 from pyscf.lib import linalg_helper
 
 #einsum = np.einsum
-einsum = lib.einsum
+# lib.einsum for the dense arrays, blockwise contraction for SymmTensor
+einsum = symm_tensor.einsum
 
 # This is restricted (R)CCSD
 # Ref: Hirata et al., J. Chem. Phys. 120, 2581 (2004)
@@ -48,7 +53,8 @@ def kernel(cc, eris, t1=None, t2=None, max_cycle=50, tol=1e-8, tolnormt=1e-6,
     conv = False
     for istep in range(max_cycle):
         t1new, t2new = cc.update_amps(t1, t2, eris)
-        normt = numpy.linalg.norm(t1new-t1) + numpy.linalg.norm(t2new-t2)
+        normt = (numpy.linalg.norm((t1new-t1).ravel()) +
+                 numpy.linalg.norm((t2new-t2).ravel()))
         t1, t2 = t1new, t2new
         t1new = t2new = None
         if cc.diis:
@@ -64,90 +70,101 @@ def kernel(cc, eris, t1=None, t2=None, max_cycle=50, tol=1e-8, tolnormt=1e-6,
     return conv, eccsd, t1, t2
 
 
-#def update_amps(cc, t1, t2, eris):
-#    # Ref: Hirata et al., J. Chem. Phys. 120, 2581 (2004) Eqs.(35)-(36)
-#    time0 = time.clock(), time.time()
-#    log = logger.Logger(cc.stdout, cc.verbose)
-#    nocc, nvir = t1.shape
-#    fock = eris.fock
-#
-#    fov = fock[:nocc,nocc:]
-#    foo = fock[:nocc,:nocc]
-#    fvv = fock[nocc:,nocc:]
-#
-#    mo_e = eris.fock.diagonal()
-#    eia = mo_e[:nocc,None] - mo_e[None,nocc:]
-#    eijab = lib.direct_sum('ia,jb->ijab',eia,eia)
-#
-#    Foo = imd.cc_Foo(t1,t2,eris)
-#    Fvv = imd.cc_Fvv(t1,t2,eris)
-#    Fov = imd.cc_Fov(t1,t2,eris)
-#    Loo = imd.Loo(t1,t2,eris)
-#    Lvv = imd.Lvv(t1,t2,eris)
-#    Woooo = imd.cc_Woooo(t1,t2,eris)
-#    Wvvvv = imd.cc_Wvvvv(t1,t2,eris)
-#    Wvoov = imd.cc_Wvoov(t1,t2,eris)
-#    Wvovo = imd.cc_Wvovo(t1,t2,eris)
-#
-#    # Move energy terms to the other side
-#    Foo -= np.diag(np.diag(foo))
-#    Fvv -= np.diag(np.diag(fvv))
-#    Loo -= np.diag(np.diag(foo))
-#    Lvv -= np.diag(np.diag(fvv))
-#
-#    # T1 equation
-#    t1new = np.array(fov).conj()
-#    t1new += -2*einsum('kc,ka,ic->ia',fov,t1,t1)
-#    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,nvir**2)).reshape(nocc,nvir,nvir,nvir)
-#    t1new +=   einsum('ac,ic->ia',Fvv,t1)
-#    t1new +=  -einsum('ki,ka->ia',Foo,t1)
-#    t1new += 2*einsum('kc,kica->ia',Fov,t2)
-#    t1new +=  -einsum('kc,ikca->ia',Fov,t2)
-#    t1new +=   einsum('kc,ic,ka->ia',Fov,t1,t1)
-#    t1new += 2*einsum('iack,kc->ia',eris.ovvo,t1)
-#    t1new +=  -einsum('kiac,kc->ia',eris.oovv,t1)
-#    t1new += 2*einsum('kdac,ikcd->ia',eris_ovvv,t2)
-#    t1new +=  -einsum('kcad,ikcd->ia',eris_ovvv,t2)
-#    t1new += 2*einsum('kdac,ic,kd->ia',eris_ovvv,t1,t1)
-#    t1new +=  -einsum('kcad,ic,kd->ia',eris_ovvv,t1,t1)
-#    t1new += -2*einsum('kilc,klac->ia',eris.ooov,t2)
-#    t1new +=  einsum('likc,klac->ia',eris.ooov,t2)
-#    t1new += -2*einsum('kilc,ka,lc->ia',eris.ooov,t1,t1)
-#    t1new +=  einsum('likc,ka,lc->ia',eris.ooov,t1,t1)
-#
-#    # T2 equation
-#    t2new = np.array(eris.ovov).transpose(0,2,1,3).conj().copy()
-#    t2new += einsum('klij,klab->ijab',Woooo,t2)
-#    t2new += einsum('klij,ka,lb->ijab',Woooo,t1,t1)
-#    for a in range(nvir):
-#        Wvvvv_a = np.array(Wvvvv[a])
-#        t2new[:,:,a,:] += einsum('bcd,ijcd->ijb',Wvvvv_a,t2)
-#        t2new[:,:,a,:] += einsum('bcd,ic,jd->ijb',Wvvvv_a,t1,t1)
-#    tmp = einsum('ac,ijcb->ijab',Lvv,t2)
-#    t2new += (tmp + tmp.transpose(1,0,3,2))
-#    tmp = einsum('ki,kjab->ijab',Loo,t2)
-#    t2new -= (tmp + tmp.transpose(1,0,3,2))
-#    tmp2 = np.array(eris_ovvv).transpose(1,3,0,2).conj() \
-#            - einsum('kibc,ka->abic',eris.oovv,t1)
-#    tmp = einsum('abic,jc->ijab',tmp2,t1)
-#    t2new += (tmp + tmp.transpose(1,0,3,2))
-#    tmp2 = np.array(eris.ooov).transpose(3,1,2,0).conj() \
-#            + einsum('iack,jc->akij',eris.ovvo,t1)
-#    tmp = einsum('akij,kb->ijab',tmp2,t1)
-#    t2new -= (tmp + tmp.transpose(1,0,3,2))
-#    tmp = 2*einsum('akic,kjcb->ijab',Wvoov,t2) - einsum('akci,kjcb->ijab',Wvovo,t2)
-#    t2new += (tmp + tmp.transpose(1,0,3,2))
-#    tmp = einsum('akic,kjbc->ijab',Wvoov,t2)
-#    t2new -= (tmp + tmp.transpose(1,0,3,2))
-#    tmp = einsum('bkci,kjac->ijab',Wvovo,t2)
-#    t2new -= (tmp + tmp.transpose(1,0,3,2))
-#
-#    t1new /= eia
-#    t2new /= eijab
-#
-#    time0 = log.timer_debug1('update t1 t2', *time0)
-#
-#    return t1new, t2new
+def update_amps(cc, t1, t2, eris):
+    '''Update the amplitudes stored in irrep blocks (SymmTensor).  The dense
+    amplitudes are updated by the optimized ccsd.update_amps.'''
+    # Ref: Hirata et al., J. Chem. Phys. 120, 2581 (2004) Eqs.(35)-(36)
+    time0 = time.clock(), time.time()
+    log = logger.Logger(cc.stdout, cc.verbose)
+    nocc, nvir = t1.shape
+    fock = eris.fock
+    mo_e = fock.diagonal()
+
+    fov = fock[:nocc,nocc:]
+
+    Foo = imd.cc_Foo(t1,t2,eris)
+    Fvv = imd.cc_Fvv(t1,t2,eris)
+    Fov = imd.cc_Fov(t1,t2,eris)
+    Loo = imd.Loo(t1,t2,eris)
+    Lvv = imd.Lvv(t1,t2,eris)
+    Woooo = imd.cc_Woooo(t1,t2,eris)
+    Wvvvv = imd.cc_Wvvvv(t1,t2,eris)
+    Wvoov = imd.cc_Wvoov(t1,t2,eris)
+    Wvovo = imd.cc_Wvovo(t1,t2,eris)
+    time1 = log.timer_debug1('intermediates', *time0)
+
+    # Move energy terms to the other side
+    Foo -= np.diag(mo_e[:nocc])
+    Fvv -= np.diag(mo_e[nocc:])
+    Loo -= np.diag(mo_e[:nocc])
+    Lvv -= np.diag(mo_e[nocc:])
+
+    # T1 equation
+    eris_ovvv = eris.ovvv
+    t1new = fov.conj()
+    t1new += -2*einsum('kc,ka,ic->ia',fov,t1,t1)
+    t1new +=   einsum('ac,ic->ia',Fvv,t1)
+    t1new +=  -einsum('ki,ka->ia',Foo,t1)
+    t1new += 2*einsum('kc,kica->ia',Fov,t2)
+    t1new +=  -einsum('kc,ikca->ia',Fov,t2)
+    t1new +=   einsum('kc,ic,ka->ia',Fov,t1,t1)
+    t1new += 2*einsum('iack,kc->ia',eris.ovvo,t1)
+    t1new +=  -einsum('kiac,kc->ia',eris.oovv,t1)
+    t1new += 2*einsum('kdac,ikcd->ia',eris_ovvv,t2)
+    t1new +=  -einsum('kcad,ikcd->ia',eris_ovvv,t2)
+    t1new += 2*einsum('kdac,ic,kd->ia',eris_ovvv,t1,t1)
+    t1new +=  -einsum('kcad,ic,kd->ia',eris_ovvv,t1,t1)
+    t1new += -2*einsum('kilc,klac->ia',eris.ooov,t2)
+    t1new +=  einsum('likc,klac->ia',eris.ooov,t2)
+    t1new += -2*einsum('kilc,ka,lc->ia',eris.ooov,t1,t1)
+    t1new +=  einsum('likc,ka,lc->ia',eris.ooov,t1,t1)
+
+    # T2 equation
+    t2new = eris.ovov.transpose(0,2,1,3).conj()
+    t2new += einsum('klij,klab->ijab',Woooo,t2)
+    t2new += einsum('klij,ka,lb->ijab',Woooo,t1,t1)
+    t2new += einsum('abcd,ijcd->ijab',Wvvvv,t2)
+    t2new += einsum('abcd,ic,jd->ijab',Wvvvv,t1,t1)
+    Wvvvv = None
+    tmp = einsum('ac,ijcb->ijab',Lvv,t2)
+    t2new += (tmp + tmp.transpose(1,0,3,2))
+    tmp = einsum('ki,kjab->ijab',Loo,t2)
+    t2new -= (tmp + tmp.transpose(1,0,3,2))
+    tmp2 = eris_ovvv.transpose(1,3,0,2).conj() \
+            - einsum('kibc,ka->abic',eris.oovv,t1)
+    tmp = einsum('abic,jc->ijab',tmp2,t1)
+    t2new += (tmp + tmp.transpose(1,0,3,2))
+    tmp2 = eris.ooov.transpose(3,1,2,0).conj() \
+            + einsum('iack,jc->akij',eris.ovvo,t1)
+    tmp = einsum('akij,kb->ijab',tmp2,t1)
+    t2new -= (tmp + tmp.transpose(1,0,3,2))
+    tmp = 2*einsum('akic,kjcb->ijab',Wvoov,t2) - einsum('akci,kjcb->ijab',Wvovo,t2)
+    t2new += (tmp + tmp.transpose(1,0,3,2))
+    tmp = einsum('akic,kjbc->ijab',Wvoov,t2)
+    t2new -= (tmp + tmp.transpose(1,0,3,2))
+    tmp = einsum('bkci,kjac->ijab',Wvovo,t2)
+    t2new -= (tmp + tmp.transpose(1,0,3,2))
+    tmp = tmp2 = None
+
+    _divide_by_denominator(t1new, mo_e, nocc)
+    _divide_by_denominator(t2new, mo_e, nocc)
+
+    log.timer_debug1('update t1 t2', *time1)
+    return t1new, t2new
+
+def _divide_by_denominator(t, mo_e, nocc):
+    '''t[i,a] /= e_i-e_a, t[i,j,a,b] /= e_i+e_j-e_a-e_b for the SymmTensor
+    amplitudes, without constructing the dense denominators'''
+    eo = mo_e[:nocc]
+    ev = mo_e[nocc:]
+    for key, blk in t.blocks.items():
+        idx = t.indices(key)
+        if t.ndim == 2:
+            blk /= lib.direct_sum('i-a->ia', eo[idx[0]], ev[idx[1]])
+        else:
+            blk /= lib.direct_sum('i+j-a-b->ijab', eo[idx[0]], eo[idx[1]],
+                                  ev[idx[2]], ev[idx[3]])
+    return t
 
 
 def energy(cc, t1, t2, eris):
@@ -165,25 +182,45 @@ class RCCSD(ccsd.CCSD):
     '''restricted CCSD with IP-EOM, EA-EOM, EE-EOM, and SF-EOM capabilities
 
     Ground-state CCSD is performed in optimized ccsd.CCSD and EOM is performed here.
+
+    Attributes:
+        symm_blocks : bool
+            For molecules with point-group symmetry, store the amplitudes,
+            the integrals and the intermediates of ground-state CCSD in
+            the symmetry-allowed blocks (see :class:`symm_tensor.SymmTensor`).
+            The memory and the cost of the contractions are reduced by a
+            factor of ~nirrep.  The amplitudes t1 and t2 are SymmTensor
+            objects then.  The EOM methods require the dense amplitudes
+            which can be obtained with SymmTensor.to_dense().  Default is
+            False.  This is implemented for RCCSD only; UCCSD raises
+            NotImplementedError when it is set.
     '''
     def __init__(self, mf, frozen=0, mo_coeff=None, mo_occ=None):
         ccsd.CCSD.__init__(self, mf, frozen, mo_coeff, mo_occ)
         self.max_space = 20
-        self._keys = self._keys.union(['max_space'])
+        self.symm_blocks = False
+        self._keys = self._keys.union(['max_space', 'symm_blocks'])
 
     def dump_flags(self):
         ccsd.CCSD.dump_flags(self)
+        if self.symm_blocks and self.mol.symmetry:
+            logger.info(self, 'Amplitudes stored in irrep blocks')
         return self
 
     def init_amps(self, eris):
         time0 = time.clock(), time.time()
         mo_e = eris.fock.diagonal()
         nocc = self.nocc
-        eia = mo_e[:nocc,None] - mo_e[None,nocc:]
-        eijab = lib.direct_sum('ia,jb->ijab',eia,eia)
-        eris_oovv = np.array(eris.ovov).transpose(0,2,1,3)
-        t1 = eris.fock[:nocc,nocc:] / eia
-        t2 = eris_oovv/eijab
+        if isinstance(eris.ovov, SymmTensor):
+            eris_oovv = eris.ovov.transpose(0,2,1,3)
+            t1 = _divide_by_denominator(eris.fock[:nocc,nocc:], mo_e, nocc)
+            t2 = _divide_by_denominator(eris_oovv.copy(), mo_e, nocc)
+        else:
+            eia = mo_e[:nocc,None] - mo_e[None,nocc:]
+            eijab = lib.direct_sum('ia,jb->ijab',eia,eia)
+            eris_oovv = np.array(eris.ovov).transpose(0,2,1,3)
+            t1 = eris.fock[:nocc,nocc:] / eia
+            t2 = eris_oovv/eijab
         wvvoo = (2*eris_oovv 
                   -eris_oovv.transpose(0,1,3,2)).transpose(2,3,0,1).conj()
         self.emp2 = einsum('ijab,abij',t2,wvvoo).real
@@ -224,10 +261,27 @@ class RCCSD(ccsd.CCSD):
         return self.e_corr, self.t1, self.t2
 
     def ao2mo(self, mo_coeff=None):
-        return _ERIS(self, mo_coeff)
+        if self.symm_blocks and self.mol.symmetry:
+            return _SymmERIS(self, mo_coeff)
+        else:
+            return _ERIS(self, mo_coeff)
 
-#    def update_amps(self, t1, t2, eris):
-#        return update_amps(self, t1, t2, eris)
+    def update_amps(self, t1, t2, eris):
+        if isinstance(t2, SymmTensor):
+            return update_amps(self, t1, t2, eris)
+        else:
+            return ccsd.CCSD.update_amps(self, t1, t2, eris)
+
+    def diis_(self, t1, t2, istep, normt, de, adiis):
+        if not isinstance(t2, SymmTensor):
+            return ccsd.CCSD.diis_(self, t1, t2, istep, normt, de, adiis)
+        if (istep > self.diis_start_cycle and
+            abs(de) < self.diis_start_energy_diff):
+            vec = self.amplitudes_to_vector(t1, t2)
+            orbsym = numpy.hstack(t1.orbsyms)
+            t1, t2 = self.vector_to_amplitudes(adiis.update(vec), orbsym=orbsym)
+            logger.debug1(self, 'DIIS for step %d', istep)
+        return t1, t2
 
     def nip(self):
         nocc = self.nocc
@@ -1320,6 +1374,8 @@ class RCCSD(ccsd.CCSD):
         return vec_eeS, vec_eeT, vec_sf
 
     def amplitudes_to_vector(self, t1, t2, out=None):
+        if isinstance(t2, SymmTensor):
+            return _amplitudes_to_vector_symm(t1, t2)
         nocc, nvir = t1.shape
         nov = nocc * nvir
         size = nov + nocc**2*nvir*(nvir+1)//2
@@ -1328,9 +1384,13 @@ class RCCSD(ccsd.CCSD):
         lib.pack_tril(t2.reshape(-1,nvir,nvir), out=vector[nov:])
         return vector
 
-    def vector_to_amplitudes(self, vector, nmo=None, nocc=None):
+    def vector_to_amplitudes(self, vector, nmo=None, nocc=None, orbsym=None):
+        '''If orbsym (the irreps of the MOs) is given, the vector is unpacked
+        to the amplitudes in irrep blocks.'''
         if nocc is None: nocc = self.nocc
         if nmo is None: nmo = self.nmo
+        if orbsym is not None:
+            return _vector_to_amplitudes_symm(vector, orbsym, nocc)
         nvir = nmo - nocc
         nov = nocc * nvir
         size = nov + nocc**2*nvir*(nvir+1)//2
@@ -1471,7 +1531,7 @@ class _ERIS:
         if (method == 'incore' and (mem_incore+mem_now < cc.max_memory)
             or cc.mol.incore_anyway):
             if ao2mofn == ao2mo.full:
-                eri = ao2mo.restore(1, ao2mofn(cc._scf._eri, mo_coeff), nmo)
+                eri = ao2mo.restore(1, ao2mo.cache.full(cc._scf._eri, mo_coeff), nmo)
             else:
                 eri = ao2mofn(cc._scf.mol, (mo_coeff,mo_coeff,mo_coeff,mo_coeff), compact=0)
                 if mo_coeff.dtype == np.float: eri = eri.real
@@ -1537,6 +1597,110 @@ class _ERIS:
             cput1 = log.timer_debug1('transforming vvvv', *cput1)
         log.timer('CCSD integral transformation', *cput0)
 
+class _SymmERIS:
+    '''The integrals of the ground-state CCSD in the symmetry-allowed blocks
+    (SymmTensor).  The MO integrals are transformed for one irrep of the first
+    index at a time and cut into blocks, the dense integral tensors are not
+    built.'''
+    def __init__(self, cc, mo_coeff=None):
+        cput0 = (time.clock(), time.time())
+        log = logger.Logger(cc.stdout, cc.verbose)
+        mol = cc.mol
+        if mo_coeff is None:
+            mo_coeff = cc.mo_coeff
+        self.mo_coeff = mo_coeff = ccsd._mo_without_core(cc, mo_coeff)
+        self.dtype = mo_coeff.dtype
+        dm = cc._scf.make_rdm1(cc.mo_coeff, cc.mo_occ)
+        fockao = cc._scf.get_hcore() + cc._scf.get_veff(cc.mol, dm)
+        fock = reduce(numpy.dot, (mo_coeff.T, fockao, mo_coeff))
+
+        nocc = cc.nocc
+        orbsym = symm.addons.label_orb_symm(mol, mol.irrep_id, mol.symm_orb,
+                                            mo_coeff, check=False)
+        self.orbsym = orbsym = numpy.asarray(orbsym) % 10
+        so = orbsym[:nocc]
+        sv = orbsym[nocc:]
+        self.fock = SymmTensor.from_dense(fock, (orbsym,orbsym))
+
+        if cc._scf._eri is not None:
+            eri_or_mol = cc._scf._eri
+        else:
+            eri_or_mol = mol
+        def transform(orb1, orb2):
+            # (1 2|2 2) with the ket pair in lower triangular form
+            eri = ao2mo.general(eri_or_mol, (orb1,orb2,orb2,orb2), compact=True)
+            return eri.reshape(orb1.shape[1],orb2.shape[1],-1)
+
+        self.oooo = symm_tensor.zeros((so,so,so,so))
+        self.ooov = symm_tensor.zeros((so,so,so,sv))
+        self.ovov = symm_tensor.zeros((so,sv,so,sv))
+        self.oovv = symm_tensor.zeros((so,so,sv,sv))
+        self.ovvo = symm_tensor.zeros((so,sv,sv,so))
+        self.ovvv = symm_tensor.zeros((so,sv,sv,sv))
+        # MO offsets of the last three indices in the (o p|p p) integrals
+        o_blocks = ((self.oooo, (0   , 0   , 0   )),
+                    (self.ooov, (0   , 0   , nocc)),
+                    (self.ovov, (nocc, 0   , nocc)),
+                    (self.oovv, (0   , nocc, nocc)),
+                    (self.ovvo, (nocc, nocc, 0   )),
+                    (self.ovvv, (nocc, nocc, nocc)))
+        for ir in set(so.tolist()):
+            eri = transform(mo_coeff[:,:nocc][:,so==ir], mo_coeff)
+            for out, offsets in o_blocks:
+                _fill_symm_blocks(out, eri, ir, offsets)
+            eri = None
+        cput0 = log.timer_debug1('transforming (o p|p p) in irrep blocks', *cput0)
+
+        orbv = mo_coeff[:,nocc:]
+        self.vvvv = symm_tensor.zeros((sv,sv,sv,sv))
+        for ir in set(sv.tolist()):
+            eri = transform(orbv[:,sv==ir], orbv)
+            _fill_symm_blocks(self.vvvv, eri, ir, (0, 0, 0))
+            eri = None
+        log.timer('CCSD integrals in irrep blocks', *cput0)
+
+def _pair_index(p, q):
+    '''Indices of the pairs (p,q) in the lower triangular form'''
+    pq_max = numpy.maximum(p[:,None], q)
+    pq_min = numpy.minimum(p[:,None], q)
+    return (pq_max*(pq_max+1)//2 + pq_min).ravel()
+
+def _fill_symm_blocks(out, eri, ir, offsets):
+    '''Copy the integrals eri[p,q,rs] of the orbitals p of irrep ir into the
+    blocks out[ir,:,:,:].  The pair rs of eri is in the lower triangular form.
+    offsets are the positions of the orbitals of the last three indices of
+    out in the last three indices of eri.'''
+    for key in out.keys():
+        if key[0] == ir:
+            q, r, s = [x + offsets[i] for i, x in enumerate(out.indices(key)[1:])]
+            blk = eri[:,q][:,:,_pair_index(r, s)]
+            out.blocks[key] = blk.reshape(out.block_shape(key))
+    return out
+
+def _amplitudes_to_vector_symm(t1, t2):
+    '''The symmetry-allowed amplitudes in a vector.  Only the t2 blocks with
+    irrep(i) <= irrep(j) are included since t2[i,j,a,b] = t2[j,i,b,a].'''
+    vs = [t1.ravel()]
+    vs.extend([t2.blocks[k].ravel() for k in t2.keys() if k[0] <= k[1]])
+    return numpy.hstack(vs)
+
+def _vector_to_amplitudes_symm(vector, orbsym, nocc):
+    so = orbsym[:nocc]
+    sv = orbsym[nocc:]
+    t1 = symm_tensor.zeros((so,sv))
+    t1 = t1.unravel(vector[:t1.size].copy())
+    t2 = symm_tensor.zeros((so,so,sv,sv))
+    p0 = t1.size
+    for key in t2.keys():
+        if key[0] <= key[1]:
+            blk = t2.blocks[key]
+            blk[:] = vector[p0:p0+blk.size].reshape(blk.shape)
+            p0 += blk.size
+    for key in t2.keys():
+        if key[0] > key[1]:
+            t2.blocks[key] = t2.blocks[(key[1],key[0],key[3],key[2])].transpose(1,0,3,2).copy()
+    return t1, t2
+
 class _IMDS:
     def __init__(self, cc):
         self.verbose = cc.verbose
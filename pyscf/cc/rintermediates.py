@@ -2,13 +2,27 @@ import tempfile
 import numpy as np
 import h5py
 from pyscf import lib
+from pyscf.cc import symm_tensor
+from pyscf.cc.symm_tensor import SymmTensor
 
 #einsum = np.einsum
-einsum = lib.einsum
+# lib.einsum for the dense arrays, blockwise contraction for SymmTensor
+einsum = symm_tensor.einsum
 
 # This is restricted (R)CCSD
 # Ref: Hirata et al., J. Chem. Phys. 120, 2581 (2004)
 
+def _get_ovvv(eris, nocc, nvir):
+    if isinstance(eris.ovvv, SymmTensor):
+        return eris.ovvv
+    ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1))
+    return ovvv.reshape(nocc,nvir,nvir,nvir)
+
+def _asarray(a):
+    if isinstance(a, SymmTensor):
+        return a
+    return np.asarray(a)
+
 ### Eqs. (37)-(39) "kappa"
 
 def cc_Foo(t1,t2,eris):
@@ -53,7 +67,7 @@ def Lvv(t1,t2,eris):
     nocc, nvir = t1.shape
     fov = eris.fock[:nocc,nocc:]
     Lac = cc_Fvv(t1,t2,eris) - einsum('kc,ka->ac',fov,t1)
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
     Lac += 2*einsum('kdac,kd->ac',eris_ovvv,t1)
     Lac +=  -einsum('kcad,kd->ac',eris_ovvv,t1)
     return Lac
@@ -61,7 +75,7 @@ def Lvv(t1,t2,eris):
 ### Eqs. (42)-(45) "chi"
 
 def cc_Woooo(t1,t2,eris):
-    Wklij = np.array(eris.oooo).transpose(0,2,1,3).copy()
+    Wklij = _asarray(eris.oooo).transpose(0,2,1,3).copy()
     Wklij += einsum('kilc,jc->klij',eris.ooov,t1)
     Wklij += einsum('ljkc,ic->klij',eris.ooov,t1)
     Wklij += einsum('kcld,ijcd->klij',eris.ovov,t2)
@@ -69,6 +83,13 @@ def cc_Woooo(t1,t2,eris):
     return Wklij
 
 def cc_Wvvvv(t1,t2,eris):
+    if isinstance(eris.vvvv, SymmTensor):
+        # Incore, the symmetry-allowed blocks only
+        Wabcd = eris.vvvv.transpose(0,2,1,3).copy()
+        Wabcd += -einsum('kdac,kb->abcd',eris.ovvv,t1)
+        Wabcd += -einsum('kcbd,ka->abcd',eris.ovvv,t1)
+        return Wabcd
+
     ## Incore 
     #Wabcd = np.array(eris.vvvv).transpose(0,2,1,3)
     #Wabcd += -einsum('kdac,kb->abcd',eris.ovvv,t1)
@@ -82,7 +103,7 @@ def cc_Wvvvv(t1,t2,eris):
     nocc,nvir = t1.shape
     Wabcd = fimd.create_dataset('vvvv', (nvir,nvir,nvir,nvir), ds_type)
     # avoid transpose inside loop
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
     ovvv = np.array(eris_ovvv).transpose(0,2,1,3)
     for a in range(nvir):
 #        Wabcd[a] = eris.vvvv[a].transpose(1,0,2)
@@ -100,8 +121,8 @@ def cc_Wvvvv(t1,t2,eris):
 
 def cc_Wvoov(t1,t2,eris):
     nocc, nvir = t1.shape
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
-    Wakic = np.array(eris.ovvo).transpose(1,3,0,2)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
+    Wakic = _asarray(eris.ovvo).transpose(1,3,0,2).copy()
     Wakic -= einsum('likc,la->akic',eris.ooov,t1)
     Wakic += einsum('kcad,id->akic',eris_ovvv,t1)
     Wakic -= 0.5*einsum('ldkc,ilda->akic',eris.ovov,t2)
@@ -112,8 +133,8 @@ def cc_Wvoov(t1,t2,eris):
 
 def cc_Wvovo(t1,t2,eris):
     nocc, nvir = t1.shape
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
-    Wakci = np.array(eris.oovv).transpose(2,0,3,1)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
+    Wakci = _asarray(eris.oovv).transpose(2,0,3,1).copy()
     Wakci -= einsum('kilc,la->akci',eris.ooov,t1)
     Wakci += einsum('kdac,id->akci',eris_ovvv,t1)
     Wakci -= 0.5*einsum('lckd,ilda->akci',eris.ovov,t2)
@@ -126,7 +147,7 @@ def Wooov(t1,t2,eris):
 
 def Wvovv(t1,t2,eris):
     nocc, nvir = t1.shape
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
     Walcd = np.asarray(eris_ovvv).transpose(2,0,3,1) - einsum('ka,kcld->alcd',t1,eris.ovov)
     return Walcd
 
@@ -139,7 +160,7 @@ def W1ovvo(t1,t2,eris):
 
 def W2ovvo(t1,t2,eris):
     nocc, nvir = t1.shape
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
     Wkaci = einsum('la,lkic->kaci',-t1,Wooov(t1,t2,eris))
     Wkaci += einsum('kcad,id->kaci',eris_ovvv,t1)
     return Wkaci
@@ -155,7 +176,7 @@ def W1ovov(t1,t2,eris):
 
 def W2ovov(t1,t2,eris):
     nocc, nvir = t1.shape
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
     Wkbid = einsum('klid,lb->kbid',Wooov(t1,t2,eris),-t1)
     Wkbid += einsum('kcbd,ic->kbid',eris_ovvv,t1)
     return Wkbid
@@ -186,7 +207,7 @@ def Wvvvv(t1,t2,eris):
     fimd = h5py.File(_tmpfile1.name)
     nocc,nvir = t1.shape
     Wabcd = fimd.create_dataset('vvvv', (nvir,nvir,nvir,nvir), ds_type)
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
     for a in range(nvir):
         #Wabcd[a] = eris.vvvv[a].transpose(1,0,2)
         #Wabcd[a] += -einsum('ldc,lb->bcd',eris_ovvv[:,:,a,:],t1)
@@ -207,7 +228,7 @@ def Wvvvv(t1,t2,eris):
 def Wvvvo(t1,t2,eris,_Wvvvv=None):
     nocc, nvir = t1.shape
     nocc,nvir = t1.shape
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
     Wabcj = np.array(eris_ovvv).transpose(3,1,2,0).conj()
     # Check if t1=0 (HF+MBPT(2))
     # einsum will check, but don't make vvvv if you can avoid it!
@@ -229,7 +250,7 @@ def Wvvvo(t1,t2,eris,_Wvvvv=None):
 
 def Wovoo(t1,t2,eris):
     nocc, nvir = t1.shape
-    eris_ovvv = lib.unpack_tril(np.asarray(eris.ovvv).reshape(nocc*nvir,-1)).reshape(nocc,nvir,nvir,nvir)
+    eris_ovvv = _get_ovvv(eris, nocc, nvir)
     Wkbij = np.array(eris.ooov).transpose(1,3,0,2).conj()
     Wkbij +=   einsum('kbid,jd->kbij',W1ovov(t1,t2,eris),t1)
     Wkbij +=  -einsum('klij,lb->kbij',Woooo(t1,t2,eris),t1)
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+
+'''
+Block-sparse tensors of point-group symmetry
+********************************************
+
+For a molecule with point-group symmetry, an element of the amplitudes or
+the MO integrals, e.g. t2[i,j,a,b], is nonzero only if the direct product
+of the irreps of the indices contains the totally symmetric irrep.  For D2h
+and its subgroups, the irreps are labelled by the IDs (mol.irrep_id % 10) of
+which the direct product is the XOR operation.  :class:`SymmTensor` holds
+only the symmetry-allowed blocks.  The blocks are indexed by the irreps of
+the axes.  The irrep of the last axis is determined by the others.  The
+memory of a 4-index tensor is reduced by a factor of ~nirrep (8 for D2h).
+
+:func:`einsum` contracts the allowed blocks only.  The orbitals do not need
+to be sorted by irreps.
+
+It is used by RCCSD (rccsd.RCCSD.symm_blocks) and the intermediates in
+rintermediates.  UCCSD and uintermediates still work on dense arrays.
+
+>>> orbsym_o = numpy.array([0,0,3,1])
+>>> orbsym_v = numpy.array([0,2,3,1,0])
+>>> t2 = SymmTensor.from_dense(t2, (orbsym_o,orbsym_o,orbsym_v,orbsym_v))
+>>> tau = t2 + einsum('ia,jb->ijab', t1, t1)
+>>> t2.to_dense()
+'''
+
+import itertools
+import numbers
+import numpy
+from pyscf import lib
+
+
+class SymmTensor(object):
+    '''Block-sparse tensor.
+
+    Attributes:
+        orbsyms : list of 1D int arrays
+            The irreps of the orbitals of each axis
+        sym : int
+            The irrep of the tensor.  0 for totally symmetric tensors.
+        blocks : dict
+            The symmetry-allowed blocks, keyed by the tuple of the irreps of
+            the axes.  All allowed blocks are kept, including the zero blocks.
+    '''
+    # The arithmetic with numpy arrays is handled by SymmTensor
+    __array_ufunc__ = None
+
+    def __init__(self, orbsyms, sym=0, blocks=None, dtype=numpy.double):
+        self.orbsyms = [numpy.asarray(x, dtype=int) for x in orbsyms]
+        self.sym = sym
+        self._idx = [dict((ir, numpy.where(x == ir)[0]) for ir in set(x.tolist()))
+                     for x in self.orbsyms]
+        if blocks is None:
+            blocks = {}
+            for key in self._allowed_keys():
+                blocks[key] = numpy.zeros(self.block_shape(key), dtype)
+        self.blocks = blocks
+
+    def _allowed_keys(self):
+        if self.ndim == 0:
+            return [()] if self.sym == 0 else []
+        keys = []
+        for key in itertools.product(*[sorted(x) for x in self._idx[:-1]]):
+            ir = self.sym
+            for x in key:
+                ir ^= x
+            if ir in self._idx[-1]:
+                keys.append(key + (ir,))
+        return keys
+
+    @property
+    def shape(self):
+        return tuple(len(x) for x in self.orbsyms)
+
+    @property
+    def ndim(self):
+        return len(self.orbsyms)
+
+    @property
+    def size(self):
+        '''Number of the elements stored'''
+        return sum(x.size for x in self.blocks.values())
+
+    @property
+    def nbytes(self):
+        return sum(x.nbytes for x in self.blocks.values())
+
+    @property
+    def dtype(self):
+        if self.blocks:
+            return numpy.result_type(*set(x.dtype for x in self.blocks.values()))
+        else:
+            return numpy.dtype(numpy.double)
+
+    def indices(self, key):
+        '''The orbital indices of each axis in the block'''
+        return tuple(idx[ir] for idx, ir in zip(self._idx, key))
+
+    def block_shape(self, key):
+        return tuple(len(x) for x in self.indices(key))
+
+    def keys(self):
+        return sorted(self.blocks)
+
+    def diagonal(self):
+        '''Diagonal of a totally symmetric 2D tensor as a dense array'''
+        assert(self.ndim == 2 and self.sym == 0)
+        out = numpy.zeros(min(self.shape), self.dtype)
+        for (ir, jr), blk in self.blocks.items():
+            if ir == jr:
+                i, j = self.indices((ir, jr))
+                mask = numpy.in1d(i, j)
+                out[i[mask]] = blk[mask][:,numpy.in1d(j, i)].diagonal()
+        return out
+
+    @classmethod
+    def from_dense(cls, a, orbsyms, sym=0):
+        '''Extract the symmetry-allowed blocks from a dense array.  The
+        symmetry-forbidden elements are discarded.'''
+        a = numpy.asarray(a)
+        t = cls(orbsyms, sym, {})
+        for key in t._allowed_keys():
+            t.blocks[key] = a[numpy.ix_(*t.indices(key))]
+        return t
+
+    def to_dense(self):
+        out = numpy.zeros(self.shape, self.dtype)
+        for key, blk in self.blocks.items():
+            out[numpy.ix_(*self.indices(key))] = blk
+        return out
+
+    def __array__(self, dtype=None):
+        # Fallback for the code which works on dense arrays only
+        return numpy.asarray(self.to_dense(), dtype=dtype)
+
+    def _new(self, orbsyms=None, blocks=None):
+        if orbsyms is None:
+            orbsyms = self.orbsyms
+        return SymmTensor(orbsyms, self.sym, blocks)
+
+    def copy(self):
+        return self._new(blocks=dict((k, v.copy()) for k, v in self.blocks.items()))
+
+    def conj(self):
+        return self._new(blocks=dict((k, numpy.conj(v)) for k, v in self.blocks.items()))
+
+    @property
+    def real(self):
+        return self._new(blocks=dict((k, v.real) for k, v in self.blocks.items()))
+
+    def transpose(self, *axes):
+        if len(axes) == 1 and not isinstance(axes[0], numbers.Integral):
+            axes = axes[0]
+        if not axes:
+            axes = range(self.ndim)[::-1]
+        axes = tuple(axes)
+        orbsyms = [self.orbsyms[i] for i in axes]
+        blocks = dict((tuple(k[i] for i in axes), v.transpose(axes))
+                      for k, v in self.blocks.items())
+        return self._new(orbsyms, blocks)
+
+    def __getitem__(self, slices):
+        '''Basic slicing with step 1, e.g. fock[:nocc,nocc:]'''
+        if not isinstance(slices, tuple):
+            slices = (slices,)
+        if len(slices) > self.ndim or not all(isinstance(s, slice) and
+                                              s.step in (None, 1)
+                                              for s in slices):
+            raise NotImplementedError('SymmTensor slicing %s' % str(slices))
+        slices = slices + (slice(None),) * (self.ndim-len(slices))
+        ranges = [numpy.arange(n)[s] for n, s in zip(self.shape, slices)]
+        orbsyms = [x[r] for x, r in zip(self.orbsyms, ranges)]
+        out = SymmTensor(orbsyms, self.sym, {})
+        for key in out._allowed_keys():
+            blk = self.blocks[key]
+            for axis, (r, ir) in enumerate(zip(ranges, key)):
+                idx = self._idx[axis][ir]
+                sub = r[self.orbsyms[axis][r] == ir]
+                blk = blk.take(numpy.searchsorted(idx, sub), axis=axis)
+            out.blocks[key] = blk
+        return out
+
+    def ravel(self):
+        '''The allowed elements in a 1D array'''
+        if not self.blocks:
+            return numpy.zeros(0)
+        return numpy.hstack([self.blocks[k].ravel() for k in self.keys()])
+
+    def unravel(self, vec):
+        '''Inverse of ravel.  A new tensor of the same structure is created
+        with the elements in vec.'''
+        blocks = {}
+        p0 = 0
+        for key in self.keys():
+            shape = self.blocks[key].shape
+            p1 = p0 + self.blocks[key].size
+            blocks[key] = vec[p0:p1].reshape(shape)
+            p0 = p1
+        return self._new(blocks=blocks)
+
+    def _asformat(self, other):
+        if isinstance(other, SymmTensor):
+            if other.shape != self.shape or other.sym != self.sym:
+                raise ValueError('SymmTensor structures mismatch')
+            return other
+        return SymmTensor.from_dense(other, self.orbsyms, self.sym)
+
+    def _binary_op(self, other, op):
+        if _is_scalar(other):
+            blocks = dict((k, op(v, other)) for k, v in self.blocks.items())
+        else:
+            other = self._asformat(other)
+            blocks = dict((k, op(v, other.blocks[k]))
+                          for k, v in self.blocks.items())
+        return self._new(blocks=blocks)
+
+    def _inplace_op(self, other, op):
+        if _is_scalar(other):
+            for k, v in self.blocks.items():
+                self.blocks[k] = op(v, other)
+        else:
+            other = self._asformat(other)
+            for k, v in self.blocks.items():
+                self.blocks[k] = op(v, other.blocks[k])
+        return self
+
+    def __add__(self, other):
+        return self._binary_op(other, numpy.add)
+    __radd__ = __add__
+    def __sub__(self, other):
+        return self._binary_op(other, numpy.subtract)
+    def __rsub__(self, other):
+        return self._binary_op(other, lambda a, b: b - a)
+    def __mul__(self, other):
+        return self._binary_op(other, numpy.multiply)
+    __rmul__ = __mul__
+    def __truediv__(self, other):
+        return self._binary_op(other, numpy.true_divide)
+    __div__ = __truediv__
+    def __neg__(self):
+        return self._new(blocks=dict((k, -v) for k, v in self.blocks.items()))
+
+    def __iadd__(self, other):
+        return self._inplace_op(other, lambda a, b: a.__iadd__(b)
+                                if a.dtype == numpy.result_type(a, b) else a + b)
+    def __isub__(self, other):
+        return self._inplace_op(other, lambda a, b: a.__isub__(b)
+                                if a.dtype == numpy.result_type(a, b) else a - b)
+    def __imul__(self, other):
+        return self._inplace_op(other, lambda a, b: a.__imul__(b)
+                                if a.dtype == numpy.result_type(a, b) else a * b)
+    def __itruediv__(self, other):
+        return self._inplace_op(other, numpy.true_divide)
+    __idiv__ = __itruediv__
+
+    def __repr__(self):
+        return ('<SymmTensor shape=%s sym=%d blocks=%d size=%d>' %
+                (self.shape, self.sym, len(self.blocks), self.size))
+
+
+def _is_scalar(x):
+    return not isinstance(x, SymmTensor) and numpy.ndim(x) == 0
+
+def zeros(orbsyms, sym=0, dtype=numpy.double):
+    return SymmTensor(orbsyms, sym, dtype=dtype)
+
+
+def einsum(subscripts, *operands):
+    '''Same to lib.einsum if none of the operands is a SymmTensor.
+    Otherwise all operands must be SymmTensor and the contraction is
+    carried out block by block over the symmetry-allowed blocks.
+    '''
+    if not any(isinstance(x, SymmTensor) for x in operands):
+        return lib.einsum(subscripts, *operands)
+    if not all(isinstance(x, SymmTensor) for x in operands):
+        raise TypeError('einsum between SymmTensor and dense array')
+
+    subscripts = subscripts.replace(' ', '')
+    idx_in = subscripts.split('->')[0].split(',')
+    labels = ''.join(idx_in)
+    if '->' in subscripts:
+        idx_out = subscripts.split('->')[1]
+    else:
+        idx_out = ''.join(sorted(x for x in set(labels) if labels.count(x) == 1))
+    for idx in idx_in:
+        if len(set(idx)) != len(idx):
+            raise NotImplementedError('Repeated index in %s' % subscripts)
+    # The sum over the index of one tensor and the elementwise product do not
+    # conserve the symmetry
+    if any((labels.count(x) == 1) != (x in idx_out) for x in labels):
+        raise NotImplementedError('Symmetry not conserved in %s' % subscripts)
+
+    operands = list(operands)
+    # Contract the pair which shares the most indices first
+    while len(operands) > 2:
+        nshared, a, b = max((len(set(idx_in[i]).intersection(idx_in[j])), i, j)
+                            for i in range(len(operands))
+                            for j in range(i+1, len(operands)))
+        rest = ''.join(idx_in[k] for k in range(len(idx_in)) if k not in (a, b))
+        idx_ab = ''.join(sorted(set(idx_in[a]+idx_in[b]).intersection(rest+idx_out),
+                                key=(idx_in[a]+idx_in[b]).index))
+        t = _contract(idx_in[a], idx_in[b], idx_ab, operands[a], operands[b])
+        idx_in = [idx_in[k] for k in range(len(idx_in)) if k not in (a, b)] + [idx_ab]
+        operands = [operands[k] for k in range(len(operands)) if k not in (a, b)] + [t]
+
+    if len(operands) == 1:
+        out = _contract(idx_in[0], '', idx_out, operands[0], None)
+    else:
+        out = _contract(idx_in[0], idx_in[1], idx_out, operands[0], operands[1])
+    if not idx_out:
+        return out.blocks.get((), numpy.zeros(()))[()]
+    return out
+
+def _contract(idxa, idxb, idxc, a, b):
+    if b is None:
+        orbsyms = [a.orbsyms[idxa.index(x)] for x in idxc]
+        out = SymmTensor(orbsyms, a.sym, dtype=a.dtype)
+        sub = '%s->%s' % (idxa, idxc)
+        for ka, blka in a.blocks.items():
+            if blka.size > 0:
+                irs = dict(zip(idxa, ka))
+                kc = tuple(irs[x] for x in idxc)
+                out.blocks[kc] += numpy.einsum(sub, blka)
+        return out
+
+    orbsyms = []
+    for x in idxc:
+        if x in idxa:
+            orbsyms.append(a.orbsyms[idxa.index(x)])
+        else:
+            orbsyms.append(b.orbsyms[idxb.index(x)])
+    dtype = numpy.result_type(a.dtype, b.dtype)
+    out = SymmTensor(orbsyms, a.sym ^ b.sym, dtype=dtype)
+
+    shared = [x for x in idxa if x in idxb]
+    groups = {}
+    for kb, blkb in b.blocks.items():
+        if blkb.size > 0:
+            irs = dict(zip(idxb, kb))
+            groups.setdefault(tuple(irs[x] for x in shared), []).append((irs, blkb))
+
+    sub = '%s,%s->%s' % (idxa, idxb, idxc)
+    if idxc:
+        fn = lib.einsum
+    else:
+        fn = numpy.einsum
+    for ka, blka in a.blocks.items():
+        if blka.size == 0:
+            continue
+        irs_a = dict(zip(idxa, ka))
+        for irs_b, blkb in groups.get(tuple(irs_a[x] for x in shared), ()):
+            irs = irs_a.copy()
+            irs.update(irs_b)
+            kc = tuple(irs[x] for x in idxc)
+            out.blocks[kc] += fn(sub, blka, blkb)
+    return out
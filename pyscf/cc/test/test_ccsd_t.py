@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 import unittest
+import tempfile
 import numpy
+import h5py
 from pyscf import gto, scf, lib, symm
 from pyscf import cc
 from pyscf.cc import ccsd_t
@@ -50,6 +52,24 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(e3a, -0.003060022611584471, 9)
         mcc.mol.symmetry = True
 
+    def test_ccsd_t_tasks(self):
+        eris = mcc.ao2mo()
+        ftmp = tempfile.NamedTemporaryFile()
+        e3a = ccsd_t.kernel(mcc, eris, nproc=2, chkfile=ftmp.name)
+        self.assertAlmostEqual(e3a, -0.003060022611584471, 9)
+
+        # restart with unfinished tasks
+        with h5py.File(ftmp.name, 'a') as f:
+            et = f['ccsd_t/et']
+            self.assertFalse(numpy.isnan(et[:]).any())
+            et[:2] = numpy.nan
+        e3a = ccsd_t.kernel(mcc, eris, chkfile=ftmp.name)
+        self.assertAlmostEqual(e3a, -0.003060022611584471, 9)
+
+        tasks = ccsd_t._make_tasks(19, 40)
+        self.assertTrue(len(tasks) > 1)
+        self.assertEqual(sum(ccsd_t._task_weight(*x) for x in tasks), 19*20*21//6)
+
     def test_sort_eri(self):
         eris = mcc.ao2mo()
         nocc, nvir = mcc.t1.shape
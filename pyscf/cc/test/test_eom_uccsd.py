@@ -69,6 +69,11 @@ class KnowValues(unittest.TestCase):
         ecc, t1, t2 = ucc.kernel()
         self.assertAlmostEqual(ecc, -0.34869875247588372, 8)
 
+    def test_symm_blocks_not_implemented(self):
+        ucc = cc.UCCSD(mf)
+        ucc.symm_blocks = True
+        self.assertRaises(NotImplementedError, ucc.kernel)
+
     def test_eomee(self):
         ucc = cc.UCCSD(mf)
         ecc, t1, t2 = ucc.kernel()
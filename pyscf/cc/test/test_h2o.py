@@ -58,6 +58,63 @@ class KnowValues(unittest.TestCase):
         t2b = mcc.add_wvvVV(t1, t2, eris)
         self.assertTrue(numpy.allclose(t2a,t2b))
 
+    def test_ccsd_integral_direct(self):
+        mcc = cc.ccsd.CC(mf)
+        mcc.direct = True
+        mcc.direct_ovvv = True
+        mcc.conv_tol = 1e-10
+        eris = mcc.ao2mo()
+        ref = cc.ccsd.CC(mf).ao2mo()
+        self.assertTrue(numpy.allclose(eris.ovvv[:,3:7], ref.ovvv[:,3:7]))
+        self.assertTrue(numpy.allclose(eris.ovvv[2], ref.ovvv[2]))
+        # slicing transforms ovvv once and then reads the temporary file
+        tmpfile = eris.ovvv._tmpfile
+        self.assertTrue(tmpfile is not None)
+        self.assertTrue(numpy.allclose(eris.ovvv[1:4], ref.ovvv[1:4]))
+        self.assertTrue(eris.ovvv._tmpfile is tmpfile)
+        ovvv = eris.ovvv.build(eris.ovvv.orbo, eris.ovvv.orbv[:,2:5])
+        self.assertTrue(numpy.allclose(ovvv, ref.ovvv[:,2:5]))
+        self.assertTrue(numpy.allclose(eris.oovv, ref.oovv))
+        self.assertTrue(numpy.allclose(eris.ovoo, ref.ovoo))
+
+        # small max_memory to split the virtual orbitals in several blocks
+        mcc.max_memory = 1
+        emp2, t1, t2 = mcc.init_amps(eris)
+        t1a, t2a = mcc.update_amps(t1, t2, eris)
+        t1b, t2b = cc.ccsd.CC(mf).update_amps(t1, t2, ref)
+        self.assertTrue(numpy.allclose(t1a, t1b))
+        self.assertTrue(numpy.allclose(t2a, t2b))
+
+        mcc.max_memory = mf.max_memory
+        mcc.kernel(eris=eris)
+        self.assertAlmostEqual(mcc.ecc, -0.2133432312951, 8)
+
+    def test_rccsd_symm_blocks(self):
+        from pyscf.cc import rccsd, symm_tensor
+        pmol = mol.copy()
+        pmol.symmetry = True
+        pmol.build(False, False)
+        mf1 = scf.RHF(pmol).set(conv_tol_grad=1e-8).run()
+        mycc = rccsd.RCCSD(mf1)
+        mycc.symm_blocks = True
+        mycc.conv_tol = 1e-10
+        mycc.kernel()
+        self.assertTrue(isinstance(mycc.t2, symm_tensor.SymmTensor))
+        self.assertTrue(mycc.t2.size < mycc.t2.to_dense().size/3)
+        self.assertAlmostEqual(mycc.e_corr, -0.2133432312951, 7)
+
+        eris = mycc.ao2mo()
+        eris_ref = rccsd._ERIS(mycc)
+        self.assertTrue(isinstance(eris.vvvv, symm_tensor.SymmTensor))
+        nvir = mycc.nmo - mycc.nocc
+        vvvv = lib.unpack_tril(lib.unpack_tril(eris_ref.vvvv).reshape(-1,nvir**2).T)
+        self.assertAlmostEqual(abs(eris.vvvv.to_dense()-
+                                   vvvv.reshape((nvir,)*4)).max(), 0, 12)
+        self.assertAlmostEqual(abs(eris.ovvo.to_dense()-eris_ref.ovvo).max(), 0, 12)
+        vec = mycc.amplitudes_to_vector(mycc.t1, mycc.t2)
+        t1, t2 = mycc.vector_to_amplitudes(vec, orbsym=eris.orbsym)
+        self.assertAlmostEqual(abs(t2.to_dense()-mycc.t2.to_dense()).max(), 0, 12)
+
     def test_ccsd_frozen(self):
         mcc = cc.ccsd.CC(mf, frozen=range(1))
         mcc.conv_tol = 1e-10
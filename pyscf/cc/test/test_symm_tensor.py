@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy
+from pyscf.cc import symm_tensor
+from pyscf.cc.symm_tensor import SymmTensor
+
+orbsym_o = numpy.array([0,3,1,0,2])
+orbsym_v = numpy.array([1,0,2,3,0,0,1,2])
+nocc = orbsym_o.size
+
+def rand(orbsyms, sym=0):
+    a = numpy.random.random([len(x) for x in orbsyms])
+    return SymmTensor.from_dense(a, orbsyms, sym)
+
+class KnowValues(unittest.TestCase):
+    def test_einsum(self):
+        numpy.random.seed(1)
+        so, sv = orbsym_o, orbsym_v
+        t1 = rand((so,sv))
+        t2 = rand((so,so,sv,sv))
+        ovov = rand((so,sv,so,sv))
+        t1d, t2d, ovovd = t1.to_dense(), t2.to_dense(), ovov.to_dense()
+        self.assertTrue(t2.size < t2d.size/3)
+
+        self.assertAlmostEqual(symm_tensor.einsum('ijab,iajb', t2, ovov),
+                               numpy.einsum('ijab,iajb', t2d, ovovd), 9)
+        ref = numpy.einsum('kcld,ic,ld->ki', ovovd, t1d, t1d)
+        val = symm_tensor.einsum('kcld,ic,ld->ki', ovov, t1, t1)
+        self.assertTrue(numpy.allclose(val.to_dense(), ref))
+        ref = numpy.einsum('ia,jb->ijab', t1d, t1d) - t2d.transpose(1,0,3,2)
+        val = symm_tensor.einsum('ia,jb->ijab', t1, t1) - t2.transpose(1,0,3,2)
+        self.assertTrue(numpy.allclose(val.to_dense(), ref))
+
+        r1 = rand((so,sv), sym=3)
+        val = symm_tensor.einsum('ijab,jb->ia', t2, r1)
+        self.assertEqual(val.sym, 3)
+        self.assertTrue(numpy.allclose(val.to_dense(),
+                                       numpy.einsum('ijab,jb->ia', t2d, r1.to_dense())))
+        self.assertRaises(NotImplementedError, symm_tensor.einsum, 'ijab->ia', t2)
+
+    def test_arithmetic(self):
+        numpy.random.seed(2)
+        so, sv = orbsym_o, orbsym_v
+        t2 = rand((so,so,sv,sv))
+        t2d = t2.to_dense()
+        t3 = 2*t2 - t2/4
+        t3 -= numpy.ones(t2.shape)
+        # symmetry-forbidden elements are dropped
+        mask = SymmTensor.from_dense(numpy.ones(t2.shape), t2.orbsyms).to_dense()
+        ref = 1.75*t2d - mask
+        self.assertTrue(numpy.allclose(t3.to_dense(), ref))
+        self.assertTrue(numpy.allclose(t2.unravel(t2.ravel()*2).to_dense(), 2*t2d))
+        self.assertAlmostEqual(numpy.linalg.norm(t2.ravel()), numpy.linalg.norm(t2d), 9)
+
+        orbsym = numpy.hstack((so,sv))
+        fock = rand((orbsym,orbsym))
+        fockd = fock.to_dense()
+        self.assertTrue(numpy.allclose(fock[:nocc,nocc:].to_dense(), fockd[:nocc,nocc:]))
+        self.assertTrue(numpy.allclose(fock[2:4,1:7].to_dense(), fockd[2:4,1:7]))
+        self.assertTrue(numpy.allclose(fock.diagonal(), fockd.diagonal()))
+
+if __name__ == "__main__":
+    print("Full Tests for cc.symm_tensor")
+    unittest.main()
@@ -504,6 +504,10 @@ class UCCSD(rccsd.RCCSD):
             mbpt2 : bool
                 Use one-shot MBPT2 approximation to CCSD.
         '''
+        # TODO: symm_blocks (SymmTensor amplitudes and integrals) in
+        # update_amps and uintermediates.  Only RCCSD supports it now.
+        if self.symm_blocks:
+            raise NotImplementedError('symm_blocks for UCCSD')
         if eris is None: eris = self.ao2mo(self.mo_coeff)
         self.eris = eris
         self.dump_flags()
@@ -1944,12 +1948,12 @@ class _ERISspin:
             maskb = numpy.where((idxb.reshape(-1,1) & idxb).ravel())[0]
             eri = numpy.zeros((nmo*nmo,nmo*nmo))
 
-            eri_aa = ao2mo.restore(1, ao2mo.full(cc._scf._eri, moa), nmoa)
+            eri_aa = ao2mo.restore(1, ao2mo.cache.full(cc._scf._eri, moa), nmoa)
             lib.takebak_2d(eri, eri_aa.reshape(nmoa**2,-1), maska, maska)
-            eri_bb = ao2mo.restore(1, ao2mo.full(cc._scf._eri, mob), nmob)
+            eri_bb = ao2mo.restore(1, ao2mo.cache.full(cc._scf._eri, mob), nmob)
             lib.takebak_2d(eri, eri_bb.reshape(nmob**2,-1), maskb, maskb)
 
-            eri_ab = ao2mo.general(cc._scf._eri, (moa,moa,mob,mob), compact=False)
+            eri_ab = ao2mo.cache.general(cc._scf._eri, (moa,moa,mob,mob), compact=False)
             eri_ba = lib.transpose(eri_ab)
             lib.takebak_2d(eri, eri_ab, maska, maskb)
             lib.takebak_2d(eri, eri_ba, maskb, maska)
@@ -2114,9 +2118,9 @@ class _ERIS:
             nmoa = moa.shape[1]
             nmob = mob.shape[1]
 
-            eri_aa = ao2mo.restore(1, ao2mo.full(cc._scf._eri, moa), nmoa)
-            eri_bb = ao2mo.restore(1, ao2mo.full(cc._scf._eri, mob), nmob)
-            eri_ab = ao2mo.general(cc._scf._eri, (moa,moa,mob,mob), compact=False)
+            eri_aa = ao2mo.restore(1, ao2mo.cache.full(cc._scf._eri, moa), nmoa)
+            eri_bb = ao2mo.restore(1, ao2mo.cache.full(cc._scf._eri, mob), nmob)
+            eri_ab = ao2mo.cache.general(cc._scf._eri, (moa,moa,mob,mob), compact=False)
             eri_ba = lib.transpose(eri_ab)
 
             self.nocca = nocca = np.count_nonzero(self.orbspin[:nocc] == 0)
@@ -581,7 +581,7 @@ def _make_eris_incore(myci, mo_coeff=None):
     nmo = eris.fock.shape[0]
     nvir = nmo - nocc
 
-    eri1 = ao2mo.incore.full(myci._scf._eri, eris.mo_coeff)
+    eri1 = ao2mo.cache.full(myci._scf._eri, eris.mo_coeff)
     #:eri1 = ao2mo.restore(1, eri1, nmo)
     #:eris.oooo = eri1[:nocc,:nocc,:nocc,:nocc].copy()
     #:eris.vooo = eri1[nocc:,:nocc,:nocc,:nocc].copy()
@@ -5,6 +5,7 @@
 
 import copy
 import numpy
+import h5py
 from pyscf import lib
 from pyscf import gto
 from pyscf import ao2mo
@@ -51,6 +52,25 @@ class load(ao2mo.load):
     def __init__(self, eri, dataname='j3c'):
         ao2mo.load.__init__(self, eri, dataname)
 
+def load_pair_idx(cderi, dataname='j3c'):
+    '''Indices (in the nao*(nao+1)/2 pair list) of the AO pairs stored in the
+    DF tensor file (see :func:`pair_mask`), or None if the file stores all AO
+    pairs.
+    '''
+    if lib.mmapfile.is_mmapfile(cderi):
+        feri = lib.MMapFile(cderi, 'r')
+    elif isinstance(cderi, str) and h5py.is_hdf5(cderi):
+        feri = h5py.File(cderi, 'r')
+    else:
+        return None
+    try:
+        if dataname+'_idx' in feri:
+            return numpy.asarray(feri[dataname+'_idx'])
+        else:
+            return None
+    finally:
+        feri.close()
+
 
 def aug_etb_for_dfbasis(mol, dfbasis='weigend', beta=2.3, start_at='Rb'):
     '''augment weigend basis with even tempered gaussian basis
@@ -173,3 +193,51 @@ def make_auxmol(mol, auxbasis=None):
     lib.logger.debug(mol, 'num shells = %d, num cGTOs = %d',
                      pmol.nbas, pmol.nao_nr())
     return pmol
+
+def pair_mask(mol, thresh=1e-13, aosym='s2ij'):
+    '''Mask of the significant AO pairs for the 3-center integrals (ij|L).
+    The magnitude of the shell pair is estimated by the Gaussian product
+    prefactor of the most diffuse primitives
+
+        exp(-a b/(a+b) R_ij^2) (1+R_ij^2)^((l_i+l_j)/2)
+
+    Returns:
+        1D boolean array of size nao*(nao+1)/2 for aosym='s2ij' (in the order
+        of lib.pack_tril), or nao*nao for aosym='s1'
+    '''
+    nbas = mol.nbas
+    ao_loc = mol.ao_loc_nr()
+    es = numpy.array([mol.bas_exp(i).min() for i in range(nbas)])
+    ls = mol._bas[:,gto.ANG_OF]
+    rs = mol.atom_coords()[mol._bas[:,gto.ATOM_OF]]
+    rr = numpy.einsum('ijx->ij', (rs[:,None]-rs)**2)
+    aij = es[:,None] * es / (es[:,None] + es)
+    est = numpy.exp(-aij*rr) * (1+rr)**((ls[:,None]+ls)*.5)
+    shmask = est > thresh
+
+    sh_of_ao = numpy.repeat(numpy.arange(nbas), ao_loc[1:]-ao_loc[:-1])
+    mask = shmask[sh_of_ao[:,None],sh_of_ao]
+    if aosym == 's1':
+        return mask.ravel()
+    else:
+        idx = numpy.tril_indices(ao_loc[-1])
+        return mask[idx]
+
+def shell_pair_mask(mol, pair_mask, aosym='s2ij'):
+    '''Mask of the shell pairs which have at least one AO pair selected by
+    pair_mask (see :func:`pair_mask`).  The 3-center integrals of the other
+    shell pairs need not be computed.
+
+    Returns:
+        2D boolean array of (nbas,nbas)
+    '''
+    ao_loc = mol.ao_loc_nr()
+    nao = ao_loc[-1]
+    if aosym == 's1':
+        mask = pair_mask.reshape(nao,nao)
+    else:
+        mask = numpy.zeros((nao,nao), dtype=bool)
+        mask[numpy.tril_indices(nao)] = pair_mask
+        mask |= mask.T
+    mask = numpy.logical_or.reduceat(mask, ao_loc[:-1], axis=0)
+    return numpy.logical_or.reduceat(mask, ao_loc[:-1], axis=1)
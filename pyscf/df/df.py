@@ -8,7 +8,9 @@ J-metric density fitting
 '''
 
 import time
+import imp
 import tempfile
+import threading
 import numpy
 import h5py
 from pyscf import lib
@@ -21,6 +23,67 @@ from pyscf.df import addons
 from pyscf.df import df_jk
 from pyscf.ao2mo import _ao2mo
 from pyscf.ao2mo.incore import _conc_mos, iden_coeffs
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+# Number of blocks of the DF tensor to read ahead on a background thread
+PREFETCH_DEPTH = 2
+# The on-disk DF tensor is read in chunks of several blocks.  The chunk size is
+# increased until one read takes about BLOCK_READ_TIME seconds, to hide the
+# latency of HDF5 reads
+BLOCK_READ_TIME = .1
+
+def _single_precision(mydf):
+    '''Whether to store the DF tensor in single precision'''
+    return (getattr(mydf, 'single_precision', False) and
+            not getattr(mydf, '_fallback_fp64', False))
+
+def check_precision(mydf, dm):
+    '''Rebuild the single precision DF tensor in double precision if the
+    density matrix changes less than mydf.single_precision_fallback between
+    two SCF cycles, i.e. near SCF convergence where the float32 rounding error
+    (see mydf.precision_error) becomes comparable to the SCF error.
+
+    The density matrix is compared to the last different density matrix, so
+    that the calls of get_j and get_k in the same SCF cycle do not count as
+    converged cycles.  The rebuild is recorded in mydf._fallback_fp64, the
+    attribute single_precision is not changed.
+    '''
+    if not _single_precision(mydf) or mydf.single_precision_fallback is None:
+        return mydf
+    dm = numpy.array(dm)
+    dm_last = mydf._dm_last
+    if dm_last is None or dm_last.shape != dm.shape:
+        mydf._dm_last = dm
+        return mydf
+    ddm = abs(dm - dm_last).max()
+    if ddm == 0:
+        # The same density matrix (e.g. get_j and get_k of one SCF cycle)
+        return mydf
+    mydf._dm_last = dm
+    if mydf._cderi is not None and ddm < mydf.single_precision_fallback:
+        logger.info(mydf, 'Density matrix change %.3g < %g. '
+                    'Rebuild DF tensor in double precision',
+                    ddm, mydf.single_precision_fallback)
+        mydf._fallback_fp64 = True
+        mydf._dm_last = None
+        mydf.build()
+    return mydf
+
+def reset_precision(mydf):
+    '''Clear the double precision fallback of check_precision for a new SCF
+    run (or a new geometry).  The tensor rebuilt in double precision is
+    dropped, to be regenerated in single precision on demand.
+    '''
+    if getattr(mydf, '_fallback_fp64', False):
+        mydf._fallback_fp64 = False
+        mydf._cderi = None
+    if hasattr(mydf, '_dm_last'):
+        mydf._dm_last = None
+    return mydf
+
 
 class DF(lib.StreamObject):
     def __init__(self, mol):
@@ -39,6 +102,30 @@ class DF(lib.StreamObject):
         self._cderi = None
         self._call_count = 0
         self.blockdim = 240
+# Read the on-disk DF tensor on a background thread
+        self.async_io = True
+        self.prefetch_depth = PREFETCH_DEPTH
+# The number of rows of the on-disk DF tensor in one read (see loop)
+        self._read_blksize = None
+# Local exchange with the localized occupied orbitals (see df_jk.get_jk)
+        self.local_k = False
+        self.local_k_thresh = df_jk.LOCAL_K_THRESH
+        self._atm_ovlp = None
+# Only store the AO pairs which are significant (see addons.pair_mask).  The
+# indices of the stored pairs (in the nao*(nao+1)/2 pair list) are _pair_idx
+        self.screen_pairs = False
+        self.pair_screen_thresh = 1e-13
+        self._pair_idx = None
+# Store the DF tensor in float32.  J/K and the MO transformations are still
+# computed in float64.  When the density matrix of two SCF cycles differs less
+# than single_precision_fallback, the tensor is rebuilt in float64 and
+# _fallback_fp64 is set (see check_precision).  They are reset at the beginning
+# of the next SCF run (see reset_precision).
+        self.single_precision = False
+        self.single_precision_fallback = 1e-4
+        self.precision_error = 0
+        self._dm_last = None
+        self._fallback_fp64 = False
         self._keys = set(self.__dict__.keys())
 
     def dump_flags(self):
@@ -55,8 +142,20 @@ class DF(lib.StreamObject):
                      self._cderi)
         elif isinstance(self._cderi_to_save, str):
             log.info('_cderi_to_save = %s', self._cderi_to_save)
+        elif isinstance(self._cderi_to_save, lib.MMapFile):
+            log.info('_cderi_to_save = %s', self._cderi_to_save.filename)
         else:
             log.info('_cderi_to_save = %s', self._cderi_to_save.name)
+        log.info('blockdim = %d', self.blockdim)
+        if self.async_io:
+            log.info('prefetch_depth = %d', self.prefetch_depth)
+        if self.local_k:
+            log.info('local_k_thresh = %g', self.local_k_thresh)
+        if self.screen_pairs:
+            log.info('pair_screen_thresh = %g', self.pair_screen_thresh)
+        if self.single_precision:
+            log.info('single_precision_fallback = %s',
+                     self.single_precision_fallback)
 
     def build(self):
         t0 = (time.clock(), time.time())
@@ -66,40 +165,142 @@ class DF(lib.StreamObject):
         nao = mol.nao_nr()
         naux = auxmol.nao_nr()
         nao_pair = nao*(nao+1)//2
+        single_precision = _single_precision(self)
+
+        mask = None
+        self._pair_idx = None
+        self._atm_ovlp = None
+        self._read_blksize = None
+        if self.screen_pairs:
+            mask = addons.pair_mask(mol, self.pair_screen_thresh)
+            self._pair_idx = numpy.where(mask)[0]
+            log.debug('%d significant AO pairs out of %d',
+                      self._pair_idx.size, nao_pair)
+            nao_pair = self._pair_idx.size
 
         max_memory = (self.max_memory - lib.current_memory()[0]) * .8
         int3c = mol._add_suffix('int3c2e')
         int2c = mol._add_suffix('int2c2e')
         if (nao_pair*naux*3*8/1e6 < max_memory and
             not isinstance(self._cderi_to_save, str)):
-            self._cderi = incore.cholesky_eri(mol, int3c=int3c, int2c=int2c,
-                                              auxmol=auxmol, verbose=log)
+            cderi = incore.cholesky_eri(mol, int3c=int3c, int2c=int2c,
+                                        auxmol=auxmol, verbose=log,
+                                        pair_mask=mask)
+            if single_precision:
+                cderi, cderi64 = cderi.astype(numpy.float32), cderi
+                self.precision_error = abs(cderi - cderi64).max()
+                cderi64 = None
+            self._cderi = cderi
         else:
             if isinstance(self._cderi_to_save, str):
                 cderi = self._cderi_to_save
+            elif lib.param.STORAGE_BACKEND == 'mmap':
+                # Blocks of the memory-mapped tensor are read without copy
+                if not isinstance(self._cderi_to_save, lib.MMapFile):
+                    self._cderi_to_save = lib.MMapTmpFile()
+                cderi = self._cderi_to_save.filename
             else:
                 cderi = self._cderi_to_save.name
             if isinstance(self._cderi, str):
                 log.warn('Value of _cderi is ignored. DF integrals will be '
                          'saved in file %s .', cderi)
+            if single_precision:
+                dtype = numpy.float32
+            else:
+                dtype = numpy.double
             outcore.cholesky_eri(mol, cderi, dataname='j3c',
                                  int3c=int3c, int2c=int2c, auxmol=auxmol,
-                                 max_memory=max_memory, verbose=log)
-            if nao_pair*naux*8/1e6 < max_memory:
+                                 max_memory=max_memory, verbose=log,
+                                 pair_mask=mask, dtype=dtype)
+            if single_precision:
+                with addons.load(cderi, 'j3c') as feri:
+                    self.precision_error = feri.attrs['rounding_error']
+            if nao_pair*naux*numpy.dtype(dtype).itemsize/1e6 < max_memory:
                 with addons.load(cderi, 'j3c') as feri:
                     cderi = numpy.asarray(feri)
             self._cderi = cderi
             log.timer_debug1('Generate density fitting integrals', *t0)
+        if single_precision:
+            log.info('DF tensor in single precision. Max rounding error %.3g',
+                     self.precision_error)
+        else:
+            self.precision_error = 0
         return self
 
-    def loop(self):
+    def loop(self, blksize=None, sparse=False):
+        '''Iterate over the blocks of the 3-index tensor (naux, nao_pair).
+        The blocks have at most blksize (default blockdim) rows.  When the
+        tensor is on disk and async_io is set, the tensor is read in chunks
+        of several blocks (see _estimate_blockdim) on a background thread
+        while the current block is in use.  The yielded array is overwritten
+        after the next iteration.
+
+        Kwargs:
+            sparse : bool
+                If the AO pairs are screened (see screen_pairs), whether to
+                yield the blocks of the stored pairs (naux, len(_pair_idx))
+                rather than the blocks of all AO pairs.
+        '''
         if self._cderi is None:
             self.build()
+        if blksize is None:
+            blksize = self.blockdim
+        pair_idx = self._load_pair_idx()
         with addons.load(self._cderi, 'j3c') as feri:
-            naoaux = feri.shape[0]
-            for b0, b1 in self.prange(0, naoaux, self.blockdim):
-                eri1 = numpy.asarray(feri[b0:b1], order='C')
-                yield eri1
+            naoaux, npair = feri.shape
+            if pair_idx is not None and not sparse:
+                nao = self.mol.nao_nr()
+                buf = numpy.zeros((min(blksize,naoaux),nao*(nao+1)//2))
+            elif feri.dtype != numpy.double:
+                buf = numpy.empty((min(blksize,naoaux),npair))
+
+            if isinstance(feri, numpy.ndarray) or not self.async_io:
+                ranges = list(self.prange(0, naoaux, blksize))
+                blocks = ([numpy.asarray(feri[b0:b1], order='C')]
+                          for b0, b1 in ranges)
+            else:
+                if self._read_blksize is None:
+                    max_memory = self.max_memory - lib.current_memory()[0]
+                    self._read_blksize = _estimate_blockdim(
+                        feri, max_memory, self.prefetch_depth, blksize)
+                    logger.debug1(self, '%d rows in one read of the DF tensor',
+                                  self._read_blksize)
+                # Chunks of whole blocks, so that the consumers which allocate
+                # buffers of blksize rows are not affected by the read size
+                readsize = max(1, self._read_blksize//blksize) * blksize
+                ranges = list(self.prange(0, naoaux, readsize))
+                reverse = len(ranges) > 1 and ranges[0][0] > ranges[-1][0]
+                blocks = _split_blocks(prefetch((feri,), ranges,
+                                                self.prefetch_depth),
+                                       blksize, reverse)
+            try:
+                for eri1, in blocks:
+                    if pair_idx is not None and not sparse:
+                        out = buf[:eri1.shape[0]]
+                        out[:,pair_idx] = eri1
+                        eri1 = out
+                    elif eri1.dtype != numpy.double:
+                        # single precision tensor
+                        out = buf[:eri1.shape[0]]
+                        out[:] = eri1
+                        eri1 = out
+                    yield eri1
+            finally:
+                blocks.close()
+
+    def _load_pair_idx(self):
+        '''Indices of the AO pairs stored in _cderi, or None if all AO pairs
+        are stored'''
+        if self._cderi is None:
+            self.build()
+        if isinstance(self._cderi, str):
+            # _cderi may be a file assigned by the user
+            self._pair_idx = addons.load_pair_idx(self._cderi, 'j3c')
+        elif (self._pair_idx is not None and
+              self._cderi.shape[1] != self._pair_idx.size):
+            # _cderi was assigned with the tensor of all AO pairs
+            self._pair_idx = None
+        return self._pair_idx
 
     def prange(self, start, end, step):
         self._call_count += 1
@@ -119,8 +320,13 @@ class DF(lib.StreamObject):
             return feri.shape[0]
 
     def get_jk(self, dm, hermi=1, vhfopt=None, with_j=True, with_k=True):
+        if _single_precision(self):
+            self.check_precision(dm)
         return df_jk.get_jk(self, dm, hermi, vhfopt, with_j, with_k)
 
+    def check_precision(self, dm):
+        return check_precision(self, dm)
+
     def get_eri(self):
         nao = self.mol.nao_nr()
         nao_pair = nao * (nao+1) // 2
@@ -183,16 +389,24 @@ class DF4C(DF):
             raise NotImplementedError
         return self
 
-    def loop(self):
+    def loop(self, blksize=None):
         if self._cderi is None:
             self.build()
+        if blksize is None:
+            blksize = self.blockdim
         with addons.load(self._cderi[0], 'j3c') as ferill:
             naoaux = ferill.shape[0]
             with addons.load(self._cderi[1], 'j3c') as feriss: # python2.6 not support multiple with
-                for b0, b1 in self.prange(0, naoaux, self.blockdim):
-                    erill = numpy.asarray(ferill[b0:b1], order='C')
-                    eriss = numpy.asarray(feriss[b0:b1], order='C')
-                    yield erill, eriss
+                ranges = list(self.prange(0, naoaux, blksize))
+                if isinstance(ferill, numpy.ndarray) or not self.async_io:
+                    for b0, b1 in ranges:
+                        erill = numpy.asarray(ferill[b0:b1], order='C')
+                        eriss = numpy.asarray(feriss[b0:b1], order='C')
+                        yield erill, eriss
+                else:
+                    for erill, eriss in prefetch((ferill, feriss), ranges,
+                                                 self.prefetch_depth):
+                        yield erill, eriss
 
     def get_jk(self, dm, hermi=1, vhfopt=None, with_j=True, with_k=True):
         return df_jk.r_get_jk(self, dm, hermi)
@@ -200,3 +414,89 @@ class DF4C(DF):
     def ao2mo(self, mo_coeffs):
         pass
 
+
+def prefetch(datasets, ranges, depth=PREFETCH_DEPTH):
+    '''Read the slices [b0:b1] of the HDF5 datasets on a background thread.
+    Up to depth blocks are read ahead of the block being used.  The blocks are
+    read into preallocated buffers which are reused.  The yielded arrays are
+    overwritten after the next iteration.
+
+    Args:
+        datasets : a list of h5py datasets
+            The datasets have the same length in the first dimension.
+        ranges : a list of (b0, b1)
+    '''
+    if depth < 1 or len(ranges) < 2 or imp.lock_held():
+# Threads may hang in the import stage.  See lib.call_in_background
+        for b0, b1 in ranges:
+            yield [numpy.asarray(d[b0:b1], order='C') for d in datasets]
+        return
+
+    blksize = max([b1-b0 for b0, b1 in ranges])
+    free_bufs = Queue()
+    ready = Queue()
+    for i in range(min(depth, len(ranges)) + 1):
+        free_bufs.put([numpy.empty((blksize,)+d.shape[1:], dtype=d.dtype)
+                       for d in datasets])
+    stop = []
+
+    def read():
+        try:
+            for b0, b1 in ranges:
+                bufs = free_bufs.get()
+                if bufs is None or stop:
+                    break
+                blocks = []
+                for d, buf in zip(datasets, bufs):
+                    buf = buf[:b1-b0]
+                    d.read_direct(buf, numpy.s_[b0:b1])
+                    blocks.append(buf)
+                ready.put((bufs, blocks))
+        except Exception as e:
+            ready.put((None, e))
+
+    reader = threading.Thread(target=read)
+    reader.daemon = True
+    reader.start()
+    try:
+        for i in range(len(ranges)):
+            bufs, blocks = ready.get()
+            if bufs is None:
+                raise blocks
+            yield blocks
+            free_bufs.put(bufs)
+    finally:
+        stop.append(True)
+        free_bufs.put(None)
+        reader.join()
+
+def _split_blocks(chunks, blksize, reverse=False):
+    '''Split the chunks generated by prefetch into blocks of blksize rows'''
+    try:
+        for arrays in chunks:
+            n = arrays[0].shape[0]
+            ranges = list(lib.prange(0, n, blksize))
+            if reverse:
+                ranges = ranges[::-1]
+            for b0, b1 in ranges:
+                yield [x[b0:b1] for x in arrays]
+    finally:
+        chunks.close()
+
+def _estimate_blockdim(feri, max_memory, depth=PREFETCH_DEPTH, blockdim=240):
+    '''Number of rows to read from the on-disk DF tensor at once.  The size is
+    increased from blockdim until one read takes BLOCK_READ_TIME (based on the
+    throughput of a trial read) as long as the prefetched chunks and the
+    buffers of the DF consumers fit in max_memory.
+    '''
+    naux, nao_pair = feri.shape
+    unit = nao_pair * feri.dtype.itemsize
+    nprobe = min(naux, 16)
+    buf = numpy.empty((nprobe,nao_pair), dtype=feri.dtype)
+    t0 = time.time()
+    feri.read_direct(buf, numpy.s_[:nprobe])
+    rate = nprobe * unit / max(time.time() - t0, 1e-6)
+    blk_time = int(rate * BLOCK_READ_TIME / unit)
+# depth+1 buffers for prefetching, and ~2 blocks for the buffers of consumers
+    blk_mem = int(max_memory*.5e6 / ((depth+3) * unit))
+    return max(1, min(max(blockdim, blk_time), blk_mem, naux))
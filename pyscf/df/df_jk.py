@@ -15,6 +15,11 @@ from pyscf.ao2mo import _ao2mo
 libri = lib.load_library('libri')
 
 OCCDROP = 1e-12
+# Use the local exchange only if it saves more than half of the FLOPs
+LOCAL_K_EFFICIENCY = .5
+# Default cutoff of the orbital coefficients for the local exchange.  The
+# error of the SCF energy is well below the default conv_tol (1e-9)
+LOCAL_K_THRESH = 1e-10
 
 def density_fit(mf, auxbasis=None, with_df=None):
     '''For the given SCF object, update the J, K matrix constructor with
@@ -80,6 +85,11 @@ def density_fit(mf, auxbasis=None, with_df=None):
             self.with_df = with_df
             self._keys = self._keys.union(['auxbasis', 'with_df'])
 
+        def build(self, mol=None):
+            if self.with_df:
+                df.df.reset_precision(self.with_df)
+            return mf_class.build(self, mol)
+
         def get_jk(self, mol=None, dm=None, hermi=1):
             if self.with_df:
                 if mol is None: mol = self.mol
@@ -151,11 +161,26 @@ def get_jk(dfobj, dm, hermi=1, vhfopt=None, with_j=True, with_k=True):
             dmtril.append(lib.pack_tril(dms[k]+dms[k].T))
             i = numpy.arange(nao)
             dmtril[k][i*(i+1)//2+i] *= .5
-        for eri1 in dfobj.loop():
+        if hasattr(dfobj, '_load_pair_idx'):
+            pair_idx = dfobj._load_pair_idx()
+        else:
+            pair_idx = None
+        if pair_idx is None:
+            eris = dfobj.loop()
+        else:
+            # J matrix in the space of the screened AO pairs
+            dmtril = [x[pair_idx] for x in dmtril]
+            eris = dfobj.loop(sparse=True)
+        for eri1 in eris:
             naux, nao_pair = eri1.shape
             for k in range(nset):
                 rho = numpy.einsum('px,x->p', eri1, dmtril[k])
                 vj[k] += numpy.einsum('p,px->x', rho, eri1)
+        if pair_idx is not None:
+            for k in range(nset):
+                vjk = numpy.zeros(nao*(nao+1)//2)
+                vjk[pair_idx] = vj[k]
+                vj[k] = vjk
 
     elif hasattr(dm, 'mo_coeff'):
         mo_coeff = numpy.asarray(dm.mo_coeff, order='F')
@@ -172,6 +197,7 @@ def get_jk(dfobj, dm, hermi=1, vhfopt=None, with_j=True, with_k=True):
 
         dmtril = []
         orbo = []
+        domains = [None] * nset
         for k in range(nset):
             if with_j:
                 dmtril.append(lib.pack_tril(dms[k]+dms[k].T))
@@ -181,6 +207,18 @@ def get_jk(dfobj, dm, hermi=1, vhfopt=None, with_j=True, with_k=True):
             c = numpy.einsum('pi,i->pi', mo_coeff[k][:,mo_occ[k]>0],
                              numpy.sqrt(mo_occ[k][mo_occ[k]>0]))
             orbo.append(numpy.asarray(c, order='F'))
+            if getattr(dfobj, 'local_k', False) and c.shape[1] > 0:
+                lorb = cholesky_orbitals(c)
+                if getattr(dfobj, '_atm_ovlp', None) is None:
+                    # The overlap between atoms does not change in SCF cycles
+                    dfobj._atm_ovlp = atom_ovlp_max(dfobj.mol)
+                domains[k] = local_k_domains(dfobj.mol, lorb,
+                                             dfobj.local_k_thresh,
+                                             dfobj._atm_ovlp)
+                if domains[k] is not None:
+                    orbo[k] = lorb
+                    log.debug1('Local K for DM %d: %d orbital domains',
+                               k, len(domains[k]))
 
         buf = numpy.empty((dfobj.blockdim*nao,nao))
         for eri1 in dfobj.loop():
@@ -192,7 +230,11 @@ def get_jk(dfobj, dm, hermi=1, vhfopt=None, with_j=True, with_k=True):
                     vj[k] += numpy.einsum('p,px->x', rho, eri1)
 
                 nocc = orbo[k].shape[1]
-                if nocc > 0:
+                if domains[k] is not None:
+                    if isinstance(vk[k], int):
+                        vk[k] = numpy.zeros((nao,nao))
+                    _local_k(eri1, orbo[k], domains[k], vk[k])
+                elif nocc > 0:
                     buf1 = buf[:naux*nocc]
                     fdrv(ftrans, fmmm,
                          buf1.ctypes.data_as(ctypes.c_void_p),
@@ -234,6 +276,106 @@ def get_jk(dfobj, dm, hermi=1, vhfopt=None, with_j=True, with_k=True):
     return vj, vk
 
 
+def cholesky_orbitals(orbo, tol=OCCDROP):
+    '''Localized occupied orbitals from the pivoted Cholesky decomposition
+    of the density matrix  orbo.orbo^T = L.L^T.  See also
+    Aquilante et al., JCP 125, 174101 (2006).
+
+    The orbitals are not orthogonal.  The occupation numbers are absorbed in
+    the orbitals, so that the exchange matrix is invariant.
+    '''
+    nao, nocc = orbo.shape
+    dm = numpy.dot(orbo, orbo.T)
+    diag = dm.diagonal().copy()
+    lorb = numpy.zeros((nao,nocc))
+    for k in range(nocc):
+        p = numpy.argmax(diag)
+        if diag[p] < tol:
+            lorb = lorb[:,:k]
+            break
+        col = dm[:,p] - numpy.dot(lorb[:,:k], lorb[p,:k])
+        lorb[:,k] = col / numpy.sqrt(diag[p])
+        diag -= lorb[:,k]**2
+        diag[p] = 0
+    return numpy.asarray(lorb, order='F')
+
+def _ao_atom_index(mol):
+    ao_atm = numpy.empty(mol.nao_nr(), dtype=int)
+    for ia, (p0, p1) in enumerate(mol.aoslice_by_atom()[:,2:]):
+        ao_atm[p0:p1] = ia
+    return ao_atm
+
+def atom_ovlp_max(mol):
+    '''The max AO overlap |S_{mu nu}| for each pair of atoms'''
+    ao_atm = _ao_atom_index(mol)
+    ovlp = abs(mol.intor_symmetric('int1e_ovlp'))
+    smax = numpy.zeros((mol.natm,ovlp.shape[0]))
+    numpy.maximum.at(smax, ao_atm, ovlp)
+    smax1 = numpy.zeros((mol.natm,mol.natm))
+    numpy.maximum.at(smax1.T, ao_atm, smax.T)
+    return smax1
+
+def local_k_domains(mol, lorb, thresh=LOCAL_K_THRESH, atm_ovlp=None):
+    '''Group the localized orbitals by their domains.  The orbital domain
+    (AOs on the atoms where the orbital coefficients are larger than thresh)
+    and the domain of the AO index of (L|mu i) (AOs on the atoms which have
+    significant overlap with the orbital) are determined at atomic level.
+
+    Kwargs:
+        atm_ovlp : 2D array
+            The max AO overlap between atoms (see :func:`atom_ovlp_max`).  It
+            is computed if not given.
+
+    Returns:
+        A list of (orbital index, AO index of orbital domain, AO index of
+        (L|mu i) domain), or None if the local exchange cannot save FLOPs.
+    '''
+    nao, nocc = lorb.shape
+    ao_atm = _ao_atom_index(mol)
+    natm = mol.natm
+    # the max AO coefficients for each atom
+    cmax = numpy.zeros((natm,nocc))
+    numpy.maximum.at(cmax, ao_atm, abs(lorb))
+    if atm_ovlp is None:
+        atm_ovlp = atom_ovlp_max(mol)
+    smax1 = atm_ovlp
+
+    groups = {}
+    for i in range(nocc):
+        atms = tuple(numpy.where(cmax[:,i] > thresh)[0])
+        if atms not in groups:
+            groups[atms] = []
+        groups[atms].append(i)
+
+    domains = []
+    cost = 0
+    for atms, orbs in groups.items():
+        atms = numpy.asarray(atms)
+        cmax_g = cmax[atms][:,orbs].max(axis=1)
+        atms1 = numpy.where(numpy.dot(smax1[:,atms], cmax_g) > thresh)[0]
+        idx = numpy.where(numpy.in1d(ao_atm, atms))[0]
+        idx1 = numpy.where(numpy.in1d(ao_atm, atms1))[0]
+        domains.append((numpy.asarray(orbs), idx, idx1))
+        cost += (len(idx) + len(orbs)) * len(idx1) * len(orbs)
+    if cost > nao**2 * nocc * 2 * LOCAL_K_EFFICIENCY:
+        return None
+    return domains
+
+def _local_k(eri1, lorb, domains, vk):
+    '''vk += (L|mu i)(L|nu i) with the AOs of (L|mu i) and the orbital
+    coefficients restricted to the orbital domains'''
+    naux = eri1.shape[0]
+    for orbs, idx, idx1 in domains:
+        i = numpy.maximum(idx1[:,None], idx)
+        j = numpy.minimum(idx1[:,None], idx)
+        eri_sub = eri1[:,i*(i+1)//2+j].reshape(-1,len(idx))
+        half = lib.dot(eri_sub, lorb[idx][:,orbs])
+        half = half.reshape(naux,len(idx1),len(orbs)).transpose(0,2,1)
+        half = half.reshape(-1,len(idx1))
+        vk[idx1[:,None],idx1] += lib.dot(half.T, half)
+    return vk
+
+
 def r_get_jk(dfobj, dms, hermi=1):
     '''Relativistic density fitting JK'''
     t0 = (time.clock(), time.time())
@@ -21,12 +21,25 @@ def format_aux_basis(mol, auxbasis='weigend+etb'):
 
 
 # (ij|L)
-def aux_e2(mol, auxmol, intor='int3c2e_sph', aosym='s1', comp=1, out=None):
+def aux_e2(mol, auxmol, intor='int3c2e_sph', aosym='s1', comp=1, out=None,
+           shlpair_mask=None):
     '''3-center AO integrals (ij|L), where L is the auxiliary basis.
+
+    Kwargs:
+        shlpair_mask : 2D boolean array of (nbas,nbas)
+            If given, the integrals are only computed for the shell pairs
+            selected by the mask (see :func:`addons.shell_pair_mask`).  The
+            others are zero.
     '''
     pmol = gto.mole.conc_mol(mol, auxmol)
     shls_slice = (0, mol.nbas, 0, mol.nbas, mol.nbas, mol.nbas+auxmol.nbas)
-    return pmol.intor(intor, comp, aosym=aosym, shls_slice=shls_slice, out=out)
+    if shlpair_mask is None:
+        return pmol.intor(intor, comp, aosym=aosym, shls_slice=shls_slice,
+                          out=out)
+    intor = pmol._add_suffix(intor)
+    return gto.moleintor.getints3c(intor, pmol._atm, pmol._bas, pmol._env,
+                                   shls_slice, comp, aosym, out=out,
+                                   shlpair_mask=shlpair_mask)
 
 # (L|ij)
 def aux_e1(mol, auxmol, intor='int3c2e_sph', aosym='s1', comp=1, out=None):
@@ -49,8 +62,13 @@ def fill_2c2e(mol, auxmol, intor='int2c2e_sph', comp=1, hermi=1, out=None):
 # array
 def cholesky_eri(mol, auxbasis='weigend+etb', auxmol=None,
                  int3c='int3c2e_sph', aosym='s2ij', int2c='int2c2e_sph', comp=1,
-                 verbose=0, fauxe2=aux_e2):
+                 verbose=0, fauxe2=aux_e2, pair_mask=None):
     '''
+    Kwargs:
+        pair_mask : 1D boolean array
+            If given, only the AO pairs selected by the mask are kept.
+            See also :func:`addons.pair_mask`.
+
     Returns:
         2D array of (naux,nao*(nao+1)/2) in C-contiguous
     '''
@@ -72,7 +90,14 @@ def cholesky_eri(mol, auxbasis='weigend+etb', auxmol=None,
     j2c = None
     t1 = log.timer('Cholesky 2c2e', *t1)
 
-    j3c = fauxe2(mol, auxmol, intor=int3c, aosym=aosym).reshape(-1,naux)
+    if pair_mask is None:
+        j3c = fauxe2(mol, auxmol, intor=int3c, aosym=aosym).reshape(-1,naux)
+    else:
+        # Skip the insignificant shell pairs in the integral driver
+        shlpair_mask = addons.shell_pair_mask(mol, pair_mask, aosym)
+        j3c = fauxe2(mol, auxmol, intor=int3c, aosym=aosym,
+                     shlpair_mask=shlpair_mask).reshape(-1,naux)
+        j3c = j3c[pair_mask]
     t1 = log.timer('3c2e', *t1)
     cderi = scipy.linalg.solve_triangular(low, j3c.T, lower=True,
                                           overwrite_b=True)
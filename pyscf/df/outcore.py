@@ -13,7 +13,7 @@ from pyscf import gto
 from pyscf.lib import logger
 from pyscf import ao2mo
 from pyscf.ao2mo import _ao2mo
-from pyscf.df.addons import make_auxmol
+from pyscf.df.addons import make_auxmol, shell_pair_mask
 
 #
 # for auxe1 (P|ij)
@@ -21,8 +21,17 @@ from pyscf.df.addons import make_auxmol
 
 def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='eri_mo', tmpdir=None,
                  int3c='int3c2e_sph', aosym='s2ij', int2c='int2c2e_sph', comp=1,
-                 max_memory=2000, ioblk_size=256, auxmol=None, verbose=0):
+                 max_memory=2000, ioblk_size=256, auxmol=None, verbose=0,
+                 pair_mask=None, dtype=numpy.double):
     '''3-center 2-electron AO integrals
+
+    Kwargs:
+        pair_mask : 1D boolean array
+            If given, only the AO pairs selected by the mask are stored.  The
+            indices of the stored pairs are saved in dataset dataname+'_idx'.
+        dtype : numpy.double or numpy.float32
+            The data type to store the integrals.  The max rounding error is
+            saved in the attribute 'rounding_error' of the dataset.
     '''
     assert(aosym in ('s1', 's2ij'))
     assert(comp == 1)
@@ -38,7 +47,8 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='eri_mo', tmpdir
         tmpdir = lib.param.TMPDIR
     swapfile = tempfile.NamedTemporaryFile(dir=tmpdir)
     cholesky_eri_b(mol, swapfile.name, auxbasis, dataname,
-                   int3c, aosym, int2c, comp, ioblk_size, auxmol, verbose=log)
+                   int3c, aosym, int2c, comp, ioblk_size, auxmol, verbose=log,
+                   pair_mask=pair_mask)
     fswap = h5py.File(swapfile.name, 'r')
     time1 = log.timer('generate (ij|L) 1 pass', *time0)
 
@@ -49,21 +59,30 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='eri_mo', tmpdir
         nao_pair = nao * nao
     else:
         nao_pair = nao * (nao+1) // 2
+    if pair_mask is not None:
+        nao_pair = numpy.count_nonzero(pair_mask)
 
-    if h5py.is_hdf5(erifile):
+    if lib.mmapfile.is_mmapfile(erifile):
+        feri = lib.MMapFile(erifile)
+    elif h5py.is_hdf5(erifile):
         feri = h5py.File(erifile)
-        if dataname in feri:
-            del(feri[dataname])
     else:
         feri = h5py.File(erifile, 'w')
+    if dataname in feri:
+        del(feri[dataname])
+    if dataname+'_idx' in feri:
+        del(feri[dataname+'_idx'])
+    if pair_mask is not None:
+        feri[dataname+'_idx'] = numpy.where(pair_mask)[0]
     if comp == 1:
-        chunks = (min(int(16e3/nao),naoaux), nao) # 128K
-        h5d_eri = feri.create_dataset(dataname, (naoaux,nao_pair), 'f8',
+        chunks = (min(int(16e3/nao),naoaux), min(nao,nao_pair)) # 128K
+        h5d_eri = feri.create_dataset(dataname, (naoaux,nao_pair), dtype,
                                       chunks=chunks)
     else:
-        chunks = (1, min(int(16e3/nao),naoaux), nao) # 128K
-        h5d_eri = feri.create_dataset(dataname, (comp,naoaux,nao_pair), 'f8',
+        chunks = (1, min(int(16e3/nao),naoaux), min(nao,nao_pair)) # 128K
+        h5d_eri = feri.create_dataset(dataname, (comp,naoaux,nao_pair), dtype,
                                       chunks=chunks)
+    rounding_error = 0
     aopairblks = len(fswap[dataname+'/0'])
 
     ioblk_size = max(max_memory*.1, ioblk_size)
@@ -83,12 +102,16 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='eri_mo', tmpdir
                 col1 = col0 + dat.shape[1]
                 buf[:nrow,col0:col1] = dat[row0:row1]
                 col0 = col1
+            if dtype != numpy.double:
+                rounding_error = max(rounding_error, abs(
+                    buf[:nrow] - buf[:nrow].astype(dtype)).max())
             if comp == 1:
                 h5d_eri[row0:row1] = buf[:nrow]
             else:
                 h5d_eri[icomp,row0:row1] = buf[:nrow]
             ti0 = log.timer('step 2 [%d/%d], [%d,%d:%d], row = %d'%
                             (istep, totstep, icomp, row0, row1, nrow), *ti0)
+    h5d_eri.attrs['rounding_error'] = rounding_error
 
     fswap.close()
     feri.close()
@@ -98,7 +121,8 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='eri_mo', tmpdir
 # store cderi in blocks
 def cholesky_eri_b(mol, erifile, auxbasis='weigend+etb', dataname='eri_mo',
                    int3c='int3c2e_sph', aosym='s2ij', int2c='int2c2e_sph',
-                   comp=1, ioblk_size=256, auxmol=None, verbose=logger.NOTE):
+                   comp=1, ioblk_size=256, auxmol=None, verbose=logger.NOTE,
+                   pair_mask=None):
     '''3-center 2-electron AO integrals
     '''
     assert(aosym in ('s1', 's2ij'))
@@ -130,11 +154,13 @@ def cholesky_eri_b(mol, erifile, auxbasis='weigend+etb', dataname='eri_mo',
     for icomp in range(comp):
         feri.create_group('%s/%d'%(dataname,icomp)) # for h5py old version
 
-    def store(b, label):
+    def store(b, label, mask=None):
         if b.ndim == 3 and b.flags.f_contiguous:
             b = lib.transpose(b.T, axes=(0,2,1)).reshape(naux,-1)
         else:
             b = b.reshape((-1,naux)).T
+        if mask is not None:
+            b = numpy.asarray(b[:,mask], order='C')
         cderi = scipy.linalg.solve_triangular(low, b, lower=True, overwrite_b=True)
         feri[label] = cderi
 
@@ -158,19 +184,36 @@ def cholesky_eri_b(mol, erifile, auxbasis='weigend+etb', dataname='eri_mo',
         log.debug1('shranges = %s', shranges)
     cintopt = gto.moleintor.make_cintopt(atm, bas, env, int3c)
     bufs1 = numpy.empty((comp*max([x[2] for x in shranges]),naoaux))
+    if pair_mask is not None:
+        # Skip the insignificant shell pairs in the integral driver
+        shlpair_mask = shell_pair_mask(mol, pair_mask, aosym)
 
     for istep, sh_range in enumerate(shranges):
         log.debug('int3c2e [%d/%d], AO [%d:%d], nrow = %d', \
                   istep+1, len(shranges), *sh_range)
         bstart, bend, nrow = sh_range
         shls_slice = (bstart, bend, 0, mol.nbas, mol.nbas, mol.nbas+auxmol.nbas)
-        buf = gto.moleintor.getints3c(int3c, atm, bas, env, shls_slice, comp,
-                                      aosym, ao_loc, cintopt, out=bufs1)
+        if pair_mask is None:
+            buf = gto.moleintor.getints3c(int3c, atm, bas, env, shls_slice,
+                                          comp, aosym, ao_loc, cintopt,
+                                          out=bufs1)
+        else:
+            buf = gto.moleintor.getints3c(int3c, atm, bas, env, shls_slice,
+                                          comp, aosym, ao_loc, cintopt,
+                                          out=bufs1,
+                                          shlpair_mask=shlpair_mask[bstart:bend])
+        if pair_mask is None:
+            mask = None
+        elif aosym == 's1':
+            mask = pair_mask[ao_loc[bstart]*nao:ao_loc[bend]*nao]
+        else:
+            mask = pair_mask[ao_loc[bstart]*(ao_loc[bstart]+1)//2:
+                             ao_loc[bend]*(ao_loc[bend]+1)//2]
         if comp == 1:
-            store(buf, '%s/0/%d'%(dataname,istep))
+            store(buf, '%s/0/%d'%(dataname,istep), mask)
         else:
             for icomp in range(comp):
-                store(buf[icomp], '%s/%d/%d'%(dataname,icomp,istep))
+                store(buf[icomp], '%s/%d/%d'%(dataname,icomp,istep), mask)
         time1 = log.timer('gen CD eri [%d/%d]' % (istep+1,len(shranges)), *time1)
     buf = bufs1 = None
 
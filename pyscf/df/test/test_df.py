@@ -208,6 +208,151 @@ class KnowValues(unittest.TestCase):
         self.assertTrue(auxbasis['O'] == 'cc-pvdz-jkfit')
         self.assertTrue(isinstance(auxbasis['He'], list))
 
+    def test_loop_prefetch(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        cderi0 = df.incore.cholesky_eri(mol)
+        df.outcore.cholesky_eri(mol, ftmp.name, dataname='j3c')
+        dfobj = df.DF(mol)
+        dfobj._cderi = ftmp.name
+        dfobj.blockdim = 23
+        dfobj.prefetch_depth = 3
+        # The blocks are read in reversed order in every other call
+        for i in range(2):
+            blocks = [eri1.copy() for eri1 in dfobj.loop()]
+            self.assertTrue(all(b.shape[0] <= 23 for b in blocks))
+            if dfobj._call_count % 2 == 1:
+                blocks = blocks[::-1]
+            self.assertTrue(numpy.allclose(numpy.vstack(blocks), cderi0))
+        # Several blocks in one read
+        self.assertTrue(dfobj._read_blksize > 23)
+        self.assertEqual(dfobj.blockdim, 23)
+
+        for k, eri1 in enumerate(dfobj.loop()):
+            if k == 1:
+                break
+        with df.addons.load(ftmp.name, 'j3c') as feri:
+            blksize = df.df._estimate_blockdim(feri, 2000, 2, 23)
+        self.assertTrue(23 <= blksize <= cderi0.shape[0])
+
+    def test_ondisk_unbuilt(self):
+        # The DF tensor is built on disk by the first loop() call in get_jk.
+        # The buffers of get_jk are allocated by blockdim before the build.
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        mf = scf.density_fit(scf.RHF(mol))
+        mf.with_df._cderi_to_save = ftmp.name
+        mf.with_df.max_memory = 1
+        mf.with_df.blockdim = 23
+        e1 = mf.kernel(scf.hf.init_guess_by_minao(mol))
+        self.assertTrue(isinstance(mf.with_df._cderi, str))
+        self.assertEqual(mf.with_df.blockdim, 23)
+        e0 = scf.density_fit(scf.RHF(mol)).kernel()
+        self.assertAlmostEqual(e1, e0, 8)
+
+    def test_screen_pairs(self):
+        pmol = gto.M(atom='''O 0 0 0; H 0 -.757 .587; H 0 .757 .587
+                             O 0 0 15; H 0 -.757 15.587; H 0 .757 15.587''',
+                     basis='cc-pvdz', verbose=0)
+        nao = pmol.nao_nr()
+        mask = df.addons.pair_mask(pmol)
+        self.assertTrue(mask.sum() < nao*(nao+1)//2 * .6)
+        idx = numpy.tril_indices(nao)
+        self.assertTrue(mask[idx[0]==idx[1]].all())
+
+        dfobj0 = df.DF(pmol).build()
+        dfobj1 = df.DF(pmol)
+        dfobj1.screen_pairs = True
+        dfobj1.build()
+        self.assertEqual(dfobj1._cderi.shape[1], mask.sum())
+        self.assertAlmostEqual(abs(dfobj1._cderi-dfobj0._cderi[:,mask]).max(), 0, 12)
+        eri1 = numpy.vstack([x.copy() for x in dfobj1.loop()])
+        self.assertAlmostEqual(abs(eri1-dfobj0._cderi).max(), 0, 9)
+
+        numpy.random.seed(1)
+        dm = numpy.random.random((nao,nao))
+        dm = dm + dm.T
+        vj0, vk0 = dfobj0.get_jk(dm)
+        vj1 = dfobj1.get_jk(dm, with_k=False)[0]
+        vk1 = dfobj1.get_jk(dm)[1]
+        self.assertAlmostEqual(abs(vj1-vj0).max(), 0, 8)
+        self.assertAlmostEqual(abs(vk1-vk0).max(), 0, 8)
+
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        df.outcore.cholesky_eri(pmol, ftmp.name, dataname='j3c',
+                                pair_mask=mask, ioblk_size=.1)
+        with h5py.File(ftmp.name, 'r') as feri:
+            self.assertAlmostEqual(abs(feri['j3c'][:]-dfobj1._cderi).max(), 0, 12)
+            self.assertTrue(numpy.all(feri['j3c_idx'][:] == numpy.where(mask)[0]))
+
+        # the stored pairs are read from the user-assigned _cderi file
+        dfobj2 = df.DF(pmol)
+        dfobj2._cderi = ftmp.name
+        eri2 = numpy.vstack([x.copy() for x in dfobj2.loop()])
+        self.assertAlmostEqual(abs(eri2-dfobj0._cderi).max(), 0, 9)
+        vj2 = dfobj2.get_jk(dm, with_k=False)[0]
+        self.assertAlmostEqual(abs(vj2-vj0).max(), 0, 8)
+
+    def test_single_precision(self):
+        dfobj0 = df.DF(mol).build()
+        dfobj1 = df.DF(mol)
+        dfobj1.single_precision = True
+        dfobj1.build()
+        self.assertEqual(dfobj1._cderi.dtype, numpy.float32)
+        self.assertTrue(0 < dfobj1.precision_error < 1e-6)
+        for eri1 in dfobj1.loop():
+            self.assertEqual(eri1.dtype, numpy.double)
+
+        nao = mol.nao_nr()
+        numpy.random.seed(1)
+        dm = numpy.random.random((nao,nao))
+        dm = dm + dm.T
+        vj0, vk0 = dfobj0.get_jk(dm)
+        vj1, vk1 = dfobj1.get_jk(dm)
+        self.assertAlmostEqual(abs(vj1-vj0).max(), 0, 4)
+        self.assertAlmostEqual(abs(vk1-vk0).max(), 0, 4)
+        # get_j and get_k with the same dm do not trigger the fallback
+        dfobj1.get_jk(dm, with_k=False)
+        dfobj1.get_jk(dm, with_j=False)
+        self.assertEqual(dfobj1._cderi.dtype, numpy.float32)
+        # fallback to double precision
+        vj1, vk1 = dfobj1.get_jk(dm+1e-6)
+        self.assertTrue(dfobj1.single_precision)
+        self.assertTrue(dfobj1._fallback_fp64)
+        self.assertEqual(dfobj1._cderi.dtype, numpy.double)
+        self.assertAlmostEqual(abs(vj1-vj0).max(), 0, 4)
+
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        df.outcore.cholesky_eri(mol, ftmp.name, dataname='j3c',
+                                dtype=numpy.float32)
+        with h5py.File(ftmp.name, 'r') as feri:
+            self.assertEqual(feri['j3c'].dtype, numpy.float32)
+            self.assertTrue(feri['j3c'].attrs['rounding_error'] > 0)
+            self.assertAlmostEqual(abs(feri['j3c'][:]-dfobj0._cderi).max(), 0, 6)
+
+
+    def test_single_precision_scanner(self):
+        mf = scf.density_fit(scf.RHF(mol))
+        mf.with_df.single_precision = True
+        mf.conv_tol = 1e-10
+        mf_scanner = mf.as_scanner()
+        with_df = mf_scanner.with_df
+        precisions = []
+        build = with_df.build
+        def build_and_record():
+            precisions.append(df.df._single_precision(with_df))
+            return build()
+        with_df.build = build_and_record
+
+        mol1 = mol.copy()
+        mol1.atom = mol.atom.replace('0.587', '0.600')
+        mol1.build(0, 0)
+        for mol_point in (mol, mol1):
+            e1 = mf_scanner(mol_point)
+            # converged with the double precision fallback
+            self.assertTrue(with_df._fallback_fp64)
+            e0 = scf.density_fit(scf.RHF(mol_point)).kernel()
+            self.assertAlmostEqual(e1, e0, 8)
+        # Each point starts in single precision, then falls back to double
+        self.assertEqual(precisions, [True, False, True, False])
 
 if __name__ == "__main__":
     print("Full Tests for df")
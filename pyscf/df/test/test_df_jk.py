@@ -118,6 +118,43 @@ class KnowValues(unittest.TestCase):
         mf._cderi = (u[:,idx] * numpy.sqrt(w[idx])).T.copy()
         self.assertAlmostEqual(mf.kernel(), -76.026765673110447, 9)
 
+    def test_local_k(self):
+        # 12 H2 molecules in a row
+        pmol = gto.M(atom=[['H', (0, 0, i//2*5.4+i%2*1.4)] for i in range(24)],
+                     basis='6-31g', unit='B', verbose=0)
+        mf = scf.density_fit(scf.RHF(pmol), auxbasis='weigend')
+        mf.kernel()
+        dm = mf.make_rdm1()
+        dm = lib.tag_array(dm, mo_coeff=mf.mo_coeff, mo_occ=mf.mo_occ)
+        vk0 = df_jk.get_jk(mf.with_df, dm)[1]
+
+        lorb = df_jk.cholesky_orbitals(mf.mo_coeff[:,mf.mo_occ>0]*2**.5)
+        self.assertTrue(numpy.allclose(lorb.dot(lorb.T), dm))
+        domains = df_jk.local_k_domains(pmol, lorb, 1e-8)
+        self.assertTrue(domains is not None)
+
+        mf.with_df.local_k = True
+        mf.with_df.local_k_thresh = 1e-8
+        vk1 = df_jk.get_jk(mf.with_df, dm)[1]
+        self.assertAlmostEqual(abs(vk1-vk0).max(), 0, 6)
+
+    def test_local_k_energy(self):
+        # 12 He atoms in a row
+        pmol = gto.M(atom=[['He', (0, 0, i*8.)] for i in range(12)],
+                     basis='sto-3g', unit='B', verbose=0)
+        mf = scf.density_fit(scf.RHF(pmol), auxbasis='weigend')
+        e0 = mf.kernel()
+
+        lorb = df_jk.cholesky_orbitals(mf.mo_coeff[:,mf.mo_occ>0]*2**.5)
+        domains = df_jk.local_k_domains(pmol, lorb)
+        self.assertTrue(domains is not None)
+        self.assertTrue(max(len(x[2]) for x in domains) < pmol.nao_nr())
+
+        mf.with_df.local_k = True
+        e1 = mf.kernel()
+        self.assertTrue(mf.with_df._atm_ovlp is not None)
+        self.assertAlmostEqual(e1, e0, delta=mf.conv_tol)
+
 
 if __name__ == "__main__":
     print("Full Tests for df")
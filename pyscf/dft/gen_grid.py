@@ -21,6 +21,12 @@ from pyscf.dft import radi
 
 libdft = lib.load_library('libdft')
 BLKSIZE = 128  # needs to be the same to lib/gto/grid_ao_drv.c
+# Edge length (in Bohr) of the boxes used by arg_group_grids
+GROUP_BOX_SIZE = 1.2
+# In the screened partition (gen_partition with screen=True), s(nu) of the
+# original Becke scheme is treated as 0 for nu > BECKE_MU_CUTOFF, nu being
+# mu after the atomic radii adjustment
+BECKE_MU_CUTOFF = .95
 
 # ~= (L+1)**2/3
 LEBEDEV_ORDER = {
@@ -183,9 +189,10 @@ def treutler_prune(nuc, rads, n_ang, radii=None):
 # Becke partitioning
 
 # Stratmann, Scuseria, Frisch. CPL, 257, 213 (1996), eq.11
+STRATMANN_A = .64  # comment after eq. 14
 def stratmann(g):
     '''Stratmann, Scuseria, Frisch. CPL, 257, 213 (1996)'''
-    a = .64  # comment after eq. 14
+    a = STRATMANN_A
     if isinstance(g, numpy.ndarray):
         ma = g/a
         ma2 = ma * ma
@@ -237,6 +244,11 @@ def gen_atomic_grids(mol, atom_grid={}, radi_method=radi.gauss_chebyshev,
                 n_rad = _default_rad(chg, level)
                 n_ang = _default_ang(chg, level)
             rcut = kvargs['atom2rcut'][ia] if 'atom2rcut' in kvargs else None
+
+            key = (chg, n_rad, n_ang, radi_method, prune, rcut)
+            if key in _atomic_grids_cache:
+                atom_grids_tab[symb] = _atomic_grids_cache[key]
+                continue
             if radi_method.__name__=='leggauss_ab': 
               rad, dr = radi_method(n_rad, a=0.0, b=rcut)
             else:
@@ -268,15 +280,33 @@ def gen_atomic_grids(mol, atom_grid={}, radi_method=radi.gauss_chebyshev,
                     vol.append(numpy.einsum('i,j->ji', rad_weight[idx[i0:i1]],
                                             grid[:,3]).ravel())
             atom_grids_tab[symb] = (numpy.vstack(coords), numpy.hstack(vol))
+            if len(_atomic_grids_cache) >= ATOMIC_GRIDS_CACHE_SIZE:
+                _atomic_grids_cache.clear()
+            _atomic_grids_cache[key] = atom_grids_tab[symb]
     return atom_grids_tab
 
+# Atomic grids are cached by (nuclear charge, n_rad, n_ang, radi_method,
+# prune, rcut) so that they can be reused by the following calculations
+ATOMIC_GRIDS_CACHE_SIZE = 64
+_atomic_grids_cache = {}
+
 
 def gen_partition(mol, atom_grids_tab,
                   radii_adjust=None, atomic_radii=radi.BRAGG_RADII,
-                  becke_scheme=original_becke):
+                  becke_scheme=original_becke, screen=False):
     '''Generate the mesh grid coordinates and weights for DFT numerical integration.
     We can change radii_adjust, becke_scheme functions to generate different meshgrid.
 
+    Kwargs:
+        screen : bool
+            Only the atoms near each grid are included in the partition
+            function (see VXCgen_grid_screen in lib/dft/grid_basis.c).  The
+            cost scales linearly with the number of atoms.  The weights are
+            exact for the stratmann scheme.  For the original_becke scheme,
+            s(nu) is neglected when nu > BECKE_MU_CUTOFF.  nu is mu after
+            the atomic radii adjustment, and the distance cutoffs are
+            enlarged accordingly when radii_adjust is given.
+
     Returns:
         grid_coord and grid_weight arrays.  grid_coord array has shape (N,3);
         weight 1D array has N elements.
@@ -287,10 +317,9 @@ def gen_partition(mol, atom_grids_tab,
         f_radii_adjust = None
     atm_coords = numpy.asarray(mol.atom_coords() , order='C')
     atm_dist = radi._inter_distance(mol)
-    if (becke_scheme == original_becke and
-        (f_radii_adjust is None or
-         radii_adjust in (radi.treutler_atomic_radii_adjust,
-                          radi.becke_atomic_radii_adjust))):
+    if (f_radii_adjust is None or
+        radii_adjust in (radi.treutler_atomic_radii_adjust,
+                         radi.becke_atomic_radii_adjust)):
         if f_radii_adjust is None:
             p_radii_table = lib.c_null_ptr()
         else:
@@ -298,6 +327,54 @@ def gen_partition(mol, atom_grids_tab,
                                            for i in range(mol.natm)
                                            for j in range(mol.natm)])
             p_radii_table = f_radii_table.ctypes.data_as(ctypes.c_void_p)
+        radii_table_available = True
+    else:
+        radii_table_available = False
+
+    if (screen and radii_table_available and
+        becke_scheme in (original_becke, stratmann)):
+        if becke_scheme == stratmann:
+            scheme = 1
+            mu_cutoff = STRATMANN_A
+        else:
+            scheme = 0
+            mu_cutoff = BECKE_MU_CUTOFF
+        if f_radii_adjust is not None:
+            # The cutoff applies to the adjusted nu = mu + a_ij(1-mu^2).  With
+            # |a_ij| <= amax, nu >= mu_cutoff is ensured for mu >= the root of
+            # mu - amax(1-mu^2) = mu_cutoff
+            amax = abs(f_radii_table).max()
+            if amax > 1e-14:
+                mu_cutoff = ((numpy.sqrt(1 + 4*amax*(amax+mu_cutoff)) - 1)
+                             / (2*amax))
+        ratio1 = (1 + mu_cutoff) / (1 - mu_cutoff)
+        if scheme == 1:
+            ratio2 = ratio1 ** 2
+        else:
+            ratio2 = ratio1
+        coords_all = []
+        weights_all = []
+        for ia in range(mol.natm):
+            coords, vol = atom_grids_tab[mol.atom_symbol(ia)]
+            coords = numpy.asarray(coords + atm_coords[ia], order='C')
+            ngrids = coords.shape[0]
+            nbr = numpy.asarray(numpy.argsort(atm_dist[ia], kind='mergesort'),
+                                dtype=numpy.int32)
+            pbecke = numpy.empty(ngrids)
+            libdft.VXCgen_grid_screen(pbecke.ctypes.data_as(ctypes.c_void_p),
+                                      coords.ctypes.data_as(ctypes.c_void_p),
+                                      ctypes.c_int(ngrids), ctypes.c_int(ia),
+                                      atm_coords.ctypes.data_as(ctypes.c_void_p),
+                                      p_radii_table, ctypes.c_int(mol.natm),
+                                      nbr.ctypes.data_as(ctypes.c_void_p),
+                                      ctypes.c_int(nbr.size), ctypes.c_int(scheme),
+                                      ctypes.c_double(ratio1),
+                                      ctypes.c_double(ratio2))
+            coords_all.append(coords)
+            weights_all.append(vol * pbecke)
+        return numpy.vstack(coords_all), numpy.hstack(weights_all)
+
+    if becke_scheme == original_becke and radii_table_available:
         def gen_grid_partition(coords):
             coords = numpy.asarray(coords, order='F')
             ngrids = coords.shape[0]
@@ -378,6 +455,46 @@ def make_mask(mol, coords, relativity=0, shls_slice=None, verbose=None):
                            mol._env.ctypes.data_as(ctypes.c_void_p))
     return non0tab
 
+def arg_group_grids(mol, coords, box_size=GROUP_BOX_SIZE):
+    '''Index to reorder grids so that the grids in the same cubic box are
+    put together.  The boxes are traversed along the Morton (Z-order) curve.
+    After sorting, the grids of each BLKSIZE block are spatially compact,
+    which leads to a sparse non0tab for large molecules.
+
+    Args:
+        mol : an instance of :class:`Mole`
+
+        coords : 2D array, shape (N,3)
+            The coordinates of grids.
+
+    Kwargs:
+        box_size : float
+            Edge length of the boxes in Bohr.
+
+    Returns:
+        1D integer array of size N.
+    '''
+    coords = numpy.asarray(coords)
+    if coords.shape[0] == 0:
+        return numpy.arange(0)
+    boxes = numpy.floor((coords - coords.min(axis=0)) / box_size)
+    boxes = boxes.astype(numpy.int64)
+    key = (_spread_bits(boxes[:,0]) |
+           _spread_bits(boxes[:,1]) << 1 |
+           _spread_bits(boxes[:,2]) << 2)
+    # mergesort to keep the original (atom-by-atom) order within a box
+    return numpy.argsort(key, kind='mergesort')
+
+def _spread_bits(x):
+    '''Insert two zero bits between the lowest 21 bits of x'''
+    x = x & 0x1fffff
+    x = (x | x << 32) & 0x1f00000000ffff
+    x = (x | x << 16) & 0x1f0000ff0000ff
+    x = (x | x << 8 ) & 0x100f00f00f00f00f
+    x = (x | x << 4 ) & 0x10c30c30c30c30c3
+    x = (x | x << 2 ) & 0x1249249249249249
+    return x
+
 
 
 class Grids(lib.StreamObject):
@@ -432,6 +549,19 @@ class Grids(lib.StreamObject):
             (75,302) for second row;
             (80~105,434) for rest.
 
+        screen_partition : bool
+            Whether to include only the atoms near each grid in the Becke
+            partition (see :func:`gen_partition`).  The cost of the partition
+            then grows linearly with the number of atoms.  The weights are
+            exact with becke_scheme = stratmann and approximated (to ~1e-9)
+            with original_becke.  Default is False.
+
+        sort_grids : bool
+            Whether to group the grids into compact spatial boxes (see
+            :func:`arg_group_grids`).  Combined with non0tab, the numerical
+            integration only handles the AOs which are significant on each
+            block of grids.  It is recommended for large molecules.
+
         Examples:
 
         >>> mol = gto.M(atom='H 0 0 0; H 0 0 1.1')
@@ -456,6 +586,8 @@ class Grids(lib.StreamObject):
         self.prune = nwchem_prune
         self.symmetry = mol.symmetry
         self.atom_grid = {}
+        self.screen_partition = False
+        self.sort_grids = False
         self.non0tab = None
 
 ##################################################
@@ -470,6 +602,8 @@ class Grids(lib.StreamObject):
         logger.info(self, 'pruning grids: %s', self.prune)
         logger.info(self, 'grids dens level: %d', self.level)
         logger.info(self, 'symmetrized grids: %s', self.symmetry)
+        logger.info(self, 'screened partition: %s', self.screen_partition)
+        logger.info(self, 'sort grids: %s', self.sort_grids)
         if self.radii_adjust is not None:
             logger.info(self, 'atomic radii adjust function: %s',
                         self.radii_adjust)
@@ -488,7 +622,11 @@ class Grids(lib.StreamObject):
         self.coords, self.weights = \
                 self.gen_partition(mol, atom_grids_tab,
                                    self.radii_adjust, self.atomic_radii,
-                                   self.becke_scheme)
+                                   self.becke_scheme, self.screen_partition)
+        if self.sort_grids:
+            idx = arg_group_grids(mol, self.coords)
+            self.coords = self.coords[idx]
+            self.weights = self.weights[idx]
         if with_non0tab:
             self.non0tab = self.make_mask(mol, self.coords)
         else:
@@ -520,10 +658,10 @@ class Grids(lib.StreamObject):
     @lib.with_doc(gen_partition.__doc__)
     def gen_partition(self, mol, atom_grids_tab,
                       radii_adjust=None, atomic_radii=radi.BRAGG_RADII,
-                      becke_scheme=original_becke):
+                      becke_scheme=original_becke, screen=False):
         ''' See gen_grid.gen_partition function'''
         return gen_partition(mol, atom_grids_tab, radii_adjust, atomic_radii,
-                             becke_scheme)
+                             becke_scheme, screen)
 
     @property
     def prune_scheme(self):
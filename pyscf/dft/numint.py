@@ -4,6 +4,7 @@
 #
 
 import ctypes
+import tempfile
 import numpy
 import scipy.linalg
 from pyscf import lib
@@ -19,6 +20,14 @@ from pyscf.dft.gen_grid import make_mask, BLKSIZE
 libdft = lib.load_library('libdft')
 OCCDROP = 1e-12
 SWITCH_SIZE = 800
+# If fewer AOs than SPARSE_AO_RATIO*nao are significant on a block of grids,
+# the AO values are compressed to the significant ones in nr_rks/nr_uks
+SPARSE_AO_RATIO = .6
+# Max number of grids per block for the spatially sorted grids
+SPARSE_BLKSIZE = BLKSIZE * 4
+# In nr_rks_update, all blocks are recomputed if the skipped blocks refer to
+# more than this number of different density matrices
+INCREMENTAL_XC_MAX_REFS = 4
 
 def eval_ao(mol, coords, deriv=0, shls_slice=None,
             non0tab=None, out=None, verbose=None):
@@ -405,7 +414,9 @@ def _dot_ao_ao(mol, ao1, ao2, non0tab, shls_slice, ao_loc, hermi=0):
         ao1 = numpy.asarray(ao1, numpy.complex128)
         ao2 = numpy.asarray(ao2, numpy.complex128)
 
-    if non0tab is None or shls_slice is None or ao_loc is None:
+    if (non0tab is None or shls_slice is None or ao_loc is None or
+        # AOs were compressed to the significant ones (see _sparse_ao_index)
+        ao_loc[shls_slice[1]] - ao_loc[shls_slice[0]] != nao):
         pnon0tab = pshls_slice = pao_loc = lib.c_null_ptr()
     else:
         pnon0tab    = non0tab.ctypes.data_as(ctypes.c_void_p)
@@ -436,7 +447,9 @@ def _dot_ao_dm(mol, ao, dm, non0tab, shls_slice, ao_loc, out=None):
         ao = numpy.asarray(ao, numpy.complex128)
         dm = numpy.asarray(dm, numpy.complex128)
 
-    if non0tab is None or shls_slice is None or ao_loc is None:
+    if (non0tab is None or shls_slice is None or ao_loc is None or
+        # AOs were compressed to the significant ones (see _sparse_ao_index)
+        ao_loc[shls_slice[1]] - ao_loc[shls_slice[0]] != nao):
         pnon0tab = pshls_slice = pao_loc = lib.c_null_ptr()
     else:
         pnon0tab    = non0tab.ctypes.data_as(ctypes.c_void_p)
@@ -453,6 +466,45 @@ def _dot_ao_dm(mol, ao, dm, non0tab, shls_slice, ao_loc, out=None):
        pnon0tab, pshls_slice, pao_loc)
     return vm
 
+def _sparse_ao_index(mask, ngrids, ao_loc):
+    '''Indices of the AOs which are significant on the block of grids.  None
+    is returned if most AOs are significant.
+    '''
+    if mask is None:
+        return None
+    nao = ao_loc[-1]
+    nblk = (ngrids+BLKSIZE-1) // BLKSIZE
+    shl_non0 = mask[:nblk].any(axis=0)
+    ao_idx = numpy.where(numpy.repeat(shl_non0, ao_loc[1:]-ao_loc[:-1]))[0]
+    if ao_idx.size > nao * SPARSE_AO_RATIO:
+        return None
+    return ao_idx
+
+def _compress_block(ao, mask, ngrids, ao_loc, vmat):
+    '''Keep only the significant AOs of the block of grids.  Returns the
+    (compressed) AO values, the mask, the AO indices and the array which
+    accumulates the XC matrix of the block.
+    '''
+    ao_idx = _sparse_ao_index(mask, ngrids, ao_loc)
+    if ao_idx is None:
+        return ao, mask, None, vmat
+    nidx = ao_idx.size
+    v = numpy.zeros(vmat.shape[:-2]+(nidx,nidx))
+    return ao[...,ao_idx], None, ao_idx, v
+
+def _uncompress_vmat(vmat, v, ao_idx):
+    if ao_idx is not None:
+        nao = vmat.shape[-1]
+        nidx = ao_idx.size
+        vmat = vmat.reshape(-1,nao,nao)
+        for i, vi in enumerate(v.reshape(-1,nidx,nidx)):
+            lib.takebak_2d(vmat[i], vi, ao_idx, ao_idx)
+
+def _ao_buffer(shape, buf):
+    if buf is None or buf.size < numpy.prod(shape):
+        return numpy.empty(shape, order='F')
+    return numpy.ndarray(shape, order='F', buffer=buf)
+
 def nr_vxc(mol, grids, xc_code, dm, spin=0, relativity=0, hermi=0,
            max_memory=2000, verbose=None):
     if isinstance(spin, (list, tuple, numpy.ndarray)):
@@ -472,6 +524,7 @@ def nr_vxc(mol, grids, xc_code, dm, spin=0, relativity=0, hermi=0,
         return nr_uks(ni, mol, grids, xc_code, dm, relativity,
                       hermi, max_memory, verbose)
 
+@lib.profiler.timed('nr_rks')
 def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
            max_memory=2000, verbose=None):
     '''Calculate RKS XC functional and potential matrix on given meshgrids
@@ -535,9 +588,11 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
         ao_deriv = 0
         for ao, mask, weight, coords \
                 in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
-            aow = numpy.ndarray(ao.shape, order='F', buffer=aow)
+            ao, mask, ao_idx, v = _compress_block(ao, mask, weight.size,
+                                                  ao_loc, vmat)
+            aow = _ao_buffer(ao.shape, aow)
             for idm in range(nset):
-                rho = make_rho(idm, ao, mask, 'LDA')
+                rho = make_rho(idm, ao, mask, 'LDA', ao_idx)
                 exc, vxc = ni.eval_xc(xc_code, rho, 0, relativity, 1, verbose)[:2]
                 vrho = vxc[0]
                 den = rho * weight
@@ -545,16 +600,19 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
                 excsum[idm] += (den * exc).sum()
                 # *.5 because vmat + vmat.T
                 aow = numpy.einsum('pi,p->pi', ao, .5*weight*vrho, out=aow)
-                vmat[idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
+                v[idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
                 rho = exc = vxc = vrho = None
+            _uncompress_vmat(vmat, v, ao_idx)
     elif xctype == 'GGA':
         ao_deriv = 1
         for ao, mask, weight, coords \
                 in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+            ao, mask, ao_idx, v = _compress_block(ao, mask, weight.size,
+                                                  ao_loc, vmat)
             ngrid = weight.size
-            aow = numpy.ndarray(ao[0].shape, order='F', buffer=aow)
+            aow = _ao_buffer(ao[0].shape, aow)
             for idm in range(nset):
-                rho = make_rho(idm, ao, mask, 'GGA')
+                rho = make_rho(idm, ao, mask, 'GGA', ao_idx)
                 exc, vxc = ni.eval_xc(xc_code, rho, 0, relativity, 1, verbose)[:2]
                 vrho, vsigma = vxc[:2]
                 den = rho[0] * weight
@@ -565,18 +623,21 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
                 wv[0]  = weight * vrho * .5
                 wv[1:] = rho[1:] * (weight * vsigma * 2)
                 aow = numpy.einsum('npi,np->pi', ao, wv, out=aow)
-                vmat[idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                v[idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
                 rho = exc = vxc = vrho = vsigma = wv = None
+            _uncompress_vmat(vmat, v, ao_idx)
     else:
         if (any(x in xc_code.upper() for x in ('CC06', 'CS', 'BR89', 'MK00'))):
             raise NotImplementedError('laplacian in meta-GGA method')
         ao_deriv = 2
         for ao, mask, weight, coords \
                 in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+            ao, mask, ao_idx, v = _compress_block(ao, mask, weight.size,
+                                                  ao_loc, vmat)
             ngrid = weight.size
-            aow = numpy.ndarray(ao[0].shape, order='F', buffer=aow)
+            aow = _ao_buffer(ao[0].shape, aow)
             for idm in range(nset):
-                rho = make_rho(idm, ao, mask, 'MGGA')
+                rho = make_rho(idm, ao, mask, 'MGGA', ao_idx)
                 exc, vxc = ni.eval_xc(xc_code, rho, 0, relativity, 1, verbose)[:2]
                 vrho, vsigma, vlapl, vtau = vxc[:4]
                 den = rho[0] * weight
@@ -587,16 +648,17 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
                 wv[0]  = weight * vrho * .5
                 wv[1:] = rho[1:4] * (weight * vsigma * 2)
                 aow = numpy.einsum('npi,np->pi', ao[:4], wv, out=aow)
-                vmat[idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                v[idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
 
 # FIXME: .5 * .5   First 0.5 for v+v.T symmetrization.
 # Second 0.5 is due to the Libxc convention tau = 1/2 \nabla\phi\dot\nabla\phi
                 wv = (.5 * .5 * weight * vtau).reshape(-1,1)
-                vmat[idm] += _dot_ao_ao(mol, ao[1], wv*ao[1], mask, shls_slice, ao_loc)
-                vmat[idm] += _dot_ao_ao(mol, ao[2], wv*ao[2], mask, shls_slice, ao_loc)
-                vmat[idm] += _dot_ao_ao(mol, ao[3], wv*ao[3], mask, shls_slice, ao_loc)
+                v[idm] += _dot_ao_ao(mol, ao[1], wv*ao[1], mask, shls_slice, ao_loc)
+                v[idm] += _dot_ao_ao(mol, ao[2], wv*ao[2], mask, shls_slice, ao_loc)
+                v[idm] += _dot_ao_ao(mol, ao[3], wv*ao[3], mask, shls_slice, ao_loc)
 
                 rho = exc = vxc = vrho = vsigma = wv = None
+            _uncompress_vmat(vmat, v, ao_idx)
 
     for i in range(nset):
         vmat[i] = vmat[i] + vmat[i].T
@@ -606,6 +668,136 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
         vmat = vmat.reshape(nao,nao)
     return nelec, excsum, vmat
 
+@lib.profiler.timed('nr_rks_update')
+def nr_rks_update(ni, mol, grids, xc_code, dm, dm_last=0, xc_last=None,
+                  tol=1e-10, relativity=0, max_memory=2000, verbose=None):
+    '''Incremental version of :func:`nr_rks` for one symmetric density
+    matrix.  The density on each block of grids is updated with the change
+    of the density matrix since the block was last computed.  Blocks on
+    which the density does not change (within tol) are skipped, and their
+    contributions to the XC energy and the XC potential matrix are taken
+    from xc_last.  LDA and GGA functionals only.
+
+    Each block keeps the density matrix it was computed with, so the skipped
+    changes are not lost but are accumulated until they exceed tol.  All
+    blocks are recomputed when the skipped blocks refer to more than
+    INCREMENTAL_XC_MAX_REFS density matrices.
+
+    Kwargs:
+        dm_last : 2D array or 0
+            Not used.  The reference density matrices are kept in xc_last.
+        xc_last : dict or None
+            The intermediates returned by the previous call of this function.
+            If not given, the XC contributions of all blocks are computed.
+        tol : float
+            Blocks are skipped if the changes of the density matrix (restricted
+            to the AOs which are significant on the block) and of the density
+            are smaller than tol.
+
+    Returns:
+        nelec, excsum, vmat and the dict of intermediates for the next call.
+    '''
+    xctype = ni._xc_type(xc_code)
+    if xctype == 'MGGA':
+        raise NotImplementedError('incremental XC for meta-GGA')
+
+    shls_slice = (0, mol.nbas)
+    ao_loc = mol.ao_loc_nr()
+    nao = dm.shape[0]
+    ngrids = grids.weights.size
+    if (xc_last is None or xc_last['weights'] is not grids.weights or
+        xc_last['xctype'] != xctype or
+        len(xc_last['dm_refs']) > INCREMENTAL_XC_MAX_REFS):
+        nvar = 1 if xctype == 'LDA' else 4
+        rho_all = numpy.zeros((nvar,ngrids))
+        wv_all = numpy.zeros((nvar,ngrids))
+        exc_all = numpy.zeros(ngrids)
+        vmat = numpy.zeros((nao,nao))
+        dm_refs = {}
+        blk_ref = []
+        skip_tol = -1
+    else:
+        rho_all = xc_last['rho'].copy()
+        wv_all = xc_last['wv'].copy()
+        exc_all = xc_last['exc'].copy()
+        vmat = xc_last['vmat'].copy()
+        dm_refs = dict(xc_last['dm_refs'])
+        blk_ref = list(xc_last['blk_ref'])
+        skip_tol = tol
+    ref_id = max(dm_refs) + 1 if dm_refs else 0
+    dm_refs[ref_id] = dm = numpy.asarray(dm)
+
+    ddms = {}
+    def get_ddm(ref):
+        if ref not in ddms:
+            if ref < 0:  # the block has not been computed
+                ddm = dm
+            else:
+                ddm = dm - dm_refs[ref]
+            ddms[ref] = (ddm + ddm.T) * .5
+        return ddms[ref]
+
+    ao_deriv = 0 if xctype == 'LDA' else 1
+    dvmat = numpy.zeros((nao,nao))
+    nskip = 0
+    p1 = 0
+    for ib, (ao, mask, weight, coords) \
+            in enumerate(ni.block_loop(mol, grids, nao, ao_deriv, max_memory)):
+        p0, p1 = p1, p1 + weight.size
+        if ib == len(blk_ref):
+            blk_ref.append(-1)
+        ao, mask, ao_idx, v = _compress_block(ao, mask, weight.size,
+                                              ao_loc, dvmat)
+        ddm = get_ddm(blk_ref[ib])
+        if ao_idx is None:
+            ddm_blk = ddm
+        else:
+            ddm_blk = lib.take_2d(ddm, ao_idx, ao_idx)
+        if abs(ddm_blk).max() < skip_tol:
+            nskip += 1
+            continue
+
+        drho = ni.eval_rho(mol, ao, ddm_blk, mask, xctype, hermi=1)
+        if abs(drho).max() < skip_tol:
+            nskip += 1
+            continue
+        rho = rho_all[:,p0:p1]
+        rho += drho.reshape(rho.shape)
+        blk_ref[ib] = ref_id
+
+        if xctype == 'LDA':
+            exc, vxc = ni.eval_xc(xc_code, rho[0], 0, relativity, 1, verbose)[:2]
+            wv = weight * vxc[0] * .5  # *.5 because vmat + vmat.T
+            aow = numpy.einsum('pi,p->pi', ao, wv-wv_all[0,p0:p1])
+            v += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
+            wv_all[0,p0:p1] = wv
+        else:
+            exc, vxc = ni.eval_xc(xc_code, numpy.asarray(rho, order='C'),
+                                  0, relativity, 1, verbose)[:2]
+            vrho, vsigma = vxc[:2]
+            wv = numpy.empty((4,weight.size))
+            wv[0]  = weight * vrho * .5
+            wv[1:] = rho[1:] * (weight * vsigma * 2)
+            aow = numpy.einsum('npi,np->pi', ao, wv-wv_all[:,p0:p1])
+            v += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+            wv_all[:,p0:p1] = wv
+        exc_all[p0:p1] = rho[0] * weight * exc
+        _uncompress_vmat(dvmat, v, ao_idx)
+        rho = drho = exc = vxc = wv = aow = None
+
+    logger.debug1(mol, 'Incremental XC: %d blocks skipped', nskip)
+    vmat += dvmat + dvmat.T
+    nelec = numpy.dot(rho_all[0], grids.weights)
+    excsum = exc_all.sum()
+    blk_ref = numpy.asarray(blk_ref)
+    # Drop the density matrices which are not referred by any block
+    dm_refs = dict((k, v) for k, v in dm_refs.items() if k in blk_ref)
+    xc_cache = {'xctype': xctype, 'weights': grids.weights, 'rho': rho_all,
+                'wv': wv_all, 'exc': exc_all, 'vmat': vmat.copy(),
+                'dm_refs': dm_refs, 'blk_ref': blk_ref}
+    return nelec, excsum, vmat, xc_cache
+
+@lib.profiler.timed('nr_uks')
 def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
            max_memory=2000, verbose=None):
     '''Calculate UKS XC functional and potential matrix on given meshgrids
@@ -660,10 +852,12 @@ def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
         ao_deriv = 0
         for ao, mask, weight, coords \
                 in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
-            aow = numpy.ndarray(ao.shape, order='F', buffer=aow)
+            ao, mask, ao_idx, v = _compress_block(ao, mask, weight.size,
+                                                  ao_loc, vmat)
+            aow = _ao_buffer(ao.shape, aow)
             for idm in range(nset):
-                rho_a = make_rhoa(idm, ao, mask, xctype)
-                rho_b = make_rhob(idm, ao, mask, xctype)
+                rho_a = make_rhoa(idm, ao, mask, xctype, ao_idx)
+                rho_b = make_rhob(idm, ao, mask, xctype, ao_idx)
                 exc, vxc = ni.eval_xc(xc_code, (rho_a, rho_b),
                                       1, relativity, 1, verbose)[:2]
                 vrho = vxc[0]
@@ -676,19 +870,22 @@ def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
 
                 # *.5 due to +c.c. in the end
                 aow = numpy.einsum('pi,p->pi', ao, .5*weight*vrho[:,0], out=aow)
-                vmat[0,idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
+                v[0,idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
                 aow = numpy.einsum('pi,p->pi', ao, .5*weight*vrho[:,1], out=aow)
-                vmat[1,idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
+                v[1,idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
                 rho_a = rho_b = exc = vxc = vrho = None
+            _uncompress_vmat(vmat, v, ao_idx)
     elif xctype == 'GGA':
         ao_deriv = 1
         for ao, mask, weight, coords \
                 in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+            ao, mask, ao_idx, v = _compress_block(ao, mask, weight.size,
+                                                  ao_loc, vmat)
             ngrid = weight.size
-            aow = numpy.ndarray(ao[0].shape, order='F', buffer=aow)
+            aow = _ao_buffer(ao[0].shape, aow)
             for idm in range(nset):
-                rho_a = make_rhoa(idm, ao, mask, xctype)
-                rho_b = make_rhob(idm, ao, mask, xctype)
+                rho_a = make_rhoa(idm, ao, mask, xctype, ao_idx)
+                rho_b = make_rhob(idm, ao, mask, xctype, ao_idx)
                 exc, vxc = ni.eval_xc(xc_code, (rho_a, rho_b),
                                       1, relativity, 1, verbose)[:2]
                 vrho, vsigma = vxc[:2]
@@ -704,24 +901,27 @@ def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
                 wv[1:] = rho_a[1:] * (weight * vsigma[:,0] * 2)  # sigma_uu
                 wv[1:]+= rho_b[1:] * (weight * vsigma[:,1])      # sigma_ud
                 aow = numpy.einsum('npi,np->pi', ao, wv, out=aow)
-                vmat[0,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                v[0,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
                 wv[0]  = weight * vrho[:,1] * .5
                 wv[1:] = rho_b[1:] * (weight * vsigma[:,2] * 2)  # sigma_dd
                 wv[1:]+= rho_a[1:] * (weight * vsigma[:,1])      # sigma_ud
                 aow = numpy.einsum('npi,np->pi', ao, wv, out=aow)
-                vmat[1,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                v[1,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
                 rho_a = rho_b = exc = vxc = vrho = vsigma = wv = None
+            _uncompress_vmat(vmat, v, ao_idx)
     else:
         if (any(x in xc_code.upper() for x in ('CC06', 'CS', 'BR89', 'MK00'))):
             raise NotImplementedError('laplacian in meta-GGA method')
         ao_deriv = 2
         for ao, mask, weight, coords \
                 in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+            ao, mask, ao_idx, v = _compress_block(ao, mask, weight.size,
+                                                  ao_loc, vmat)
             ngrid = weight.size
-            aow = numpy.ndarray(ao[0].shape, order='F', buffer=aow)
+            aow = _ao_buffer(ao[0].shape, aow)
             for idm in range(nset):
-                rho_a = make_rhoa(idm, ao, mask, xctype)
-                rho_b = make_rhob(idm, ao, mask, xctype)
+                rho_a = make_rhoa(idm, ao, mask, xctype, ao_idx)
+                rho_b = make_rhob(idm, ao, mask, xctype, ao_idx)
                 exc, vxc = ni.eval_xc(xc_code, (rho_a, rho_b),
                                       1, relativity, 1, verbose)[:2]
                 vrho, vsigma, vlapl, vtau = vxc[:4]
@@ -737,24 +937,25 @@ def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
                 wv[1:] = rho_a[1:4] * (weight * vsigma[:,0] * 2)  # sigma_uu
                 wv[1:]+= rho_b[1:4] * (weight * vsigma[:,1])      # sigma_ud
                 aow = numpy.einsum('npi,np->pi', ao[:4], wv, out=aow)
-                vmat[0,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                v[0,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
                 wv[0]  = weight * vrho[:,1] * .5
                 wv[1:] = rho_b[1:4] * (weight * vsigma[:,2] * 2)  # sigma_dd
                 wv[1:]+= rho_a[1:4] * (weight * vsigma[:,1])      # sigma_ud
                 aow = numpy.einsum('npi,np->pi', ao[:4], wv, out=aow)
-                vmat[1,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                v[1,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
 
 # FIXME: .5 * .5   First 0.5 for v+v.T symmetrization.
 # Second 0.5 is due to the Libxc convention tau = 1/2 \nabla\phi\dot\nabla\phi
                 wv = (.25 * weight * vtau[:,0]).reshape(-1,1)
-                vmat[0,idm] += _dot_ao_ao(mol, ao[1], wv*ao[1], mask, shls_slice, ao_loc)
-                vmat[0,idm] += _dot_ao_ao(mol, ao[2], wv*ao[2], mask, shls_slice, ao_loc)
-                vmat[0,idm] += _dot_ao_ao(mol, ao[3], wv*ao[3], mask, shls_slice, ao_loc)
+                v[0,idm] += _dot_ao_ao(mol, ao[1], wv*ao[1], mask, shls_slice, ao_loc)
+                v[0,idm] += _dot_ao_ao(mol, ao[2], wv*ao[2], mask, shls_slice, ao_loc)
+                v[0,idm] += _dot_ao_ao(mol, ao[3], wv*ao[3], mask, shls_slice, ao_loc)
                 wv = (.25 * weight * vtau[:,1]).reshape(-1,1)
-                vmat[1,idm] += _dot_ao_ao(mol, ao[1], wv*ao[1], mask, shls_slice, ao_loc)
-                vmat[1,idm] += _dot_ao_ao(mol, ao[2], wv*ao[2], mask, shls_slice, ao_loc)
-                vmat[1,idm] += _dot_ao_ao(mol, ao[3], wv*ao[3], mask, shls_slice, ao_loc)
+                v[1,idm] += _dot_ao_ao(mol, ao[1], wv*ao[1], mask, shls_slice, ao_loc)
+                v[1,idm] += _dot_ao_ao(mol, ao[2], wv*ao[2], mask, shls_slice, ao_loc)
+                v[1,idm] += _dot_ao_ao(mol, ao[3], wv*ao[3], mask, shls_slice, ao_loc)
                 rho_a = rho_b = exc = vxc = vrho = vsigma = wv = None
+            _uncompress_vmat(vmat, v, ao_idx)
 
     for i in range(nset):
         vmat[0,i] = vmat[0,i] + vmat[0,i].T
@@ -1275,9 +1476,135 @@ def large_rho_indices(ni, mol, dm, grids, cutoff=1e-10, max_memory=2000):
     return nelec, numpy.hstack(idx)
 
 
+class _AOCache(object):
+    '''AO values (and derivatives) on the grids, compressed to the AOs which
+    are significant on each block of grids.  Blocks are held in memory until
+    max_memory (in MB) is used up.  The rest are stored in a memory-mapped
+    file in lib.param.TMPDIR.
+    '''
+    def __init__(self, max_memory=2000):
+        self.max_memory = max_memory
+        self._key = None
+        self.deriv = -1
+        self.nao = 0
+        self.blocks = []
+        self._swapfile = None
+        self._swap = None
+
+    def is_valid(self, mol, grids, nao, deriv):
+        if self._key is None or self.deriv < deriv or self.nao != nao:
+            return False
+        key = (mol, grids.coords, grids.weights, grids.non0tab)
+        return all(a is b for a, b in zip(self._key, key))
+
+    def reset(self, mol, grids, nao, deriv, blksize, non0tab):
+        '''Prepare the storage for the blocks which will be generated by
+        block_loop
+        '''
+        self.close()
+        comp = (deriv+1)*(deriv+2)*(deriv+3)//6
+        ngrids = grids.weights.size
+        ao_loc = mol.ao_loc_nr()
+        nao_per_shell = ao_loc[1:] - ao_loc[:-1]
+        incore = int(self.max_memory*1e6/8)
+        swapsize = 0
+        blocks = []
+        for ip0 in range(0, ngrids, blksize):
+            ip1 = min(ngrids, ip0+blksize)
+            non0 = non0tab[ip0//BLKSIZE:(ip1+BLKSIZE-1)//BLKSIZE]
+            ao_idx = numpy.where(numpy.repeat(non0.any(axis=0), nao_per_shell))[0]
+            if ao_idx.size == nao:
+                ao_idx = None
+            size = comp * (ip1-ip0) * (nao if ao_idx is None else ao_idx.size)
+            if size <= incore:
+                incore -= size
+                offset = None
+            else:
+                offset = swapsize
+                swapsize += size
+            blocks.append([ip0, ip1, ao_idx, offset])
+
+        if swapsize > 0:
+            self._swapfile = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+            self._swap = numpy.memmap(self._swapfile.name, dtype=numpy.double,
+                                      mode='w+', shape=(swapsize,))
+        self.blocks = blocks
+        self.nao = nao
+        self.deriv = deriv
+        # The cache becomes valid only after all blocks were filled
+        self._pending_key = (mol, grids.coords, grids.weights, grids.non0tab)
+        self._filled = 0
+
+    def append(self, ao, ip0, ip1):
+        '''Save the AO values of the next block'''
+        blk = self.blocks[self._filled]
+        assert(blk[0] == ip0 and blk[1] == ip1)
+        comp = (self.deriv+1)*(self.deriv+2)*(self.deriv+3)//6
+        ao_idx, offset = blk[2], blk[3]
+        # (comp,ngrids,nao) F-contiguous -> (comp,nao,ngrids) C-contiguous
+        ao = numpy.swapaxes(ao.reshape(comp,ip1-ip0,self.nao), 1, 2)
+        if ao_idx is not None:
+            ao = ao[:,ao_idx]
+        if offset is None:
+            blk[3] = numpy.array(ao, order='C')
+        else:
+            blk[3] = self._swap[offset:offset+ao.size].reshape(ao.shape)
+            blk[3][:] = ao
+        self._filled += 1
+        if self._filled == len(self.blocks):
+            self._key = self._pending_key
+
+    def loop(self, grids, deriv, buf=None):
+        '''Iterate over the cached blocks, in the same format as block_loop'''
+        comp = (deriv+1)*(deriv+2)*(deriv+3)//6
+        nao = self.nao
+        non0tab = self._key[3]
+        if non0tab is None:
+            non0tab = numpy.ones(((grids.weights.size+BLKSIZE-1)//BLKSIZE,
+                                  self._key[0].nbas), dtype=numpy.uint8)
+        blksize = max([ip1-ip0 for ip0, ip1, ao_idx, data in self.blocks])
+        if buf is None or buf.size < comp*blksize*nao:
+            buf = numpy.empty(comp*blksize*nao)
+        for ip0, ip1, ao_idx, data in self.blocks:
+            ao = numpy.ndarray((comp,nao,ip1-ip0), buffer=buf)
+            if ao_idx is None:
+                ao[:] = data[:comp]
+            else:
+                ao[:] = 0
+                ao[:,ao_idx] = data[:comp]
+            ao = numpy.swapaxes(ao, 1, 2)
+            if deriv == 0:
+                ao = ao[0]
+            yield (ao, non0tab[ip0//BLKSIZE:], grids.weights[ip0:ip1],
+                   grids.coords[ip0:ip1])
+
+    def close(self):
+        self._key = None
+        self.blocks = []
+        self._swap = None
+        if self._swapfile is not None:
+            self._swapfile.close()
+            self._swapfile = None
+
+
 class _NumInt(object):
+    '''Numerical integration
+
+    Attributes:
+        cache_ao : bool
+            Whether to keep the AO values (and derivatives) on the grids
+            between calls of nr_rks, nr_uks, nr_rks_fxc, cache_xc_kernel etc.
+            The cache is rebuilt when the molecule or the grids changes.
+            Default is False.
+        cache_ao_memory : int or float
+            The memory (in MB) to hold the cached AO values.  Blocks beyond
+            this size are stored in a memory-mapped file in lib.param.TMPDIR.
+    '''
     def __init__(self):
         self.libxc = libxc
+        self.cache_ao = False
+        self.cache_ao_memory = 2000
+        self._ao_cache = None
 
     def nr_vxc(self, mol, grids, xc_code, dms, spin=0, relativity=0, hermi=0,
                max_memory=2000, verbose=None):
@@ -1293,6 +1620,7 @@ class _NumInt(object):
                                max_memory, verbose)
 
     nr_rks = nr_rks
+    nr_rks_update = nr_rks_update
     nr_uks = nr_uks
     nr_rks_fxc = nr_rks_fxc
     nr_uks_fxc = nr_uks_fxc
@@ -1328,10 +1656,21 @@ class _NumInt(object):
             grids.build(with_non0tab=True)
         ngrids = grids.weights.size
         comp = (deriv+1)*(deriv+2)*(deriv+3)//6
+        with_cache = self.cache_ao and non0tab is None
+        if with_cache:
+            if self._ao_cache is None:
+                self._ao_cache = _AOCache()
+            self._ao_cache.max_memory = self.cache_ao_memory
+            if self._ao_cache.is_valid(mol, grids, nao, deriv):
+                for x in self._ao_cache.loop(grids, deriv, buf):
+                    yield x
+                return
 # NOTE to index grids.non0tab, the blksize needs to be the integer multiplier of BLKSIZE
         if blksize is None:
             blksize = min(int(max_memory*1e6/(comp*2*nao*8*BLKSIZE))*BLKSIZE, ngrids)
             blksize = max(blksize, BLKSIZE)
+            if getattr(grids, 'sort_grids', False):
+                blksize = min(blksize, SPARSE_BLKSIZE)
         if non0tab is None:
             non0tab = grids.non0tab
         if non0tab is None:
@@ -1339,12 +1678,16 @@ class _NumInt(object):
                                  dtype=numpy.uint8)
         if buf is None:
             buf = numpy.empty((comp,blksize,nao))
+        if with_cache:
+            self._ao_cache.reset(mol, grids, nao, deriv, blksize, non0tab)
         for ip0 in range(0, ngrids, blksize):
             ip1 = min(ngrids, ip0+blksize)
             coords = grids.coords[ip0:ip1]
             weight = grids.weights[ip0:ip1]
             non0 = non0tab[ip0//BLKSIZE:]
             ao = self.eval_ao(mol, coords, deriv=deriv, non0tab=non0, out=buf)
+            if with_cache:
+                self._ao_cache.append(ao, ip0, ip1)
             yield ao, non0, weight, coords
 
     def _gen_rho_evaluator(self, mol, dms, hermi=0):
@@ -1356,9 +1699,11 @@ class _NumInt(object):
                 mo_occ = [mo_occ]
             nao = mo_coeff[0].shape[0]
             ndms = len(mo_occ)
-            def make_rho(idm, ao, non0tab, xctype):
-                return self.eval_rho2(mol, ao, mo_coeff[idm], mo_occ[idm],
-                                      non0tab, xctype)
+            def make_rho(idm, ao, non0tab, xctype, ao_idx=None):
+                c = mo_coeff[idm]
+                if ao_idx is not None:
+                    c = c[ao_idx]
+                return self.eval_rho2(mol, ao, c, mo_occ[idm], non0tab, xctype)
         else:
             if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
                 dms = [dms]
@@ -1366,8 +1711,11 @@ class _NumInt(object):
                 dms = [(dm+dm.conj().T)*.5 for dm in dms]
             nao = dms[0].shape[0]
             ndms = len(dms)
-            def make_rho(idm, ao, non0tab, xctype):
-                return self.eval_rho(mol, ao, dms[idm], non0tab, xctype, hermi=1)
+            def make_rho(idm, ao, non0tab, xctype, ao_idx=None):
+                dm = dms[idm]
+                if ao_idx is not None:
+                    dm = lib.take_2d(dm, ao_idx, ao_idx)
+                return self.eval_rho(mol, ao, dm, non0tab, xctype, hermi=1)
         return make_rho, ndms, nao
 
 ####################
@@ -59,10 +59,19 @@ def get_veff(ks, mol=None, dm=None, dm_last=0, vhf_last=0, hermi=1):
             ks.grids = prune_small_rho_grids_(ks, mol, dm, ks.grids)
         t0 = logger.timer(ks, 'setting up grids', *t0)
 
+    xc_cache = None
     if hermi == 2:  # because rho = 0
         n, exc, vxc = 0, 0, 0
     else:
-        n, exc, vxc = ks._numint.nr_rks(mol, ks.grids, ks.xc, dm)
+        if (ks.incremental_xc and ground_state and
+            ks._numint._xc_type(ks.xc) != 'MGGA'):
+            xc_last = getattr(vhf_last, 'xc_cache', None)
+            n, exc, vxc, xc_cache = \
+                    ks._numint.nr_rks_update(mol, ks.grids, ks.xc, dm,
+                                             xc_last=xc_last,
+                                             tol=ks.incremental_xc_tol)
+        else:
+            n, exc, vxc = ks._numint.nr_rks(mol, ks.grids, ks.xc, dm)
         logger.debug(ks, 'nelec by numeric integration = %s', n)
         t0 = logger.timer(ks, 'vxc', *t0)
 
@@ -96,7 +105,8 @@ def get_veff(ks, mol=None, dm=None, dm_last=0, vhf_last=0, hermi=1):
     else:
         ecoul = None
 
-    vxc = lib.tag_array(vxc, ecoul=ecoul, exc=exc, vj=vj, vk=vk)
+    vxc = lib.tag_array(vxc, ecoul=ecoul, exc=exc, vj=vj, vk=vk,
+                        xc_cache=xc_cache)
     return vxc
 
 
@@ -180,6 +190,16 @@ class RKS(hf.RHF):
             Drop grids if their contribution to total electrons smaller than
             this cutoff value.  Default is 1e-7.
 
+        incremental_xc : bool
+            Whether to update the XC potential with the density change
+            between two SCF cycles (RKS with LDA/GGA functionals only).  The
+            grids blocks on which the density does not change are skipped.
+            The XC potential is rebuilt from scratch whenever the HF
+            potential is (see rebuild_nsteps).  Default is False.
+        incremental_xc_tol : float
+            Threshold of the density change to skip grids blocks in the
+            incremental XC update.  Default is 1e-10.
+
     Examples:
 
     >>> mol = gto.M(atom='O 0 0 0; H 0 0 1; H 0 1 0', basis='ccpvdz', verbose=0)
@@ -196,6 +216,8 @@ class RKS(hf.RHF):
         hf.RHF.dump_flags(self)
         logger.info(self, 'XC functionals = %s', self.xc)
         logger.info(self, 'small_rho_cutoff = %g', self.small_rho_cutoff)
+        if self.incremental_xc:
+            logger.info(self, 'incremental_xc_tol = %g', self.incremental_xc_tol)
         self.grids.dump_flags()
 
     get_veff = get_veff
@@ -213,10 +235,13 @@ def _dft_common_init_(mf):
     mf.xc = 'LDA,VWN'
     mf.grids = gen_grid.Grids(mf.mol)
     mf.small_rho_cutoff = 1e-7  # Use rho to filter grids
+    mf.incremental_xc = False
+    mf.incremental_xc_tol = 1e-10
 ##################################################
 # don't modify the following attributes, they are not input options
     mf._numint = numint._NumInt()
-    mf._keys = mf._keys.union(['xc', 'grids', 'small_rho_cutoff'])
+    mf._keys = mf._keys.union(['xc', 'grids', 'small_rho_cutoff',
+                               'incremental_xc', 'incremental_xc_tol'])
 
 
 if __name__ == '__main__':
@@ -85,6 +85,47 @@ class KnowValues(unittest.TestCase):
         self.assertEqual(non0.sum(), 106)
         self.assertAlmostEqual(lib.finger(non0), -0.81399929716237085, 9)
 
+    def test_screen_partition(self):
+        grid = gen_grid.Grids(h2o)
+        grid.atom_grid = {"H": (10, 110), "O": (10, 110),}
+        for scheme in (gen_grid.stratmann, gen_grid.original_becke):
+            grid.becke_scheme = scheme
+            grid.screen_partition = False
+            coords, weights = grid.build()
+            grid.screen_partition = True
+            coords1, weights1 = grid.build()
+            self.assertAlmostEqual(abs(coords1-coords).max(), 0, 12)
+            self.assertAlmostEqual(abs(weights1-weights).max(), 0, 8)
+
+    def test_screen_partition_radii_adjust(self):
+        # An elongated chain of different elements, in which many atom pairs
+        # are screened and the radii adjustments are large
+        mol = gto.M(atom=[['H' if i % 2 else 'Li', (0, 0, i*1.6)]
+                          for i in range(12)],
+                    basis='sto3g', verbose=0)
+        grid = gen_grid.Grids(mol)
+        grid.atom_grid = {'H': (10, 50), 'Li': (10, 50)}
+        self.assertTrue(grid.radii_adjust is not None)
+        for scheme, prec in ((gen_grid.stratmann, 12),
+                             (gen_grid.original_becke, 8)):
+            grid.becke_scheme = scheme
+            grid.screen_partition = False
+            coords, weights = grid.build()
+            grid.screen_partition = True
+            coords1, weights1 = grid.build()
+            self.assertAlmostEqual(abs(weights1-weights).max(), 0, prec)
+
+    def test_arg_group_grids(self):
+        grid = gen_grid.Grids(h2o)
+        grid.atom_grid = {"H": (10, 110), "O": (10, 110),}
+        coords, weights = grid.build()
+        idx = gen_grid.arg_group_grids(h2o, coords)
+        self.assertEqual(sorted(idx), list(range(weights.size)))
+        grid.sort_grids = True
+        grid.build()
+        self.assertAlmostEqual(abs(grid.coords-coords[idx]).max(), 0, 12)
+        self.assertAlmostEqual(abs(grid.weights-weights[idx]).max(), 0, 12)
+
 
 
 if __name__ == "__main__":
@@ -49,6 +49,31 @@ class KnowValues(unittest.TestCase):
         method.xc = 'b88, vwn'
         self.assertAlmostEqual(method.scf(), -76.690247578608236, 9)
 
+    def test_nr_b88vwn_incremental_xc(self):
+        method = dft.RKS(h2o)
+        method.grids.prune = dft.gen_grid.treutler_prune
+        method.grids.atom_grid = {"H": (50, 194), "O": (50, 194),}
+        method.xc = 'b88, vwn'
+        method.incremental_xc = True
+        self.assertAlmostEqual(method.scf(), -76.690247578608236, 8)
+        method.xc = 'lda, vwn_rpa'
+        self.assertAlmostEqual(method.scf(), -76.01330948329084, 8)
+
+    def test_incremental_xc_restart(self):
+        method = dft.RKS(h2o)
+        method.grids.atom_grid = {"H": (50, 194), "O": (50, 194),}
+        method.xc = 'b88, vwn'
+        dm0 = method.get_init_guess()
+        dm1 = dm0 * 1.01
+        # vhf_last has vj but no XC intermediates
+        vhf0 = method.get_veff(h2o, dm0)
+        method.incremental_xc = True
+        vhf1 = method.get_veff(h2o, dm1, dm0, vhf0)
+        method.incremental_xc = False
+        vhf2 = method.get_veff(h2o, dm1)
+        self.assertAlmostEqual(abs(vhf1-vhf2).max(), 0, 9)
+        self.assertAlmostEqual(vhf1.exc, vhf2.exc, 9)
+
     def test_nr_xlyp(self):
         method = dft.RKS(h2o)
         method.grids.prune = dft.gen_grid.treutler_prune
@@ -117,6 +117,53 @@ class KnowValues(unittest.TestCase):
         v = ni.nr_uks_fxc(mol, mf.grids, 'B88', dm0, dms)
         self.assertAlmostEqual(finger(v), 403.56257213149746, 8)
 
+    def test_sorted_grids(self):
+        numpy.random.seed(10)
+        dm = numpy.random.random((2,nao,nao))
+        dm = dm + dm.transpose(0,2,1)
+        grids = dft.gen_grid.Grids(mol)
+        grids.atom_grid = {"H": (50, 110)}
+        grids.prune = None
+        grids.sort_grids = True
+        grids.build(with_non0tab=True)
+        self.assertAlmostEqual(abs(grids.weights.sum()-mf.grids.weights.sum()), 0, 9)
+        ni = dft.numint._NumInt()
+        for xc in ('lda,vwn', 'b88,p86'):
+            ref = ni.nr_rks(mol, mf.grids, xc, dm)
+            res = ni.nr_rks(mol, grids, xc, dm)
+            self.assertAlmostEqual(abs(res[0]-ref[0]).max(), 0, 9)
+            self.assertAlmostEqual(abs(res[1]-ref[1]).max(), 0, 9)
+            self.assertAlmostEqual(abs(res[2]-ref[2]).max(), 0, 9)
+            ref = ni.nr_uks(mol, mf.grids, xc, dm)
+            res = ni.nr_uks(mol, grids, xc, dm)
+            self.assertAlmostEqual(abs(res[1]-ref[1]).max(), 0, 9)
+            self.assertAlmostEqual(abs(res[2]-ref[2]).max(), 0, 9)
+
+    def test_cache_ao(self):
+        numpy.random.seed(10)
+        dm0 = numpy.random.random((nao,nao))
+        dm0 = dm0 + dm0.T
+        dms = numpy.random.random((2,nao,nao))
+        grids = dft.gen_grid.Grids(mol)
+        grids.atom_grid = {"H": (50, 110)}
+        grids.prune = None
+        grids.build(with_non0tab=True)
+        ni = dft.numint._NumInt()
+        ref0 = ni.nr_rks(mol, grids, 'b88,p86', dm0)
+        ref1 = ni.nr_rks_fxc(mol, grids, 'b88', dm0, dms, hermi=0)
+        ni.cache_ao = True
+        ni.cache_ao_memory = 1  # to test the memory-mapped blocks
+        for i in range(2):
+            res0 = ni.nr_rks(mol, grids, 'b88,p86', dm0)
+            res1 = ni.nr_rks_fxc(mol, grids, 'b88', dm0, dms, hermi=0)
+            self.assertTrue(ni._ao_cache.is_valid(mol, grids, nao, 1))
+            self.assertAlmostEqual(abs(res0[1]-ref0[1]).max(), 0, 9)
+            self.assertAlmostEqual(abs(res0[2]-ref0[2]).max(), 0, 9)
+            self.assertAlmostEqual(abs(res1-ref1).max(), 0, 9)
+        res0 = ni.nr_rks(mol, grids, 'lda,vwn', dm0)
+        ref0 = dft.numint._NumInt().nr_rks(mol, grids, 'lda,vwn', dm0)
+        self.assertAlmostEqual(abs(res0[2]-ref0[2]).max(), 0, 9)
+
 if __name__ == "__main__":
     print("Test numint")
     unittest.main()
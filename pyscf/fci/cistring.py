@@ -6,11 +6,20 @@
 import sys
 import ctypes
 import math
+import collections
 import numpy
 from pyscf import lib
 
 libfci = lib.load_library('libfci')
 
+# Number of link tables kept by gen_linkstr_index.  The FCI solver is called
+# many times with the same (norb, nelec) in the CASSCF iterations.
+LINKSTR_CACHE_SIZE = 12
+# Total size (in MB) of the cached link tables.  Large tables (e.g. (18o,9e)
+# takes ~77 MB) are dropped first.  A table larger than this is not cached.
+LINKSTR_CACHE_MEMORY = 200
+_linkstr_cache = collections.OrderedDict()
+
 def gen_strings4orblist(orb_list, nelec):
     '''Generate string from the given orbital list.
 
@@ -187,10 +196,32 @@ def gen_linkstr_index(orb_list, nocc, strs=None, tril=False):
     excitations, which do not change the string. The next nocc*nvir rows
     [a(:vir),i(:occ),str1,sign] are occupied-virtual exciations, starting from
     str0, annihilating i, creating a, to get str1.
+
+    The tables of the default strings (strs=None) are cached for the
+    last LINKSTR_CACHE_SIZE (orb_list, nocc, tril), up to
+    LINKSTR_CACHE_MEMORY MB.  A copy of the cached table is returned.
     '''
     if strs is None:
-        strs = gen_strings4orblist(orb_list, nocc)
+        key = (tuple(orb_list), nocc, tril)
+        if key in _linkstr_cache:
+            # Move to the end as the most recently used table
+            link_index = _linkstr_cache[key] = _linkstr_cache.pop(key)
+            return link_index.copy()
+        link_index = _gen_linkstr_index(orb_list, nocc,
+                                        gen_strings4orblist(orb_list, nocc),
+                                        tril)
+        if (LINKSTR_CACHE_SIZE > 0 and
+            link_index.nbytes/1e6 <= LINKSTR_CACHE_MEMORY):
+            _linkstr_cache[key] = link_index.copy()
+            while (len(_linkstr_cache) > LINKSTR_CACHE_SIZE or
+                   sum([x.nbytes for x in _linkstr_cache.values()])/1e6 >
+                   LINKSTR_CACHE_MEMORY):
+                _linkstr_cache.popitem(last=False)
+        return link_index
+    else:
+        return _gen_linkstr_index(orb_list, nocc, strs, tril)
 
+def _gen_linkstr_index(orb_list, nocc, strs, tril):
     if isinstance(strs, OIndexList):
         return gen_linkstr_index_o1(orb_list, nocc, strs, tril)
 
@@ -35,6 +35,7 @@ from pyscf.lib import logger
 from pyscf.fci import cistring
 from pyscf.fci import rdm
 from pyscf.fci import spin_op
+from pyscf.fci import outcore
 from pyscf.fci.spin_op import contract_ss
 
 libfci = lib.load_library('libfci')
@@ -111,6 +112,45 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
                                 link_indexb.ctypes.data_as(ctypes.c_void_p))
     return ci1
 
+def contract_2e_block(eri, fcivecs, norb, nelec, link_index=None):
+    '''Contract the 2-electron Hamiltonian with a set of FCI vectors in one
+    pass.  The vectors are stacked along the beta strings, so that the
+    intermediates E_{rs}|CI> of all vectors are contracted with the integrals
+    in the same matrix multiplication.  See also :func:`contract_2e`.
+
+    Returns:
+        A list of FCI vectors, one for each vector in fcivecs.
+    '''
+    eri = ao2mo.restore(4, eri, norb)
+    link_indexa, link_indexb = _unpack(norb, nelec, link_index)
+    na, nlinka = link_indexa.shape[:2]
+    nb, nlinkb = link_indexb.shape[:2]
+    nvec = len(fcivecs)
+    # ci0[a,k,b] = fcivecs[k][a,b]
+    ci0 = numpy.empty((na,nvec,nb))
+    for k, c in enumerate(fcivecs):
+        ci0[:,k] = numpy.asarray(c).reshape(na,nb)
+    ci1 = numpy.empty_like(ci0)
+    # Beta strings of the k-th vector are addressed by k*nb+strb
+    link_indexb = numpy.vstack([link_indexb] * nvec)
+    link_indexb[:,:,2] += (numpy.arange(nvec)*nb).repeat(nb).reshape(-1,1)
+
+    libfci.FCIcontract_2e_spin1(eri.ctypes.data_as(ctypes.c_void_p),
+                                ci0.ctypes.data_as(ctypes.c_void_p),
+                                ci1.ctypes.data_as(ctypes.c_void_p),
+                                ctypes.c_int(norb),
+                                ctypes.c_int(na), ctypes.c_int(nb*nvec),
+                                ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
+                                link_indexa.ctypes.data_as(ctypes.c_void_p),
+                                link_indexb.ctypes.data_as(ctypes.c_void_p))
+    return [ci1[:,k].reshape(numpy.shape(c)) for k, c in enumerate(fcivecs)]
+
+def _is_default_contract_2e(fci):
+    '''Whether fci.contract_2e is FCISolver.contract_2e, not overridden by a
+    subclass or patched on the instance'''
+    func = getattr(FCISolver.contract_2e, '__func__', FCISolver.contract_2e)
+    return getattr(fci.contract_2e, '__func__', None) is func
+
 def make_hdiag(h1e, eri, norb, nelec):
     '''Diagonal Hamiltonian for Davidson preconditioner
     '''
@@ -398,9 +438,41 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
     precond = fci.make_precond(hdiag, pw, pv, addr)
 
     h2e = fci.absorb_h1e(h1e, eri, norb, nelec, .5)
-    def hop(c):
-        hc = fci.contract_2e(h2e, c, norb, nelec, (link_indexa,link_indexb))
-        return hc.ravel()
+    if getattr(fci, 'outcore', False):
+        # Stream over the blocks of alpha strings
+        link_index1 = fci.gen_linkstr(norb, nelec, tril=False)
+        if hasattr(fci, 'gen_strs_irrep'):
+            # Symmetry adapted CI vectors (direct_spin1_symm).  The full
+            # Hamiltonian conserves the symmetry, but the numerical noise
+            # (eg of outcore_dtype) in other irreps needs to be removed.
+            airreps, birreps, wfnsym = fci.gen_strs_irrep(norb, nelec)
+        else:
+            airreps = None
+        def hop(c):
+            mem_now = lib.current_memory()[0]
+            max_memory1 = max(400, fci.max_memory-mem_now)
+            hc = outcore.contract_2e(h2e, c, norb, nelec, link_index1,
+                                     max_memory=max_memory1)
+            if airreps is not None:
+                outcore.project_wfnsym(hc, airreps, birreps, wfnsym)
+            return hc.ravel()
+    else:
+        def hop(c):
+            hc = fci.contract_2e(h2e, c, norb, nelec, (link_indexa,link_indexb))
+            return hc.ravel()
+        if (hasattr(fci, 'contract_2e_block') and
+            _is_default_contract_2e(fci)):
+            # The trial vectors of all roots in one Davidson iteration are
+            # contracted together.  Not for the solvers which modify
+            # contract_2e (e.g. addons.fix_spin_ which patches the instance)
+            def hop_block(cs):
+                if len(cs) == 1:
+                    return [hop(cs[0])]
+                cs = [c.reshape(na,nb) for c in cs]
+                hcs = fci.contract_2e_block(h2e, cs, norb, nelec,
+                                            (link_indexa,link_indexb))
+                return [hc.ravel() for hc in hcs]
+            hop.block = hop_block
 
     if ci0 is None:
         if hasattr(fci, 'get_init_guess'):
@@ -499,6 +571,19 @@ class FCISolver(lib.StreamObject):
         wfnsym : str or int
             Symmetry of wavefunction.  It is used only in direct_spin1_symm
             and direct_spin0_symm solver.
+        outcore : bool
+            Out-of-core mode for large active spaces.  The Davidson subspace
+            vectors are stored in memory-mapped files, and the Hamiltonian
+            and the density matrices are computed by streaming over the
+            blocks of alpha strings (see :mod:`pyscf.fci.outcore`) within
+            max_memory.  It is used by direct_spin1 and direct_spin1_symm
+            solvers.  Default is False.
+        outcore_dtype : numpy dtype
+            The data type to store the subspace vectors in the out-of-core
+            mode, eg numpy.float32.  Single precision limits the accuracy of
+            the energy to ~1e-7.  Default is None, the dtype of CI vectors.
+            Note the Davidson solver holds about 3*nroots+1 full CI vectors
+            in memory in the out-of-core mode.
 
     Saved results
 
@@ -545,6 +630,8 @@ class FCISolver(lib.StreamObject):
 # solver.  They are not used by direct_spin1 solver.
         self.orbsym = None
         self.wfnsym = None
+        self.outcore = False
+        self.outcore_dtype = None
 
         self.converged = False
         self._keys = set(self.__dict__.keys())
@@ -563,6 +650,9 @@ class FCISolver(lib.StreamObject):
         log.info('nroots = %d', self.nroots)
         log.info('pspace_size = %d', self.pspace_size)
         log.info('spin = %s', self.spin)
+        if self.outcore:
+            log.info('outcore = %s  outcore_dtype = %s',
+                     self.outcore, self.outcore_dtype)
         return self
 
     @lib.with_doc(absorb_h1e.__doc__)
@@ -585,6 +675,15 @@ class FCISolver(lib.StreamObject):
     def contract_2e(self, eri, fcivec, norb, nelec, link_index=None, **kwargs):
         return contract_2e(eri, fcivec, norb, nelec, link_index, **kwargs)
 
+    @lib.with_doc(contract_2e_block.__doc__)
+    def contract_2e_block(self, eri, fcivecs, norb, nelec, link_index=None):
+        if not _is_default_contract_2e(self):
+            # Solvers with their own contract_2e (symmetry, UHF, spin
+            # penalty, ...)
+            return [self.contract_2e(eri, c, norb, nelec, link_index)
+                    for c in fcivecs]
+        return contract_2e_block(eri, fcivecs, norb, nelec, link_index)
+
     def eig(self, op, x0=None, precond=None, **kwargs):
         if isinstance(op, numpy.ndarray):
             self.converged = True
@@ -594,9 +693,16 @@ class FCISolver(lib.StreamObject):
             lessio = True
         else:
             lessio = False
+        if self.outcore:
+            kwargs['outcore'] = True
+            kwargs['outcore_dtype'] = self.outcore_dtype
+        if hasattr(op, 'block'):
+            # op.block computes op for a list of vectors in one pass
+            aop = op.block
+        else:
+            aop = lambda xs: [op(x) for x in xs]
         self.converged, e, ci = \
-                lib.davidson1(lambda xs: [op(x) for x in xs],
-                              x0, precond, lessio=lessio, **kwargs)
+                lib.davidson1(aop, x0, precond, lessio=lessio, **kwargs)
         if kwargs['nroots'] == 1:
             e = e[0]
             ci = ci[0]
@@ -642,6 +748,10 @@ class FCISolver(lib.StreamObject):
 
     @lib.with_doc(make_rdm1.__doc__)
     def make_rdm1(self, fcivec, norb, nelec, link_index=None):
+        if self.outcore:
+            nelec = _unpack_nelec(nelec, self.spin)
+            return outcore.make_rdm1(fcivec, norb, nelec,
+                                     max_memory=self.max_memory)
         return make_rdm1(fcivec, norb, nelec, link_index)
 
     @lib.with_doc(make_rdm12s.__doc__)
@@ -652,6 +762,9 @@ class FCISolver(lib.StreamObject):
     @lib.with_doc(make_rdm12.__doc__)
     def make_rdm12(self, fcivec, norb, nelec, link_index=None, reorder=True):
         nelec = _unpack_nelec(nelec, self.spin)
+        if self.outcore:
+            return outcore.make_rdm12(fcivec, norb, nelec, None, reorder,
+                                      max_memory=self.max_memory)
         return make_rdm12(fcivec, norb, nelec, link_index, reorder)
 
     def make_rdm2(self, fcivec, norb, nelec, link_index=None, reorder=True):
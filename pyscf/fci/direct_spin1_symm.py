@@ -319,6 +319,18 @@ class FCISolver(direct_spin1.FCISolver):
         wfnsym = _id_wfnsym(self, norb, nelec, self.wfnsym)
         return get_init_guess(norb, nelec, nroots, hdiag, self.orbsym, wfnsym)
 
+    def gen_strs_irrep(self, norb, nelec):
+        '''Irreps of alpha strings, beta strings, and the irrep of the
+        wavefunction'''
+        neleca, nelecb = direct_spin1._unpack_nelec(nelec)
+        strsa = cistring.gen_strings4orblist(range(norb), neleca)
+        airreps = birreps = _gen_strs_irrep(strsa, self.orbsym)
+        if neleca != nelecb:
+            strsb = cistring.gen_strings4orblist(range(norb), nelecb)
+            birreps = _gen_strs_irrep(strsb, self.orbsym)
+        wfnsym = _id_wfnsym(self, norb, nelec, self.wfnsym)
+        return airreps, birreps, wfnsym
+
     def guess_wfnsym(self, norb, nelec, fcivec=None, wfnsym=None, **kwargs):
         if fcivec is None:
             wfnsym = _id_wfnsym(self, norb, nelec, wfnsym)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+'''
+Out-of-core FCI
+
+The Davidson subspace of a large active space (~ (16e,16o)) may not fit in
+memory.  The functions in this module take the CI vectors as 2D arrays
+[alpha,beta] which can be memory-mapped arrays (eg the datasets of
+lib.MMapFile).  The alpha strings are processed block by block.  For each
+block, only the intermediates of the block and the rows of the CI vector
+which are connected to the block by single excitations are loaded in memory.
+
+The out-of-core mode of the FCI solvers is switched on by the attribute
+FCISolver.outcore.  In this mode the subspace vectors are stored on disk,
+but the Davidson solver still holds the current trial vectors, eigenvectors
+and residuals, about 3*nroots+1 full CI vectors, in memory.  One CI vector
+of (16e,16o) takes 1.3 GB, and of (18e,18o) 19 GB.
+'''
+
+import numpy
+import scipy.sparse
+from pyscf import lib
+from pyscf import ao2mo
+from pyscf.fci import cistring
+from pyscf.fci import rdm
+
+
+def contract_2e(eri, fcivec, norb, nelec, link_index=None, out=None,
+                max_memory=2000):
+    '''Compute E_{pq}E_{rs}|CI> for eri returned by absorb_h1e, the same to
+    :func:`direct_spin1.contract_2e`.  fcivec and out can be memory-mapped
+    arrays.  The result is written to out if out is given.
+
+    Kwargs:
+        link_index : a tuple of two arrays
+            Look up tables of alpha and beta strings, generated by
+            cistring.gen_linkstr_index (not the lower triangular form).
+    '''
+    link_indexa, link_indexb = _unpack(norb, nelec, link_index)
+    na = link_indexa.shape[0]
+    nb = link_indexb.shape[0]
+    fcivec = fcivec.reshape(na,nb)
+    nn = norb * norb
+    eri = ao2mo.restore(1, eri, norb).reshape(nn,nn)
+    if out is None:
+        out = numpy.zeros((na,nb))
+    else:
+        out = out.reshape(na,nb)
+        out[:] = 0
+
+    mb = _excitation_matrix(link_indexb, norb, 0, nb)
+    blksize = _blksize(norb, link_indexa, nb, max_memory)
+    for p0, p1 in lib.prange(0, na, blksize):
+        ma = _excitation_matrix(link_indexa, norb, p0, p1)
+        t1 = _gather(ma, mb, fcivec, nn, p0, p1)
+        g = lib.dot(eri, t1.reshape(nn,-1)).reshape(nn,p1-p0,nb)
+        t1 = None
+        # beta excitations  g[ai,I,Ib] -> out[I,Jb]
+        out[p0:p1] += mb.dot(g.transpose(0,2,1).reshape(nn*nb,p1-p0)).T
+        # alpha excitations  g[ai,I,:] -> out[J,:]
+        rows = numpy.unique(link_indexa[p0:p1,:,2])
+        out[rows] += ma[rows].dot(g.reshape(nn*(p1-p0),nb))
+        g = None
+    return out
+
+def make_rdm1(fcivec, norb, nelec, link_index=None, max_memory=2000):
+    '''Spin-traced 1-particle density matrix, the same to
+    :func:`direct_spin1.make_rdm1`.  fcivec can be a memory-mapped array.
+    '''
+    return _make_rdm12(fcivec, norb, nelec, link_index, False, max_memory)[0]
+
+def make_rdm12(fcivec, norb, nelec, link_index=None, reorder=True,
+               max_memory=2000):
+    '''Spin-traced 1- and 2-particle density matrices, the same to
+    :func:`direct_spin1.make_rdm12`.  fcivec can be a memory-mapped array.
+    '''
+    dm1, dm2 = _make_rdm12(fcivec, norb, nelec, link_index, True, max_memory)
+    if reorder:
+        dm1, dm2 = rdm.reorder_rdm(dm1, dm2, inplace=True)
+    return dm1, dm2
+
+def _make_rdm12(fcivec, norb, nelec, link_index, with_rdm2, max_memory):
+    link_indexa, link_indexb = _unpack(norb, nelec, link_index)
+    na = link_indexa.shape[0]
+    nb = link_indexb.shape[0]
+    fcivec = fcivec.reshape(na,nb)
+    nn = norb * norb
+    dm1 = numpy.zeros(nn)
+    dm2 = numpy.zeros((nn,nn))
+
+    mb = _excitation_matrix(link_indexb, norb, 0, nb)
+    blksize = _blksize(norb, link_indexa, nb, max_memory)
+    for p0, p1 in lib.prange(0, na, blksize):
+        ma = _excitation_matrix(link_indexa, norb, p0, p1)
+        # t1[(q,p)] = E_{pq}|CI> for the alpha strings in [p0:p1]
+        t1 = _gather(ma, mb, fcivec, nn, p0, p1).reshape(nn,-1)
+        dm1 += numpy.dot(t1, numpy.asarray(fcivec[p0:p1]).ravel())
+        if with_rdm2:
+            dm2 += lib.dot(t1, t1.T)
+        t1 = None
+    # dm1[p,q] = <E_{pq}>,  dm2[p,q,r,s] = <E_{pq} E_{rs}>
+    dm1 = dm1.reshape(norb,norb).T.copy()
+    dm2 = dm2.reshape(norb,norb,norb,norb).transpose(0,1,3,2).copy()
+    return dm1, dm2
+
+def project_wfnsym(fcivec, airreps, birreps, wfnsym, blksize=2000):
+    '''Zero out the determinants (in place) which do not belong to the irrep
+    wfnsym, the same to addons.symmetrize_wfn without normalization.
+    fcivec can be a memory-mapped array.
+    '''
+    na = len(airreps)
+    fcivec = fcivec.reshape(na,-1)
+    for p0, p1 in lib.prange(0, na, blksize):
+        mask = (airreps[p0:p1].reshape(-1,1) ^ birreps) != wfnsym
+        fcivec[p0:p1][mask] = 0
+    return fcivec
+
+def _gather(ma, mb, fcivec, nn, p0, p1):
+    '''t1[(a,i),I,:] = <I|E_{ia}|CI>, I in alpha strings [p0:p1]'''
+    nb = fcivec.shape[1]
+    t1 = ma.T.dot(fcivec).reshape(nn,p1-p0,nb)
+    ci_blk = numpy.asarray(fcivec[p0:p1])
+    t1 += mb.T.dot(ci_blk.T).reshape(nn,nb,p1-p0).transpose(0,2,1)
+    return t1
+
+def _excitation_matrix(link_index, norb, p0, p1):
+    '''Sparse matrix M[J,(a,i),I] = <J|a^+ i|I> for the strings I in [p0:p1],
+    stored as a matrix of shape (nstr,norb*norb*(p1-p0))'''
+    nstr = link_index.shape[0]
+    tab = link_index[p0:p1]
+    blk, nlink = tab.shape[:2]
+    cols = (tab[:,:,0] * norb + tab[:,:,1]) * blk
+    cols += numpy.arange(blk).reshape(-1,1)
+    return scipy.sparse.csr_matrix((tab[:,:,3].ravel().astype(numpy.double),
+                                    (tab[:,:,2].ravel(), cols.ravel())),
+                                   shape=(nstr,norb*norb*blk))
+
+def _blksize(norb, link_indexa, nb, max_memory):
+    nlinka = link_indexa.shape[1]
+    # t1 and g of each alpha string, and the alpha rows updated in out
+    unit = (norb**2*2 + nlinka) * nb * 8 / 1e6
+    return max(1, min(link_indexa.shape[0], int(max_memory/unit)))
+
+def _unpack(norb, nelec, link_index):
+    if link_index is None:
+        if isinstance(nelec, (int, numpy.number)):
+            nelecb = nelec//2
+            neleca = nelec - nelecb
+        else:
+            neleca, nelecb = nelec
+        link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
+        if neleca == nelecb:
+            link_indexb = link_indexa
+        else:
+            link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+        return link_indexa, link_indexb
+    else:
+        return link_index
@@ -201,6 +201,21 @@ class KnowValues(unittest.TestCase):
         mci = fci.FCI(mol, mf.mo_coeff, True)
         check(mci)
 
+    def test_fix_spin_nroots(self):
+        # The spin penalty is applied to the multi-root Davidson iterations
+        mci = fci.addons.fix_spin_(fci.direct_spin1.FCISolver(mol), 2, 0)
+        mci.nroots = 3
+        es, cs = mci.kernel(h1e, g2e, norb, nelec, tol=1e-12)
+        for c in cs:
+            self.assertAlmostEqual(fci.spin_op.spin_square0(c, norb, nelec)[0], 0, 6)
+
+        mci = fci.direct_spin1.FCISolver(mol)
+        mci.nroots = 20
+        eref, cs = mci.kernel(h1e, g2e, norb, nelec, tol=1e-12)
+        ss = [fci.spin_op.spin_square0(c, norb, nelec)[0] for c in cs]
+        eref = [e for e, s in zip(eref, ss) if abs(s) < .1][:3]
+        self.assertAlmostEqual(abs(es - eref).max(), 0, 7)
+
     def test_transform_ci_for_orbital_rotation(self):
         numpy.random.seed(12)
         norb = nelec = 6
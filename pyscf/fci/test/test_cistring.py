@@ -68,6 +68,35 @@ class KnowValues(unittest.TestCase):
         self.assertEqual(t1strs(7, 3), cistring.tn_strs(7, 3, 1).tolist())
         self.assertEqual(t2strs(7, 3), cistring.tn_strs(7, 3, 2).tolist())
 
+    def test_linkstr_cache(self):
+        cistring._linkstr_cache.clear()
+        link1 = cistring.gen_linkstr_index_trilidx(range(7), 3)
+        link1[:] = 0
+        link2 = cistring.gen_linkstr_index_trilidx(range(7), 3)
+        self.assertEqual(len(cistring._linkstr_cache), 1)
+        strs = cistring.gen_strings4orblist(range(7), 3)
+        link0 = cistring.gen_linkstr_index(range(7), 3, strs, True)
+        self.assertTrue(numpy.array_equal(link2[:,:,0], link0[:,:,0]))
+        self.assertTrue(numpy.array_equal(link2[:,:,2:], link0[:,:,2:]))
+        for n in range(cistring.LINKSTR_CACHE_SIZE):
+            cistring.gen_linkstr_index(range(n+8), 2)
+        self.assertEqual(len(cistring._linkstr_cache), cistring.LINKSTR_CACHE_SIZE)
+        self.assertFalse((tuple(range(7)), 3, True) in cistring._linkstr_cache)
+
+        # The cache is bounded by LINKSTR_CACHE_MEMORY
+        max_memory, cistring.LINKSTR_CACHE_MEMORY = cistring.LINKSTR_CACHE_MEMORY, .1
+        try:
+            cistring._linkstr_cache.clear()
+            link1 = cistring.gen_linkstr_index(range(12), 6)  # 0.6 MB
+            self.assertEqual(len(cistring._linkstr_cache), 0)
+            for n in range(4):
+                cistring.gen_linkstr_index(range(n+8), 3)
+            nbytes = sum([x.nbytes for x in cistring._linkstr_cache.values()])
+            self.assertTrue(0 < nbytes <= .1e6)
+            self.assertTrue(len(cistring._linkstr_cache) < 4)
+        finally:
+            cistring.LINKSTR_CACHE_MEMORY = max_memory
+
 def t1strs(norb, nelec):
     nocc = nelec
     hf_str = int('1'*nocc, 2)
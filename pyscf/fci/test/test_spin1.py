@@ -57,6 +57,18 @@ class KnowValues(unittest.TestCase):
         ci3 = fci.direct_spin1.contract_2e(g2e, ci2, norb, neleci)
         self.assertAlmostEqual(numpy.linalg.norm(ci3), 127.49780293866368, 6)
 
+    def test_contract_2e_block(self):
+        hcs = fci.direct_spin1.contract_2e_block(g2e, [ci2, ci3], norb, neleci)
+        self.assertTrue(numpy.allclose(hcs[0], fci.direct_spin1.contract_2e(g2e, ci2, norb, neleci)))
+        self.assertTrue(numpy.allclose(hcs[1], fci.direct_spin1.contract_2e(g2e, ci3, norb, neleci)))
+
+        cis = fci.direct_spin1.FCISolver(mol)
+        cis.nroots = 3
+        eref = cis.kernel(h1e, g2e, norb, neleci)[0]  # exact diagonalization
+        cis.davidson_only = True
+        e = cis.kernel(h1e, g2e, norb, neleci)[0]
+        self.assertAlmostEqual(abs(e - eref).max(), 0, 8)
+
     def test_kernel(self):
         eref, cref = fci.direct_spin0.kernel(h1e, g2e, norb, mol.nelectron)
         e, c = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)
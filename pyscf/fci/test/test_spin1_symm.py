@@ -77,6 +77,45 @@ class KnowValues(unittest.TestCase):
         ss = mc.fcisolver.spin_square(mc.ci[1], mc.ncas, mc.nelecas)
         self.assertAlmostEqual(ss[0], 2, 9)
 
+    def test_outcore(self):
+        from pyscf import lib
+        ci1 = fci.addons.symmetrize_wfn(ci0, norb, nelec, orbsym, wfnsym=0)
+        tmpf = lib.MMapTmpFile()
+        tmpf['ci'] = ci1
+        out = tmpf.create_dataset('out', ci1.shape)
+        h2e = fci.direct_spin1.absorb_h1e(h1e, g2e, norb, nelec, .5)
+        fci.outcore.contract_2e(h2e, tmpf['ci'], norb, nelec, out=out,
+                                max_memory=.01)
+        ref = fci.direct_spin1.contract_2e(h2e, ci1, norb, nelec)
+        self.assertTrue(numpy.allclose(out, ref))
+
+        cis1 = fci.direct_spin1_symm.FCISolver(mol)
+        cis1.orbsym = orbsym
+        cis1.outcore = True
+        e, c = cis1.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e, -84.200905534209554, 8)
+        dm1, dm2 = cis1.make_rdm12(c, norb, nelec)
+        dm1ref, dm2ref = fci.direct_spin1.make_rdm12(c, norb, nelec)
+        self.assertTrue(numpy.allclose(dm1, dm1ref))
+        self.assertTrue(numpy.allclose(dm2, dm2ref))
+
+        cis1.outcore_dtype = numpy.float32
+        e = cis1.kernel(h1e, g2e, norb, nelec)[0]
+        self.assertAlmostEqual(e, -84.200905534209554, 5)
+
+        # The solution stays in the excited irrep
+        cis0 = fci.direct_spin1_symm.FCISolver(mol)
+        cis0.orbsym = orbsym
+        cis0.wfnsym = cis1.wfnsym = 'B1'
+        eref = cis0.kernel(h1e, g2e, norb, nelec)[0]
+        for dtype in (None, numpy.float32):
+            cis1.outcore_dtype = dtype
+            e, c = cis1.kernel(h1e, g2e, norb, nelec)
+            self.assertAlmostEqual(e, eref, 5)
+            c1 = fci.addons.symmetrize_wfn(c, norb, nelec, orbsym,
+                                           wfnsym=pyscf.symm.irrep_name2id('C2v', 'B1'))
+            self.assertAlmostEqual(abs(c1-c).max(), 0, 6)
+
 
 if __name__ == "__main__":
     print("Full Tests for spin1-symm")
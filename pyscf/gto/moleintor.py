@@ -255,7 +255,12 @@ def getints2c(intor_name, atm, bas, env, shls_slice=None, comp=1, hermi=0,
     return mat
 
 def getints3c(intor_name, atm, bas, env, shls_slice=None, comp=1,
-              aosym='s1', ao_loc=None, cintopt=None, out=None):
+              aosym='s1', ao_loc=None, cintopt=None, out=None,
+              shlpair_mask=None):
+    '''3-center integrals.  If shlpair_mask (a 2D boolean array for the i and
+    j shells of shls_slice) is given, the integrals of the shell pairs which
+    are not selected by the mask are not computed and set to zero.
+    '''
     atm = numpy.asarray(atm, dtype=numpy.int32, order='C')
     bas = numpy.asarray(bas, dtype=numpy.int32, order='C')
     env = numpy.asarray(env, dtype=numpy.double, order='C')
@@ -300,13 +305,22 @@ def getints3c(intor_name, atm, bas, env, shls_slice=None, comp=1,
     if cintopt is None:
         cintopt = make_cintopt(atm, bas, env, intor_name)
 
-    drv(getattr(libcgto, intor_name), fill,
-        mat.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(comp),
-        (ctypes.c_int*6)(*(shls_slice[:6])),
-        ao_loc.ctypes.data_as(ctypes.c_void_p), cintopt,
-        atm.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(natm),
-        bas.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(nbas),
-        env.ctypes.data_as(ctypes.c_void_p))
+    args = (getattr(libcgto, intor_name), fill,
+            mat.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(comp),
+            (ctypes.c_int*6)(*(shls_slice[:6])),
+            ao_loc.ctypes.data_as(ctypes.c_void_p), cintopt,
+            atm.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(natm),
+            bas.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(nbas),
+            env.ctypes.data_as(ctypes.c_void_p))
+    if shlpair_mask is None:
+        drv(*args)
+    else:
+        assert('spinor' not in intor_name)
+        shlpair_mask = numpy.asarray(shlpair_mask, dtype=numpy.int8, order='C')
+        assert(shlpair_mask.shape == (i1-i0, j1-j0))
+        mat[:] = 0
+        libcgto.GTOnr3c_screened_drv(*(args +
+            (shlpair_mask.ctypes.data_as(ctypes.c_void_p),)))
 
     mat = numpy.rollaxis(mat, -1, 0)
     if comp == 1:
@@ -17,4 +17,6 @@ from pyscf.lib.numpy_helper import *
 from pyscf.lib.linalg_helper import *
 from pyscf.lib import chkfile
 from pyscf.lib import diis
+from pyscf.lib import profiler
+from pyscf.lib import mmapfile
 from pyscf.lib.misc import StreamObject
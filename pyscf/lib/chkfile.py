@@ -3,7 +3,11 @@
 # Author: Qiming Sun <osirpt.sun@gmail.com>
 #
 
+import os
 import json
+import atexit
+import threading
+import numpy
 import h5py
 import pyscf.gto
 
@@ -54,7 +58,7 @@ def load(chkfile, key):
         else:
             return val.value
 
-    with h5py.File(chkfile, 'r') as fh5:
+    with _h5file(chkfile, 'r') as fh5:
         return load_as_dic(key, fh5)
 
 def dump_chkfile_key(chkfile, key, value):
@@ -112,7 +116,10 @@ def dump(chkfile, key, value):
                 for k, v in enumerate(value):
                     save_as_group(str(k), v, root1)
 
-    if h5py.is_hdf5(chkfile):
+    writer = get_writer(chkfile)
+    if writer is not None:
+        writer.dump(key, value)
+    elif h5py.is_hdf5(chkfile):
         with h5py.File(chkfile, 'r+') as fh5:
             if key in fh5:
                 del(fh5[key])
@@ -144,13 +151,13 @@ def load_mol(chkfile):
     <pyscf.gto.mole.Mole object at 0x7fdcd94d7f50>
     '''
     try:
-        with h5py.File(chkfile, 'r') as fh5:
+        with _h5file(chkfile, 'r') as fh5:
             mol = pyscf.gto.loads(fh5['mol'].value)
     except:
 # Compatibility to the old serialization format
 # TODO: remove it in future release
         from numpy import array
-        with h5py.File(chkfile, 'r') as fh5:
+        with _h5file(chkfile, 'r') as fh5:
             mol = pyscf.gto.Mole()
             mol.output = '/dev/null'
             moldic = eval(fh5['mol'].value)
@@ -175,3 +182,227 @@ def save_mol(mol, chkfile):
     dump(chkfile, 'mol', mol.dumps())
 dump_mol = save_mol
 
+
+
+class ChkfileWriter(object):
+    '''Keep the chkfile open and write the values on a background thread.
+
+    Each value is first compared to the last value written under that key.
+    Only the changed datasets are written, in place when shape and dtype
+    have not changed.  Arrays are stored in chunked datasets, optionally
+    compressed.  The structure of the data in the chkfile is the same as
+    what :func:`dump` produces.  While a writer is open for a chkfile,
+    :func:`dump` and :func:`load` on that chkfile go through the writer.
+
+    Attributes:
+        compression : str or None
+            HDF5 compression filter for array datasets, eg 'gzip' or 'lzf'.
+        async_io : bool
+            Whether to write on a background thread.  If False, the values
+            are written when :func:`dump` is called.
+
+    Examples:
+
+    >>> with lib.chkfile.ChkfileWriter('scf.chk') as w:
+    ...     for cycle in range(10):
+    ...         lib.chkfile.dump('scf.chk', 'scf/mo_coeff', mo_coeff)
+    '''
+    def __init__(self, chkfile, compression=None, async_io=True):
+        self.chkfile = chkfile
+        self.compression = compression
+        self.async_io = async_io
+        self._fh5 = None
+        self._last = {}
+        self._tasks = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._error = None
+        self._lock = threading.RLock()
+
+    def open(self):
+        if self._fh5 is None:
+            if h5py.is_hdf5(self.chkfile):
+                self._fh5 = h5py.File(self.chkfile, 'r+')
+            else:
+                self._fh5 = h5py.File(self.chkfile, 'w')
+            _writers[_writer_key(self.chkfile)] = self
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def dump(self, key, value):
+        '''Write value under key.  See :func:`dump` for the arguments.'''
+        if self._fh5 is None:
+            self.open()
+        leaves = dict(_flatten(key, value))
+        last = self._last.get(key)
+        if last is not None and _same_leaves(last, leaves):
+            return
+        if last is None or set(last) != set(leaves):
+            # The key will be rewritten.  Forget what was written under it.
+            for k in list(self._last):
+                if k.startswith(key+'/') or k.startswith(key+'__from_list__/'):
+                    del(self._last[k])
+        self._last[key] = leaves
+        if self.async_io:
+            with self._cond:
+                self._tasks.append((key, leaves, last))
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._worker)
+                    self._thread.daemon = True
+                    self._thread.start()
+                self._cond.notify()
+        else:
+            self._write(key, leaves, last)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._tasks:
+                    self._cond.wait()
+                task = self._tasks[0]
+            if task is None:
+                with self._cond:
+                    self._tasks.pop(0)
+                    self._cond.notify_all()
+                return
+            try:
+                self._write(*task)
+            except Exception as e:
+                self._error = e
+            with self._cond:
+                self._tasks.pop(0)
+                self._cond.notify_all()
+
+    def _write(self, key, leaves, last):
+        with self._lock:
+            fh5 = self._fh5
+            if last is None or set(last) != set(leaves):
+                # the structure is changed, rewrite the whole key
+                for k in (key, key+'__from_list__'):
+                    if k in fh5:
+                        del(fh5[k])
+                last = {}
+            for path, val in leaves.items():
+                if path in last and _same_value(last[path], val):
+                    continue
+                if path in fh5:
+                    dset = fh5[path]
+                    if (isinstance(val, numpy.ndarray) and val.ndim > 0 and
+                        dset.shape == val.shape and dset.dtype == val.dtype):
+                        dset[...] = val
+                        continue
+                    del(fh5[path])
+                if isinstance(val, numpy.ndarray) and val.ndim > 0 and val.size > 0:
+                    fh5.create_dataset(path, data=val, chunks=True,
+                                       compression=self.compression)
+                else:
+                    fh5[path] = val
+
+    def flush(self):
+        '''Wait for the pending writes and flush the file'''
+        if self._thread is not None:
+            with self._cond:
+                while self._tasks:
+                    self._cond.wait()
+        if self._error is not None:
+            e, self._error = self._error, None
+            raise e
+        with self._lock:
+            if self._fh5 is not None:
+                self._fh5.flush()
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            with self._cond:
+                self._tasks.append(None)
+                self._cond.notify()
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        finally:
+            if self._fh5 is not None:
+                self._fh5.close()
+                self._fh5 = None
+            self._last = {}
+            if _writers.get(_writer_key(self.chkfile)) is self:
+                del(_writers[_writer_key(self.chkfile)])
+
+_writers = {}
+def _writer_key(chkfile):
+    return os.path.abspath(chkfile)
+
+def get_writer(chkfile):
+    '''The ChkfileWriter which is open for chkfile, or None'''
+    if not isinstance(chkfile, str):
+        return None
+    return _writers.get(_writer_key(chkfile))
+
+def open_writer(chkfile, compression=None, async_io=True):
+    '''Open a ChkfileWriter for chkfile, or return the one already open'''
+    writer = get_writer(chkfile)
+    if writer is None:
+        writer = ChkfileWriter(chkfile, compression, async_io).open()
+    return writer
+
+@atexit.register
+def _close_writers():
+    for writer in list(_writers.values()):
+        writer.close()
+
+class _h5file(object):
+    '''Open chkfile, or borrow the file handle of the writer which is open
+    for chkfile'''
+    def __init__(self, chkfile, mode='r'):
+        self.chkfile = chkfile
+        self.mode = mode
+        self.writer = get_writer(chkfile)
+        self.fh5 = None
+    def __enter__(self):
+        if self.writer is not None:
+            self.writer.flush()
+            self.writer._lock.acquire()
+            return self.writer._fh5
+        self.fh5 = h5py.File(self.chkfile, self.mode)
+        return self.fh5
+    def __exit__(self, type, value, traceback):
+        if self.writer is not None:
+            self.writer._lock.release()
+        else:
+            self.fh5.close()
+
+def _flatten(key, value):
+    '''Datasets (path, value) in the layout of :func:`dump`.  The values
+    are copied so that they can be written later.'''
+    if isinstance(value, dict):
+        for k in value:
+            for x in _flatten(key+'/'+k, value[k]):
+                yield x
+    elif (isinstance(value, (tuple, list)) or
+          (isinstance(value, numpy.ndarray) and value.dtype == object)):
+        for k, v in enumerate(value):
+            for x in _flatten(key+'__from_list__/'+str(k), v):
+                yield x
+    elif isinstance(value, numpy.ndarray):
+        yield key, numpy.array(value)
+    else:
+        yield key, value
+
+def _same_value(a, b):
+    if isinstance(a, numpy.ndarray) or isinstance(b, numpy.ndarray):
+        a = numpy.asarray(a)
+        b = numpy.asarray(b)
+        return (a.shape == b.shape and a.dtype == b.dtype and
+                numpy.array_equal(a, b))
+    else:
+        return type(a) == type(b) and a == b
+
+def _same_leaves(last, leaves):
+    return (set(last) == set(leaves) and
+            all(_same_value(last[k], leaves[k]) for k in leaves))
@@ -140,3 +140,133 @@ void VXCgen_grid(double *out, double *coords, double *atm_coords,
         free(grid_dist);
 }
 
+
+/*
+ * s(mu) of the partition function.  scheme = 0 for Becke, JCP, 88, 2547;
+ * scheme = 1 for Stratmann, Scuseria, Frisch, CPL, 257, 213
+ */
+static double partition_s(double g, int scheme)
+{
+        if (scheme == 1) {
+                const double a = .64;
+                if (g <= -a) {
+                        return 1;
+                } else if (g >= a) {
+                        return 0;
+                }
+                double ma = g / a;
+                double ma2 = ma * ma;
+                g = (1/16.)*(ma*(35 + ma2*(-35 + ma2*(21 - 5 *ma2))));
+        } else {
+                g = (3 - g*g) * g * .5;
+                g = (3 - g*g) * g * .5;
+                g = (3 - g*g) * g * .5;
+        }
+        return .5 * (1 - g);
+}
+
+/*
+ * Partition weights of the grids of atom ia (the vol part is not included).
+ * Atoms are visited in the order given by nbr, which should be sorted by
+ * the distance to atom ia.  For grid r, let dmin be the distance to the
+ * nearest atom.  The cell function of atom X is taken to be 0 if
+ * |r-X| >= ratio1 * dmin, and only the atoms with |r-B| < ratio2 * dmin are
+ * included in the products of the cell functions.  With the Stratmann scheme,
+ * ratio1 = (1+m)/(1-m) and ratio2 = ratio1**2 give the exact weights, m being
+ * the smallest mu for which the adjusted nu = mu + a_ij(1-mu^2) reaches the
+ * cutoff a of s(nu) for all a_ij in radii_table (m = a without adjustment).
+ */
+void VXCgen_grid_screen(double *out, double *coords, int ngrids, int ia,
+                        double *atm_coords, double *radii_table, int natm,
+                        int *nbr, int nnbr, int scheme,
+                        double ratio1, double ratio2)
+{
+#pragma omp parallel default(none) \
+        shared(out, coords, ngrids, ia, atm_coords, radii_table, natm, \
+               nbr, nnbr, scheme, ratio1, ratio2)
+{
+        int n, k, i, j, ib, jb, nlst, ncell;
+        double dx, dy, dz, dA, dmin, rab, g, pa, psum, pi;
+        double *ra = atm_coords + ia * 3;
+        double *rb;
+        int *lst = malloc(sizeof(int) * nnbr);
+        int *cell = malloc(sizeof(int) * nnbr);
+        double *dlst = malloc(sizeof(double) * nnbr);
+#pragma omp for schedule(dynamic, 64)
+        for (n = 0; n < ngrids; n++) {
+                dx = coords[n*3+0] - ra[0];
+                dy = coords[n*3+1] - ra[1];
+                dz = coords[n*3+2] - ra[2];
+                dA = sqrt(dx*dx + dy*dy + dz*dz);
+                dmin = dA;
+                nlst = 0;
+                for (k = 0; k < nnbr; k++) {
+                        ib = nbr[k];
+                        rb = atm_coords + ib * 3;
+                        dx = rb[0] - ra[0];
+                        dy = rb[1] - ra[1];
+                        dz = rb[2] - ra[2];
+                        rab = sqrt(dx*dx + dy*dy + dz*dz);
+                        // |r-B| >= rab - dA
+                        if (rab - dA >= ratio2 * dmin) {
+                                break;
+                        }
+                        dx = coords[n*3+0] - rb[0];
+                        dy = coords[n*3+1] - rb[1];
+                        dz = coords[n*3+2] - rb[2];
+                        dlst[nlst] = sqrt(dx*dx + dy*dy + dz*dz);
+                        lst[nlst] = ib;
+                        dmin = MIN(dmin, dlst[nlst]);
+                        nlst++;
+                        if (dA >= ratio1 * dmin) {
+                                break;
+                        }
+                }
+                if (dA >= ratio1 * dmin) {
+                        out[n] = 0;
+                        continue;
+                }
+
+                ncell = 0;
+                for (k = 0; k < nlst; k++) {
+                        if (dlst[k] < ratio1 * dmin) {
+                                cell[ncell] = k;
+                                ncell++;
+                        }
+                }
+
+                pa = 0;
+                psum = 0;
+                for (i = 0; i < ncell; i++) {
+                        ib = lst[cell[i]];
+                        pi = 1;
+                        for (j = 0; j < nlst && pi > 0; j++) {
+                                jb = lst[j];
+                                if (jb == ib || dlst[j] >= ratio2 * dmin) {
+                                        continue;
+                                }
+                                dx = atm_coords[ib*3+0] - atm_coords[jb*3+0];
+                                dy = atm_coords[ib*3+1] - atm_coords[jb*3+1];
+                                dz = atm_coords[ib*3+2] - atm_coords[jb*3+2];
+                                g = (dlst[cell[i]] - dlst[j]) / sqrt(dx*dx + dy*dy + dz*dz);
+                                if (radii_table != NULL) {
+                                        g += radii_table[ib*natm+jb] * (1 - g*g);
+                                }
+                                pi *= partition_s(g, scheme);
+                        }
+                        psum += pi;
+                        if (ib == ia) {
+                                pa = pi;
+                        }
+                }
+                if (psum > 0) {
+                        out[n] = pa / psum;
+                } else {
+                        out[n] = 0;
+                }
+        }
+        free(lst);
+        free(cell);
+        free(dlst);
+}
+}
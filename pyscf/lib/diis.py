@@ -15,6 +15,7 @@ import h5py
 from . import parameters
 from . import logger
 from . import misc
+from . import profiler
 
 
 INCORE_SIZE = 1e7
@@ -31,6 +32,21 @@ class DIIS(object):
             DIIS subspace size. The maximum number of the vectors to be stored.
         min_space
             The minimal size of subspace before DIIS extrapolation.
+        err_vec_dtype : numpy dtype
+            For the large vectors which are saved on disk, a copy of the
+            error vectors can be kept in memory in a lower precision (e.g.
+            numpy.float32).  The DIIS B matrix is then updated from these
+            copies and the error vectors are not read back from disk.  Only
+            the extrapolation coefficients are affected by the precision.
+            Default is None (not to cache error vectors).
+        max_memory : float or int
+            Memory budget (in MB) for the cached error vectors.  The error
+            vectors which do not fit in the budget are read from disk.
+            Default is None (no limit).
+        async_io : bool
+            Whether to write the vectors to disk in a background thread
+            (write-behind).  The input vectors should not be modified in place
+            by the caller when async_io is enabled.  Default is False.
 
     Functions:
         update(x, xerr=None) :
@@ -93,6 +109,9 @@ class DIIS(object):
             self.stdout = sys.stdout
         self.space = 6
         self.min_space = 1
+        self.err_vec_dtype = None
+        self.max_memory = None
+        self.async_io = False
 
 ##################################################
 # don't modify the following private variables, they are not input options
@@ -104,6 +123,8 @@ class DIIS(object):
         self._H = None
         self._xprev = None
         self._err_vec_touched = False
+        self._err_cache = {}
+        self._writer = None
 
     def _store(self, key, value):
         if value.size < INCORE_SIZE:
@@ -114,12 +135,41 @@ class DIIS(object):
         if value.size >= INCORE_SIZE or isinstance(self.filename, str):
             if self._diisfile is None:
                 self._diisfile = misc.H5TmpFile(self.filename)
-            if key in self._diisfile:
-                self._diisfile[key][:] = value
-            else:
-                self._diisfile[key] = value
-# to avoid "Unable to find a valid file signature" error when reopen from crash
-            self._diisfile.flush()
+            if key[0] == 'e' and value.size >= INCORE_SIZE:
+                self._cache_err_vec(int(key[1:]), value)
+            self._write(_write_h5, self._diisfile, key, value)
+
+    def _write(self, fn, *args):
+        '''Write vectors to the DIIS file, in background if async_io is set'''
+        self._wait_for_writer()
+        if self.async_io:
+            self._writer = misc.background_thread(fn, *args)
+        else:
+            fn(*args)
+
+    def _wait_for_writer(self):
+        '''Wait for the background writer.  The exception raised in the
+        writer (eg disk full) is re-raised here.'''
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            writer.join()
+
+    def _cache_err_vec(self, idx, value):
+        '''Keep a low-precision copy of the error vector in memory'''
+        self._err_cache.pop(idx, None)
+        if self.err_vec_dtype is None:
+            return
+        dtype = numpy.dtype(self.err_vec_dtype)
+        if numpy.iscomplexobj(value):
+            dtype = numpy.result_type(dtype, numpy.complex64)
+        if self.max_memory is not None:
+            mem_now = sum(v.nbytes for v in self._err_cache.values())
+            if (mem_now + value.size * dtype.itemsize) > self.max_memory * 1e6:
+                return
+        buf = numpy.empty(value.size, dtype=dtype)
+        for p0, p1 in prange(0, value.size, BLOCK_SIZE):
+            buf[p0:p1] = value[p0:p1]
+        self._err_cache[idx] = buf
 
     def push_err_vec(self, xerr):
         self._err_vec_touched = True
@@ -158,27 +208,28 @@ class DIIS(object):
                 if isinstance(self.filename, str):
                     self._store(ekey, self._buffer[ekey])
             else:
-                if ekey not in self._diisfile:
-                    self._diisfile.create_dataset(ekey, (x.size,), x.dtype)
-                for p0,p1 in prange(0, x.size, BLOCK_SIZE):
-                    self._diisfile[ekey][p0:p1] = x[p0:p1] - self._xprev[p0:p1]
+                self._cache_err_vec(self._head, _DiffVec(x, self._xprev))
+                self._write(_write_h5_diff, self._diisfile, ekey, x, self._xprev)
             self._head += 1
 
     def get_err_vec(self, idx):
         if self._buffer:
             return self._buffer['e%d'%idx]
         else:
+            self._wait_for_writer()
             return self._diisfile['e%d'%idx]
 
     def get_vec(self, idx):
         if self._buffer:
             return self._buffer['x%d'%idx]
         else:
+            self._wait_for_writer()
             return self._diisfile['x%d'%idx]
 
     def get_num_vec(self):
         return len(self._bookkeep)
 
+    @profiler.timed('diis')
     def update(self, x, xerr=None):
         '''Extrapolate vector 
 
@@ -197,15 +248,23 @@ class DIIS(object):
         if nd < self.min_space:
             return x
 
-        dt = numpy.array(self.get_err_vec(self._head-1), copy=False)
+        # Only the row of the new error vector in the B matrix is updated.
+        # Use the in-memory copies of the error vectors if available.
+        if not self._buffer and all(i in self._err_cache for i in range(nd)):
+            get_err_vec = self._err_cache.get
+        else:
+            get_err_vec = self.get_err_vec
+        dt = numpy.array(get_err_vec(self._head-1), copy=False)
+        dtype = numpy.result_type(dt.dtype, numpy.float64)
         if self._H is None:
-            self._H = numpy.zeros((self.space+1,self.space+1), dt.dtype)
+            self._H = numpy.zeros((self.space+1,self.space+1), dtype)
             self._H[0,1:] = self._H[1:,0] = 1
         for i in range(nd):
             tmp = 0
-            dti = self.get_err_vec(i)
+            dti = get_err_vec(i)
             for p0,p1 in prange(0, dt.size, BLOCK_SIZE):
-                tmp += numpy.dot(dt[p0:p1].conj(), dti[p0:p1])
+                tmp += numpy.dot(numpy.asarray(dt[p0:p1], dtype=dtype).conj(),
+                                 numpy.asarray(dti[p0:p1], dtype=dtype))
             self._H[self._head,i+1] = tmp
             self._H[i+1,self._head] = tmp.conjugate()
         dt = None
@@ -230,7 +289,12 @@ class DIIS(object):
             self._xprev = xnew = numpy.zeros_like(x.ravel())
 
         for i, ci in enumerate(c[1:]):
-            xi = self.get_vec(i)
+            if i == self._head-1 and not self._buffer:
+                # The last vector is still in memory.  Avoid waiting for it
+                # being written to disk.
+                xi = x.ravel()
+            else:
+                xi = self.get_vec(i)
             for p0,p1 in prange(0, x.size, BLOCK_SIZE):
                 xnew[p0:p1] += xi[p0:p1] * ci
         return xnew.reshape(x.shape)
@@ -239,3 +303,28 @@ def prange(start, end, step):
     for i in range(start, end, step):
         yield i, min(i+step, end)
 
+def _write_h5(h5file, key, value):
+    if key in h5file:
+        h5file[key][:] = value
+    else:
+        h5file[key] = value
+# to avoid "Unable to find a valid file signature" error when reopen from crash
+    h5file.flush()
+
+def _write_h5_diff(h5file, key, x, xprev):
+    if key not in h5file:
+        h5file.create_dataset(key, (x.size,), x.dtype)
+    for p0,p1 in prange(0, x.size, BLOCK_SIZE):
+        h5file[key][p0:p1] = x[p0:p1] - xprev[p0:p1]
+    h5file.flush()
+
+class _DiffVec(object):
+    '''Lazy x - xprev, evaluated block by block'''
+    def __init__(self, x, xprev):
+        self.x = x
+        self.xprev = xprev
+        self.size = x.size
+        self.dtype = numpy.result_type(x.dtype, xprev.dtype)
+    def __getitem__(self, s):
+        return self.x[s] - self.xprev[s]
+
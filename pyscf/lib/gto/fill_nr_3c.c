@@ -196,3 +196,43 @@ void GTOnr3c_drv(int (*intor)(), void (*fill)(), double *eri, int comp,
         free(buf);
 }
 }
+
+/*
+ * Same to GTOnr3c_drv, but the shell pairs (ish,jsh) with shlpair_mask == 0
+ * are skipped.  The corresponding elements of eri are not touched.
+ * shlpair_mask[nish,njsh] in C-order, for the shells in shls_slice
+ */
+void GTOnr3c_screened_drv(int (*intor)(), void (*fill)(), double *eri, int comp,
+                          int *shls_slice, int *ao_loc, CINTOpt *cintopt,
+                          int *atm, int natm, int *bas, int nbas, double *env,
+                          char *shlpair_mask)
+{
+        const int ish0 = shls_slice[0];
+        const int ish1 = shls_slice[1];
+        const int jsh0 = shls_slice[2];
+        const int jsh1 = shls_slice[3];
+        const int nish = ish1 - ish0;
+        const int njsh = jsh1 - jsh0;
+        const int di = GTOmax_shell_dim(ao_loc, shls_slice, 3);
+        const int cache_size = GTOmax_cache_size(intor, shls_slice, 3,
+                                                 atm, natm, bas, nbas, env);
+
+#pragma omp parallel default(none) \
+        shared(intor, fill, eri, comp, shls_slice, ao_loc, cintopt, \
+               atm, natm, bas, nbas, env, shlpair_mask)
+{
+        int ish, jsh, ij;
+        double *buf = malloc(sizeof(double) * (di*di*di*comp + cache_size));
+#pragma omp for schedule(dynamic)
+        for (ij = 0; ij < nish*njsh; ij++) {
+                if (!shlpair_mask[ij]) {
+                        continue;
+                }
+                ish = ij / njsh;
+                jsh = ij % njsh;
+                (*fill)(intor, eri, buf, comp, ish, jsh, shls_slice, ao_loc,
+                        cintopt, atm, natm, bas, nbas, env);
+        }
+        free(buf);
+}
+}
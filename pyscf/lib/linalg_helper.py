@@ -213,7 +213,8 @@ def davidson(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
 
 def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
              lindep=1e-14, max_memory=2000, dot=numpy.dot, callback=None,
-             nroots=1, lessio=False, verbose=logger.WARN, follow_state=False):
+             nroots=1, lessio=False, verbose=logger.WARN, follow_state=False,
+             outcore=False, outcore_dtype=None):
     '''Davidson diagonalization method to solve  a c = e c.  Ref
     [1] E.R. Davidson, J. Comput. Phys. 17 (1), 87-94 (1975).
     [2] http://people.inf.ethz.ch/arbenz/ewp/Lnotes/chapter11.pdf
@@ -266,6 +267,15 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
             If the solution dramatically changes in two iterations, clean the
             subspace and restart the iteration with the old solution.  It can
             help to improve numerical stability.  Default is False.
+        outcore : bool
+            Whether to store the subspace vectors in memory-mapped files
+            regardless of max_memory.  Default is False.
+        outcore_dtype : numpy dtype
+            The data type to store the out-of-core subspace vectors, eg
+            numpy.float32 to halve the disk space and IO.  In this case a*x0
+            is evaluated by aop (as lessio=True) and the a*x of the subspace
+            are not stored.  The accuracy of the eigenvectors is limited by
+            the precision of outcore_dtype.  Default is None, the dtype of x0.
 
     Returns:
         conv : bool
@@ -301,7 +311,14 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
     max_space = max_space + nroots * 3
     # max_space*2 for holding ax and xs, nroots*2 for holding axt and xt
     _incore = max_memory*1e6/x0[0].nbytes > max_space*2+nroots*3
-    lessio = lessio and not _incore
+    if outcore or outcore_dtype is not None:
+        _incore = False
+    # Rounding the subspace vectors to a lower precision, ax of the subspace
+    # are not stored.  heff is computed with the rounded xs and a*x0 is
+    # computed by aop.
+    _lowprec = (outcore_dtype is not None and
+                numpy.dtype(outcore_dtype).itemsize < x0[0].itemsize)
+    lessio = (lessio and not _incore) or _lowprec
     log.debug1('max_cycle %d  max_space %d  max_memory %d  incore %s',
                max_cycle, max_space, max_memory, _incore)
     heff = None
@@ -315,8 +332,8 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
                 xs = []
                 ax = []
             else:
-                xs = _Xlist()
-                ax = _Xlist()
+                xs = _Xlist(outcore_dtype, outcore)
+                ax = _Xlist(outcore_dtype, outcore)
             space = 0
 # Orthogonalize xt space because the basis of subspace xs must be orthogonal
 # but the eigenvectors x0 might not be strictly orthogonal
@@ -330,17 +347,21 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
             xt = _qr(xt, dot)
             xt = xt[:40]  # 40 trial vectors at most
 
+        if _lowprec:
+            xt = [numpy.asarray(xi.astype(outcore_dtype), dtype=xi.dtype)
+                  for xi in xt]
         axt = aop(xt)
         for k, xi in enumerate(xt):
             xs.append(xt[k])
-            ax.append(axt[k])
+            if not _lowprec:
+                ax.append(axt[k])
         rnow = len(xt)
         head, space = space, space+rnow
 
         if heff is None:  # Lazy initilize heff to determine the dtype
-            heff = numpy.empty((max_space+nroots,max_space+nroots), dtype=ax[0].dtype)
+            heff = numpy.empty((max_space+nroots,max_space+nroots), dtype=axt[0].dtype)
         else:
-            heff = numpy.asarray(heff, dtype=ax[0].dtype)
+            heff = numpy.asarray(heff, dtype=axt[0].dtype)
 
         elast = e
         for i in range(space):
@@ -348,10 +369,16 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
                 for k in range(i-head+1):
                     heff[head+k,i] = dot(xt[k].conj(), axt[i-head])
                     heff[i,head+k] = heff[head+k,i].conj()
+            elif _lowprec:
+                xsi = xs[i]
+                for k in range(rnow):
+                    heff[i,head+k] = dot(xsi.conj(), axt[k])
+                    heff[head+k,i] = heff[i,head+k].conj()
             else:
                 for k in range(rnow):
                     heff[head+k,i] = dot(xt[k].conj(), ax[i])
                     heff[i,head+k] = heff[head+k,i].conj()
+        axt = None
 
         w, v = scipy.linalg.eigh(heff[:space,:space])
         e, v = _sort_by_similarity(w, v, nroots, conv, vlast, emin)
@@ -1182,13 +1209,22 @@ def _sort_by_similarity(w, v, nroots, conv, vlast, emin=None, heff=None):
 
 
 class _Xlist(list):
-    def __init__(self):
-        self.scr_h5 = misc.H5TmpFile()
+    '''A list of vectors stored on disk.  The vectors are saved in a
+    temporary HDF5 file, or memory-mapped files if mmap is set.  If dtype is
+    given, the vectors are stored with dtype and converted back to the
+    original dtype when they are read.'''
+    def __init__(self, dtype=None, mmap=False):
+        if mmap:
+            self.scr_h5 = misc.MMapTmpFile()
+        else:
+            self.scr_h5 = misc.H5TmpFile()
+        self.dtype = dtype
         self.index = []
+        self._dtypes = {}
 
     def __getitem__(self, n):
         key = self.index[n]
-        return self.scr_h5[key].value
+        return numpy.array(self.scr_h5[key], dtype=self._dtypes[key])
 
     def append(self, x):
         key = str(len(self.index) + 1)
@@ -1198,7 +1234,12 @@ class _Xlist(list):
                     key = str(i)
                     break
         self.index.append(key)
-        self.scr_h5[key] = x
+        x = numpy.asarray(x)
+        self._dtypes[key] = x.dtype
+        if self.dtype is None:
+            self.scr_h5[key] = x
+        else:
+            self.scr_h5[key] = x.astype(self.dtype)
         self.scr_h5.flush()
 
     def __setitem__(self, n, x):
@@ -1212,6 +1253,7 @@ class _Xlist(list):
     def pop(self, index):
         key = self.index.pop(index)
         del(self.scr_h5[key])
+        del(self._dtypes[key])
 
 
 if __name__ == '__main__':
@@ -14,6 +14,8 @@
 #include "fci.h"
 // for (16e,16o) ~ 11 MB buffer = 120 * 12870 * 8
 #define STRB_BLKSIZE    112
+// Number of tiles per thread for the dynamic scheduler
+#define TILES_PER_THREAD        8
 
 /*
  * CPU timing of single thread can be estimated:
@@ -306,6 +308,40 @@ static void ctr_rhf2e_kern(double *eri, double *ci0, double *ci1,
                        norb, ncol_ci1buf, nlinka, clink_indexa);
 }
 
+/*
+ * Partition the alpha strings [start:end) into (at most ntile) tiles of
+ * similar cost.  cost[k] is the cost of the k-th alpha string.  If cost is
+ * NULL, all strings have the same cost and the tiles have the same size.
+ * Tile it covers strings [tiles[it]:tiles[it+1]).  Returns the number of
+ * tiles.
+ */
+static int balance_tiles(int *tiles, size_t *cost, int start, int end,
+                         int ntile)
+{
+        int k, n;
+        size_t total = 0;
+        size_t acc = 0;
+        if (cost == NULL) {
+                total = end - start;
+        } else {
+                for (k = start; k < end; k++) {
+                        total += cost[k];
+                }
+        }
+        ntile = MAX(1, MIN(ntile, end-start));
+        tiles[0] = start;
+        n = 1;
+        for (k = start; k < end && n < ntile; k++) {
+                acc += (cost == NULL) ? 1 : cost[k];
+                if (acc * ntile >= total * n) {
+                        tiles[n] = k + 1;
+                        n++;
+                }
+        }
+        tiles[n] = end;
+        return n;
+}
+
 void FCIaxpy2d(double *out, double *in, size_t count, size_t no, size_t ni)
 {
         int i, j;
@@ -333,10 +369,15 @@ void FCIcontract_2e_spin0(double *eri, double *ci0, double *ci1,
 
         memset(ci1, 0, sizeof(double)*na*na);
         double *ci1bufs[MAX_THREADS];
+        int *tiles = malloc(sizeof(int) * (na+1));
+        size_t *cost = malloc(sizeof(size_t) * na);
+        int ntile = 0;
 #pragma omp parallel default(none) \
-                shared(eri, ci0, ci1, norb, na, nlink, clink, ci1bufs)
+                shared(eri, ci0, ci1, norb, na, nlink, clink, ci1bufs, \
+                       tiles, cost, ntile)
 {
-        int strk, ib;
+        const size_t nnorb = norb * (norb+1)/2;
+        int strk, ib, it;
         size_t blen;
         double *t1buf = malloc(sizeof(double) * STRB_BLKSIZE*norb*(norb+1));
         double *ci1buf = malloc(sizeof(double) * na*STRB_BLKSIZE);
@@ -344,15 +385,28 @@ void FCIcontract_2e_spin0(double *eri, double *ci0, double *ci1,
         for (ib = 0; ib < na; ib += STRB_BLKSIZE) {
                 blen = MIN(STRB_BLKSIZE, na-ib);
                 memset(ci1buf, 0, sizeof(double) * na*blen);
-#pragma omp for schedule(static, 112)
-/* strk starts from MAX(strk0, ib), because [0:ib,0:ib] have been evaluated */
+/* The lower triangular part of the beta block is computed for the first few
+ * alpha strings.  The tiles are balanced by the number of beta strings (the
+ * number of links is the same for all strings). */
+#pragma omp single
+{
                 for (strk = ib; strk < na; strk++) {
+                        cost[strk] = MIN(STRB_BLKSIZE, strk+1-ib) *
+                                (nlink * 2 + nnorb);
+                }
+                ntile = balance_tiles(tiles, cost, ib, na,
+                                      omp_get_num_threads()*TILES_PER_THREAD);
+}
+#pragma omp for schedule(dynamic)
+/* strk starts from MAX(strk0, ib), because [0:ib,0:ib] have been evaluated */
+                for (it = 0; it < ntile; it++) {
+                for (strk = tiles[it]; strk < tiles[it+1]; strk++) {
                         ctr_rhf2e_kern(eri, ci0, ci1, ci1buf, t1buf,
                                        MIN(STRB_BLKSIZE, strk-ib), blen,
                                        MIN(STRB_BLKSIZE, strk+1-ib),
                                        strk, ib, norb, na, na, nlink, nlink,
                                        clink, clink);
-                }
+                } }
                 NPomp_dsum_reduce_inplace(ci1bufs, blen*na);
 #pragma omp master
                 FCIaxpy2d(ci1+ib, ci1buf, na, na, blen);
@@ -360,6 +414,8 @@ void FCIcontract_2e_spin0(double *eri, double *ci0, double *ci1,
         free(ci1buf);
         free(t1buf);
 }
+        free(tiles);
+        free(cost);
         free(clink);
 }
 
@@ -375,25 +431,33 @@ void FCIcontract_2e_spin1(double *eri, double *ci0, double *ci1,
 
         memset(ci1, 0, sizeof(double)*na*nb);
         double *ci1bufs[MAX_THREADS];
+        int *tiles = malloc(sizeof(int) * (na+1));
+        int ntile = 0;
 #pragma omp parallel default(none) \
         shared(eri, ci0, ci1, norb, na, nb, nlinka, nlinkb, \
-               clinka, clinkb, ci1bufs)
+               clinka, clinkb, ci1bufs, tiles, ntile)
 {
-        int strk, ib;
+        int strk, ib, it;
         size_t blen;
         double *t1buf = malloc(sizeof(double) * STRB_BLKSIZE*norb*(norb+1));
         double *ci1buf = malloc(sizeof(double) * na*STRB_BLKSIZE);
         ci1bufs[omp_get_thread_num()] = ci1buf;
+/* Every alpha string has the same number of links and the same cost.  The
+ * tiles have the same size and are distributed by the dynamic scheduler. */
+#pragma omp single
+        ntile = balance_tiles(tiles, NULL, 0, na,
+                              omp_get_num_threads()*TILES_PER_THREAD);
         for (ib = 0; ib < nb; ib += STRB_BLKSIZE) {
                 blen = MIN(STRB_BLKSIZE, nb-ib);
                 memset(ci1buf, 0, sizeof(double) * na*blen);
-#pragma omp for schedule(static)
-                for (strk = 0; strk < na; strk++) {
+#pragma omp for schedule(dynamic)
+                for (it = 0; it < ntile; it++) {
+                for (strk = tiles[it]; strk < tiles[it+1]; strk++) {
                         ctr_rhf2e_kern(eri, ci0, ci1, ci1buf, t1buf,
                                        blen, blen, blen, strk, ib,
                                        norb, na, nb, nlinka, nlinkb,
                                        clinka, clinkb);
-                }
+                } }
                 NPomp_dsum_reduce_inplace(ci1bufs, blen*na);
 #pragma omp master
                 FCIaxpy2d(ci1+ib, ci1buf, na, nb, blen);
@@ -401,6 +465,7 @@ void FCIcontract_2e_spin1(double *eri, double *ci0, double *ci1,
         free(ci1buf);
         free(t1buf);
 }
+        free(tiles);
         free(clinka);
         free(clinkb);
 }
@@ -458,25 +523,31 @@ void FCIcontract_uhf2e(double *eri_aa, double *eri_ab, double *eri_bb,
 
         memset(ci1, 0, sizeof(double)*na*nb);
         double *ci1bufs[MAX_THREADS];
+        int *tiles = malloc(sizeof(int) * (na+1));
+        int ntile = 0;
 #pragma omp parallel default(none) \
         shared(eri_aa, eri_ab, eri_bb, ci0, ci1, norb, na, nb, nlinka, nlinkb,\
-               clinka, clinkb, ci1bufs)
+               clinka, clinkb, ci1bufs, tiles, ntile)
 {
-        int strk, ib;
+        int strk, ib, it;
         size_t blen;
         double *t1buf = malloc(sizeof(double) * STRB_BLKSIZE*norb*(norb+1)*2);
         double *ci1buf = malloc(sizeof(double) * na*STRB_BLKSIZE);
         ci1bufs[omp_get_thread_num()] = ci1buf;
+#pragma omp single
+        ntile = balance_tiles(tiles, NULL, 0, na,
+                              omp_get_num_threads()*TILES_PER_THREAD);
         for (ib = 0; ib < nb; ib += STRB_BLKSIZE) {
                 blen = MIN(STRB_BLKSIZE, nb-ib);
                 memset(ci1buf, 0, sizeof(double) * na*blen);
-#pragma omp for schedule(static)
-                for (strk = 0; strk < na; strk++) {
+#pragma omp for schedule(dynamic)
+                for (it = 0; it < ntile; it++) {
+                for (strk = tiles[it]; strk < tiles[it+1]; strk++) {
                         ctr_uhf2e_kern(eri_aa, eri_ab, eri_bb, ci0, ci1,
                                        ci1buf, t1buf, blen, strk, ib,
                                        norb, na, nb, nlinka, nlinkb,
                                        clinka, clinkb);
-                }
+                } }
                 NPomp_dsum_reduce_inplace(ci1bufs, blen*na);
 #pragma omp master
                 FCIaxpy2d(ci1+ib, ci1buf, na, nb, blen);
@@ -484,6 +555,7 @@ void FCIcontract_uhf2e(double *eri_aa, double *eri_ab, double *eri_bb,
         free(t1buf);
         free(ci1buf);
 }
+        free(tiles);
         free(clinka);
         free(clinkb);
 }
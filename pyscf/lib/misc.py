@@ -18,6 +18,7 @@ import ctypes
 import numpy
 import h5py
 from pyscf.lib import param
+from pyscf.lib.mmapfile import MMapFile, MMapGroup, MMapTmpFile
 
 c_double_p = ctypes.POINTER(ctypes.c_double)
 c_int_p = ctypes.POINTER(ctypes.c_int)
@@ -41,6 +42,8 @@ def load_library(libname):
         _loaderpath = os.path.dirname(__file__)
         return numpy.ctypeslib.load_library(libname, _loaderpath)
 
+_np_helper = load_library('libnp_helper')
+
 #Fixme, the standard resouce module gives wrong number when objects are released
 #see http://fa.bianp.net/blog/2013/different-ways-to-get-memory-consumption-or-lessons-learned-from-memory_profiler/#fn:1
 #or use slow functions as memory_profiler._get_memory did
@@ -417,11 +420,20 @@ class ThreadWithReturnValue(Thread):
                  kwargs=None):
         self._q = Queue()
         def qwrap(*args, **kwargs):
-            self._q.put(target(*args, **kwargs))
+            # The exception raised in the thread is queued and re-raised in
+            # join.  Otherwise join would wait for the return value forever.
+            try:
+                self._q.put((True, target(*args, **kwargs)))
+            except BaseException as e:
+                self._q.put((False, e))
         Thread.__init__(self, group, qwrap, name, args, kwargs)
     def join(self):
         Thread.join(self)
-        return self._q.get()
+        success, result = self._q.get()
+        if success:
+            return result
+        else:
+            raise result
     get = join
 
 def background_thread(func, *args, **kwargs):
@@ -449,6 +461,16 @@ class H5TmpFile(h5py.File):
     def __del__(self):
         self.close()
 
+def TmpFile(filename=None, mode='a'):
+    '''A temporary file for intermediates.  It is an HDF5 file (H5TmpFile) or
+    a directory of memory-mapped datasets (MMapTmpFile), depending on
+    lib.param.STORAGE_BACKEND.
+    '''
+    if param.STORAGE_BACKEND == 'mmap':
+        return MMapTmpFile(filename, mode)
+    else:
+        return H5TmpFile(filename, mode)
+
 def finger(a):
     return numpy.dot(numpy.cos(numpy.arange(a.size)), a.ravel())
 
@@ -515,6 +537,97 @@ class call_in_background(object):
             self.handler.join()
 
 
+class with_omp_threads(object):
+    '''Set the number of OpenMP threads for the C kernels called by the
+    current thread.  The setting is restored on exit.  It only affects the
+    thread which enters the context.
+
+    Usage:
+        with with_omp_threads(1):
+            fn()  # OpenMP kernels in fn run on 1 thread
+    '''
+    def __init__(self, nthreads=None):
+        self.nthreads = nthreads
+        self.sys_threads = None
+
+    def __enter__(self):
+        if self.nthreads is not None and self.nthreads >= 1:
+            self.sys_threads = _np_helper.NPomp_get_max_threads()
+            _np_helper.NPomp_set_num_threads(ctypes.c_int(self.nthreads))
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if self.sys_threads is not None:
+            _np_helper.NPomp_set_num_threads(ctypes.c_int(self.sys_threads))
+
+
+def prefetch_generator(gen, depth=1):
+    '''Run the generator on a background thread.  Up to depth items are
+    produced ahead of the item being used by the caller.
+
+    If the generator reuses the output buffers, it needs (depth+2) buffers
+    (depth items in the queue, one in use by the caller and one being
+    generated) to avoid overwriting the item in use.
+
+    The OpenMP kernels called by the generator run on one thread, so that
+    the background thread and the caller together use one thread more than
+    the configured number of OpenMP threads.
+
+    Usage:
+        def gen():
+            for i, buf in enumerate(bufs*100):
+                fill(i, buf)
+                yield buf
+        for buf in prefetch_generator(gen(), depth=len(bufs)-2):
+            use(buf)
+    '''
+    if depth < 1 or imp.lock_held():
+# See the comments of call_in_background
+        for x in gen:
+            yield x
+        return
+
+    try:
+        from queue import Queue
+    except ImportError:
+        from Queue import Queue
+    q = Queue(maxsize=depth)
+    stop = []
+    end = object()
+    def produce():
+        try:
+            with with_omp_threads(1):
+                for x in gen:
+                    q.put((True, x))
+                    if stop:
+                        break
+        except Exception as e:
+            q.put((False, e))
+        else:
+            q.put((True, end))
+
+    producer = Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            ok, x = q.get()
+            if not ok:
+                raise x
+            elif x is end:
+                break
+            yield x
+    finally:
+        stop.append(True)
+        # unblock the producer
+        while producer.is_alive():
+            try:
+                q.get(timeout=.01)
+            except Exception:
+                pass
+        producer.join()
+
+
 if __name__ == '__main__':
     for i,j in prange_tril(0, 90, 300):
         print(i, j, j*(j+1)//2-i*(i+1)//2)
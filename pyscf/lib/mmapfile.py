@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+'''
+Memory-mapped storage
+*********************
+
+A storage of intermediates based on memory-mapped files, as an alternative
+to HDF5 for the out-of-core algorithms.  An MMapFile is a directory in which
+each dataset is a raw binary file in numpy .npy format, i.e. a small header
+(dtype and shape) followed by the data.  The datasets are memory-mapped.
+Slicing a dataset returns a numpy view of the mapped memory without copying
+the data, and the pages are loaded by the OS on demand.
+
+The API follows h5py.File (create_dataset, create_group, __getitem__,
+__setitem__, __delitem__, keys, attrs, read_direct, close) as far as the
+out-of-core code of pyscf needs.  The temporary files of lib.TmpFile are
+created in this format if lib.param.STORAGE_BACKEND is 'mmap' (or with
+environment PYSCF_STORAGE_BACKEND=mmap).  HDF5 remains the default format.
+
+>>> f = MMapFile('tmp.mmap', 'w')
+>>> dset = f.create_dataset('a/b', (4,5), 'f8')
+>>> dset[1:3] = 1
+>>> f['a/b'][1:3].sum()
+10.0
+'''
+
+import os
+import json
+import shutil
+import tempfile
+import numpy
+from numpy.lib import format as npformat
+from pyscf.lib import param
+
+SUFFIX = '.npy'
+ATTRS_SUFFIX = '.attrs.json'
+# The file which tags a directory as MMapFile
+MAGIC = '.pyscf_mmap'
+
+class Dataset(numpy.memmap):
+    '''A memory-mapped array with the h5py Dataset methods attrs and
+    read_direct'''
+    def read_direct(self, dest, source_sel=None, dest_sel=None):
+        if source_sel is None:
+            source_sel = Ellipsis
+        if dest_sel is None:
+            dest_sel = Ellipsis
+        dest[dest_sel] = self[source_sel]
+
+    @property
+    def attrs(self):
+        path = getattr(self, '_attrs_path', None)
+        if path is None:
+            raise AttributeError('attrs')
+        return Attributes(path)
+
+class Attributes(dict):
+    '''Attributes of a dataset or a group, saved in a JSON file'''
+    def __init__(self, path):
+        dict.__init__(self)
+        self.path = path
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                dict.update(self, json.load(f))
+
+    def __setitem__(self, key, val):
+        dict.__setitem__(self, key, numpy.asarray(val).tolist())
+        self._flush()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._flush()
+
+    def _flush(self):
+        with open(self.path, 'w') as f:
+            json.dump(dict(self), f)
+
+
+class MMapGroup(object):
+    def __init__(self, fileobj, path, name='/'):
+        self.file = fileobj
+        self.path = path
+        self.name = name
+
+    @property
+    def filename(self):
+        return self.file.path
+
+    @property
+    def attrs(self):
+        return Attributes(os.path.join(self.path, ATTRS_SUFFIX))
+
+    def _locate(self, key):
+        return os.path.join(self.path, *key.strip('/').split('/'))
+
+    def __contains__(self, key):
+        path = self._locate(key)
+        return os.path.isdir(path) or os.path.isfile(path+SUFFIX)
+
+    def __getitem__(self, key):
+        path = self._locate(key)
+        name = '/'.join((self.name.rstrip('/'), key.strip('/')))
+        if os.path.isdir(path):
+            return MMapGroup(self.file, path, name)
+        elif os.path.isfile(path+SUFFIX):
+            return _open_dataset(path, self.file.mode)
+        else:
+            raise KeyError(key)
+
+    def __setitem__(self, key, val):
+        self.create_dataset(key, data=val)
+
+    def __delitem__(self, key):
+        path = self._locate(key)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.isfile(path+SUFFIX):
+            os.remove(path+SUFFIX)
+            if os.path.isfile(path+ATTRS_SUFFIX):
+                os.remove(path+ATTRS_SUFFIX)
+        else:
+            raise KeyError(key)
+
+    def keys(self):
+        keys = []
+        for key in sorted(os.listdir(self.path)):
+            if key.endswith(SUFFIX):
+                keys.append(key[:-len(SUFFIX)])
+            elif os.path.isdir(os.path.join(self.path, key)):
+                keys.append(key)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def create_group(self, key):
+        if key in self:
+            raise ValueError('Unable to create group (name already exists)')
+        return self.require_group(key)
+
+    def require_group(self, key):
+        path = self._locate(key)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        return self[key]
+
+    def create_dataset(self, key, shape=None, dtype=None, data=None, **kwargs):
+        '''Create a dataset.  The HDF5 options (chunks, compression, ...) in
+        kwargs are ignored.'''
+        if key in self:
+            raise ValueError('Unable to create dataset (name already exists)')
+        if data is not None:
+            data = numpy.asarray(data, dtype=dtype)
+            shape = data.shape
+            dtype = data.dtype
+        if dtype is None:
+            dtype = numpy.double
+        shape = tuple(shape)
+        path = self._locate(key)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        if numpy.prod(shape) == 0:
+            # mmap does not support empty files
+            with open(path+SUFFIX, 'wb') as f:
+                npformat.write_array(f, numpy.empty(shape, dtype=dtype))
+            return _open_dataset(path, self.file.mode)
+        dset = npformat.open_memmap(path+SUFFIX, mode='w+', dtype=dtype,
+                                    shape=shape)
+        if data is not None:
+            dset[:] = data
+        dset.flush()
+        dset = dset.view(Dataset)
+        dset._attrs_path = path + ATTRS_SUFFIX
+        return dset
+
+def _open_dataset(path, mode):
+    if mode != 'r':
+        mode = 'r+'
+    with open(path+SUFFIX, 'rb') as f:
+        version = npformat.read_magic(f)
+        if version == (1, 0):
+            shape = npformat.read_array_header_1_0(f)[0]
+        else:
+            shape = npformat.read_array_header_2_0(f)[0]
+    if numpy.prod(shape) == 0:
+        dset = numpy.load(path+SUFFIX).view(Dataset)
+    else:
+        dset = npformat.open_memmap(path+SUFFIX, mode=mode).view(Dataset)
+    dset._attrs_path = path + ATTRS_SUFFIX
+    return dset
+
+
+class MMapFile(MMapGroup):
+    '''A directory of memory-mapped datasets, with an API similar to
+    h5py.File
+
+    Args:
+        filename : str
+            Name of the directory
+        mode : str
+            'r' read only; 'r+' read/write, the file must exist;
+            'w' create the file, truncate if exists; 'a' (default)
+            read/write if exists, create otherwise.
+    '''
+    def __init__(self, filename, mode='a'):
+        if mode == 'w' and os.path.exists(filename):
+            shutil.rmtree(filename)
+        if mode in ('r', 'r+'):
+            if not is_mmapfile(filename):
+                raise IOError('%s is not an MMapFile' % filename)
+        elif not os.path.isdir(filename):
+            os.makedirs(filename)
+            with open(os.path.join(filename, MAGIC), 'w') as f:
+                f.write('pyscf memory-mapped storage\n')
+        self.mode = mode
+        MMapGroup.__init__(self, self, filename)
+
+    def close(self):
+        '''The mapped memory is released when the arrays are deleted'''
+        pass
+
+    def flush(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+class MMapTmpFile(MMapFile):
+    '''A temporary MMapFile which is removed when the object is deleted'''
+    def __init__(self, filename=None, mode='a', dir=None):
+        if filename is None:
+            if dir is None:
+                dir = param.TMPDIR
+            filename = tempfile.mkdtemp(dir=dir)
+            os.rmdir(filename)
+        MMapFile.__init__(self, filename, mode)
+
+    def __del__(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def is_mmapfile(filename):
+    return (isinstance(filename, str) and
+            os.path.isfile(os.path.join(filename, MAGIC)))
@@ -6,6 +6,26 @@
 #include <complex.h>
 #include "config.h"
 
+/*
+ * The OpenMP settings of the calling thread.  A Python thread which is not
+ * created by OpenMP holds its own copy of the number of threads.
+ */
+int NPomp_get_max_threads()
+{
+#ifdef _OPENMP
+        return omp_get_max_threads();
+#else
+        return 1;
+#endif
+}
+
+void NPomp_set_num_threads(int n)
+{
+#ifdef _OPENMP
+        omp_set_num_threads(n);
+#endif
+}
+
 void NPomp_dsum_reduce_inplace(double **vec, size_t count)
 {
         unsigned int nthreads = omp_get_num_threads();
@@ -7,6 +7,9 @@ L_MAX      = 8
 MAX_MEMORY = int(os.environ.get('PYSCF_MAX_MEMORY', 4000)) # MB
 TMPDIR = os.environ.get('TMPDIR', '.')
 TMPDIR = os.environ.get('PYSCF_TMPDIR', TMPDIR)
+# Format of the temporary files created by lib.TmpFile: 'hdf5' or 'mmap'
+# (memory-mapped files, see lib.mmapfile)
+STORAGE_BACKEND = os.environ.get('PYSCF_STORAGE_BACKEND', 'hdf5')
 
 LIGHT_SPEED = 137.03599967994  #http://physics.nist.gov/cgi-bin/cuu/Value?alph
 #LIGHT_SPEED = 137.0359895
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+
+'''
+Profiler for timed regions
+**************************
+
+The profiler records nested timed regions with the number of calls, the CPU
+and the wall time, and optionally the FLOP and byte counts.  It is disabled
+by default and the regions cost (almost) nothing then.
+
+>>> from pyscf import lib
+>>> lib.profiler.enable()
+>>> mf = scf.RHF(mol).run()
+>>> print(lib.profiler.report())
+>>> lib.profiler.dump_json('prof.json')
+>>> lib.profiler.dump_chrome_trace('trace.json')  # for chrome://tracing
+
+Regions are defined with the context manager :func:`region` or the
+decorator :func:`timed`
+
+>>> with lib.profiler.region('get_jk', flops=2*nao**4):
+...     vj, vk = mf.get_jk(mol, dm)
+
+The functions of the C libraries can be wrapped with :func:`instrument`
+so that each call is recorded as a region
+
+>>> libcvhf = lib.load_library('libcvhf')
+>>> lib.profiler.instrument(libcvhf, 'CVHFnr_direct_drv')
+'''
+
+import os
+import time
+import json
+import threading
+import functools
+
+if hasattr(time, 'process_time'):
+    _cpu_time = time.process_time
+else:
+    _cpu_time = time.clock
+
+# Enable the profiler by default with environment PYSCF_PROFILE=1
+ENABLED = os.environ.get('PYSCF_PROFILE', '0') not in ('', '0')
+# Whether to keep every call of the regions as an event for the Chrome trace
+TRACE = True
+# Max number of events to keep for the Chrome trace
+MAX_EVENTS = 1000000
+
+class Region(object):
+    '''Statistics of a timed region'''
+    __slots__ = ('name', 'count', 'cpu', 'wall', 'flops', 'nbytes',
+                 'children')
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.cpu = 0
+        self.wall = 0
+        self.flops = 0
+        self.nbytes = 0
+        self.children = {}
+
+    def child(self, name):
+        if name not in self.children:
+            self.children[name] = Region(name)
+        return self.children[name]
+
+    def to_dict(self):
+        return {'name'    : self.name,
+                'count'   : self.count,
+                'cpu'     : self.cpu,
+                'wall'    : self.wall,
+                'flops'   : self.flops,
+                'nbytes'  : self.nbytes,
+                'children': [c.to_dict() for c in self.children.values()]}
+
+_lock = threading.Lock()
+_roots = {}    # thread id -> root Region
+_events = []
+_local = threading.local()
+_t0 = time.time()
+# Incremented by reset() to invalidate the stacks of the open regions
+_generation = 0
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None or _local.generation != _generation:
+        tid = threading.current_thread().ident
+        with _lock:
+            if tid not in _roots:
+                _roots[tid] = Region(threading.current_thread().name)
+            root = _roots[tid]
+        stack = _local.stack = [root]
+        _local.generation = _generation
+    return stack
+
+def enable(trace=None):
+    '''Start to record the timed regions'''
+    global ENABLED, TRACE
+    ENABLED = True
+    if trace is not None:
+        TRACE = trace
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def is_enabled():
+    return ENABLED
+
+def reset():
+    '''Discard all records.  The regions which are open when reset is called
+    are closed silently and not recorded.'''
+    global _t0, _generation
+    with _lock:
+        _roots.clear()
+        del _events[:]
+        _t0 = time.time()
+        _generation += 1
+    _local.stack = None
+
+
+class _NullRegion(object):
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, traceback):
+        pass
+    def add(self, flops=0, nbytes=0):
+        pass
+_null_region = _NullRegion()
+
+class _TimedRegion(object):
+    def __init__(self, name, flops, nbytes):
+        self.name = name
+        self.flops = flops
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        stack = _stack()
+        self.generation = _generation
+        self.region = stack[-1].child(self.name)
+        stack.append(self.region)
+        self.cpu0 = _cpu_time()
+        self.wall0 = time.time()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        wall1 = time.time()
+        if self.generation != _generation:
+            # The records were discarded by reset() while the region was open
+            return
+        region = self.region
+        region.count += 1
+        region.cpu += _cpu_time() - self.cpu0
+        region.wall += wall1 - self.wall0
+        region.flops += self.flops
+        region.nbytes += self.nbytes
+        stack = _stack()
+        stack.pop()
+        if TRACE and len(_events) < MAX_EVENTS:
+            event = {'name': self.name, 'ph': 'X', 'pid': 0,
+                     'tid': threading.current_thread().ident,
+                     'ts': (self.wall0 - _t0) * 1e6,
+                     'dur': (wall1 - self.wall0) * 1e6}
+            if self.flops or self.nbytes:
+                event['args'] = {'flops': self.flops, 'nbytes': self.nbytes}
+            with _lock:
+                _events.append(event)
+
+    def add(self, flops=0, nbytes=0):
+        '''Add FLOP and byte counts to the region'''
+        self.flops += flops
+        self.nbytes += nbytes
+
+def region(name, flops=0, nbytes=0):
+    '''Context manager to time a region.  The region is nested in the
+    region which is currently open in the same thread.
+
+    Kwargs:
+        flops : int
+            Number of floating point operations of the region.
+        nbytes : int
+            Number of bytes read or written by the region.
+    '''
+    if ENABLED:
+        return _TimedRegion(name, flops, nbytes)
+    else:
+        return _null_region
+
+def add_counts(flops=0, nbytes=0):
+    '''Add FLOP and byte counts to the region currently open'''
+    if ENABLED:
+        stack = _stack()
+        stack[-1].flops += flops
+        stack[-1].nbytes += nbytes
+
+def timed(name=None):
+    '''Decorator to time a function as a region'''
+    def decorator(fn):
+        label = name or fn.__name__
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _TimedRegion(label, 0, 0):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _InstrumentedFunction(object):
+    def __init__(self, libname, fname, fn, flops=None, nbytes=None):
+        self.name = '%s.%s' % (libname, fname)
+        self.fn = fn
+        self.flops = flops
+        self.nbytes = nbytes
+
+    def __call__(self, *args):
+        if not ENABLED:
+            return self.fn(*args)
+        flops = nbytes = 0
+        if self.flops is not None:
+            flops = self.flops(*args)
+        if self.nbytes is not None:
+            nbytes = self.nbytes(*args)
+        with _TimedRegion(self.name, flops, nbytes):
+            return self.fn(*args)
+
+    def __getattr__(self, key):
+        # restype, argtypes, ... of the ctypes function
+        return getattr(self.fn, key)
+
+def instrument(library, names, flops=None, nbytes=None):
+    '''Record the calls of the C functions in the library (the object
+    returned by lib.load_library) as timed regions.
+
+    Args:
+        library : ctypes.CDLL
+
+        names : str or list of str
+            Names of the C functions.
+
+    Kwargs:
+        flops : function(*args) => int
+            To estimate the FLOP count from the arguments of the C function.
+        nbytes : function(*args) => int
+            To estimate the bytes of memory or disk traffic of the C function.
+    '''
+    if isinstance(names, str):
+        names = [names]
+    libname = getattr(library, '_name', None) or 'lib'
+    libname = os.path.basename(libname).split('.')[0]
+    for name in names:
+        fn = getattr(library, name)
+        if isinstance(fn, _InstrumentedFunction):
+            fn = fn.fn
+        setattr(library, name,
+                _InstrumentedFunction(libname, name, fn, flops, nbytes))
+    return library
+
+def uninstrument(library, names):
+    if isinstance(names, str):
+        names = [names]
+    for name in names:
+        fn = getattr(library, name)
+        if isinstance(fn, _InstrumentedFunction):
+            setattr(library, name, fn.fn)
+    return library
+
+
+def to_dict():
+    '''The records of all threads in a dict'''
+    with _lock:
+        return {'threads': [r.to_dict() for r in _roots.values()]}
+
+def dump_json(filename):
+    '''Save the nested regions in a JSON file'''
+    with open(filename, 'w') as f:
+        json.dump(to_dict(), f, indent=1)
+
+def dump_chrome_trace(filename):
+    '''Save the events in Chrome trace format, which can be loaded by
+    chrome://tracing or https://ui.perfetto.dev'''
+    with _lock:
+        events = list(_events)
+    with open(filename, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+def report(min_wall=0):
+    '''A table of the regions, ordered by the nesting level'''
+    lines = ['%-48s %8s %12s %12s %12s %12s' %
+             ('region', 'calls', 'CPU (s)', 'wall (s)', 'GFLOP', 'MB')]
+    def walk(region, level):
+        for c in sorted(region.children.values(), key=lambda x: -x.wall):
+            if c.wall < min_wall:
+                continue
+            lines.append('%-48s %8d %12.3f %12.3f %12.3f %12.3f' %
+                         ('  '*level + c.name, c.count, c.cpu, c.wall,
+                          c.flops*1e-9, c.nbytes*1e-6))
+            walk(c, level+1)
+    with _lock:
+        roots = list(_roots.values())
+    for root in roots:
+        walk(root, 0)
+    return '\n'.join(lines)
@@ -38,6 +38,24 @@ class KnowValues(unittest.TestCase):
         dat = lib.chkfile.load(fchk.name, 'a')
         self.assertTrue('x' in dat)
         self.assertTrue('y' in dat)
+    def test_writer(self):
+        fchk = tempfile.NamedTemporaryFile()
+        a = numpy.random.random((6,6))
+        with lib.chkfile.ChkfileWriter(fchk.name, compression='gzip') as w:
+            for i in range(3):
+                a[0,0] = i
+                lib.chkfile.save(fchk.name, 'scf', {'e_tot': -1.*i, 'mo_coeff': a,
+                                                    'occ': [numpy.eye(2)]*2})
+                lib.chkfile.save(fchk.name, 'scf/kpts', numpy.zeros((2,3)))
+            dat = lib.chkfile.load(fchk.name, 'scf')
+            self.assertEqual(dat['e_tot'], -2.)
+            self.assertTrue(numpy.all(dat['mo_coeff'] == a))
+            self.assertTrue(isinstance(dat['occ'], list))
+            lib.chkfile.save(fchk.name, 'scf', {'e_tot': 1., 'mo_coeff': a[:2]})
+        self.assertTrue(lib.chkfile.get_writer(fchk.name) is None)
+        dat = lib.chkfile.load(fchk.name, 'scf')
+        self.assertEqual(sorted(dat.keys()), ['e_tot', 'mo_coeff'])
+        self.assertTrue(numpy.all(dat['mo_coeff'] == a[:2]))
 
 if __name__ == "__main__":
     print("Full Tests for lib.chkfile")
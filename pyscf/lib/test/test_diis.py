@@ -0,0 +1,58 @@
+import unittest
+import numpy
+from pyscf import lib
+
+numpy.random.seed(2)
+n = 300
+a = numpy.random.random((n,n))
+a = a + a.T + numpy.eye(n) * n
+b = numpy.random.random(n)
+
+def jacobi_diis(adiis, ondisk=False):
+    incore_size = lib.diis.INCORE_SIZE
+    if ondisk:
+        lib.diis.INCORE_SIZE = 10
+    try:
+        x = numpy.zeros(n)
+        for i in range(12):
+            x = x + (b - a.dot(x)) / a.diagonal() * .9
+            x = adiis.update(x)
+    finally:
+        lib.diis.INCORE_SIZE = incore_size
+    return x
+
+class KnowValues(unittest.TestCase):
+    def test_ondisk(self):
+        x0 = jacobi_diis(lib.diis.DIIS())
+        x1 = jacobi_diis(lib.diis.DIIS(), ondisk=True)
+        self.assertAlmostEqual(abs(x0-x1).max(), 0, 12)
+
+    def test_compressed_err_vec(self):
+        x0 = jacobi_diis(lib.diis.DIIS())
+        adiis = lib.diis.DIIS()
+        adiis.err_vec_dtype = numpy.float32
+        adiis.async_io = True
+        x1 = jacobi_diis(adiis, ondisk=True)
+        self.assertEqual(len(adiis._err_cache), adiis.space)
+        self.assertAlmostEqual(abs(x0-x1).max(), 0, 7)
+
+        adiis = lib.diis.DIIS()
+        adiis.err_vec_dtype = numpy.float32
+        adiis.max_memory = n * 4 * 2 / 1e6
+        x1 = jacobi_diis(adiis, ondisk=True)
+        self.assertEqual(len(adiis._err_cache), 2)
+        self.assertAlmostEqual(abs(x0-x1).max(), 0, 7)
+
+    def test_async_write_failure(self):
+        adiis = lib.diis.DIIS()
+        adiis.async_io = True
+        feri = lib.H5TmpFile()
+        feri.close()
+        adiis._write(lib.diis._write_h5, feri, 'x1', numpy.zeros(n))
+        self.assertRaises(Exception, adiis._wait_for_writer)
+        self.assertTrue(adiis._writer is None)
+
+
+if __name__ == "__main__":
+    print("Full Tests for lib.diis")
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy
+from pyscf import lib
+from pyscf.lib import mmapfile
+
+class KnowValues(unittest.TestCase):
+    def test_dataset(self):
+        f = mmapfile.MMapTmpFile()
+        a = numpy.random.random((6,5))
+        f['a'] = a
+        dset = f.create_dataset('g/b', (4,5), 'f8')
+        dset[1:3] = 1
+        self.assertTrue(isinstance(f['g'], mmapfile.MMapGroup))
+        self.assertEqual(f['g/b'][1:3].sum(), 10)
+        self.assertTrue(numpy.allclose(f['a'][2:4], a[2:4]))
+        self.assertEqual(sorted(f.keys()), ['a', 'g'])
+
+        out = numpy.zeros((3,5))
+        f['a'].read_direct(out, numpy.s_[1:3], numpy.s_[:2])
+        self.assertTrue(numpy.allclose(out[:2], a[1:3]))
+
+        f['a'].attrs['x'] = 1.5
+        self.assertEqual(f['a'].attrs['x'], 1.5)
+        f.create_dataset('e', (0,5))
+        self.assertEqual(f['e'].shape, (0,5))
+
+        del(f['g'])
+        self.assertFalse('g/b' in f)
+        self.assertTrue(mmapfile.is_mmapfile(f.filename))
+        f1 = mmapfile.MMapFile(f.filename, 'r')
+        self.assertTrue(numpy.allclose(f1['a'], a))
+
+    def test_tmpfile(self):
+        backend = lib.param.STORAGE_BACKEND
+        lib.param.STORAGE_BACKEND = 'mmap'
+        self.assertTrue(isinstance(lib.TmpFile(), mmapfile.MMapFile))
+        lib.param.STORAGE_BACKEND = 'hdf5'
+        self.assertTrue(isinstance(lib.TmpFile(), lib.H5TmpFile))
+        lib.param.STORAGE_BACKEND = backend
+
+if __name__ == "__main__":
+    print("Full Tests for lib.mmapfile")
+    unittest.main()
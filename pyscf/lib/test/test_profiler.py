@@ -0,0 +1,82 @@
+import unittest
+import json
+import ctypes
+import tempfile
+import numpy
+from pyscf import lib
+from pyscf.lib import profiler
+
+class KnowValues(unittest.TestCase):
+    def setUp(self):
+        profiler.reset()
+        profiler.enable()
+
+    def tearDown(self):
+        profiler.disable()
+        profiler.reset()
+
+    def test_nested_regions(self):
+        @profiler.timed('f')
+        def f(x):
+            with profiler.region('dot', flops=2*x.size):
+                return x.dot(x)
+        x = numpy.ones(100)
+        for i in range(3):
+            with profiler.region('outer', nbytes=x.nbytes):
+                f(x)
+                profiler.add_counts(flops=10)
+        root = profiler.to_dict()['threads'][0]
+        outer = root['children'][0]
+        self.assertEqual(outer['name'], 'outer')
+        self.assertEqual(outer['count'], 3)
+        self.assertEqual(outer['flops'], 30)
+        self.assertEqual(outer['nbytes'], 2400)
+        dot = outer['children'][0]['children'][0]
+        self.assertEqual(dot['name'], 'dot')
+        self.assertEqual(dot['count'], 3)
+        self.assertEqual(dot['flops'], 600)
+        self.assertTrue('dot' in profiler.report())
+
+        ftmp = tempfile.NamedTemporaryFile()
+        profiler.dump_chrome_trace(ftmp.name)
+        with open(ftmp.name) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(len(events), 9)
+        profiler.dump_json(ftmp.name)
+        with open(ftmp.name) as f:
+            self.assertEqual(json.load(f)['threads'][0]['children'][0]['count'], 3)
+
+    def test_disabled(self):
+        profiler.disable()
+        with profiler.region('a'):
+            pass
+        self.assertEqual(profiler.to_dict()['threads'], [])
+
+    def test_reset_in_region(self):
+        with profiler.region('outer'):
+            with profiler.region('inner'):
+                profiler.reset()
+            with profiler.region('after'):
+                pass
+        root = profiler.to_dict()['threads'][0]
+        self.assertEqual([c['name'] for c in root['children']], ['after'])
+        with profiler.region('next'):
+            pass
+        root = profiler.to_dict()['threads'][0]
+        self.assertEqual(sorted(root['children'][i]['name'] for i in range(2)),
+                         ['after', 'next'])
+
+    def test_instrument(self):
+        libc = ctypes.CDLL(None)
+        profiler.instrument(libc, 'abs', flops=lambda x: 1)
+        try:
+            self.assertEqual(libc.abs(-3), 3)
+            root = profiler.to_dict()['threads'][0]
+            self.assertEqual(root['children'][0]['flops'], 1)
+        finally:
+            profiler.uninstrument(libc, 'abs')
+        self.assertFalse(isinstance(libc.abs, profiler._InstrumentedFunction))
+
+if __name__ == "__main__":
+    print("Full Tests for lib.profiler")
+    unittest.main()
@@ -101,6 +101,56 @@ int CVHFnrs8_prescreen(int *shls, CVHFOpt *opt,
             || (  opt->dm_cond[i*n+l] > dmin));
 }
 
+/*
+ * Screen the integrals against the density matrix elements which are
+ * contracted in J only: (ij|kl) D_lk and (ij|kl) D_ji
+ */
+int CVHFnrs8_vj_prescreen(int *shls, CVHFOpt *opt,
+                          int *atm, int *bas, double *env)
+{
+        if (!opt) {
+                return 1; // no screen
+        }
+        int i = shls[0];
+        int j = shls[1];
+        int k = shls[2];
+        int l = shls[3];
+        int n = opt->nbas;
+        assert(opt->q_cond);
+        assert(opt->dm_cond);
+        double qijkl = opt->q_cond[i*n+j] * opt->q_cond[k*n+l];
+        double dmin = opt->direct_scf_cutoff / qijkl;
+        return qijkl > opt->direct_scf_cutoff
+            &&((4*opt->dm_cond[j*n+i] > dmin)
+            || (4*opt->dm_cond[l*n+k] > dmin));
+}
+
+/*
+ * Screen the integrals against the density matrix elements which are
+ * contracted in K only: (ij|kl) D_jk, D_jl, D_ik, D_il
+ */
+int CVHFnrs8_vk_prescreen(int *shls, CVHFOpt *opt,
+                          int *atm, int *bas, double *env)
+{
+        if (!opt) {
+                return 1; // no screen
+        }
+        int i = shls[0];
+        int j = shls[1];
+        int k = shls[2];
+        int l = shls[3];
+        int n = opt->nbas;
+        assert(opt->q_cond);
+        assert(opt->dm_cond);
+        double qijkl = opt->q_cond[i*n+j] * opt->q_cond[k*n+l];
+        double dmin = opt->direct_scf_cutoff / qijkl;
+        return qijkl > opt->direct_scf_cutoff
+            &&((opt->dm_cond[j*n+k] > dmin)
+            || (opt->dm_cond[j*n+l] > dmin)
+            || (opt->dm_cond[i*n+k] > dmin)
+            || (opt->dm_cond[i*n+l] > dmin));
+}
+
 // return flag to decide whether transpose01324
 int CVHFr_vknoscreen(int *shls, CVHFOpt *opt,
                      double **dms_cond, int n_dm, double *dm_atleast,
@@ -124,20 +174,19 @@ double CVHFget_direct_scf_cutoff(CVHFOpt *opt)
 }
 
 
-void CVHFsetnr_direct_scf(CVHFOpt *opt, int *atm, int natm,
-                          int *bas, int nbas, double *env)
+/*
+ * Schwarz bound sqrt(max|(ij|ij)|) of shell pair (i,j).  If shls_mask is
+ * given, only the pairs which involve at least one masked shell are
+ * computed.  The rest of q_cond is not touched.
+ */
+static void set_nr_qcond(double *q_cond, char *shls_mask,
+                         int *atm, int natm, int *bas, int nbas, double *env)
 {
-        /* This memory is released in void CVHFdel_optimizer, Don't know
-         * why valgrind raises memory leak here */
-        if (opt->q_cond) {
-                free(opt->q_cond);
-        }
-        opt->q_cond = (double *)malloc(sizeof(double) * nbas*nbas);
         int shls_slice[] = {0, nbas};
         const int cache_size = GTOmax_cache_size(&int2e_sph, shls_slice, 1,
                                                  atm, natm, bas, nbas, env);
 #pragma omp parallel default(none) \
-        shared(opt, atm, natm, bas, nbas, env)
+        shared(q_cond, shls_mask, atm, natm, bas, nbas, env)
 {
         double qtmp, tmp;
         int ij, i, j, di, dj, ish, jsh;
@@ -153,6 +202,9 @@ void CVHFsetnr_direct_scf(CVHFOpt *opt, int *atm, int natm,
         for (ij = 0; ij < nbas*(nbas+1)/2; ij++) {
                 ish = (int)(sqrt(2*ij+.25) - .5 + 1e-7);
                 jsh = ij - ish*(ish+1)/2;
+                if (shls_mask != NULL && !shls_mask[ish] && !shls_mask[jsh]) {
+                        continue;
+                }
                 di = CINTcgto_spheric(ish, bas);
                 dj = CINTcgto_spheric(jsh, bas);
                 shls[0] = ish;
@@ -168,14 +220,50 @@ void CVHFsetnr_direct_scf(CVHFOpt *opt, int *atm, int natm,
                         } }
                         qtmp = sqrt(qtmp);
                 }
-                opt->q_cond[ish*nbas+jsh] = qtmp;
-                opt->q_cond[jsh*nbas+ish] = qtmp;
+                q_cond[ish*nbas+jsh] = qtmp;
+                q_cond[jsh*nbas+ish] = qtmp;
         }
         free(buf);
         free(cache);
 }
 }
 
+void CVHFsetnr_direct_scf(CVHFOpt *opt, int *atm, int natm,
+                          int *bas, int nbas, double *env)
+{
+        /* This memory is released in void CVHFdel_optimizer, Don't know
+         * why valgrind raises memory leak here */
+        if (opt->q_cond) {
+                free(opt->q_cond);
+        }
+        opt->q_cond = (double *)malloc(sizeof(double) * nbas*nbas);
+        set_nr_qcond(opt->q_cond, NULL, atm, natm, bas, nbas, env);
+}
+
+/*
+ * Recompute opt->q_cond only for the shell pairs which involve the shells
+ * flagged in shls_mask, e.g. the shells on the atoms moved in a geometry
+ * scan.  opt->q_cond must hold the values of the previous geometry.
+ */
+void CVHFupdatenr_direct_scf(CVHFOpt *opt, char *shls_mask,
+                             int *atm, int natm, int *bas, int nbas, double *env)
+{
+        assert(opt->q_cond);
+        set_nr_qcond(opt->q_cond, shls_mask, atm, natm, bas, nbas, env);
+}
+
+/*
+ * Assign the (cached) screening table to opt->q_cond
+ */
+void CVHFset_q_cond(CVHFOpt *opt, double *q_cond, int len)
+{
+        if (opt->q_cond) {
+                free(opt->q_cond);
+        }
+        opt->q_cond = (double *)malloc(sizeof(double) * len);
+        memcpy(opt->q_cond, q_cond, sizeof(double) * len);
+}
+
 void CVHFsetnr_direct_scf_dm(CVHFOpt *opt, double *dm, int nset, int *ao_loc,
                              int *atm, int natm, int *bas, int nbas, double *env)
 {
@@ -29,6 +29,10 @@ int CVHFnr_schwarz_cond(int *shls, CVHFOpt *opt,
                         int *atm, int *bas, double *env);
 int CVHFnrs8_prescreen(int *shls, CVHFOpt *opt,
                        int *atm, int *bas, double *env);
+int CVHFnrs8_vj_prescreen(int *shls, CVHFOpt *opt,
+                          int *atm, int *bas, double *env);
+int CVHFnrs8_vk_prescreen(int *shls, CVHFOpt *opt,
+                          int *atm, int *bas, double *env);
 
 int CVHFr_vknoscreen(int *shls, CVHFOpt *opt,
                      double **dms_cond, int n_dm, double *dm_atleast,
@@ -36,6 +40,9 @@ int CVHFr_vknoscreen(int *shls, CVHFOpt *opt,
 
 void CVHFsetnr_direct_scf(CVHFOpt *opt, int *atm, int natm,
                           int *bas, int nbas, double *env);
+void CVHFupdatenr_direct_scf(CVHFOpt *opt, char *shls_mask,
+                             int *atm, int natm, int *bas, int nbas, double *env);
+void CVHFset_q_cond(CVHFOpt *opt, double *q_cond, int len);
 void CVHFsetnr_direct_scf_dm(CVHFOpt *opt, double *dm, int nset, int *ao_loc,
                              int *atm, int natm, int *bas, int nbas, double *env);
 
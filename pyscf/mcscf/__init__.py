@@ -286,6 +286,7 @@ try:
         return df.density_fit(mc, auxbasis)
 
     approx_hessian = df.approx_hessian
+    mixed_hessian = df.mixed_hessian
 
     def density_fit(mc, auxbasis=None, with_df=None):
         return mc.density_fit(auxbasis, with_df)
@@ -698,6 +698,10 @@ class CASCI(lib.StreamObject):
         from pyscf.mcscf import df
         return df.approx_hessian(self, auxbasis, with_df)
 
+    def mixed_hessian(self, auxbasis=None, with_df=None):
+        from pyscf.mcscf import df
+        return df.mixed_hessian(self, auxbasis, with_df)
+
 
 if __name__ == '__main__':
     from pyscf import gto
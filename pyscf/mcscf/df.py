@@ -217,6 +217,142 @@ def approx_hessian(casscf, auxbasis=None, with_df=None):
     return CASSCF()
 
 
+def mixed_hessian(casscf, auxbasis=None, with_df=None):
+    '''Optimize the orbitals with density fitting integrals while keeping
+    the exact CASSCF solution.
+
+    The (pp|aa), (pa|pa) integrals of orbital hessian, micro iterations and
+    CI response are generated with density fitting.  The core potential,
+    the active space integrals (aa|aa) and the orbital gradients are
+    computed with exact integrals.  The converged energy and orbitals are
+    the same to the normal CASSCF.  When the norm of orbital gradients is
+    smaller than the attribute .switch_exact_tol (or conv_tol_grad), the
+    rest iterations are carried out with exact integrals.
+
+    Args:
+        casscf : an CASSCF object
+
+    Kwargs:
+        auxbasis : str or basis dict
+            Same format to the input attribute mol.basis.
+
+    Returns:
+        A CASSCF object which approximates orbital hessian with density
+        fitting integrals
+
+    Examples:
+
+    >>> mol = gto.M(atom='H 0 0 0; F 0 0 1', basis='ccpvdz', verbose=0)
+    >>> mf = scf.RHF(mol)
+    >>> mf.scf()
+    >>> mc = mcscf.mixed_hessian(mcscf.CASSCF(mf, 4, 4))
+    -100.06458716530391
+    '''
+    casscf_class = casscf.__class__
+
+    if 'CASCI' in str(casscf_class):
+        return casscf  # because CASCI does not need orbital optimization
+
+    if hasattr(casscf, 'with_df') and casscf.with_df:
+        return casscf
+
+    if with_df is None:
+        if (hasattr(casscf._scf, 'with_df') and
+            (auxbasis is None or auxbasis == casscf._scf.with_df.auxbasis)):
+            with_df = casscf._scf.with_df
+        else:
+            with_df = df.DF(casscf.mol)
+            with_df.max_memory = casscf.max_memory
+            with_df.stdout = casscf.stdout
+            with_df.verbose = casscf.verbose
+            if auxbasis is not None:
+                with_df.auxbasis = auxbasis
+
+    class CASSCF(casscf_class):
+        def __init__(self):
+            self.__dict__.update(casscf.__dict__)
+            self.with_df = with_df
+            self.switch_exact_tol = 1e-3
+            self._exact = False
+            self._exact_next = False
+            self._keys = self._keys.union(['with_df', 'switch_exact_tol'])
+
+        def dump_flags(self):
+            casscf_class.dump_flags(self)
+            logger.info(self, 'CASSCF: density fitting for orbital hessian, '
+                        'exact integrals for orbital gradients and energy')
+            logger.info(self, 'switch_exact_tol = %g', self.switch_exact_tol)
+
+        def kernel(self, *args, **kwargs):
+            self._exact = self._exact_next = False
+            return casscf_class.kernel(self, *args, **kwargs)
+
+        def ao2mo(self, mo_coeff):
+            self._exact = self._exact_next
+            if self._exact:
+                return casscf_class.ao2mo(self, mo_coeff)
+
+            eris = _ERIS(self, mo_coeff, self.with_df)
+# The exact core potential and (pa|aa) for orbital gradients.  The (aa|aa)
+# block of ppaa is replaced by the exact integrals for CASCI energy.
+            ncore = self.ncore
+            nocc = ncore + self.ncas
+            mo_core = mo_coeff[:,:ncore]
+            dm_core = numpy.dot(mo_core, mo_core.T)
+            vj, vk = casscf_class.get_jk(self, self.mol, dm_core)
+            eris.vhf_c = reduce(numpy.dot, (mo_coeff.T, vj*2-vk, mo_coeff))
+            eris.paaa = self._exact_paaa(mo_coeff, 1)
+            eris.ppaa[ncore:nocc,ncore:nocc] = eris.paaa[ncore:nocc]
+            return eris
+
+        def gen_g_hop(self, mo, u, casdm1, casdm2, eris):
+            g_orb, gorb_update, h_op, h_diag = \
+                    casscf_class.gen_g_hop(self, mo, u, casdm1, casdm2, eris)
+            if not hasattr(eris, 'paaa'):
+                return g_orb, gorb_update, h_op, h_diag
+
+            g_exact = self._exact_gorb(mo, casdm1, casdm2, eris)
+            norm_gorb = numpy.linalg.norm(g_exact)
+            conv_tol_grad = self.conv_tol_grad
+            if conv_tol_grad is None:
+                conv_tol_grad = numpy.sqrt(self.conv_tol)
+            if norm_gorb < max(self.switch_exact_tol, conv_tol_grad):
+                logger.info(self, '|g|=%5.3g. Switch to exact integrals', norm_gorb)
+                self._exact_next = True
+
+# Shift the DF gradients of micro iterations so that they are consistent
+# with the exact gradients at the current orbitals
+            dg = g_exact - g_orb
+            def gorb_update_mixed(u, fcivec):
+                return gorb_update(u, fcivec) + dg
+            return g_exact, gorb_update_mixed, h_op, h_diag
+
+        def _exact_gorb(self, mo, casdm1, casdm2, eris):
+            ncore = self.ncore
+            ncas = self.ncas
+            nocc = ncore + ncas
+            mo_cas = mo[:,ncore:nocc]
+            dm_cas = reduce(numpy.dot, (mo_cas, casdm1, mo_cas.T))
+            vj, vk = casscf_class.get_jk(self, self.mol, dm_cas)
+            vhf_a = reduce(numpy.dot, (mo.T, vj-vk*.5, mo))
+            h1e_mo = reduce(numpy.dot, (mo.T, self.get_hcore(), mo))
+            g = numpy.zeros_like(h1e_mo)
+            g[:,:ncore] = (h1e_mo[:,:ncore] + eris.vhf_c[:,:ncore] + vhf_a[:,:ncore]) * 2
+            g[:,ncore:nocc] = numpy.dot(h1e_mo[:,ncore:nocc]+eris.vhf_c[:,ncore:nocc], casdm1)
+            g[:,ncore:nocc] += numpy.einsum('puvw,vwux->px', eris.paaa, casdm2)
+            return self.pack_uniq_var(g-g.T)
+
+# DF JK matrix for the orbital hessian (self.update_jk_in_ah) and the
+# gradients of micro iterations
+        def get_jk(self, mol, dm, hermi=1):
+            if self.with_df and not self._exact:
+                return self.with_df.get_jk(dm, hermi=hermi)
+            else:
+                return casscf_class.get_jk(self, mol, dm, hermi)
+
+    return CASSCF()
+
+
 class _ERIS(object):
     def __init__(self, casscf, mo, with_df):
         import gc
@@ -302,6 +302,7 @@ def rotate_orb_cc(casscf, mo, fcivec, fcasdm1, fcasdm2, eris, x0_guess=None,
     yield u, g_kf, ihop+jkcount, dxi
 
 
+@lib.profiler.timed('casscf')
 def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None,
            ci0=None, callback=None, verbose=logger.NOTE, dump_chk=True):
     '''CASSCF solver
@@ -314,9 +315,10 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None,
 
     mo = mo_coeff
     nmo = mo_coeff.shape[1]
-    #TODO: lazy evaluate eris, to leave enough memory for FCI solver
-    eris = casscf.ao2mo(mo)
-    e_tot, e_ci, fcivec = casscf.casci(mo, ci0, eris, log, locals())
+    with lib.profiler.region('ao2mo'):
+        eris = casscf.ao2mo(mo)
+    with lib.profiler.region('casci'):
+        e_tot, e_ci, fcivec = casscf.casci(mo, ci0, eris, log, locals())
     if casscf.ncas == nmo and not casscf.internal_rotation:
         if casscf.canonicalization:
             log.debug('CASSCF canonicalization')
@@ -360,7 +362,8 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None,
                           imicro, norm_t, norm_gorb)
                 break
 
-            casdm1, casdm2, gci, fcivec = casscf.update_casdm(mo, u, fcivec, e_ci, eris, locals())
+            with lib.profiler.region('update_casdm'):
+                casdm1, casdm2, gci, fcivec = casscf.update_casdm(mo, u, fcivec, e_ci, eris, locals())
             norm_ddm = numpy.linalg.norm(casdm1 - casdm1_last)
             norm_ddm_micro = numpy.linalg.norm(casdm1 - casdm1_prev)
             casdm1_prev = casdm1
@@ -389,15 +392,23 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None,
         totmicro += imicro
         totinner += njk
 
-        eris = None
+        if isinstance(eris, mc_ao2mo._LazyERIS):
+            eris.release()
+        else:
+            eris = None
         # keep u, g_orb in locals() so that they can be accessed by callback
         u = u.copy()
         g_orb = g_orb.copy()
         mo = casscf.rotate_mo(mo, u, log)
-        eris = casscf.ao2mo(mo)
+        with lib.profiler.region('ao2mo'):
+            if isinstance(eris, mc_ao2mo._LazyERIS):
+                eris = eris.update(mo)
+            else:
+                eris = casscf.ao2mo(mo)
         t2m = log.timer('update eri', *t3m)
 
-        e_tot, e_ci, fcivec = casscf.casci(mo, fcivec, eris, log, locals())
+        with lib.profiler.region('casci'):
+            e_tot, e_ci, fcivec = casscf.casci(mo, fcivec, eris, log, locals())
         casdm1, casdm2 = casscf.fcisolver.make_rdm12(fcivec, casscf.ncas, casscf.nelecas)
         norm_ddm = numpy.linalg.norm(casdm1 - casdm1_last)
         casdm1_prev = casdm1_last = casdm1
@@ -502,6 +513,13 @@ class CASSCF(casci.CASCI):
             Default is the checkpoint file of mean field object.
         ci_response_space : int
             subspace size to solve the CI vector response.  Default is 3.
+        lazy_eris : bool
+            Whether to evaluate the MO integrals on demand.  The (pp|aa) and
+            (pa|pa) integrals are not generated before the CASCI solver, and
+            they are released (at most once in each macro iteration) when the
+            CI response solver needs the memory.
+            The core potential is reused if the core orbitals are not changed
+            by the orbital rotation.  Default is False.
         callback : function(envs_dict) => None
             callback function takes one dict as the argument which is
             generated by the builtin function :func:`locals`, so that the
@@ -578,6 +596,7 @@ class CASSCF(casci.CASCI):
         self.chk_ci = False
         self.kf_interval = 4
         self.kf_trust_region = 3.0
+        self.lazy_eris = False
 
         self.fcisolver.max_cycle = 50
 
@@ -621,6 +640,7 @@ class CASSCF(casci.CASCI):
         log.info('ci_response_space = %d', self.ci_response_space)
         log.info('ci_grad_trust_region = %d', self.ci_grad_trust_region)
         log.info('with_dep4 %d', self.with_dep4)
+        log.info('lazy_eris = %s', self.lazy_eris)
         log.info('natorb = %s', self.natorb)
         log.info('canonicalization = %s', self.canonicalization)
         log.info('chkfile = %s', self.chkfile)
@@ -777,6 +797,8 @@ class CASSCF(casci.CASCI):
 #        eris.papa = numpy.asarray(eri[:,ncore:nocc,:,ncore:nocc], order='C')
 #        return eris
 
+        if self.lazy_eris:
+            return mc_ao2mo._LazyERIS(self, mo, method='incore', level=2)
         return mc_ao2mo._ERIS(self, mo, method='incore', level=2)
 
     # Don't remove the two functions.  They are used in df/approx_hessian code
@@ -904,7 +926,20 @@ class CASSCF(casci.CASCI):
         if self.ci_response_space > 7:
             logger.debug(self, 'CI step by full response')
             # full response
-            max_memory = max(400, self.max_memory-lib.current_memory()[0])
+            mem_now = self.max_memory - lib.current_memory()[0]
+            # Davidson subspace vectors and sigma vectors
+            mem_fci = ci0.size*8e-6 * (getattr(self.fcisolver, 'max_space', 12)*2+4)
+            eris = envs.get('eris')
+            # The released integrals are regenerated by the next gen_g_hop.
+            # Release them only once in each macro iteration (eris is
+            # renewed in every macro iteration) to avoid regenerating them
+            # in every micro iteration.
+            if (isinstance(eris, mc_ao2mo._LazyERIS) and not eris.released
+                and mem_now < mem_fci):
+                logger.debug(self, 'Release (pp|aa), (pa|pa) for FCI solver')
+                eris.release()
+                mem_now = self.max_memory - lib.current_memory()[0]
+            max_memory = max(400, mem_now)
             e, ci1 = self.fcisolver.kernel(h1, h2, ncas, nelecas, ci0=ci0,
                                            tol=tol, max_memory=max_memory)
         else:
@@ -1047,7 +1082,10 @@ def _fake_h_for_fast_casci(casscf, mo, eris):
 
     ncore = casscf.ncore
     nocc = ncore + casscf.ncas
-    eri_cas = eris.ppaa[ncore:nocc,ncore:nocc,:,:].copy()
+    if isinstance(eris, mc_ao2mo._LazyERIS):
+        eri_cas = eris.get_aaaa()
+    else:
+        eri_cas = eris.ppaa[ncore:nocc,ncore:nocc,:,:].copy()
     mc.get_h2eff = lambda *args: eri_cas
     return mc
 
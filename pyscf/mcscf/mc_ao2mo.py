@@ -25,6 +25,10 @@ from pyscf.ao2mo import outcore
 
 libmcscf = lib.load_library('libmcscf')
 
+# The core potential is reused if the core density matrix changes less
+# than this threshold
+CORE_DM_TOL = 1e-10
+
 def trans_e1_incore(eri_ao, mo, ncore, ncas):
     nmo = mo.shape[1]
     nocc = ncore + ncas
@@ -87,7 +91,11 @@ def trans_e1_outcore(mol, mo, ncore, ncas, erifile,
     k_pc = numpy.zeros((nmo,ncore))
 
     mem_words = int(max(2000,max_memory-papa_buf.nbytes/1e6)*1e6/8)
-    aobuflen = mem_words//(nao_pair+nocc*nmo) + 1
+# The AO integrals are generated on a background thread in a ring of
+# (PIPELINE_DEPTH+2) buffers, see ao2mo.outcore.half_e1
+    depth = outcore.PIPELINE_DEPTH
+    nfillbuf = depth + 2 if depth > 0 else 1
+    aobuflen = mem_words//(nfillbuf*nao_pair+nocc*nmo) + 1
     ao_loc = numpy.array(mol.ao_loc_nr(), dtype=numpy.int32)
     shranges = outcore.guess_shell_ranges(mol, True, aobuflen, None, ao_loc)
     intor = mol._add_suffix('int2e')
@@ -97,26 +105,30 @@ def trans_e1_outcore(mol, mo, ncore, ncas, erifile,
     paapp = 0
     maxbuflen = max([x[2] for x in shranges])
     log.debug('mem_words %.8g MB, maxbuflen = %d', mem_words*8/1e6, maxbuflen)
-    bufs1 = numpy.empty((maxbuflen, nao_pair))
+    bufs1 = [numpy.empty((maxbuflen, nao_pair)) for i in range(nfillbuf)]
     bufs2 = numpy.empty((maxbuflen, nmo*ncas))
     if level == 1:
         bufs3 = numpy.empty((maxbuflen, nao*ncore))
         log.debug('mem cache %.8g MB',
-                  (bufs1.nbytes+bufs2.nbytes+bufs3.nbytes)/1e6)
+                  (bufs1[0].nbytes*nfillbuf+bufs2.nbytes+bufs3.nbytes)/1e6)
     else:
-        log.debug('mem cache %.8g MB', (bufs1.nbytes+bufs2.nbytes)/1e6)
+        log.debug('mem cache %.8g MB', (bufs1[0].nbytes*nfillbuf+bufs2.nbytes)/1e6)
     ti0 = log.timer('Initializing trans_e1_outcore', *time0)
 
     # fmmm, ftrans, fdrv for level 1
     fmmm = libmcscf.AO2MOmmm_ket_nr_s2
     ftrans = libmcscf.AO2MOtranse1_nr_s4
     fdrv = libmcscf.AO2MOnr_e2_drv
-    for istep,sh_range in enumerate(shranges):
+    def gen_ao_blocks():
+        for istep,sh_range in enumerate(shranges):
+            buf = bufs1[istep%nfillbuf][:sh_range[2]]
+            _ao2mo.nr_e1fill(intor, sh_range,
+                             mol._atm, mol._bas, mol._env, 's4', 1, ao2mopt, buf)
+            yield buf
+    for istep, buf in enumerate(lib.prefetch_generator(gen_ao_blocks(), depth)):
+        sh_range = shranges[istep]
         log.debug('[%d/%d], AO [%d:%d], len(buf) = %d',
                   istep+1, nstep, *sh_range)
-        buf = bufs1[:sh_range[2]]
-        _ao2mo.nr_e1fill(intor, sh_range,
-                         mol._atm, mol._bas, mol._env, 's4', 1, ao2mopt, buf)
         if log.verbose >= logger.DEBUG1:
             ti1 = log.timer('AO integrals buffer', *ti0)
         bufpa = bufs2[:sh_range[2]]
@@ -261,7 +273,13 @@ class _ERIS(object):
         dm_core = numpy.dot(mo[:,:ncore], mo[:,:ncore].T)
         vj, vk = casscf._scf.get_jk(mol, dm_core)
         self.vhf_c = reduce(numpy.dot, (mo.T, vj*2-vk, mo))
+        self._trans_e1(casscf, mo, method, level)
 
+    def _trans_e1(self, casscf, mo, method, level):
+        mol = casscf.mol
+        nao, nmo = mo.shape
+        ncore = casscf.ncore
+        ncas = casscf.ncas
         mem_incore, mem_outcore, mem_basic = _mem_usage(ncore, ncas, nmo)
         mem_now = lib.current_memory()[0]
         eri = casscf._scf._eri
@@ -290,6 +308,80 @@ class _ERIS(object):
             self.ppaa = self.feri['ppaa']
             self.papa = self.feri['papa']
 
+class _LazyERIS(_ERIS):
+    '''The integrals of :class:`_ERIS`, evaluated on demand.
+
+    Nothing is computed in the initialization.  vhf_c is generated on its
+    first access.  j_pc, k_pc, ppaa and papa are generated together on the
+    first access of any of them, with the memory left at that moment.  The
+    (aa|aa) block required by the CASCI solver is computed by
+    :func:`get_aaaa` without the (pp|aa), (pa|pa) integrals, so that the
+    FCI solver can take the memory which would be held by ppaa and papa.
+
+    The large blocks can be dropped by :func:`release` when the memory is
+    needed by others.  They are regenerated on the next access.  The flag
+    released records whether they have been dropped, so that the callers can
+    avoid to regenerate them repeatedly.
+    :func:`update` returns the integrals of the rotated orbitals.  The core
+    potential (in AO representation) is reused if the rotation does not
+    change the core density matrix.
+    '''
+    _keys_pp = ('j_pc', 'k_pc', 'ppaa', 'papa')
+
+    def __init__(self, casscf, mo, method='incore', level=1, eris_last=None):
+        self.casscf = casscf
+        self.mo = mo
+        self.method = method
+        self.level = level
+        self.released = False
+        ncore = casscf.ncore
+        self.dm_core = numpy.dot(mo[:,:ncore], mo[:,:ncore].T)
+        self._vhf_ao = None
+        if (eris_last is not None and eris_last._vhf_ao is not None and
+            abs(self.dm_core - eris_last.dm_core).max() < CORE_DM_TOL):
+            self._vhf_ao = eris_last._vhf_ao
+
+    def __getattr__(self, key):
+        if key == 'vhf_c':
+            if self._vhf_ao is None:
+                vj, vk = self.casscf._scf.get_jk(self.casscf.mol, self.dm_core)
+                self._vhf_ao = vj*2-vk
+            self.vhf_c = reduce(numpy.dot, (self.mo.T, self._vhf_ao, self.mo))
+            return self.vhf_c
+        elif key in self._keys_pp:
+            log = logger.Logger(self.casscf.stdout, self.casscf.verbose)
+            log.debug('CASSCF: generate (pp|aa) and (pa|pa) integrals')
+            self._trans_e1(self.casscf, self.mo, self.method, self.level)
+            return self.__dict__[key]
+        raise AttributeError('%s object has no attribute %s' %
+                             (self.__class__, key))
+
+    def get_aaaa(self):
+        '''(aa|aa) integrals, taken from ppaa if it is available'''
+        ncore = self.casscf.ncore
+        ncas = self.casscf.ncas
+        nocc = ncore + ncas
+        if 'ppaa' in self.__dict__:
+            return numpy.asarray(self.ppaa[ncore:nocc,ncore:nocc])
+        eri_cas = self.casscf.get_h2cas(self.mo[:,ncore:nocc])
+        return ao2mo.restore(1, eri_cas, ncas)
+
+    def release(self):
+        '''Drop j_pc, k_pc, ppaa, papa.  They are regenerated on demand.'''
+        self.released = True
+        for key in self._keys_pp:
+            self.__dict__.pop(key, None)
+        if 'feri' in self.__dict__:
+            self.feri.close()
+            del(self.feri)
+            del(self._tmpfile)
+        return self
+
+    def update(self, mo):
+        '''The integrals of the rotated orbitals mo'''
+        self.release()
+        return _LazyERIS(self.casscf, mo, self.method, self.level, self)
+
 def _mem_usage(ncore, ncas, nmo):
     nvir = nmo - ncore
     outcore = basic = ncas**2*nmo**2*2 * 8/1e6
@@ -66,6 +66,90 @@ class KnowValues(unittest.TestCase):
         self.assertTrue(numpy.allclose(ppaa , eris0.ppaa ))
         self.assertTrue(numpy.allclose(papa , eris0.papa ))
 
+    def test_lazy_eris(self):
+        mol.atom = [
+            ['O', ( 0., 0.    , 0.   )],
+            ['H', ( 0., -0.757, 0.587)],
+            ['H', ( 0., 0.757 , 0.587)],]
+        mol.basis = '6-31g'
+        mol.charge = 0
+        mol.spin = 0
+        mol.build()
+
+        m = scf.RHF(mol)
+        ehf = m.scf()
+        mc = mcscf.CASSCF(m, 6, 4)
+        mc.verbose = 5
+        mo = m.mo_coeff
+        ncore = mc.ncore
+        nocc = ncore + mc.ncas
+
+        eris0 = mcscf.mc_ao2mo._ERIS(mc, mo, 'incore')
+        eris1 = mcscf.mc_ao2mo._LazyERIS(mc, mo, 'incore')
+        self.assertTrue('ppaa' not in eris1.__dict__)
+        aaaa = eris1.get_aaaa()
+        self.assertTrue('ppaa' not in eris1.__dict__)
+        self.assertTrue(numpy.allclose(aaaa, eris0.ppaa[ncore:nocc,ncore:nocc]))
+        self.assertTrue(numpy.allclose(eris0.vhf_c, eris1.vhf_c))
+        self.assertTrue(numpy.allclose(eris0.j_pc , eris1.j_pc ))
+        self.assertTrue(numpy.allclose(eris0.k_pc , eris1.k_pc ))
+        self.assertTrue(numpy.allclose(eris0.ppaa , eris1.ppaa ))
+        self.assertTrue(numpy.allclose(eris0.papa , eris1.papa ))
+        eris1.release()
+        self.assertTrue('ppaa' not in eris1.__dict__)
+        self.assertTrue(numpy.allclose(eris0.papa , eris1.papa ))
+
+        # rotation within the active and virtual space keeps the core potential
+        u = numpy.eye(mo.shape[1])
+        u[ncore:,ncore:] = numpy.linalg.qr(numpy.random.random(u[ncore:,ncore:].shape))[0]
+        mo1 = numpy.dot(mo, u)
+        eris2 = eris1.update(mo1)
+        self.assertTrue(eris2._vhf_ao is eris1._vhf_ao)
+        eris3 = mcscf.mc_ao2mo._ERIS(mc, mo1, 'incore')
+        self.assertTrue(numpy.allclose(eris3.vhf_c, eris2.vhf_c))
+        self.assertTrue(numpy.allclose(eris3.ppaa , eris2.ppaa ))
+
+        mc.lazy_eris = True
+        e1 = mc.kernel()[0]
+        mc.lazy_eris = False
+        e0 = mc.kernel()[0]
+        self.assertAlmostEqual(e1, e0, 9)
+
+    def test_lazy_eris_release(self):
+        mol.atom = [
+            ['O', ( 0., 0.    , 0.   )],
+            ['H', ( 0., -0.757, 0.587)],
+            ['H', ( 0., 0.757 , 0.587)],]
+        mol.basis = '6-31g'
+        mol.charge = 0
+        mol.spin = 0
+        mol.build()
+
+        m = scf.RHF(mol)
+        ehf = m.scf()
+        e0 = mcscf.CASSCF(m, 6, 4).kernel()[0]
+
+        mc = mcscf.CASSCF(m, 6, 4)
+        mc.lazy_eris = True
+        mc.ci_response_space = 8
+        # Not enough memory for the CI response solver, to release ppaa/papa
+        mc.max_memory = 1
+        trans_e1 = mcscf.mc_ao2mo._LazyERIS._trans_e1
+        ntrans = {}
+        def count_trans_e1(eris, *args):
+            ntrans[id(eris)] = ntrans.get(id(eris), 0) + 1
+            return trans_e1(eris, *args)
+        mcscf.mc_ao2mo._LazyERIS._trans_e1 = count_trans_e1
+        try:
+            e1 = mc.kernel()[0]
+        finally:
+            mcscf.mc_ao2mo._LazyERIS._trans_e1 = trans_e1
+        self.assertAlmostEqual(e1, e0, 9)
+        # generated once, and regenerated at most once after the release in
+        # each macro iteration
+        self.assertTrue(max(ntrans.values()) <= 2)
+        self.assertTrue(len(ntrans) <= mc.max_cycle_macro+1)
+
     def test_uhf(self):
         mol.atom = [
             ['O', ( 0., 0.    , 0.   )],
@@ -53,6 +53,14 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(numpy.linalg.norm(mc.analyze()),
                                2.7015375913946591, 4)
 
+    def test_mixed_hessian_4o4e(self):
+        mc = mcscf.mixed_hessian(mcscf.CASSCF(m, 4, 4), auxbasis='weigend')
+        emc = mc.mc1step()[0]
+        self.assertAlmostEqual(emc, -108.913786407955, 7)
+        self.assertTrue(mc._exact)
+        emc = mc.mc2step()[0]
+        self.assertAlmostEqual(emc, -108.913786407955, 7)
+
     def test_mc1step_4o4e_df(self):
         mc = mcscf.density_fit(mcscf.CASSCF(m, 4, 4), auxbasis='weigend')
         emc = mc.mc1step()[0]
@@ -271,7 +271,7 @@ class _ERIS:
               (mp._scf._eri is not None and
                mem_incore+mem_now < mp.max_memory)):
             log.debug('transform (ia|jb) incore')
-            self.ovov = ao2mo.incore.general(mp._scf._eri, (co,cv,co,cv))
+            self.ovov = ao2mo.cache.general(mp._scf._eri, (co,cv,co,cv))
 
         else:
             log.debug('transform (ia|jb) outcore')
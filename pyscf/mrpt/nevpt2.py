@@ -278,7 +278,7 @@ def Sr(mc,ci,dms, eris=None, verbose=None):
     if eris is None:
         h1e = mc.h1e_for_cas()[0]
         h2e = ao2mo.restore(1, mc.ao2mo(mo_cas), mc.ncas).transpose(0,2,1,3)
-        h2e_v = ao2mo.incore.general(mc._scf._eri,[mo_virt,mo_cas,mo_cas,mo_cas],compact=False)
+        h2e_v = ao2mo.cache.general(mc._scf._eri,[mo_virt,mo_cas,mo_cas,mo_cas],compact=False)
         h2e_v = h2e_v.reshape(mo_virt.shape[1],mc.ncas,mc.ncas,mc.ncas).transpose(0,2,1,3)
         core_dm = numpy.dot(mo_core,mo_core.T) *2
         core_vhf = mc.get_veff(mc.mol,core_dm)
@@ -321,7 +321,7 @@ def Si(mc, ci, dms, eris=None, verbose=None):
     if eris is None:
         h1e = mc.h1e_for_cas()[0]
         h2e = ao2mo.restore(1, mc.ao2mo(mo_cas), mc.ncas).transpose(0,2,1,3)
-        h2e_v = ao2mo.incore.general(mc._scf._eri,[mo_cas,mo_core,mo_cas,mo_cas],compact=False)
+        h2e_v = ao2mo.cache.general(mc._scf._eri,[mo_cas,mo_core,mo_cas,mo_cas],compact=False)
         h2e_v = h2e_v.reshape(mc.ncas,mc.ncore,mc.ncas,mc.ncas).transpose(0,2,1,3)
         core_dm = numpy.dot(mo_core,mo_core.T) *2
         core_vhf = mc.get_veff(mc.mol,core_dm)
@@ -394,7 +394,7 @@ def Sijr(mc, dms, eris, verbose=None):
     if eris is None:
         h1e = mc.h1e_for_cas()[0]
         h2e = ao2mo.restore(1, mc.ao2mo(mo_cas), mc.ncas).transpose(0,2,1,3)
-        h2e_v = ao2mo.incore.general(mc._scf._eri,[mo_virt,mo_core,mo_cas,mo_core],compact=False)
+        h2e_v = ao2mo.cache.general(mc._scf._eri,[mo_virt,mo_core,mo_cas,mo_core],compact=False)
         h2e_v = h2e_v.reshape(mo_virt.shape[1],mc.ncore,mc.ncas,mc.ncore).transpose(0,2,1,3)
     else:
         ncore = mc.ncore
@@ -425,7 +425,7 @@ def Srsi(mc, dms, eris, verbose=None):
     if eris is None:
         h1e = mc.h1e_for_cas()[0]
         h2e = ao2mo.restore(1, mc.ao2mo(mo_cas), mc.ncas).transpose(0,2,1,3)
-        h2e_v = ao2mo.incore.general(mc._scf._eri,[mo_virt,mo_core,mo_virt,mo_cas],compact=False)
+        h2e_v = ao2mo.cache.general(mc._scf._eri,[mo_virt,mo_core,mo_virt,mo_cas],compact=False)
         h2e_v = h2e_v.reshape(mo_virt.shape[1],mc.ncore,mo_virt.shape[1],mc.ncas).transpose(0,2,1,3)
     else:
         ncore = mc.ncore
@@ -453,7 +453,7 @@ def Srs(mc, dms, eris=None, verbose=None):
     if eris is None:
         h1e = mc.h1e_for_cas()[0]
         h2e = ao2mo.restore(1, mc.ao2mo(mo_cas), mc.ncas).transpose(0,2,1,3)
-        h2e_v = ao2mo.incore.general(mc._scf._eri,[mo_virt,mo_cas,mo_virt,mo_cas],compact=False)
+        h2e_v = ao2mo.cache.general(mc._scf._eri,[mo_virt,mo_cas,mo_virt,mo_cas],compact=False)
         h2e_v = h2e_v.reshape(mo_virt.shape[1],mc.ncas,mo_virt.shape[1],mc.ncas).transpose(0,2,1,3)
     else:
         ncore = mc.ncore
@@ -480,7 +480,7 @@ def Sij(mc, dms, eris, verbose=None):
     if eris is None:
         h1e = mc.h1e_for_cas()[0]
         h2e = ao2mo.restore(1, mc.ao2mo(mo_cas), mc.ncas).transpose(0,2,1,3)
-        h2e_v = ao2mo.incore.general(mc._scf._eri,[mo_cas,mo_core,mo_cas,mo_core],compact=False)
+        h2e_v = ao2mo.cache.general(mc._scf._eri,[mo_cas,mo_core,mo_cas,mo_core],compact=False)
         h2e_v = h2e_v.reshape(mc.ncas,mc.ncore,mc.ncas,mc.ncore).transpose(0,2,1,3)
     else:
         ncore = mc.ncore
@@ -519,9 +519,9 @@ def Sir(mc, dms, eris, verbose=None):
     if eris is None:
         h1e = mc.h1e_for_cas()[0]
         h2e = ao2mo.restore(1, mc.ao2mo(mo_cas), mc.ncas).transpose(0,2,1,3)
-        h2e_v1 = ao2mo.incore.general(mc._scf._eri,[mo_virt,mo_core,mo_cas,mo_cas],compact=False)
+        h2e_v1 = ao2mo.cache.general(mc._scf._eri,[mo_virt,mo_core,mo_cas,mo_cas],compact=False)
         h2e_v1 = h2e_v1.reshape(mo_virt.shape[1],mc.ncore,mc.ncas,mc.ncas).transpose(0,2,1,3)
-        h2e_v2 = ao2mo.incore.general(mc._scf._eri,[mo_virt,mo_cas,mo_cas,mo_core],compact=False)
+        h2e_v2 = ao2mo.cache.general(mc._scf._eri,[mo_virt,mo_cas,mo_cas,mo_core],compact=False)
         h2e_v2 = h2e_v2.reshape(mo_virt.shape[1],mc.ncas,mc.ncas,mc.ncore).transpose(0,2,1,3)
         core_dm = numpy.dot(mo_core,mo_core.T)*2
     else:
@@ -25,6 +25,7 @@ from pyscf import lib
 from pyscf import gto
 from pyscf.lib import logger
 from pyscf.df import addons
+from pyscf.df.df import check_precision, reset_precision, _single_precision
 from pyscf.df.outcore import _guess_shell_ranges
 from pyscf.pbc.gto.cell import _estimate_rcut
 from pyscf.pbc import tools
@@ -307,6 +308,11 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
         for k, ji in enumerate(adapted_ji_idx):
             v = feri['j3c/%d'%ji][:naux0]
             del(feri['j3c/%d'%ji])
+            if _single_precision(mydf):
+                v, v64 = v.astype(_SINGLE[v.dtype]), v
+                mydf.precision_error = max(mydf.precision_error,
+                                           abs(v - v64).max())
+                v64 = None
             feri['j3c/%d'%ji] = v
 
     for k, kpt in enumerate(uniq_kpts):
@@ -348,6 +354,12 @@ class DF(aft.AFTDF):
         self._cderi_to_save = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
 # If _cderi is specified, the 3C-integral tensor will be read from this file
         self._cderi = None
+# Store the DF tensor in single precision (see pyscf.df.DF)
+        self.single_precision = False
+        self.single_precision_fallback = 1e-4
+        self.precision_error = 0
+        self._dm_last = None
+        self._fallback_fp64 = False
         self._keys = set(self.__dict__.keys())
 
     def dump_flags(self, log=None):
@@ -372,6 +384,9 @@ class DF(aft.AFTDF):
         if self.kpts_band is not None:
             log.info('len(kpts_band) = %d', len(self.kpts_band))
             log.debug1('    kpts_band = %s', self.kpts_band)
+        if self.single_precision:
+            log.info('single_precision_fallback = %s',
+                     self.single_precision_fallback)
         return self
 
     def check_sanity(self):
@@ -419,8 +434,12 @@ class DF(aft.AFTDF):
                 cderi = self._cderi_to_save.name
             self._cderi = cderi
             t1 = (time.clock(), time.time())
+            self.precision_error = 0
             self._make_j3c(self.cell, self.auxcell, kptij_lst, cderi)
             t1 = logger.timer_debug1(self, 'j3c', *t1)
+            if _single_precision(self):
+                logger.info(self, 'DF tensor in single precision. '
+                            'Max rounding error %.3g', self.precision_error)
         return self
 
     _make_j3c = _make_j3c
@@ -490,7 +509,7 @@ class DF(aft.AFTDF):
         if unpack:
             buf = numpy.empty((blksize,nao*(nao+1)//2))
         def load(Lpq, b0, b1, bufR, bufI):
-            Lpq = numpy.asarray(Lpq[b0:b1])
+            Lpq = _upcast(numpy.asarray(Lpq[b0:b1]))
             if is_real:
                 if unpack:
                     LpqR = lib.unpack_tril(Lpq, out=bufR).reshape(-1,nao**2)
@@ -528,6 +547,8 @@ class DF(aft.AFTDF):
             else:
                 kpts = self.kpts
         kpts = numpy.asarray(kpts)
+        if _single_precision(self):
+            check_precision(self, dm)
 
         if kpts.shape == (3,):
             return df_jk.get_jk(self, dm, hermi, kpts, kpts_band, with_j,
@@ -601,6 +622,17 @@ def fuse_auxcell(mydf, auxcell, l_max=3):
     return fused_cell, fuse
 
 
+_SINGLE = {numpy.dtype(numpy.double): numpy.float32,
+           numpy.dtype(numpy.complex128): numpy.complex64}
+def _upcast(v):
+    '''Convert the single precision DF tensor to double precision'''
+    if v.dtype == numpy.float32:
+        return v.astype(numpy.double)
+    elif v.dtype == numpy.complex64:
+        return v.astype(numpy.complex128)
+    else:
+        return v
+
 class _load3c(object):
     def __init__(self, cderi, label, kpti_kptj):
         self.cderi = cderi
@@ -637,6 +669,6 @@ class _load_and_unpack(object):
         self.shape = self.dat.shape
     def __getitem__(self, s):
         nao = int(numpy.sqrt(self.shape[1]))
-        v = numpy.asarray(self.dat[s])
+        v = _upcast(numpy.asarray(self.dat[s]))
         v = lib.transpose(v.reshape(-1,nao,nao), axes=(0,2,1)).conj()
         return v.reshape(-1,nao**2)
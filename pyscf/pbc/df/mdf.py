@@ -196,6 +196,11 @@ def _make_j3c(mydf, cell, auxcell, kptij_lst, cderi_file):
         for k, ji in enumerate(adapted_ji_idx):
             v = feri['j3c/%d'%ji][:naux0]
             del(feri['j3c/%d'%ji])
+            if df._single_precision(mydf):
+                v, v64 = v.astype(df._SINGLE[v.dtype]), v
+                mydf.precision_error = max(mydf.precision_error,
+                                           abs(v - v64).max())
+                v64 = None
             feri['j3c/%d'%ji] = v
 
     for k, kpt in enumerate(uniq_kpts):
@@ -228,6 +233,13 @@ class MDF(df.DF):
         self._cderi_to_save = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
 # If _cderi is specified, the 3C-integral tensor will be read from this file
         self._cderi = None
+# Store the Gaussian density fitting part of the tensor in single precision
+# (see pyscf.df.DF).  The planewave part is computed in double precision.
+        self.single_precision = False
+        self.single_precision_fallback = 1e-4
+        self.precision_error = 0
+        self._dm_last = None
+        self._fallback_fp64 = False
         self._keys = set(self.__dict__.keys())
 
     @property
@@ -256,6 +268,8 @@ class MDF(df.DF):
             else:
                 kpts = self.kpts
         kpts = numpy.asarray(kpts)
+        if df._single_precision(self):
+            df.check_precision(self, dm)
 
         if kpts.shape == (3,):
             return mdf_jk.get_jk(self, dm, hermi, kpts, kpts_band, with_j,
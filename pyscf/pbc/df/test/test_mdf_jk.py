@@ -80,6 +80,22 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(ej0, 242.1884365696942 , 8)
         self.assertAlmostEqual(ek0, 280.70983914362148, 8)
 
+    def test_jk_single_precision(self):
+        numpy.random.seed(12)
+        nao = cell.nao_nr()
+        dm = numpy.random.random((nao,nao))
+        dm = dm + dm.T
+        jkdf = mdf.MDF(cell).set(auxbasis='weigend')
+        jkdf.gs = (5,)*3
+        jkdf.eta = 0.3
+        jkdf.single_precision = True
+        vj1, vk1 = jkdf.get_jk(dm, exxdiv=None)
+        self.assertTrue(0 < jkdf.precision_error < 1e-5)
+        ej1 = numpy.einsum('ij,ji->', vj1, dm)
+        ek1 = numpy.einsum('ij,ji->', vk1, dm)
+        self.assertAlmostEqual(ej1, 242.19367653513683, 3)
+        self.assertAlmostEqual(ek1, 280.28452000317401, 3)
+
     def test_j_kpts(self):
         numpy.random.seed(1)
         nao = cell.nao_nr()
@@ -15,7 +15,6 @@ See Also:
 import sys
 import time
 import numpy as np
-import h5py
 from pyscf.scf import hf
 from pyscf import lib
 from pyscf.lib import logger
@@ -261,6 +260,10 @@ class SCF(hf.SCF):
 
         self._keys = self._keys.union(['cell', 'exxdiv', 'with_df'])
 
+    def build(self, cell=None):
+        df.df.reset_precision(self.with_df)
+        return hf.SCF.build(self, cell)
+
     @property
     def kpt(self):
         return self.with_df.kpts.reshape(3)
@@ -432,8 +435,7 @@ class SCF(hf.SCF):
     def dump_chk(self, envs):
         hf.SCF.dump_chk(self, envs)
         if self.chkfile:
-            with h5py.File(self.chkfile) as fh5:
-                fh5['scf/kpt'] = self.kpt
+            lib.chkfile.dump(self.chkfile, 'scf/kpt', self.kpt)
         return self
 
     def _is_mem_enough(self):
@@ -17,7 +17,6 @@ import time
 from functools import reduce
 import numpy as np
 import scipy.linalg
-import h5py
 from pyscf.pbc.scf import hf as pbchf
 from pyscf import lib
 from pyscf.scf import hf
@@ -363,6 +362,7 @@ class KSCF(hf.SCF):
         return self
 
     def build(self, cell=None):
+        df.df.reset_precision(self.with_df)
         hf.SCF.build(self, cell)
         #if self.exxdiv == 'vcut_ws':
         #    self.precompute_exx()
@@ -532,8 +532,7 @@ class KSCF(hf.SCF):
     def dump_chk(self, envs):
         hf.SCF.dump_chk(self, envs)
         if self.chkfile:
-            with h5py.File(self.chkfile) as fh5:
-                fh5['scf/kpts'] = self.kpts
+            lib.chkfile.dump(self.chkfile, 'scf/kpts', self.kpts)
         return self
 
     def mulliken_meta(self, cell=None, dm=None, verbose=logger.DEBUG,
@@ -20,6 +20,7 @@ from pyscf import lib
 from pyscf.lib import logger
 from pyscf.pbc.scf import addons
 from pyscf.pbc.scf import chkfile
+from pyscf.pbc import df
 
 
 canonical_occ = canonical_occ_ = addons.canonical_occ_
@@ -284,6 +285,7 @@ class KUHF(mol_uhf.UHF, khf.KSCF):
     check_sanity = khf.KSCF.check_sanity
 
     def build(self, cell=None):
+        df.df.reset_precision(self.with_df)
         mol_uhf.UHF.build(self, cell)
         #if self.exxdiv == 'vcut_ws':
         #    self.precompute_exx()
@@ -113,6 +113,34 @@ class KnowValues(unittest.TestCase):
         e = kmf1.get_bands(kpts_bands)[0]
         self.assertAlmostEqual(finger(np.array(e)), -0.045547555445877741, 6)
 
+    def test_uhf_get_j(self):
+        # molecular UHF.get_j/get_k should not hide the PBC get_j/get_k
+        from pyscf.pbc.scf import uhf as pbcuhf
+        from pyscf.pbc import dft as pbcdft
+        ngs = 4
+        cell = make_primitive_cell(ngs)
+        kpts = cell.make_kpts((2,1,1))
+        kmf = kuhf.KUHF(cell, kpts)
+        dm = kmf.get_init_guess()
+        vj0, vk0 = kmf.get_jk(cell, dm, 1, kpts)
+        self.assertTrue(np.allclose(kmf.get_j(cell, dm, 1, kpts), vj0))
+        self.assertTrue(np.allclose(kmf.get_k(cell, dm, 1, kpts), vk0))
+
+        mf = pbcuhf.UHF(cell, kpts[1])
+        dm = mf.get_init_guess()
+        vj0, vk0 = mf.get_jk(cell, dm, 1, kpts[1])
+        self.assertTrue(np.allclose(mf.get_j(cell, dm, 1, kpts[1]), vj0))
+        self.assertTrue(np.allclose(mf.get_k(cell, dm, 1, kpts[1]), vk0))
+
+        mf = pbcdft.UKS(cell)
+        mf.xc = 'lda,vwn'
+        mf.max_cycle = 1
+        mf.kernel()
+        mf = pbcdft.KUKS(cell, kpts)
+        mf.xc = 'lda,vwn'
+        mf.max_cycle = 1
+        mf.kernel()
+
 if __name__ == '__main__':
     print("Full Tests for pbc.scf.khf")
     unittest.main()
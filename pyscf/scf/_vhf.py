@@ -3,7 +3,10 @@
 import sys
 import ctypes
 import _ctypes
+import hashlib
+import collections
 import numpy
+import h5py
 import pyscf.lib
 from pyscf import gto
 from pyscf.gto.moleintor import make_cintopt, make_loc, ascint3
@@ -21,6 +24,7 @@ class VHFOpt(object):
         self._intor = intor
         self._cintopt = pyscf.lib.c_null_ptr()
         self._dmcondname = dmcondname
+        self._qcondname = qcondname
         self.init_cvhf_direct(mol, intor, prescreen, qcondname)
 
     def init_cvhf_direct(self, mol, intor, prescreen, qcondname):
@@ -42,11 +46,40 @@ class VHFOpt(object):
         self._this.contents.fprescreen = _fpointer(prescreen)
 
         if prescreen != 'CVHFnoscreen':
-            fsetqcond = getattr(libcvhf, qcondname)
-            fsetqcond(self._this,
-                      c_atm.ctypes.data_as(ctypes.c_void_p), natm,
-                      c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
-                      c_env.ctypes.data_as(ctypes.c_void_p))
+            q_cond = qcond_cache.get(mol, intor, qcondname)
+            if q_cond is not None:
+                self.set_q_cond(q_cond)
+                return
+
+            q_cond, shls_mask = qcond_cache.get_nearest(mol, intor, qcondname)
+            if q_cond is not None:
+                # Only the shell pairs on the displaced atoms are updated
+                self.set_q_cond(q_cond)
+                libcvhf.CVHFupdatenr_direct_scf(
+                    self._this, shls_mask.ctypes.data_as(ctypes.c_void_p),
+                    c_atm.ctypes.data_as(ctypes.c_void_p), natm,
+                    c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
+                    c_env.ctypes.data_as(ctypes.c_void_p))
+            else:
+                fsetqcond = getattr(libcvhf, qcondname)
+                fsetqcond(self._this,
+                          c_atm.ctypes.data_as(ctypes.c_void_p), natm,
+                          c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
+                          c_env.ctypes.data_as(ctypes.c_void_p))
+            qcond_cache.put(mol, intor, qcondname, self.get_q_cond())
+
+    def get_q_cond(self):
+        '''A copy of the screening table (Schwarz bounds of shell pairs)'''
+        nbas = self._this.contents.nbas
+        ptr = ctypes.cast(self._this.contents.q_cond,
+                          ctypes.POINTER(ctypes.c_double))
+        size = nbas * nbas * _QCOND_NSET.get(self._qcondname, 1)
+        return numpy.ctypeslib.as_array(ptr, shape=(size,)).copy()
+
+    def set_q_cond(self, q_cond):
+        q_cond = numpy.asarray(q_cond, dtype=numpy.double, order='C')
+        libcvhf.CVHFset_q_cond(self._this, q_cond.ctypes.data_as(ctypes.c_void_p),
+                               ctypes.c_int(q_cond.size))
 
     @property
     def direct_scf_tol(self):
@@ -76,6 +109,113 @@ class VHFOpt(object):
                    c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
                    c_env.ctypes.data_as(ctypes.c_void_p))
 
+# Number of nbas x nbas tables a q_cond initializer allocates
+_QCOND_NSET = {'CVHFrkbssll_direct_scf': 2}
+# The initializers which support the partial update of q_cond
+_QCOND_UPDATABLE = ('CVHFsetnr_direct_scf',)
+
+class QCondCache(object):
+    '''LRU cache of the integral screening tables (q_cond) of VHFOpt.
+
+    The tables are keyed by the basis, the geometry, the integral and the
+    initializer of q_cond.  They are shared by all SCF objects (and the
+    post-SCF methods which call mf.get_jk) of the same molecule, and by the
+    steps of a PES scanner.  When the geometry changes but the basis is the
+    same, the table of the last geometry is updated for the shell pairs on
+    the displaced atoms only.
+
+    Attributes:
+        max_entries : int
+            Number of tables kept in memory.  Set it to 0 to disable the cache.
+        h5file : str
+            If given, the tables are saved in this HDF5 file as well and the
+            tables missing in memory are looked up in the file.
+    '''
+    def __init__(self, max_entries=8, h5file=None):
+        self.max_entries = max_entries
+        self.h5file = h5file
+        self._data = collections.OrderedDict()
+
+    def clear(self):
+        self._data.clear()
+
+    def _basis_key(self, mol, intor, qcondname):
+        atm = numpy.array(mol._atm, copy=True)
+        env = numpy.array(mol._env, copy=True)
+        for ptr in atm[:,gto.PTR_COORD]:
+            env[ptr:ptr+3] = 0
+        m = hashlib.md5()
+        m.update(intor.encode())
+        m.update(str(qcondname).encode())
+        m.update(atm.tobytes())
+        m.update(numpy.asarray(mol._bas).tobytes())
+        m.update(env.tobytes())
+        return m.hexdigest()
+
+    def _geom_key(self, mol):
+        return hashlib.md5(_atom_coords(mol).tobytes()).hexdigest()
+
+    def get(self, mol, intor, qcondname):
+        if not self.max_entries:
+            return None
+        key = (self._basis_key(mol, intor, qcondname), self._geom_key(mol))
+        if key in self._data:
+            coords, q_cond = self._data.pop(key)
+            self._data[key] = (coords, q_cond)
+            return q_cond
+        elif self.h5file is not None:
+            with h5py.File(self.h5file, 'a') as f:
+                path = '/'.join(key)
+                if path in f:
+                    q_cond = numpy.asarray(f[path])
+                    self._add(key, _atom_coords(mol), q_cond)
+                    return q_cond
+        return None
+
+    def get_nearest(self, mol, intor, qcondname):
+        '''The most recent table of the same basis on a different geometry,
+        and the mask of the shells whose atoms were displaced.
+        '''
+        if not self.max_entries or qcondname not in _QCOND_UPDATABLE:
+            return None, None
+        bas_key = self._basis_key(mol, intor, qcondname)
+        coords = _atom_coords(mol)
+        for key in reversed(self._data):
+            if key[0] == bas_key:
+                coords_last, q_cond = self._data[key]
+                moved = abs(coords - coords_last).max(axis=1) > 0
+                if moved.all():
+                    return None, None
+                shls_mask = numpy.asarray(moved[mol._bas[:,gto.ATOM_OF]],
+                                          dtype=numpy.int8)
+                return q_cond, shls_mask
+        return None, None
+
+    def put(self, mol, intor, qcondname, q_cond):
+        if not self.max_entries:
+            return
+        key = (self._basis_key(mol, intor, qcondname), self._geom_key(mol))
+        self._add(key, _atom_coords(mol), q_cond)
+        if self.h5file is not None:
+            with h5py.File(self.h5file, 'a') as f:
+                path = '/'.join(key)
+                if path not in f:
+                    f[path] = q_cond
+
+    def _add(self, key, coords, q_cond):
+        self._data.pop(key, None)
+        self._data[key] = (coords, q_cond)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+def _atom_coords(mol):
+    ptr = numpy.asarray(mol._atm)[:,gto.PTR_COORD]
+    env = numpy.asarray(mol._env)
+    return numpy.array([env[p:p+3] for p in ptr]).reshape(-1,3)
+
+qcond_cache = QCondCache()
+
+
 class _CVHFOpt(ctypes.Structure):
     _fields_ = [('nbas', ctypes.c_int),
                 ('_padding', ctypes.c_int),
@@ -140,7 +280,15 @@ def incore(eri, dm, hermi=0):
 
 # use int2e_sph as cintor, CVHFnrs8_ij_s2kl, CVHFnrs8_jk_s2il as fjk to call
 # direct_mapdm
-def direct(dms, atm, bas, env, vhfopt=None, hermi=0, cart=False):
+# All density matrices share one pass over the screened shell quartets.  The
+# integrals are screened against the max of the density matrices over the
+# batch.  With with_j=False or with_k=False, the J (or K) contraction is
+# skipped and the integrals are screened against the K (or J) pattern only.
+# prescreen (the name of a C function) overrides the prescreen of vhfopt for
+# this call only.  The function always returns the tuple (vj, vk), vj or vk
+# being None if it is not requested.
+def direct(dms, atm, bas, env, vhfopt=None, hermi=0, cart=False,
+           with_j=True, with_k=True, prescreen=None):
     c_atm = numpy.asarray(atm, dtype=numpy.int32, order='C')
     c_bas = numpy.asarray(bas, dtype=numpy.int32, order='C')
     c_env = numpy.asarray(env, dtype=numpy.double, order='C')
@@ -177,37 +325,60 @@ def direct(dms, atm, bas, env, vhfopt=None, hermi=0, cart=False):
         fvk = _fpointer('CVHFnrs8_li_s2kj')
     else:
         fvk = _fpointer('CVHFnrs8_li_s1kj')
-    vjk = numpy.empty((2,n_dm,nao,nao))
-    fjk = (ctypes.c_void_p*(2*n_dm))()
-    dmsptr = (ctypes.c_void_p*(2*n_dm))()
-    vjkptr = (ctypes.c_void_p*(2*n_dm))()
-    for i in range(n_dm):
-        dmsptr[i] = dms[i].ctypes.data_as(ctypes.c_void_p)
-        vjkptr[i] = vjk[0,i].ctypes.data_as(ctypes.c_void_p)
-        fjk[i] = fvj
-    for i in range(n_dm):
-        dmsptr[n_dm+i] = dms[i].ctypes.data_as(ctypes.c_void_p)
-        vjkptr[n_dm+i] = vjk[1,i].ctypes.data_as(ctypes.c_void_p)
-        fjk[n_dm+i] = fvk
+
+    jkops = []
+    if with_j:
+        jkops.append(fvj)
+    if with_k:
+        jkops.append(fvk)
+    njk = len(jkops)
+    vjk = numpy.empty((njk,n_dm,nao,nao))
+    fjk = (ctypes.c_void_p*(njk*n_dm))()
+    dmsptr = (ctypes.c_void_p*(njk*n_dm))()
+    vjkptr = (ctypes.c_void_p*(njk*n_dm))()
+    for k, f1 in enumerate(jkops):
+        for i in range(n_dm):
+            dmsptr[k*n_dm+i] = dms[i].ctypes.data_as(ctypes.c_void_p)
+            vjkptr[k*n_dm+i] = vjk[k,i].ctypes.data_as(ctypes.c_void_p)
+            fjk[k*n_dm+i] = f1
     shls_slice = (ctypes.c_int*8)(*([0, c_bas.shape[0]]*4))
     ao_loc = make_loc(bas, intor)
 
+    if (prescreen is None and vhfopt is not None and njk == 1 and
+        vhfopt._this.contents.fprescreen == _fpointer('CVHFnrs8_prescreen').value):
+        if with_j:
+            prescreen = 'CVHFnrs8_vj_prescreen'
+        else:
+            prescreen = 'CVHFnrs8_vk_prescreen'
+    if prescreen is not None and vhfopt is not None:
+        # A private copy of the optimizer (sharing q_cond and dm_cond) which
+        # carries the prescreen function.  The shared vhfopt is not modified.
+        cvhfopt = ctypes.pointer(_CVHFOpt.from_buffer_copy(vhfopt._this.contents))
+        cvhfopt.contents.fprescreen = _fpointer(prescreen)
     fdrv(cintor, fdot, fjk, dmsptr, vjkptr,
-         ctypes.c_int(n_dm*2), ctypes.c_int(1),
+         ctypes.c_int(n_dm*njk), ctypes.c_int(1),
          shls_slice, ao_loc.ctypes.data_as(ctypes.c_void_p), cintopt, cvhfopt,
          c_atm.ctypes.data_as(ctypes.c_void_p), natm,
          c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
          c_env.ctypes.data_as(ctypes.c_void_p))
 
-    # vj must be symmetric
-    for idm in range(n_dm):
-        vjk[0,idm] = pyscf.lib.hermi_triu(vjk[0,idm], 1)
-    if hermi != 0: # vk depends
+    vj = vk = None
+    if with_j:
+        vj = vjk[0]
+        # vj must be symmetric
         for idm in range(n_dm):
-            vjk[1,idm] = pyscf.lib.hermi_triu(vjk[1,idm], hermi)
+            vj[idm] = pyscf.lib.hermi_triu(vj[idm], 1)
+    if with_k:
+        vk = vjk[njk-1]
+        if hermi != 0: # vk depends
+            for idm in range(n_dm):
+                vk[idm] = pyscf.lib.hermi_triu(vk[idm], hermi)
     if n_dm == 1:
-        vjk = vjk.reshape(2,nao,nao)
-    return vjk
+        if vj is not None:
+            vj = vj.reshape(nao,nao)
+        if vk is not None:
+            vk = vk.reshape(nao,nao)
+    return vj, vk
 
 # call all fjk for each dm, the return array has len(dms)*len(jkdescript)*ncomp components
 # jkdescript: 'ij->s1kl', 'kl->s2ij', ...
@@ -4,6 +4,7 @@
 #
 
 import h5py
+from pyscf import lib
 from pyscf.lib.chkfile import load_chkfile_key, load
 from pyscf.lib.chkfile import dump_chkfile_key, dump, save
 from pyscf.lib.chkfile import load_mol, save_mol
@@ -15,9 +16,10 @@ def dump_scf(mol, chkfile, e_tot, mo_energy, mo_coeff, mo_occ,
              overwrite_mol=True):
     '''save temporary results'''
     if h5py.is_hdf5(chkfile) and not overwrite_mol:
-        with h5py.File(chkfile) as fh5:
-            if 'mol' not in fh5:
-                fh5['mol'] = mol.dumps()
+        with lib.chkfile._h5file(chkfile, 'a') as fh5:
+            has_mol = 'mol' in fh5
+        if not has_mol:
+            save_mol(mol, chkfile)
     else:
         save_mol(mol, chkfile)
 
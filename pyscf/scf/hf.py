@@ -21,6 +21,7 @@ from pyscf.scf import _vhf
 from pyscf.scf import chkfile
 
 
+@lib.profiler.timed('scf')
 def kernel(mf, conv_tol=1e-10, conv_tol_grad=None,
            dump_chk=True, dm0=None, callback=None, conv_check=True, **kwargs):
     '''kernel: the SCF driver.
@@ -119,67 +120,92 @@ Keyword argument "init_dm" is replaced by "dm0"''')
     e_tot = mf.energy_tot(dm, h1e, vhf)
     logger.info(mf, 'init E= %.15g', e_tot)
 
+    chk_writer = None
     if dump_chk:
         # Explicit overwrite the mol object in chkfile
         # Note in pbc.scf, mf.mol == mf.cell, cell is saved under key "mol"
         chkfile.save_mol(mol, mf.chkfile)
-
-    scf_conv = False
-    cycle = 0
-    cput1 = logger.timer(mf, 'initialize scf', *cput0)
-    while not scf_conv and cycle < max(1, mf.max_cycle):
-        dm_last = dm
-        last_hf_e = e_tot
-
-        fock = mf.get_fock(h1e, s1e, vhf, dm, cycle, mf_diis)
-        mo_energy, mo_coeff = mf.eig(fock, s1e)
-        mo_occ = mf.get_occ(mo_energy, mo_coeff)
-        dm = mf.make_rdm1(mo_coeff, mo_occ)
-        # attach mo_coeff and mo_occ to dm to improve DFT get_veff efficiency
-        dm = lib.tag_array(dm, mo_coeff=mo_coeff, mo_occ=mo_occ)
-        vhf = mf.get_veff(mol, dm, dm_last, vhf)
-        e_tot = mf.energy_tot(dm, h1e, vhf)
-
-        fock = mf.get_fock(h1e, s1e, vhf, dm)  # = h1e + vhf, no DIIS
-        norm_gorb = numpy.linalg.norm(mf.get_grad(mo_coeff, mo_occ, fock))
-        norm_ddm = numpy.linalg.norm(dm-dm_last)
-        logger.info(mf, 'cycle= %d E= %.15g  delta_E= %4.3g  |g|= %4.3g  |ddm|= %4.3g',
-                    cycle+1, e_tot, e_tot-last_hf_e, norm_gorb, norm_ddm)
-
-        if (abs(e_tot-last_hf_e) < conv_tol and norm_gorb < conv_tol_grad):
-            scf_conv = True
-
-        if dump_chk:
-            mf.dump_chk(locals())
-
-        if callable(callback):
-            callback(locals())
-
-        cput1 = logger.timer(mf, 'cycle= %d'%(cycle+1), *cput1)
-        cycle += 1
-
-    if conv_check:
-        # An extra diagonalization, to remove level shift
-        #fock = mf.get_fock(h1e, s1e, vhf, dm)  # = h1e + vhf
-        mo_energy, mo_coeff = mf.eig(fock, s1e)
-        mo_occ = mf.get_occ(mo_energy, mo_coeff)
-        dm, dm_last = mf.make_rdm1(mo_coeff, mo_occ), dm
-        dm = lib.tag_array(dm, mo_coeff=mo_coeff, mo_occ=mo_occ)
-        vhf = mf.get_veff(mol, dm, dm_last, vhf)
-        e_tot, last_hf_e = mf.energy_tot(dm, h1e, vhf), e_tot
-
-        fock = mf.get_fock(h1e, s1e, vhf, dm)
-        norm_gorb = numpy.linalg.norm(mf.get_grad(mo_coeff, mo_occ, fock))
-        norm_ddm = numpy.linalg.norm(dm-dm_last)
-        scf_conv = (abs(e_tot-last_hf_e) < conv_tol*10 and
-                    norm_gorb < conv_tol_grad*3)
-        logger.info(mf, 'Extra cycle  E= %.15g  delta_E= %4.3g  |g|= %4.3g  |ddm|= %4.3g',
-                    e_tot, e_tot-last_hf_e, norm_gorb, norm_ddm)
-        if dump_chk:
-            mf.dump_chk(locals())
+        if mf.chkfile and getattr(mf, 'chkfile_async', False):
+            # Keep chkfile open during the SCF iterations.  mf.dump_chk
+            # writes the changed datasets on a background thread.
+            chk_writer = lib.chkfile.open_writer(mf.chkfile)
+
+    try:
+        scf_conv = False
+        cycle = 0
+        cput1 = logger.timer(mf, 'initialize scf', *cput0)
+        while not scf_conv and cycle < max(1, mf.max_cycle):
+            dm_last = dm
+            last_hf_e = e_tot
+
+            with lib.profiler.region('get_fock'):
+                fock = mf.get_fock(h1e, s1e, vhf, dm, cycle, mf_diis)
+            with lib.profiler.region('eig'):
+                mo_energy, mo_coeff = mf.eig(fock, s1e)
+            mo_occ = mf.get_occ(mo_energy, mo_coeff)
+            dm = mf.make_rdm1(mo_coeff, mo_occ)
+            # attach mo_coeff and mo_occ to dm to improve DFT get_veff efficiency
+            dm = lib.tag_array(dm, mo_coeff=mo_coeff, mo_occ=mo_occ)
+            with lib.profiler.region('get_veff'):
+                if _full_rebuild(mf, cycle):
+                    # Discard the accumulated error of the incremental Fock build
+                    vhf = mf.get_veff(mol, dm)
+                else:
+                    vhf = mf.get_veff(mol, dm, dm_last, vhf)
+            e_tot = mf.energy_tot(dm, h1e, vhf)
+
+            fock = mf.get_fock(h1e, s1e, vhf, dm)  # = h1e + vhf, no DIIS
+            norm_gorb = numpy.linalg.norm(mf.get_grad(mo_coeff, mo_occ, fock))
+            norm_ddm = numpy.linalg.norm(dm-dm_last)
+            logger.info(mf, 'cycle= %d E= %.15g  delta_E= %4.3g  |g|= %4.3g  |ddm|= %4.3g',
+                        cycle+1, e_tot, e_tot-last_hf_e, norm_gorb, norm_ddm)
+
+            if (abs(e_tot-last_hf_e) < conv_tol and norm_gorb < conv_tol_grad):
+                scf_conv = True
+
+            if dump_chk:
+                with lib.profiler.region('dump_chk'):
+                    mf.dump_chk(locals())
+
+            if callable(callback):
+                callback(locals())
+
+            cput1 = logger.timer(mf, 'cycle= %d'%(cycle+1), *cput1)
+            cycle += 1
+
+        if conv_check:
+            # An extra diagonalization, to remove level shift
+            #fock = mf.get_fock(h1e, s1e, vhf, dm)  # = h1e + vhf
+            mo_energy, mo_coeff = mf.eig(fock, s1e)
+            mo_occ = mf.get_occ(mo_energy, mo_coeff)
+            dm, dm_last = mf.make_rdm1(mo_coeff, mo_occ), dm
+            dm = lib.tag_array(dm, mo_coeff=mo_coeff, mo_occ=mo_occ)
+            vhf = mf.get_veff(mol, dm, dm_last, vhf)
+            e_tot, last_hf_e = mf.energy_tot(dm, h1e, vhf), e_tot
+
+            fock = mf.get_fock(h1e, s1e, vhf, dm)
+            norm_gorb = numpy.linalg.norm(mf.get_grad(mo_coeff, mo_occ, fock))
+            norm_ddm = numpy.linalg.norm(dm-dm_last)
+            scf_conv = (abs(e_tot-last_hf_e) < conv_tol*10 and
+                        norm_gorb < conv_tol_grad*3)
+            logger.info(mf, 'Extra cycle  E= %.15g  delta_E= %4.3g  |g|= %4.3g  |ddm|= %4.3g',
+                        e_tot, e_tot-last_hf_e, norm_gorb, norm_ddm)
+            if dump_chk:
+                mf.dump_chk(locals())
+    finally:
+        # Close the chkfile even if the SCF iterations are interrupted
+        if chk_writer is not None:
+            chk_writer.close()
     logger.timer(mf, 'scf_cycle', *cput0)
     return scf_conv, e_tot, mo_energy, mo_coeff, mo_occ
 
+def _full_rebuild(mf, cycle):
+    '''Whether to build the HF potential from the full density matrix rather
+    than the density difference in the given SCF cycle'''
+    nsteps = getattr(mf, 'rebuild_nsteps', 0)
+    return (mf.direct_scf and nsteps is not None and nsteps > 0 and
+            (cycle+1) % nsteps == 0)
+
 
 def energy_elec(mf, dm=None, h1e=None, vhf=None):
     r'''Electronic part of Hartree-Fock energy, for given core hamiltonian and
@@ -528,7 +554,7 @@ def dot_eri_dm(eri, dm, hermi=0):
     return vj, vk
 
 
-def get_jk(mol, dm, hermi=1, vhfopt=None):
+def get_jk(mol, dm, hermi=1, vhfopt=None, with_j=True, with_k=True):
     '''Compute J, K matrices for the given density matrix
 
     Args:
@@ -548,11 +574,17 @@ def get_jk(mol, dm, hermi=1, vhfopt=None):
         vhfopt :
             A class which holds precomputed quantities to optimize the
             computation of J, K matrices
+        with_j : boolean
+            Whether to compute J matrices
+        with_k : boolean
+            Whether to compute K matrices
 
     Returns:
         Depending on the given dm, the function returns one J and one K matrix,
         or a list of J matrices and a list of K matrices, corresponding to the
-        input density matrices.
+        input density matrices.  All density matrices are contracted in one
+        pass over the integrals.  vj (or vk) is None if with_j (or with_k) is
+        False.
 
     Examples:
 
@@ -566,9 +598,15 @@ def get_jk(mol, dm, hermi=1, vhfopt=None):
     '''
     dm = numpy.asarray(dm, order='C')
     nao = dm.shape[-1]
-    vj, vk = _vhf.direct(dm.reshape(-1,nao,nao), mol._atm, mol._bas, mol._env,
-                         vhfopt=vhfopt, hermi=hermi, cart=mol.cart)
-    return vj.reshape(dm.shape), vk.reshape(dm.shape)
+    with lib.profiler.region('get_jk'):
+        vj, vk = _vhf.direct(dm.reshape(-1,nao,nao), mol._atm, mol._bas,
+                             mol._env, vhfopt=vhfopt, hermi=hermi,
+                             cart=mol.cart, with_j=with_j, with_k=with_k)
+    if with_j:
+        vj = vj.reshape(dm.shape)
+    if with_k:
+        vk = vk.reshape(dm.shape)
+    return vj, vk
 
 
 def get_veff(mol, dm, dm_last=None, vhf_last=None, hermi=1, vhfopt=None):
@@ -1027,6 +1065,13 @@ class SCF(lib.StreamObject):
             Allowed memory in MB.  Default equals to :class:`Mole.max_memory`
         chkfile : str
             checkpoint file to save MOs, orbital energies etc.
+        chkfile_async : bool
+            Whether to keep the chkfile open during the SCF iterations and
+            write the changed datasets on a background thread (see
+            :class:`lib.chkfile.ChkfileWriter`).  The file stays open for
+            writing until the SCF finishes.  Other processes which open the
+            chkfile in the meantime fail on the HDF5 file lock.  Default is
+            False.
         conv_tol : float
             converge threshold.  Default is 1e-10
         conv_tol_grad : float
@@ -1050,6 +1095,13 @@ class SCF(lib.StreamObject):
             Direct SCF is used by default.
         direct_scf_tol : float
             Direct SCF cutoff threshold.  Default is 1e-13.
+        rebuild_nsteps : int
+            In direct SCF, the HF potential is updated incrementally with the
+            density difference between two cycles, and the integrals are
+            screened against the density difference.  The potential is
+            rebuilt from the full density matrix every rebuild_nsteps cycles
+            to remove the accumulated numerical error.  Setting it to 0
+            disables the full rebuild.  Default is 8.
         callback : function(envs_dict) => None
             callback function takes one dict as the argument which is
             generated by the builtin function :func:`locals`, so that the
@@ -1093,6 +1145,7 @@ class SCF(lib.StreamObject):
 # filename to self.chkfile
         self._chkfile = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
         self.chkfile = self._chkfile.name
+        self.chkfile_async = False
         self.conv_tol = 1e-9
         self.conv_tol_grad = None
         self.max_cycle = 50
@@ -1109,6 +1162,7 @@ class SCF(lib.StreamObject):
         self.level_shift = 0
         self.direct_scf = True
         self.direct_scf_tol = 1e-13
+        self.rebuild_nsteps = 8
         self.conv_check = True
 ##################################################
 # don't modify the following attributes, they are not input options
@@ -1153,6 +1207,7 @@ class SCF(lib.StreamObject):
         logger.info(self, 'direct_scf = %s', self.direct_scf)
         if self.direct_scf:
             logger.info(self, 'direct_scf_tol = %g', self.direct_scf_tol)
+            logger.info(self, 'rebuild_nsteps = %s', self.rebuild_nsteps)
         if self.chkfile:
             logger.info(self, 'chkfile to save SCF result = %s', self.chkfile)
         logger.info(self, 'max_memory %d MB (current use %d MB)',
@@ -1329,7 +1384,7 @@ class SCF(lib.StreamObject):
         return opt
 
     @lib.with_doc(get_jk.__doc__)
-    def get_jk(self, mol=None, dm=None, hermi=1):
+    def get_jk(self, mol=None, dm=None, hermi=1, with_j=True, with_k=True):
         if mol is None: mol = self.mol
         if dm is None: dm = self.make_rdm1()
         cpu0 = (time.clock(), time.time())
@@ -1337,9 +1392,14 @@ class SCF(lib.StreamObject):
             self.opt = self.init_direct_scf(mol)
         dm = numpy.asarray(dm)
         nao = dm.shape[-1]
-        vj, vk = get_jk(mol, dm.reshape(-1,nao,nao), hermi, self.opt)
+        vj, vk = get_jk(mol, dm.reshape(-1,nao,nao), hermi, self.opt,
+                        with_j, with_k)
         logger.timer(self, 'vj and vk', *cpu0)
-        return vj.reshape(dm.shape), vk.reshape(dm.shape)
+        if with_j:
+            vj = vj.reshape(dm.shape)
+        if with_k:
+            vk = vk.reshape(dm.shape)
+        return vj, vk
 
     def get_j(self, mol=None, dm=None, hermi=1):
         '''Compute J matrix for the given density matrix.
@@ -1477,7 +1537,7 @@ class RHF(SCF):
         SCF.__init__(self, mol)
 
     @lib.with_doc(get_jk.__doc__)
-    def get_jk(self, mol=None, dm=None, hermi=1):
+    def get_jk(self, mol=None, dm=None, hermi=1, with_j=True, with_k=True):
 # Note the incore version, which initializes an _eri array in memory.
         if mol is None: mol = self.mol
         if dm is None: dm = self.make_rdm1()
@@ -1486,9 +1546,19 @@ class RHF(SCF):
                 self._eri = mol.intor('int2e', aosym='s8')
             vj, vk = dot_eri_dm(self._eri, dm, hermi)
         else:
-            vj, vk = SCF.get_jk(self, mol, dm, hermi)
+            vj, vk = SCF.get_jk(self, mol, dm, hermi, with_j, with_k)
         return vj, vk
 
+    def get_j(self, mol=None, dm=None, hermi=1):
+        '''Compute J matrix for the given density matrix.
+        '''
+        return self.get_jk(mol, dm, hermi, with_k=False)[0]
+
+    def get_k(self, mol=None, dm=None, hermi=1):
+        '''Compute K matrix for the given density matrix.
+        '''
+        return self.get_jk(mol, dm, hermi, with_j=False)[1]
+
     def convert_from_(self, mf):
         '''Convert given mean-field object to RHF/ROHF'''
         from pyscf.scf import addons
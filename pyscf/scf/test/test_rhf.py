@@ -292,6 +292,12 @@ class KnowValues(unittest.TestCase):
         dip = mf.dip_moment(unit_symbol='au')
         self.assertTrue(numpy.allclose(dip, [0.00000, 0.00000, 0.80985])) 
 
+    def test_rebuild_nsteps(self):
+        mf1 = scf.RHF(mol).set(conv_tol=1e-10, rebuild_nsteps=1)
+        self.assertAlmostEqual(mf1.kernel(), mf.e_tot, 9)
+        mf1 = scf.RHF(mol).set(conv_tol=1e-10, rebuild_nsteps=0)
+        self.assertAlmostEqual(mf1.kernel(), mf.e_tot, 9)
+
 if __name__ == "__main__":
     print("Full Tests for rhf")
     unittest.main()
@@ -140,6 +140,47 @@ class KnowValues(unittest.TestCase):
                                  (dm,), 1, mol._atm, mol._bas, mol._env)
         self.assertTrue(numpy.allclose(vk0,vk1))
 
+    def test_direct_j_or_k(self):
+        numpy.random.seed(1)
+        dms = numpy.random.random((3,nao,nao))
+        dms = dms + dms.transpose(0,2,1)
+        opt = mf.init_direct_scf(mol)
+        vj0, vk0 = scf.hf.get_jk(mol, dms, hermi=1, vhfopt=opt)
+        vj1 = scf.hf.get_jk(mol, dms, hermi=1, vhfopt=opt, with_k=False)[0]
+        vk1 = scf.hf.get_jk(mol, dms, hermi=1, vhfopt=opt, with_j=False)[1]
+        self.assertTrue(numpy.allclose(vj0, vj1))
+        self.assertTrue(numpy.allclose(vk0, vk1))
+        vj1, vk1 = scf.hf.get_jk(mol, dms[0], hermi=1, with_k=False)
+        self.assertTrue(vk1 is None)
+        self.assertTrue(numpy.allclose(vj0[0], vj1))
+        # the shared optimizer is not modified
+        self.assertEqual(opt._this.contents.fprescreen,
+                         _vhf._fpointer('CVHFnrs8_prescreen').value)
+        vjk = _vhf.direct(dms, mol._atm, mol._bas, mol._env, vhfopt=opt, hermi=1)
+        self.assertTrue(isinstance(vjk, tuple))
+        vjk = _vhf.direct(dms, mol._atm, mol._bas, mol._env, vhfopt=opt,
+                          hermi=1, with_k=False)
+        self.assertTrue(isinstance(vjk, tuple))
+        self.assertTrue(vjk[1] is None)
+
+    def test_qcond_cache(self):
+        def make_opt(mol):
+            return _vhf.VHFOpt(mol, 'int2e_sph', 'CVHFnrs8_prescreen',
+                               'CVHFsetnr_direct_scf', 'CVHFsetnr_direct_scf_dm')
+        _vhf.qcond_cache.clear()
+        q0 = make_opt(mol).get_q_cond()
+        self.assertEqual(len(_vhf.qcond_cache._data), 1)
+        self.assertTrue(numpy.allclose(make_opt(mol).get_q_cond(), q0))
+        self.assertEqual(len(_vhf.qcond_cache._data), 1)
+
+        mol1 = mol.copy()
+        mol1.atom = [['O', (0, 0, 0)], ['H', (0, -.757, .587)], ['H', (0, .8, .6)]]
+        mol1.build(False, False)
+        q1 = make_opt(mol1).get_q_cond()
+        _vhf.qcond_cache.clear()
+        self.assertTrue(numpy.allclose(make_opt(mol1).get_q_cond(), q1))
+        self.assertFalse(numpy.allclose(q0, q1))
+
 
 if __name__ == "__main__":
     print("Full Tests for _vhf")
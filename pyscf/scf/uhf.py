@@ -677,7 +677,7 @@ class UHF(hf.SCF):
         if chkfile is None: chkfile = self.chkfile
         return init_guess_by_chkfile(self.mol, chkfile, project=project)
 
-    def get_jk(self, mol=None, dm=None, hermi=1):
+    def get_jk(self, mol=None, dm=None, hermi=1, with_j=True, with_k=True):
         '''Coulomb (J) and exchange (K)
 
         Args:
@@ -691,8 +691,18 @@ class UHF(hf.SCF):
                 self._eri = mol.intor('int2e', aosym='s8')
             vj, vk = hf.dot_eri_dm(self._eri, dm, hermi)
         else:
-            vj, vk = hf.SCF.get_jk(self, mol, dm, hermi)
-        return numpy.asarray(vj), numpy.asarray(vk)
+            vj, vk = hf.SCF.get_jk(self, mol, dm, hermi, with_j, with_k)
+        if vj is not None:
+            vj = numpy.asarray(vj)
+        if vk is not None:
+            vk = numpy.asarray(vk)
+        return vj, vk
+
+    def get_j(self, mol=None, dm=None, hermi=1):
+        return self.get_jk(mol, dm, hermi, with_k=False)[0]
+
+    def get_k(self, mol=None, dm=None, hermi=1):
+        return self.get_jk(mol, dm, hermi, with_j=False)[1]
 
     @lib.with_doc(get_veff.__doc__)
     def get_veff(self, mol=None, dm=None, dm_last=0, vhf_last=0, hermi=1):